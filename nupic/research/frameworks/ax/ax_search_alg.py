@@ -29,12 +29,18 @@ logger = logging.getLogger(__name__)
 
 class NonblockingAxSearch(SuggestionAlgorithm):
     def __init__(self, ax_frontend, metric_function=None, max_concurrent=40,
-                 m_suggestions_allowed_before_nth_completion=None, **kwargs):
+                 m_suggestions_allowed_before_nth_completion=None,
+                 max_batch_size=None, **kwargs):
         """
         @param metric_function (function or None)
         An optional function that takes the trial's result and returns a result
         for Ax.
 
+        @param max_batch_size (int or None)
+        Candidates are generated in batches sized to the number of free trial
+        slots and prefetched by the frontend. This optionally caps the size of
+        these batches.
+
         @param m_suggestions_allowed_before_nth_completion (None or pair of ints)
         Useful for making sure you don't try to generate a non-random set of
         parameters before any trials have completed. (Ax will throw an error if
@@ -54,6 +60,7 @@ class NonblockingAxSearch(SuggestionAlgorithm):
         self._m_suggestions_allowed_before_nth_completion = (
             m_suggestions_allowed_before_nth_completion
         )
+        self._max_batch_size = max_batch_size
 
         super().__init__(**kwargs)
 
@@ -61,12 +68,17 @@ class NonblockingAxSearch(SuggestionAlgorithm):
         if self._num_live_trials() >= self._max_concurrent:
             return None
 
+        num_needed = self._max_concurrent - self._num_live_trials()
         if self._m_suggestions_allowed_before_nth_completion is not None:
             m, n = self._m_suggestions_allowed_before_nth_completion
-            if self._num_completed < n and self._num_suggested >= m:
-                return None
+            if self._num_completed < n:
+                if self._num_suggested >= m:
+                    return None
+                num_needed = min(num_needed, m - self._num_suggested)
+        if self._max_batch_size is not None:
+            num_needed = min(num_needed, self._max_batch_size)
 
-        success, v = ray.get(self._ax_frontend.get_next_trial.remote())
+        success, v = ray.get(self._ax_frontend.get_next_trial.remote(num_needed))
         if success:
             parameters, trial_index = v
             self._live_index_mapping[trial_id] = trial_index
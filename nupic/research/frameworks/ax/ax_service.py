@@ -19,33 +19,68 @@
 # http://numenta.org/licenses/
 # ----------------------------------------------------------------------
 
+import json
+import os
 from collections import deque
 
+import numpy as np
 import ray
 import torch
 
 
+def _json_default(obj):
+    if isinstance(obj, np.generic):
+        return obj.item()
+    raise TypeError(f"{type(obj).__name__} is not JSON serializable")
+
+
 class AxService:
     """
     This will often be a subclass of AxClient or CoreAxClient that simply
     overrides its __init__ method. The __init__ method takes one parameter: the
     serialization file path. The user can choose whether or not to support
     serialization.
+
+    Generated trials are prefetched and stay candidates until the frontend
+    hands them out, at which point they are marked as running.
+
+    Rather than saving a full snapshot after every generated, dispatched or
+    completed trial, these events are appended to a journal next to the
+    serialized file ("<serialized_filepath>.journal"). A full snapshot is only
+    saved every `snapshot_every` events, after which the journal is cleared.
+    When the client is recreated from its snapshot, the journal is replayed on
+    top of it.
+
+    Generated trials can only be journaled if the client implements
+    `generation_to_json`, returning a json description of the trials created
+    by its last `get_next_trials` call, and `attach_generation`, recreating
+    them (see CoreAxClient). Otherwise a full snapshot is saved after every
+    generation.
     """
     def __init__(self, ax_client_class, serialized_filepath=None,  # NOQA: C901
-                 actor_resources=None):
+                 actor_resources=None, snapshot_every=100):
         """
         @param actor_resources (dict or None)
         Custom resources for the backend and frontend. This is useful for
         ensuring that the AxClient runs on a reliable machine (e.g. the head EC2
         on-demand instance rather than a worker spot instance).
+
+        @param snapshot_every (int)
+        Number of journaled events between two full snapshots.
         """
+        journal_filepath = (serialized_filepath + ".journal"
+                            if serialized_filepath is not None else None)
+
         @ray.remote(num_gpus=(1 if torch.cuda.is_available() else 0),
                     resources=actor_resources)
         class AxBackend(ax_client_class):
             def __init__(self):
                 super().__init__(serialized_filepath)
                 self.frontend = None
+                self.num_journal_entries = 0
+                if journal_filepath is not None and os.path.exists(
+                        journal_filepath):
+                    self._replay_journal()
 
             def add_frontend(self, frontend):
                 self.frontend = frontend
@@ -63,22 +98,91 @@ class AxService:
             def _absorb_results_queue(self):
                 results = ray.get(self.frontend.get_and_clear_results.remote())
                 for trial_index, raw_data, metadata in results:
+                    self._mark_dispatched(trial_index)
                     self.complete_trial(trial_index, raw_data, metadata)
-                self.save()
+                self._journal([("completed", trial_index, raw_data, metadata)
+                               for trial_index, raw_data, metadata in results])
 
             def notify_results_available(self):
                 self._absorb_results_queue()
 
-            def notify_params_needed(self):
+            def notify_trials_dispatched(self, trial_indices):
+                self._journal([("dispatched", trial_index)
+                               for trial_index in trial_indices
+                               if self._mark_dispatched(trial_index)])
+
+            def _mark_dispatched(self, trial_index):
+                trial = self.experiment.trials[trial_index]
+                if trial.status.is_candidate:
+                    trial.mark_running(no_runner_required=True)
+                    return True
+                return False
+
+            def notify_params_needed(self, num_params=1):
                 # In the time since the head invoked this method, they may have invoked
                 # notify_results_available, but that actor invocation is queued after
                 # this one. It is best to have all of the available results when
                 # generating the next parameters, so check if there are any available.
                 self._absorb_results_queue()
 
-                params, trial_index = self.get_next_trial()
-                self.frontend.put_params.remote((params, trial_index))
+                batched = getattr(self, "supports_batch_generation", False)
+                trials = []
+                try:
+                    if batched:
+                        trials = self.get_next_trials(num_params)
+                    else:
+                        trials = [self.get_next_trial() for _ in range(num_params)]
+                finally:
+                    # Always answer, so the frontend can request these again
+                    self.frontend.put_generated_params.remote(trials, num_params)
+                if len(trials) == 0:
+                    return
+                if batched and hasattr(self, "generation_to_json"):
+                    self._journal([("generated",
+                                    [trial_index for _, trial_index in trials],
+                                    self.generation_to_json())])
+                else:
+                    self._snapshot()
+
+            def _journal(self, entries):
+                if journal_filepath is None:
+                    self.save()
+                    return
+                if len(entries) == 0:
+                    return
+
+                with open(journal_filepath, "a") as f:
+                    for entry in entries:
+                        f.write(json.dumps(entry, default=_json_default) + "\n")
+                self.num_journal_entries += len(entries)
+
+                if self.num_journal_entries >= snapshot_every:
+                    self._snapshot()
+
+            def _snapshot(self):
                 self.save()
+                if journal_filepath is not None:
+                    open(journal_filepath, "w").close()
+                self.num_journal_entries = 0
+
+            def _replay_journal(self):
+                with open(journal_filepath) as f:
+                    entries = [json.loads(line) for line in f if line.strip()]
+
+                for entry in entries:
+                    if entry[0] == "generated":
+                        if entry[1][0] not in self.experiment.trials:
+                            trial_indices = self.attach_generation(entry[2])
+                            assert trial_indices == entry[1]
+                    elif entry[0] == "dispatched":
+                        self._mark_dispatched(entry[1])
+                    elif (entry[0] == "completed"
+                          and not self.experiment.trials[entry[1]].status.is_completed):
+                        raw_data = {name: tuple(value)
+                                    for name, value in entry[2].items()}
+                        self._mark_dispatched(entry[1])
+                        self.complete_trial(entry[1], raw_data, entry[3])
+                self.num_journal_entries = len(entries)
 
         AxBackend.__name__ = f"{ax_client_class.__name__}Backend"
 
@@ -91,27 +195,46 @@ class AxService:
                 self.backend = backend
                 self.params_queue = deque()
                 self.results_queue = deque()
-                self.notified_params_needed = False
+                self.num_params_requested = 0
                 self.notified_results_available = False
 
-            def get_next_trial(self):
+            def get_next_trial(self, num_needed=1):
+                """
+                @param num_needed (int)
+                Number of trials that could start now, e.g. the number of free
+                worker slots. The queue is refilled up to this number with a
+                single batch request to the backend.
+                """
                 if len(self.params_queue) > 0:
-                    return True, self.params_queue.pop()
+                    params = self.params_queue.pop()
+                    self.backend.notify_trials_dispatched.remote([params[1]])
+                    self._request_params(num_needed - 1)
+                    return True, params
                 else:
-                    if not self.notified_params_needed:
-                        self.backend.notify_params_needed.remote()
-                        self.notified_params_needed = True
+                    self._request_params(num_needed)
                     return False, None
 
+            def _request_params(self, num_needed):
+                num_missing = (num_needed - len(self.params_queue)
+                               - self.num_params_requested)
+                if num_missing > 0:
+                    self.backend.notify_params_needed.remote(num_missing)
+                    self.num_params_requested += num_missing
+
             def complete_trial(self, trial_index, raw_data, metadata=None):
                 self.results_queue.append((trial_index, raw_data, metadata))
                 if not self.notified_results_available:
-                    self.backend.notify_results_available.remote()
+                    # Set the flag first, the backend may clear it before this
+                    # call returns (e.g. in ray's local mode)
                     self.notified_results_available = True
+                    self.backend.notify_results_available.remote()
 
             def put_params(self, params):
                 self.params_queue.appendleft(params)
-                self.notified_params_needed = False
+
+            def put_generated_params(self, params_list, num_requested):
+                self.params_queue.extendleft(params_list)
+                self.num_params_requested -= num_requested
 
             def get_and_clear_results(self):
                 results = list(self.results_queue)
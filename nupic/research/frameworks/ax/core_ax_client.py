@@ -20,6 +20,7 @@
 # ----------------------------------------------------------------------
 
 import numbers
+from collections import OrderedDict
 
 import numpy as np
 from ax import Arm, Data
@@ -47,6 +48,10 @@ class CoreAxClient:
         self.experiment = experiment
         self.generation_strategy = generation_strategy
         self.verbose = verbose
+        self.last_generator_run = None
+
+    # Whether get_next_trials can generate several trials in one model call
+    supports_batch_generation = True
 
     def get_next_trial(self, model_gen_options=None):
         """
@@ -57,29 +62,79 @@ class CoreAxClient:
              },
         }
         """
-        trial = self.experiment.new_trial(
-            generator_run=self.generation_strategy.gen(
-                experiment=self.experiment,
-                n=1,
-                pending_observations={
-                    metric_name: [
-                        ObservationFeatures(parameters=trial.arm.parameters,
-                                            trial_index=np.int64(trial_index))
-                        for trial_index, trial in self.experiment.trials.items()
-                        if not trial.status.is_completed
-                    ]
-                    for metric_name in self.experiment.metrics
-                },
-                model_gen_options=model_gen_options,
-            )
+        return self.get_next_trials(1, model_gen_options)[0]
+
+    def get_next_trials(self, n, model_gen_options=None):
+        """
+        Generate n trials with a single call to the generation strategy, so
+        that the model jointly optimizes the batch (q-batch acquisition) and
+        is only fit once.
+
+        The trials are left as candidates. The caller marks each of them as
+        running once it is actually dispatched, so prefetched trials that are
+        never used don't show up as running.
+
+        @param n (int)
+        Number of trials to generate.
+
+        @param model_gen_options (dict or None)
+        See get_next_trial.
+
+        @return list of (parameters, trial_index) tuples
+        """
+        generator_run = self.generation_strategy.gen(
+            experiment=self.experiment,
+            n=n,
+            pending_observations={
+                metric_name: [
+                    ObservationFeatures(parameters=trial.arm.parameters,
+                                        trial_index=np.int64(trial_index))
+                    for trial_index, trial in self.experiment.trials.items()
+                    if not trial.status.is_completed
+                ]
+                for metric_name in self.experiment.metrics
+            },
+            model_gen_options=model_gen_options,
         )
 
-        if self.verbose:
-            print(f"Generated Ax trial {trial.index} with model "
-                  f"{type(self.generation_strategy.model.model).__name__}")
-            print(f"Marking Ax trial {trial.index} as running")
-        trial.mark_running(no_runner_required=True)
-        return trial.arm.parameters, trial.index
+        self.last_generator_run = generator_run
+
+        trials = []
+        for arm_generator_run in split_generator_run(generator_run):
+            trial = self.experiment.new_trial(generator_run=arm_generator_run)
+            if self.verbose:
+                print(f"Generated Ax trial {trial.index} with model "
+                      f"{type(self.generation_strategy.model.model).__name__}")
+            trials.append((trial.arm.parameters, trial.index))
+        return trials
+
+    def generation_to_json(self):
+        """
+        Serialize the generator run of the last get_next_trials call, so that
+        its trials can be recreated with attach_generation without saving a
+        full snapshot.
+        """
+        return object_to_json(self.last_generator_run)
+
+    def attach_generation(self, serialized):
+        """
+        Recreate the trials of a generator run serialized by
+        generation_to_json. The generator run is also added back to the
+        generation strategy, which then continues from the same step as if it
+        had generated these trials itself.
+
+        @return list of the trial indices
+        """
+        generator_run = object_from_json(serialized)
+        generation_strategy = self.generation_strategy
+        generation_strategy._generator_runs.append(generator_run)
+        step_index = getattr(generator_run, "_generation_step_index", None)
+        if step_index is not None:
+            generation_strategy._curr = generation_strategy._steps[step_index]
+        self.last_generator_run = generator_run
+
+        return [self.experiment.new_trial(generator_run=arm_generator_run).index
+                for arm_generator_run in split_generator_run(generator_run)]
 
     def complete_trial(self, trial_index, raw_data, metadata=None):
         """
@@ -109,6 +164,8 @@ class CoreAxClient:
                 trial_index=trial.index,
             )
         )
+        if trial.status.is_candidate:
+            trial.mark_running(no_runner_required=True)
         if self.verbose:
             print(f"Marking Ax trial {trial.index} as completed")
         trial.mark_completed()
@@ -153,3 +210,22 @@ class CoreAxClient:
             )
         )
         self.__dict__.update(other.__dict__)
+
+
+def split_generator_run(generator_run):
+    """
+    Split a generator run into one generator run per arm, keeping the model
+    information, so that every arm of a batch can be run as its own Ax trial.
+    """
+    if len(generator_run.arms) <= 1:
+        return [generator_run]
+
+    generator_runs = []
+    for i in range(len(generator_run.arms)):
+        arm_generator_run = generator_run.clone()
+        arm_weight = list(arm_generator_run._arm_weight_table.values())[i]
+        arm_generator_run._arm_weight_table = OrderedDict(
+            [(arm_weight.arm.signature, arm_weight)]
+        )
+        generator_runs.append(arm_generator_run)
+    return generator_runs
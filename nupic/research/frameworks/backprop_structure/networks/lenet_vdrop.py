@@ -29,6 +29,7 @@ from functools import partial
 from torch import nn
 
 from nupic.research.frameworks.backprop_structure.modules.vdrop_layers import (
+    VDropCentralData,
     VDropConv2d,
     VDropLinear,
 )
@@ -49,7 +50,12 @@ class LeNetVDrop(nn.Sequential):
                  kernel_size=5,
                  linear_units=1000,
                  maxpool_stride=2,
-                 bn_track_running_stats=True):
+                 bn_track_running_stats=True,
+                 z_logvar_init=-10):
+        # Can't save the vdrop_data on the self until after nn.Module.__init__()
+        # has been called.
+        vdrop_data = VDropCentralData(z_logvar_init=z_logvar_init)
+
         feature_map_sidelength = (
             (((input_size[1] - kernel_size + 1) / maxpool_stride)
              - kernel_size + 1) / maxpool_stride
@@ -64,7 +70,8 @@ class LeNetVDrop(nn.Sequential):
 
             ("cnn1", VDropConv2d(input_size[0],
                                  cnn_out_channels[0],
-                                 kernel_size)),
+                                 kernel_size,
+                                 vdrop_data)),
             ("cnn1_maxpool", nn.MaxPool2d(maxpool_stride)),
         ]
 
@@ -84,7 +91,8 @@ class LeNetVDrop(nn.Sequential):
 
             ("cnn2", VDropConv2d(cnn_out_channels[0],
                                  cnn_out_channels[1],
-                                 kernel_size)),
+                                 kernel_size,
+                                 vdrop_data)),
             ("cnn2_maxpool", nn.MaxPool2d(maxpool_stride)),
         ]
 
@@ -105,7 +113,8 @@ class LeNetVDrop(nn.Sequential):
 
             ("fc1", VDropLinear(
                 (feature_map_sidelength**2) * cnn_out_channels[1],
-                linear_units)),
+                linear_units,
+                vdrop_data)),
         ]
 
         if use_batch_norm:
@@ -122,11 +131,27 @@ class LeNetVDrop(nn.Sequential):
             # Output Layer
             # -------------
 
-            ("fc2", VDropLinear(linear_units, num_classes)),
+            ("fc2", VDropLinear(linear_units, num_classes, vdrop_data)),
         ]
 
         super().__init__(OrderedDict(modules))
 
+        vdrop_data.finalize()
+        self.vdrop_data = vdrop_data
+
+    def forward(self, x):
+        self.vdrop_data.compute_forward_data()
+        for module in self.children():
+            if module is not self.vdrop_data:
+                x = module(x)
+        self.vdrop_data.clear_forward_data()
+        return x
+
+    def to(self, *args, **kwargs):
+        ret = super().to(*args, **kwargs)
+        self.vdrop_data = self.vdrop_data.to(*args, **kwargs)
+        return ret
+
 
 gsc_lenet_vdrop = partial(
     LeNetVDrop,
@@ -32,12 +32,14 @@ from __future__ import absolute_import, division, print_function
 import codecs
 import copy
 import glob
+import hashlib
 import json
 import numbers
 import os
 import pickle
 import warnings
 from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor
 
 import numpy as np
 import pandas as pd
@@ -144,17 +146,34 @@ def unpickle_within_dataframe(df, conditions):
 
 
 def load(
-    experiment_path, performance_metrics=None, raw_metrics=None, required_epochs=None
+    experiment_path, performance_metrics=None, raw_metrics=None, required_epochs=None,
+    use_cache=False, cache_dir=None, num_workers=None,
 ):
-    """Load a single experiment into a dataframe"""
+    """
+    Load a single experiment into a dataframe
+
+    :param use_cache: Whether to use the columnar results cache. Only trials
+                      whose files changed since the last call will be parsed.
+                      The cache is written to `cache_dir`
+    :param cache_dir: Location of the cache. Defaults to
+                      "{experiment_path}/.browser_cache"
+    :param num_workers: Number of processes used to parse the trials not found
+                        in the cache. Defaults to the number of CPUs
+    """
     experiment_path = os.path.expanduser(experiment_path)
     experiment_states = _get_experiment_states(experiment_path, exit_on_fail=True)
+    if use_cache:
+        cache = ResultsCache(experiment_path, cache_dir=cache_dir,
+                             num_workers=num_workers)
 
     # run once per experiment state
     # columns might differ between experiments
     dataframes = []
     for exp_state, exp_name in experiment_states:
-        progress, params = _read_experiment(exp_state, experiment_path)
+        if use_cache:
+            progress, params = cache.read_experiment(exp_state)
+        else:
+            progress, params = _read_experiment(exp_state, experiment_path)
         if len(progress) != 0:
             dataframes.append(
                 _get_value(
@@ -174,11 +193,13 @@ def load(
 
 
 def load_many(
-    experiment_paths, performance_metrics=None, raw_metrics=None, required_epochs=None
+    experiment_paths, performance_metrics=None, raw_metrics=None, required_epochs=None,
+    use_cache=False, cache_dir=None, num_workers=None,
 ):
     """Load several experiments into a single dataframe"""
     dataframes = [
-        load(path, performance_metrics, raw_metrics, required_epochs)
+        load(path, performance_metrics, raw_metrics, required_epochs,
+             use_cache=use_cache, cache_dir=cache_dir, num_workers=num_workers)
         for path in experiment_paths
     ]
     return pd.concat(dataframes, axis=0, ignore_index=True, sort=False)
@@ -213,6 +234,171 @@ def _read_experiment(experiment_state, experiment_path):
     return progress, params
 
 
+# ---------------------------
+# Results cache
+# ---------------------------
+
+
+def _save_columns(df, path):
+    """
+    Save dataframe in a columnar format. Each column is stored as a separate
+    numpy array so columns can be loaded independently.
+    """
+    columns = {f"c{i}": df[col].to_numpy() for i, col in enumerate(df.columns)}
+    names = np.array(list(df.columns), dtype=object)
+    with open(path, "wb") as f:
+        np.savez(f, __columns__=names, **columns)
+
+
+def _load_columns(path):
+    """Load dataframe saved by `_save_columns`"""
+    with np.load(path, allow_pickle=True) as data:
+        names = data["__columns__"]
+        return pd.DataFrame({
+            name: data[f"c{i}"] for i, name in enumerate(names)
+        }, columns=list(names))
+
+
+def _file_signature(path):
+    stat = os.stat(path)
+    return [stat.st_mtime_ns, stat.st_size]
+
+
+def _parse_trial(trial_path, cache_file):
+    """
+    Parse a single trial directory into the cache. Runs in a worker process.
+
+    :return: tuple with the cache entry and the trial params or None when the
+             trial has no results
+    """
+    csv = os.path.join(trial_path, "progress.csv")
+    params_file = os.path.join(trial_path, "params.json")
+    entry = dict(progress=_file_signature(csv), params=_file_signature(params_file))
+
+    # check if file size is > 0 before proceeding
+    if not os.stat(csv).st_size:
+        return entry, None
+
+    _save_columns(pd.read_csv(csv), cache_file)
+    with open(params_file) as f:
+        params = json.load(f)
+
+    return entry, params
+
+
+class ResultsCache(object):
+    """
+    Incremental columnar cache of Ray Tune trial results.
+
+    Each trial "progress.csv" is converted into a columnar numpy archive and
+    its "params.json" is kept in the cache index. Cached trials are keyed by
+    their absolute path, so several experiments can share a cache directory,
+    and validated by the modification time and size of their files so only new
+    or changed trials are parsed again. Parsing runs in parallel worker
+    processes.
+
+    :param experiment_path: Ray Tune experiment results directory
+    :param cache_dir: Location of the cache. Defaults to
+                      "{experiment_path}/.browser_cache"
+    :param num_workers: Number of processes used to parse the trials. Defaults
+                        to the number of CPUs
+    """
+
+    INDEX_FILE = "index.json"
+
+    def __init__(self, experiment_path, cache_dir=None, num_workers=None):
+        self.experiment_path = os.path.expanduser(experiment_path)
+        if cache_dir is None:
+            cache_dir = os.path.join(self.experiment_path, ".browser_cache")
+        self.cache_dir = os.path.expanduser(cache_dir)
+        self.num_workers = num_workers or os.cpu_count() or 1
+        os.makedirs(self.cache_dir, exist_ok=True)
+
+        self.index_file = os.path.join(self.cache_dir, self.INDEX_FILE)
+        self.index = {}
+        if os.path.exists(self.index_file):
+            with open(self.index_file) as f:
+                self.index = json.load(f)
+
+    def _trial_path(self, exp_dir):
+        return os.path.abspath(os.path.join(self.experiment_path, exp_dir))
+
+    def _cache_file(self, trial_path):
+        # Trials of different experiments may have the same directory name
+        digest = hashlib.sha1(trial_path.encode()).hexdigest()[:16]
+        return os.path.join(self.cache_dir,
+                            f"{os.path.basename(trial_path)}-{digest}.npz")
+
+    def _is_valid(self, exp_dir):
+        trial_path = self._trial_path(exp_dir)
+        entry = self.index.get(trial_path, None)
+        if entry is None:
+            return False
+        try:
+            return (
+                entry["progress"] == _file_signature(
+                    os.path.join(trial_path, "progress.csv"))
+                and entry["params"] == _file_signature(
+                    os.path.join(trial_path, "params.json"))
+            )
+        except OSError:
+            return False
+
+    def update(self, exp_dirs):
+        """
+        Parse all trials not found in the cache or modified since they were
+        cached
+
+        :param exp_dirs: list of trial directories names
+        """
+        stale = [self._trial_path(d) for d in exp_dirs if not self._is_valid(d)]
+        if len(stale) == 0:
+            return
+
+        args = [(trial_path, self._cache_file(trial_path)) for trial_path in stale]
+        if self.num_workers > 1 and len(stale) > 1:
+            with ProcessPoolExecutor(max_workers=self.num_workers) as executor:
+                parsed = list(executor.map(_parse_trial, *zip(*args)))
+        else:
+            parsed = [_parse_trial(*a) for a in args]
+
+        for trial_path, (entry, params) in zip(stale, parsed):
+            entry["trial_params"] = params
+            self.index[trial_path] = entry
+
+        # Atomically replace the index
+        tmp_file = f"{self.index_file}.tmp"
+        with open(tmp_file, "w") as f:
+            json.dump(self.index, f)
+        os.replace(tmp_file, self.index_file)
+
+    def read_experiment(self, experiment_state):
+        """
+        Cached version of `_read_experiment` returning the same progress
+        dataframes and params.
+        """
+        checkpoint_dicts = experiment_state["checkpoints"]
+        checkpoint_dicts = [flatten_dict(g) for g in checkpoint_dicts]
+
+        trials = {}
+        for exp in checkpoint_dicts:
+            if exp.get("logdir", None) is None:
+                continue
+            trials[exp["experiment_tag"]] = os.path.basename(exp["logdir"])
+        self.update(list(trials.values()))
+
+        progress = {}
+        params = {}
+        for exp_tag, exp_dir in trials.items():
+            trial_path = self._trial_path(exp_dir)
+            trial_params = self.index[trial_path]["trial_params"]
+            if trial_params is not None:
+                progress[exp_tag] = _load_columns(self._cache_file(trial_path))
+                params[exp_tag] = trial_params
+
+        return progress, params
+
+
 def _get_value(  # noqa: C901
     progress,
     params,
@@ -23,4 +23,5 @@ from .dscnn import *
 from .dsnn import *
 from .main import *
 from .modules import *
+from .prune_grow import *
 from .pruning import *
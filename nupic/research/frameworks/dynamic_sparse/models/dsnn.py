@@ -24,6 +24,7 @@ import torch
 
 from .loggers import DSNNLogger
 from .main import SparseModel
+from .prune_grow import PruneGrowEngine
 
 __all__ = [
     "DSNNHeb",
@@ -48,6 +49,7 @@ class DSNNHeb(SparseModel):
             weight_prune_perc=None,
             hebbian_grow=False,
             reset_coactivations=True,
+            batched_rewiring=True,
         )
         new_defaults = {k: v for k, v in new_defaults.items() if k not in self.__dict__}
         self.__dict__.update(new_defaults)
@@ -66,6 +68,8 @@ class DSNNHeb(SparseModel):
         # initialize hebbian learning
         self._init_hebbian()
         self.prune_cycles_completed = 0
+        self._prune_grow_engine = None
+        self.rewiring_counts = None
 
         self.logger = DSNNLogger(self, config=self.config)
 
@@ -98,7 +102,9 @@ class DSNNHeb(SparseModel):
 
     def _reinitialize_weights(self):
         """Reinitialize weights - prune and grow"""
-        if self.pruning_active:
+        if self.pruning_active and self.batched_rewiring:
+            self._batched_reinitialize_weights()
+        elif self.pruning_active:
             # keep track of added synapes
             for module in self.sparse_modules:
                 if self._is_dynamic(module):
@@ -119,6 +125,38 @@ class DSNNHeb(SparseModel):
                     )
                     self.logger.save_surviving_synapses(module, keep_mask, add_mask)
 
+    def _batched_reinitialize_weights(self):
+        """
+        Prune and grow all dynamic modules at once, with a PruneGrowEngine.
+        The number of kept and added synapses per module are stored as device
+        tensors in self.rewiring_counts, and only read when masks are logged.
+        """
+        engine = self._prune_grow_engine
+        if engine is None:
+            modules = [m for m in self.sparse_modules if self._is_dynamic(m)]
+            if not modules:
+                return
+            engine = PruneGrowEngine(modules, self.device)
+            self._prune_grow_engine = engine
+
+        new_mask, keep_mask, add_mask, num_add = engine.rewire(
+            self._batched_prune,
+            self._batched_grow,
+            [module.num_params for module in engine.modules],
+        )
+        self.rewiring_counts = dict(
+            keep=keep_mask.sum(dim=1), add=add_mask.sum(dim=1), num_add=num_add
+        )
+
+        if self.logger.log_masks or self.logger.log_surviving_synapses:
+            masks = zip(
+                engine.unpack(new_mask), engine.unpack(keep_mask),
+                engine.unpack(add_mask), num_add.tolist()
+            )
+            for module, (new, keep, add, num) in zip(engine.modules, masks):
+                self.logger.save_masks(module.pos, new, keep, add, num)
+                self.logger.save_surviving_synapses(module, keep, add)
+
     def _get_hebbian_mask(self, weight, corr, active_synapses, prune_perc):
 
         num_synapses = np.prod(weight.shape)
@@ -261,6 +299,17 @@ class DSNNHeb(SparseModel):
     def prune(self, module):
         pass
 
+    def _batched_prune(self, engine, weight, active):
+        """
+        Batched version of prune, returns the keep mask for all modules.
+        Keeps the active synapses, as the base model does not prune
+        """
+        return active
+
+    def _batched_grow(self, engine, nonactive, num_add):
+        """Batched version of grow, returns the add mask for all modules"""
+        return engine.random_add_mask(nonactive, num_add)
+
 
 class DSNNWeightedMag(DSNNHeb):
     """Weight weights using correlation"""
@@ -289,6 +338,11 @@ class DSNNWeightedMag(DSNNHeb):
 
         return keep_mask
 
+    def _batched_prune(self, engine, weight, active):
+        hebbian_prune = [module.hebbian_prune for module in engine.modules]
+        weight = weight * engine.coactivations()
+        return engine.magnitude_mask(weight, active, engine.row_values(hebbian_prune))
+
     def grow(self, module, num_add):
         """Add randomly"""
         with torch.no_grad():
@@ -302,6 +356,8 @@ class DSNNWeightedMag(DSNNHeb):
 class DSNNMixedHeb(DSNNHeb):
     """Improved results compared to DSNNHeb"""
 
+    inverse_hebbian = False
+
     def _is_dynamic(self, module):
         return module.hebbian_prune is not None or module.weight_prune is not None
 
@@ -344,6 +400,33 @@ class DSNNMixedHeb(DSNNHeb):
 
         return keep_mask
 
+    def _batched_prune(self, engine, weight, active):
+        hebbian_prune = [module.hebbian_prune for module in engine.modules]
+        weight_prune = [module.weight_prune for module in engine.modules]
+        use_hebbian = engine.row_values(hebbian_prune).bool().unsqueeze(1)
+        use_magnitude = engine.row_values(weight_prune).bool().unsqueeze(1)
+
+        # join both masks, modules with no pruning keep the same synapses
+        keep_mask = torch.zeros_like(active)
+        if any(hebbian_prune):
+            keep_mask |= use_hebbian & engine.hebbian_mask(
+                engine.coactivations(), active, engine.row_values(hebbian_prune),
+                inverse=self.inverse_hebbian,
+            )
+        if any(weight_prune):
+            keep_mask |= use_magnitude & engine.magnitude_mask(
+                weight, active, engine.row_values(weight_prune)
+            )
+        return torch.where(use_hebbian | use_magnitude, keep_mask, active)
+
+    def _batched_grow(self, engine, nonactive, num_add):
+        if self.hebbian_grow:
+            return engine.hebbian_add_mask(
+                engine.coactivations(), nonactive, num_add,
+                inverse=self.inverse_hebbian,
+            )
+        return engine.random_add_mask(nonactive, num_add)
+
     def grow(self, module, num_add):
         """Add randomly"""
         with torch.no_grad():
@@ -382,6 +465,10 @@ class SET(DSNNHeb):
 
         return keep_mask.to(self.device)
 
+    def _batched_prune(self, engine, weight, active):
+        weight_prune = [module.weight_prune for module in engine.modules]
+        return engine.magnitude_mask(weight, active, engine.row_values(weight_prune))
+
     def grow(self, module, num_add):
         """Add randomly"""
         with torch.no_grad():
@@ -395,6 +482,8 @@ class SET(DSNNHeb):
 class DSNNMixedHebInverse(DSNNMixedHeb):
     """Test the extreme alternative hypothesis"""
 
+    inverse_hebbian = True
+
     def prune(self, module):
         """Allows pruning by magnitude and hebbian"""
         with torch.no_grad():
@@ -0,0 +1,246 @@
+# ----------------------------------------------------------------------
+# Numenta Platform for Intelligent Computing (NuPIC)
+# Copyright (C) 2021, Numenta, Inc.  Unless you have an agreement
+# with Numenta, Inc., for a separate license for this software code, the
+# following terms and conditions apply:
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero Public License version 3 as
+# published by the Free Software Foundation.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.
+# See the GNU Affero Public License for more details.
+#
+# You should have received a copy of the GNU Affero Public License
+# along with this program.  If not, see http://www.gnu.org/licenses.
+#
+# http://numenta.org/licenses/
+# ----------------------------------------------------------------------
+
+import torch
+
+__all__ = [
+    "PruneGrowEngine",
+]
+
+
+class PruneGrowEngine:
+    """
+    Batched prune and grow for a list of sparse modules.
+
+    The weights of all modules are packed into a (num_modules, max_numel) matrix,
+    padded with zeros, so the per module thresholds of the DSNN models are computed
+    for every layer with a single top-k, on the device where the weights live. The
+    counts are kept as tensors: the only value copied back to the host while
+    rewiring is the largest number of active synapses, which sizes the top-k.
+
+    The masks of the modules are packed in one flat buffer and each `module.mask`
+    becomes a view into it, so a rewiring round updates every mask with one copy.
+
+    The selection functions replicate the semantics of the per module functions in
+    :class:`DSNNHeb` (same kth values and edge cases), except random growth, which
+    draws from the torch generator instead of numpy.
+
+    :param modules: list of :class:`SparseModule` to rewire
+    :param device: device used to store the packed tensors
+    """
+
+    def __init__(self, modules, device=None):
+        self.modules = list(modules)
+        weights = [module.m.weight for module in self.modules]
+        self.device = device or weights[0].device
+        self.shapes = [w.shape for w in weights]
+        self.numels = [w.numel() for w in weights]
+        self.width = max(self.numels)
+
+        # Positions of every module element in the flattened padded matrix
+        num_modules = len(self.modules)
+        rows = torch.cat([
+            torch.full((n,), i, dtype=torch.long) for i, n in enumerate(self.numels)
+        ])
+        cols = torch.cat([torch.arange(n) for n in self.numels])
+        self.index = (rows * self.width + cols).to(self.device)
+        valid = torch.zeros(num_modules * self.width, dtype=torch.bool)
+        valid[self.index.cpu()] = True
+        self.valid = valid.view(num_modules, self.width).to(self.device)
+        self.num_synapses = torch.tensor(self.numels, device=self.device)
+        self.bound = self.width
+
+        self.mask = torch.zeros(sum(self.numels), device=self.device)
+        self.mask_views = list(
+            view.view(shape)
+            for view, shape in zip(self.mask.split(self.numels), self.shapes)
+        )
+        self._link_masks()
+
+    def _link_masks(self):
+        """Make each module mask a view of the flat mask buffer"""
+        for module, view in zip(self.modules, self.mask_views):
+            if module.mask is not view:
+                if module.mask is not None:
+                    view.copy_(module.mask)
+                else:
+                    view.copy_(module.m.weight != 0)
+                module.mask = view
+
+    def pack(self, tensors, fill=0):
+        """Pack a list of per module tensors into a padded 2D tensor"""
+        packed = tensors[0].new_full((len(tensors) * self.width,), fill)
+        packed[self.index] = torch.cat([t.reshape(-1) for t in tensors])
+        return packed.view(len(tensors), self.width)
+
+    def unpack(self, packed):
+        """Split a padded 2D tensor back into per module tensors"""
+        flat = packed.reshape(-1)[self.index]
+        return [t.view(shape) for t, shape in zip(flat.split(self.numels), self.shapes)]
+
+    def row_values(self, values, default=0.0):
+        """Convert a per module list, possibly with None entries, to a tensor"""
+        values = [default if v is None else v for v in values]
+        return torch.tensor(values, dtype=torch.float64, device=self.device)
+
+    def weights(self):
+        return self.pack([module.m.weight.detach() for module in self.modules])
+
+    def coactivations(self):
+        corrs = []
+        for module, shape in zip(self.modules, self.shapes):
+            corr = getattr(module.m, "coactivations", None)
+            if corr is None:
+                corr = torch.zeros(shape, device=self.device)
+            corrs.append(corr.to(self.device, torch.float))
+        return self.pack(corrs)
+
+    def _gather(self, values, idx):
+        """Gather one value per row, clamping the indices to the valid range"""
+        idx = idx.clamp(0, values.shape[1] - 1).unsqueeze(1)
+        return values.gather(1, idx).squeeze(1)
+
+    def _floor(self, perc, count):
+        """Per row equivalent of int(perc * count)"""
+        return (perc * count.double()).floor().long()
+
+    def _ranked(self, values, candidates, largest=False):
+        """
+        Sorted smallest (or largest) values among the candidates of each row. Only
+        the first `self.bound` values are computed, which is enough for all the
+        kth values used by the models.
+        """
+        fill = float("-inf") if largest else float("inf")
+        values = values.masked_fill(~candidates, fill)
+        ranked, _ = values.topk(min(self.bound, self.width), dim=1, largest=largest)
+        return ranked
+
+    def magnitude_mask(self, weight, active, prune_perc):
+        """Batched version of :meth:`DSNNHeb._get_magnitude_mask`"""
+        positive = weight > 0
+        negative = weight < 0
+        num_pos = positive.sum(dim=1)
+        num_neg = negative.sum(dim=1)
+
+        pos_kth = self._floor(prune_perc, num_pos)
+        pos_threshold = self._gather(self._ranked(weight, positive), pos_kth - 1)
+        pos_threshold = torch.where(
+            pos_kth == 0, torch.full_like(pos_threshold, -1), pos_threshold
+        )
+        pos_threshold = pos_threshold.masked_fill(num_pos == 0, 0)
+
+        neg_kth = self._floor(1 - prune_perc, num_neg)
+        sorted_neg = self._ranked(weight, negative)
+        neg_threshold = torch.where(
+            neg_kth == 0, sorted_neg[:, 0] - 1, self._gather(sorted_neg, neg_kth - 1)
+        )
+        neg_threshold = neg_threshold.masked_fill(num_neg == 0, -1)
+
+        keep_mask = (weight > pos_threshold.unsqueeze(1)) | (
+            weight <= neg_threshold.unsqueeze(1)
+        )
+        return keep_mask & active
+
+    def hebbian_mask(self, corr, active, prune_perc, inverse=False):
+        """
+        Batched version of :meth:`DSNNHeb._get_hebbian_mask` and, with
+        `inverse=True`, of :meth:`DSNNHeb._get_inverse_hebbian_mask`
+        """
+        total_active = active.sum(dim=1)
+        if inverse:
+            kth = self._floor(1 - prune_perc, total_active)
+        else:
+            kth = self._floor(prune_perc, total_active)
+        threshold = self._gather(self._ranked(corr, active), kth - 1).unsqueeze(1)
+
+        if inverse:
+            keep_mask = (corr <= threshold) & active
+            keep_mask &= (kth > 0).unsqueeze(1)
+            keep_mask |= (kth >= self.num_synapses).unsqueeze(1) & active
+        else:
+            keep_mask = (corr > threshold) & active
+            keep_mask |= (kth == 0).unsqueeze(1) & active
+            keep_mask &= (kth < self.num_synapses).unsqueeze(1)
+        return keep_mask
+
+    def random_add_mask(self, nonactive, num_add):
+        """
+        Batched version of :meth:`DSNNHeb._get_random_add_mask`. Selects exactly
+        min(num_add, nonactive) synapses per row, uniformly at random.
+        """
+        num_add = torch.min(num_add, nonactive.sum(dim=1))
+        scores = torch.rand(nonactive.shape, device=self.device)
+        ranked = self._ranked(scores, nonactive, largest=True)
+        threshold = self._gather(ranked, num_add - 1).unsqueeze(1)
+        add_mask = (scores >= threshold) & nonactive
+        return add_mask & (num_add > 0).unsqueeze(1)
+
+    def hebbian_add_mask(self, corr, nonactive, num_add, inverse=False):
+        """
+        Batched version of :meth:`DSNNHeb._get_hebbian_add_mask` and, with
+        `inverse=True`, of :meth:`DSNNHeb._get_inverse_add_mask`
+        """
+        if inverse:
+            ranked = self._ranked(corr, nonactive)
+            threshold = self._gather(ranked, num_add - 1).unsqueeze(1)
+            add_mask = (corr <= threshold) & nonactive
+            return add_mask & (num_add > 0).unsqueeze(1)
+
+        # the (nonactive - num_add)th smallest is the (num_add + 1)th largest
+        ranked = self._ranked(corr, nonactive, largest=True)
+        threshold = self._gather(ranked, num_add).unsqueeze(1)
+        add_mask = (corr > threshold) & nonactive
+        # nothing left to keep out, add every nonactive synapse
+        return add_mask | ((num_add >= nonactive.sum(dim=1)).unsqueeze(1) & nonactive)
+
+    @torch.no_grad()
+    def rewire(self, prune_fn, grow_fn, num_params):
+        """
+        Prune and grow all modules at once.
+
+        :param prune_fn: callable(engine, weight, active) returning the keep mask
+        :param grow_fn: callable(engine, nonactive, num_add) returning the add mask
+        :param num_params: per module list with the number of params to keep
+
+        :return: tuple with the padded (new, keep, add) masks and the tensor with
+                 the number of synapses to add per module. Nothing is moved to the
+                 host, the caller decides when to read the values.
+        """
+        self._link_masks()
+        weight = self.weights()
+        active = weight != 0
+        nonactive = (weight == 0) & self.valid
+
+        # all kth values are bounded by the number of active synapses, which is
+        # read once here, or by the number of synapses to add
+        self.bound = int(max(max(num_params), active.sum(dim=1).max().item())) + 1
+
+        keep_mask = prune_fn(self, weight, active)
+        num_params = torch.tensor(num_params, device=self.device).long()
+        num_add = (num_params - keep_mask.sum(dim=1)).clamp(min=0)
+        add_mask = grow_fn(self, nonactive, num_add)
+        new_mask = keep_mask | add_mask
+
+        self.mask.copy_(new_mask.reshape(-1)[self.index])
+        for module in self.modules:
+            module.apply_mask()
+
+        return new_mask, keep_mask, add_mask, num_add
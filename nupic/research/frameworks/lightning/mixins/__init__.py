@@ -1,4 +1,5 @@
 from .knowledge_distillation import *
 from .profile import *
 from .rezero_weights import *
+from .shared_memory_data import *
 from .update_boost_strength import *
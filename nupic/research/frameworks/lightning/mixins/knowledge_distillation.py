@@ -82,9 +82,11 @@ class KnowledgeDistillation:
             # self.logger.info(f"KD single teacher class: {teacher_model_class}")
             teacher_model_class = [teacher_model_class]
 
-        self.teacher_models = [
-            model().eval().to(self.device) for model in teacher_model_class
-        ]
+        # Teachers are only prepared once, even if setup is called per stage
+        if getattr(self, "teacher_models", None) is None:
+            self.teacher_models = [
+                model().eval().to(self.device) for model in teacher_model_class
+            ]
         # if len(self.teacher_models) > 1:
         #     self.logger.info(f"KD teacher is ensemble of "
         #                      f"{len(self.teacher_models)} models")
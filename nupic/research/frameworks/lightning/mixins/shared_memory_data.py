@@ -0,0 +1,136 @@
+# ----------------------------------------------------------------------
+# Numenta Platform for Intelligent Computing (NuPIC)
+# Copyright (C) 2021, Numenta, Inc.  Unless you have an agreement
+# with Numenta, Inc., for a separate license for this software code, the
+# following terms and conditions apply:
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero Public License version 3 as
+# published by the Free Software Foundation.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.
+# See the GNU Affero Public License for more details.
+#
+# You should have received a copy of the GNU Affero Public License
+# along with this program.  If not, see http://www.gnu.org/licenses.
+#
+# http://numenta.org/licenses/
+# ----------------------------------------------------------------------
+
+import torch
+
+from nupic.research.frameworks.pytorch.dataset_utils.shared_memory import (
+    EpochBatchSampler,
+    EpochVariants,
+    ResizeBatch,
+    SharedTensorDataset,
+    create_epoch_loader,
+)
+
+__all__ = [
+    "SharedMemoryData",
+]
+
+
+class SharedMemoryData:
+    """
+    Loads the datasets once into shared memory tensors and serves every epoch
+    from them, with an epoch dependent batch size, resolution and subset. The
+    number of steps of every epoch is known ahead of time, so
+    `compute_steps_in_epoch` no longer builds a loader per epoch.
+
+    The datasets are expected to have a fixed preprocessing. Datasets with
+    random transforms are refused, unless allowed by the config, in which case
+    the augmentations are drawn once, when the datasets are loaded.
+
+    The same loaders serve every epoch. With "workers" > 0,
+    :func:`create_epoch_loader` keeps their workers alive between epochs with
+    `persistent_workers`. The pinned torch==1.6 does not support it, so there
+    the workers are still started again every epoch. Batches are gathered from
+    the shared tensors directly, so "workers" = 0 usually avoids that cost.
+
+    :param config:
+        - data_variants: A dictionary mapping epoch to the data loading
+                         arguments used from this epoch onward. Supported
+                         arguments are "batch_size", "resolution" (int or
+                         pair) and "subset" (fraction of the train set or
+                         list of indices). See :class:`EpochVariants`
+        - shared_memory_load_workers: workers used to load the datasets once
+        - shared_memory_allow_random_transforms: whether or not to load
+                                                 datasets with random transforms
+    """
+
+    trainer_requirements = dict(
+        # Epoch variants change the number of batches per epoch
+        reload_dataloaders_every_epoch=True,
+        # EpochBatchSampler partitions the data between replicas itself
+        replace_sampler_ddp=False,
+    )
+
+    def setup(self, stage):
+        if isinstance(getattr(self, "train_dataset", None), SharedTensorDataset):
+            return
+        super().setup(stage)
+
+        load_workers = self.config.get("shared_memory_load_workers", 0)
+        allow_random_transforms = self.config.get(
+            "shared_memory_allow_random_transforms", False)
+        self.data_variants = EpochVariants(
+            defaults=dict(batch_size=self.config.get("batch_size", 1)),
+            variants=self.config.get("data_variants", None),
+        )
+        self.train_dataset = SharedTensorDataset.from_dataset(
+            self.train_dataset, num_workers=load_workers,
+            allow_random_transforms=allow_random_transforms,
+            batch_transform=ResizeBatch(self.data_variants),
+        )
+        self.val_dataset = SharedTensorDataset.from_dataset(
+            self.val_dataset, num_workers=load_workers,
+            allow_random_transforms=allow_random_transforms,
+        )
+
+        self.train_sampler = EpochBatchSampler(
+            len(self.train_dataset), self.data_variants,
+            shuffle=True,
+            drop_last=self.config.get("train_loader_drop_last", True),
+            seed=self.config.get("seed", 0),
+        )
+        val_batch_size = self.config.get("val_batch_size",
+                                         self.config.get("batch_size", 1))
+        self.val_sampler = EpochBatchSampler(
+            len(self.val_dataset), EpochVariants(dict(batch_size=val_batch_size)),
+            shuffle=False, drop_last=False,
+        )
+        self._train_loader = None
+        self._val_loader = None
+
+    def train_dataloader(self):
+        return self.create_train_loader(self.current_epoch)
+
+    def val_dataloader(self):
+        if self._val_loader is None:
+            self._val_loader = create_epoch_loader(
+                self.val_dataset, self.val_sampler,
+                num_workers=self.config.get("workers", 0),
+                pin_memory=torch.cuda.is_available(),
+            )
+        return self._val_loader
+
+    def create_train_loader(self, epoch):
+        """
+        The same loader is returned for every epoch, only its sampler is moved
+        to the given epoch.
+        """
+        self.train_sampler.set_epoch(epoch)
+        if self._train_loader is None:
+            self._train_loader = create_epoch_loader(
+                self.train_dataset, self.train_sampler,
+                num_workers=self.config.get("workers", 0),
+                pin_memory=torch.cuda.is_available(),
+            )
+        return self._train_loader
+
+    def compute_steps_in_epoch(self, epoch):
+        return self.train_sampler.num_batches(epoch)
@@ -0,0 +1,382 @@
+# ----------------------------------------------------------------------
+# Numenta Platform for Intelligent Computing (NuPIC)
+# Copyright (C) 2021, Numenta, Inc.  Unless you have an agreement
+# with Numenta, Inc., for a separate license for this software code, the
+# following terms and conditions apply:
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero Public License version 3 as
+# published by the Free Software Foundation.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.
+# See the GNU Affero Public License for more details.
+#
+# You should have received a copy of the GNU Affero Public License
+# along with this program.  If not, see http://www.gnu.org/licenses.
+#
+# http://numenta.org/licenses/
+# ----------------------------------------------------------------------
+
+"""
+Memory budgeter for activation checkpointing of ResNets.
+
+Measures the activation memory kept for the backward pass by each block of a
+:class:`~nupic.research.frameworks.pytorch.models.resnets.ResNet` and selects
+the blocks to recompute during the backward pass so that the activations fit in
+a memory budget, trading compute for memory. Example::
+
+    footprints = measure_block_footprints(model, torch.rand(32, 3, 224, 224))
+    plan = plan_activation_checkpointing(footprints, budget_bytes=2 * 2 ** 30)
+    model.set_checkpoint_plan(plan)
+
+    # Peak memory and step time of candidate plans
+    report = profile_checkpoint_plans(model, torch.rand(32, 3, 224, 224), {
+        "none": {},
+        "budget": plan,
+        "all": {"group1": True, "group2": True, "group3": True, "group4": True},
+    })
+"""
+
+import copy
+import time
+from collections import OrderedDict
+
+import torch
+
+from nupic.research.frameworks.pytorch.models.resnets import ResNetGroup
+
+__all__ = [
+    "measure_block_footprints",
+    "estimate_activation_memory",
+    "plan_activation_checkpointing",
+    "profile_checkpoint_plans",
+]
+
+# Other modules than the ResNet blocks (stem, classifier, loss)
+OTHER = ("other", None)
+
+
+def _storage_key(tensor):
+    if hasattr(tensor, "untyped_storage"):
+        storage = tensor.untyped_storage()
+    else:
+        storage = tensor.storage()
+    return storage.data_ptr(), storage.nbytes()
+
+
+class _SavedTensorsCounter(object):
+    """
+    Counts the bytes of the tensors saved for the backward pass, attributed to
+    the block running when they are saved. Tensors sharing a storage are only
+    counted once and parameters are not counted. Requires torch >= 1.10,
+    otherwise the outputs of the leaf modules of each block are counted
+    instead, which is a close upper bound for conv / BN / activation stacks.
+    """
+
+    def __init__(self, model, sample_input):
+        self.model = model
+        self.current = [OTHER]
+        self.bytes = OrderedDict()
+        self.seen = {_storage_key(p) for p in model.parameters()}
+        self.seen.add(_storage_key(sample_input))
+        self.handles = []
+
+    def _add(self, tensor):
+        if not isinstance(tensor, torch.Tensor):
+            return
+        key = _storage_key(tensor)
+        if key not in self.seen:
+            self.seen.add(key)
+            owner = self.current[-1]
+            self.bytes[owner] = self.bytes.get(owner, 0) + key[1]
+
+    def _pack(self, tensor):
+        self._add(tensor)
+        return tensor
+
+    def track_blocks(self, blocks):
+        def enter(key):
+            def hook(module, inputs):
+                self.current.append(key)
+            return hook
+
+        def leave(module, inputs, output):
+            self.current.pop()
+
+        for key, block in blocks.items():
+            self.handles.append(block.register_forward_pre_hook(enter(key)))
+            self.handles.append(block.register_forward_hook(leave))
+
+    def __enter__(self):
+        graph = getattr(torch.autograd, "graph", None)
+        if hasattr(graph, "saved_tensors_hooks"):
+            self.context = graph.saved_tensors_hooks(self._pack, lambda t: t)
+        else:
+            self.context = None
+            for m in self.model.modules():
+                if not list(m.children()):
+                    self.handles.append(m.register_forward_hook(
+                        lambda module, inputs, output: self._add(output)))
+        if self.context is not None:
+            self.context.__enter__()
+        return self
+
+    def __exit__(self, *args):
+        if self.context is not None:
+            self.context.__exit__(*args)
+        for handle in self.handles:
+            handle.remove()
+        self.handles = []
+
+    @property
+    def total(self):
+        return sum(self.bytes.values())
+
+
+def _get_blocks(model):
+    """Map (group name, block index) to the blocks of a ResNet"""
+    blocks = OrderedDict()
+    for name, group in model.features.named_children():
+        if isinstance(group, ResNetGroup):
+            for i, block in enumerate(group):
+                blocks[(name, i)] = block
+    return blocks
+
+
+def _loss(output, target, loss_fn):
+    if loss_fn is None:
+        return output.float().sum()
+    return loss_fn(output, target)
+
+
+def measure_block_footprints(model, sample_input, target=None, loss_fn=None):
+    """
+    Measure the activation memory kept for the backward pass by each block of
+    the ResNet during a training step on the given batch, along with the size
+    of its input and its forward time. The model is left untouched, the
+    measurement runs on a copy.
+
+    :param model: ResNet model
+    :param sample_input: A representative training batch
+    :param target: Target passed to `loss_fn`
+    :param loss_fn: Loss function, defaults to the sum of the model outputs
+    :return: Ordered dictionary mapping ``(group name, block index)`` to a dict
+             with the ``activation_bytes``, ``input_bytes``, ``output_bytes``
+             and ``forward_time`` of the block. The ``("other", None)`` entry
+             holds the activations of the stem and the classifier.
+    """
+    model = copy.deepcopy(model).train()
+    model.set_checkpoint_plan(None)
+    blocks = _get_blocks(model)
+
+    footprints = OrderedDict((key, dict(activation_bytes=0, input_bytes=0,
+                                        output_bytes=0, forward_time=0.0))
+                             for key in blocks)
+    footprints[OTHER] = dict(activation_bytes=0, input_bytes=0, output_bytes=0,
+                             forward_time=0.0)
+
+    start_times = {}
+    handles = []
+
+    def pre_hook(key):
+        def hook(module, inputs):
+            footprints[key]["input_bytes"] = inputs[0].numel() * \
+                inputs[0].element_size()
+            start_times[key] = time.perf_counter()
+        return hook
+
+    def post_hook(key):
+        def hook(module, inputs, output):
+            footprints[key]["forward_time"] = time.perf_counter() - \
+                start_times[key]
+            footprints[key]["output_bytes"] = output.numel() * \
+                output.element_size()
+        return hook
+
+    for key, block in blocks.items():
+        handles.append(block.register_forward_pre_hook(pre_hook(key)))
+        handles.append(block.register_forward_hook(post_hook(key)))
+
+    try:
+        with _SavedTensorsCounter(model, sample_input) as counter:
+            counter.track_blocks(blocks)
+            output = model(sample_input)
+            loss = _loss(output, target, loss_fn)
+    finally:
+        for handle in handles:
+            handle.remove()
+    loss.backward()
+
+    for key, num_bytes in counter.bytes.items():
+        footprints[key]["activation_bytes"] = num_bytes
+    return footprints
+
+
+def _normalize_segments(segments, num_blocks):
+    if segments is True:
+        return [(0, num_blocks)]
+    return [(s, s + 1) if isinstance(s, int) else tuple(s)
+            for s in segments or []]
+
+
+def estimate_activation_memory(footprints, plan):
+    """
+    Estimate the activation memory of a training step with the given
+    checkpoint plan. Each checkpointed segment only keeps its input during the
+    forward pass but its activations are recomputed, one segment at a time,
+    during the backward pass.
+
+    :param footprints: Block footprints from :func:`measure_block_footprints`
+    :param plan: Checkpoint plan, see `ResNet.set_checkpoint_plan`
+    :return: Tuple with the memory kept after the forward pass and the
+             estimated peak memory during the backward pass, in bytes
+    """
+    num_blocks = {}
+    for key in footprints:
+        if key != OTHER:
+            num_blocks[key[0]] = max(num_blocks.get(key[0], 0), key[1] + 1)
+
+    checkpointed = {}
+    for group, segments in (plan or {}).items():
+        for start, end in _normalize_segments(segments, num_blocks[group]):
+            checkpointed[(group, start)] = end
+
+    stored = footprints[OTHER]["activation_bytes"]
+    recomputed = 0
+    keys = [key for key in footprints if key != OTHER]
+    # The segments keep their input, which was accounted to the block before
+    # them unless it is the stem (that does not keep its output) or another
+    # segment. Likewise their output was accounted to their last block and is
+    # now kept by the next block unless that block is checkpointed too.
+    previous_checkpointed = True
+    i = 0
+    while i < len(keys):
+        group, index = keys[i]
+        end = checkpointed.get((group, index))
+        if end is None:
+            stored += footprints[keys[i]]["activation_bytes"]
+            previous_checkpointed = False
+            i += 1
+            continue
+        segment = [(group, j) for j in range(index, end)]
+        if previous_checkpointed:
+            stored += footprints[segment[0]]["input_bytes"]
+        previous_checkpointed = True
+        i += len(segment)
+        if i < len(keys) and keys[i] not in checkpointed:
+            stored += footprints[segment[-1]]["output_bytes"]
+        recomputed = max(recomputed, sum(footprints[key]["activation_bytes"]
+                                         for key in segment))
+    return stored, stored + recomputed
+
+
+def plan_activation_checkpointing(footprints, budget_bytes, granularity="block"):
+    """
+    Select the segments to recompute so that the estimated peak activation
+    memory fits in the budget. Segments are selected greedily by memory saved
+    per second of recomputation.
+
+    :param footprints: Block footprints from :func:`measure_block_footprints`
+    :param budget_bytes: Activation memory budget in bytes
+    :param granularity: Checkpoint each "block" or each "group" as a segment
+    :return: Checkpoint plan for `ResNet.set_checkpoint_plan`
+    :raises ValueError: if the budget can not be met
+    """
+    candidates = OrderedDict()
+    for key in footprints:
+        if key == OTHER:
+            continue
+        group, index = key
+        if granularity == "block":
+            candidates[key] = [key]
+        elif granularity == "group":
+            candidates.setdefault((group, 0), []).append(key)
+        else:
+            raise ValueError(f"Unknown granularity {granularity}")
+
+    def score(segment):
+        saved = (sum(footprints[k]["activation_bytes"] for k in segment)
+                 - footprints[segment[0]]["input_bytes"])
+        cost = sum(footprints[k]["forward_time"] for k in segment)
+        return saved / max(cost, 1e-9)
+
+    def to_plan(selected):
+        plan = {}
+        for start in sorted(selected, key=list(candidates).index):
+            segment = candidates[start]
+            plan.setdefault(start[0], []).append((start[1],
+                                                  segment[-1][1] + 1))
+        return plan
+
+    selected = []
+    remaining = sorted(candidates, key=lambda k: score(candidates[k]),
+                       reverse=True)
+    plan = to_plan(selected)
+    _, peak = estimate_activation_memory(footprints, plan)
+    while peak > budget_bytes:
+        if not remaining:
+            raise ValueError(
+                f"Activation memory budget of {budget_bytes} bytes can not be "
+                f"met, checkpointing every {granularity} needs {peak} bytes")
+        selected.append(remaining.pop(0))
+        plan = to_plan(selected)
+        _, peak = estimate_activation_memory(footprints, plan)
+    return plan
+
+
+def profile_checkpoint_plans(model, sample_input, plans, target=None,
+                             loss_fn=None, num_steps=3):
+    """
+    Report the activation memory and the step time of a training step
+    (forward and backward) for each checkpoint plan. On CUDA the peak memory
+    is measured by the allocator, otherwise it is the memory kept after the
+    forward pass, measured from the tensors saved for the backward pass, plus
+    the largest recomputed segment. The model is left untouched, the
+    measurement runs on a copy.
+
+    :param model: ResNet model
+    :param sample_input: A representative training batch
+    :param plans: Dictionary mapping plan names to checkpoint plans
+    :param target: Target passed to `loss_fn`
+    :param loss_fn: Loss function, defaults to the sum of the model outputs
+    :param num_steps: Number of timed steps for each plan, after a warmup step
+    :return: List of dicts with the ``plan`` name, ``stored_bytes``,
+             ``peak_bytes`` and mean ``step_time`` in seconds of each plan
+    """
+    footprints = measure_block_footprints(model, sample_input, target, loss_fn)
+    model = copy.deepcopy(model).train()
+    cuda = sample_input.is_cuda
+
+    report = []
+    for name, plan in plans.items():
+        model.set_checkpoint_plan(plan)
+        estimated_stored, estimated_peak = estimate_activation_memory(
+            footprints, plan)
+
+        # Warmup step, also measuring the memory kept for the backward pass
+        with _SavedTensorsCounter(model, sample_input) as counter:
+            loss = _loss(model(sample_input), target, loss_fn)
+        loss.backward()
+        model.zero_grad()
+        stored = counter.total
+        peak = stored + estimated_peak - estimated_stored
+
+        if cuda:
+            torch.cuda.synchronize()
+            torch.cuda.reset_peak_memory_stats()
+            baseline = torch.cuda.memory_allocated()
+        start = time.perf_counter()
+        for _ in range(num_steps):
+            loss = _loss(model(sample_input), target, loss_fn)
+            loss.backward()
+            model.zero_grad()
+        if cuda:
+            torch.cuda.synchronize()
+            peak = torch.cuda.max_memory_allocated() - baseline
+        step_time = (time.perf_counter() - start) / num_steps
+
+        report.append(dict(plan=name, stored_bytes=stored, peak_bytes=peak,
+                           step_time=step_time))
+    return report
@@ -21,4 +21,10 @@
 from .common import *
 from .hdf5_utils import *
 from .auto_augment import ImageNetPolicy
-from .samplers import *
\ No newline at end of file
+from .batch_auto_augment import (
+    CIFAR10BatchPolicy,
+    ImageNetBatchPolicy,
+    SVHNBatchPolicy,
+)
+from .samplers import *
+from .shared_memory import *
\ No newline at end of file
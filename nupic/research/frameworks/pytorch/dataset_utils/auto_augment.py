@@ -24,6 +24,109 @@ import numpy as np
 from PIL import Image, ImageEnhance, ImageOps
 
 
+# Best 24 sub-policies on ImageNet, as
+# (p1, operation1, magnitude_idx1, p2, operation2, magnitude_idx2)
+IMAGENET_POLICIES = [
+    (0.4, "posterize", 8, 0.6, "rotate", 9),
+    (0.6, "solarize", 5, 0.6, "autocontrast", 5),
+    (0.8, "equalize", 8, 0.6, "equalize", 3),
+    (0.6, "posterize", 7, 0.6, "posterize", 6),
+    (0.4, "equalize", 7, 0.2, "solarize", 4),
+
+    (0.4, "equalize", 4, 0.8, "rotate", 8),
+    (0.6, "solarize", 3, 0.6, "equalize", 7),
+    (0.8, "posterize", 5, 1.0, "equalize", 2),
+    (0.2, "rotate", 3, 0.6, "solarize", 8),
+    (0.6, "equalize", 8, 0.4, "posterize", 6),
+
+    (0.8, "rotate", 8, 0.4, "color", 0),
+    (0.4, "rotate", 9, 0.6, "equalize", 2),
+    (0.0, "equalize", 7, 0.8, "equalize", 8),
+    (0.6, "invert", 4, 1.0, "equalize", 8),
+    (0.6, "color", 4, 1.0, "contrast", 8),
+
+    (0.8, "rotate", 8, 1.0, "color", 2),
+    (0.8, "color", 8, 0.8, "solarize", 7),
+    (0.4, "sharpness", 7, 0.6, "invert", 8),
+    (0.6, "shear_x", 5, 1.0, "equalize", 9),
+    (0.4, "color", 0, 0.6, "equalize", 3),
+
+    (0.4, "equalize", 7, 0.2, "solarize", 4),
+    (0.6, "solarize", 5, 0.6, "autocontrast", 5),
+    (0.6, "invert", 4, 1.0, "equalize", 8),
+    (0.6, "color", 4, 1.0, "contrast", 8),
+    (0.8, "equalize", 8, 0.6, "equalize", 3),
+]
+
+# Best 25 sub-policies on CIFAR10, as
+# (p1, operation1, magnitude_idx1, p2, operation2, magnitude_idx2)
+CIFAR10_POLICIES = [
+    (0.1, "invert", 7, 0.2, "contrast", 6),
+    (0.7, "rotate", 2, 0.3, "translate_x", 9),
+    (0.8, "sharpness", 1, 0.9, "sharpness", 3),
+    (0.5, "shear_y", 8, 0.7, "translate_y", 9),
+    (0.5, "autocontrast", 8, 0.9, "equalize", 2),
+
+    (0.2, "shear_y", 7, 0.3, "posterize", 7),
+    (0.4, "color", 3, 0.6, "brightness", 7),
+    (0.3, "sharpness", 9, 0.7, "brightness", 9),
+    (0.6, "equalize", 5, 0.5, "equalize", 1),
+    (0.6, "contrast", 7, 0.6, "sharpness", 5),
+
+    (0.7, "color", 7, 0.5, "translate_x", 8),
+    (0.3, "equalize", 7, 0.4, "autocontrast", 8),
+    (0.4, "translate_y", 3, 0.2, "sharpness", 6),
+    (0.9, "brightness", 6, 0.2, "color", 8),
+    (0.5, "solarize", 2, 0.0, "invert", 3),
+
+    (0.2, "equalize", 0, 0.6, "autocontrast", 0),
+    (0.2, "equalize", 8, 0.6, "equalize", 4),
+    (0.9, "color", 9, 0.6, "equalize", 6),
+    (0.8, "autocontrast", 4, 0.2, "solarize", 8),
+    (0.1, "brightness", 3, 0.7, "color", 0),
+
+    (0.4, "solarize", 5, 0.9, "autocontrast", 3),
+    (0.9, "translate_y", 9, 0.7, "translate_y", 9),
+    (0.9, "autocontrast", 2, 0.8, "solarize", 3),
+    (0.8, "equalize", 8, 0.1, "invert", 3),
+    (0.7, "translate_y", 9, 0.9, "autocontrast", 1),
+]
+
+# Best 25 sub-policies on SVHN, as
+# (p1, operation1, magnitude_idx1, p2, operation2, magnitude_idx2)
+SVHN_POLICIES = [
+    (0.9, "shear_x", 4, 0.2, "invert", 3),
+    (0.9, "shear_y", 8, 0.7, "invert", 5),
+    (0.6, "equalize", 5, 0.6, "solarize", 6),
+    (0.9, "invert", 3, 0.6, "equalize", 3),
+    (0.6, "equalize", 1, 0.9, "rotate", 3),
+
+    (0.9, "shear_x", 4, 0.8, "autocontrast", 3),
+    (0.9, "shear_y", 8, 0.4, "invert", 5),
+    (0.9, "shear_y", 5, 0.2, "solarize", 6),
+    (0.9, "invert", 6, 0.8, "autocontrast", 1),
+    (0.6, "equalize", 3, 0.9, "rotate", 3),
+
+    (0.9, "shear_x", 4, 0.3, "solarize", 3),
+    (0.8, "shear_y", 8, 0.7, "invert", 4),
+    (0.9, "equalize", 5, 0.6, "translate_y", 6),
+    (0.9, "invert", 4, 0.6, "equalize", 7),
+    (0.3, "contrast", 3, 0.8, "rotate", 4),
+
+    (0.8, "invert", 5, 0.0, "translate_y", 2),
+    (0.7, "shear_y", 6, 0.4, "solarize", 8),
+    (0.6, "invert", 4, 0.8, "rotate", 4),
+    (0.3, "shear_y", 7, 0.9, "translate_x", 3),
+    (0.1, "shear_x", 6, 0.6, "invert", 5),
+
+    (0.7, "solarize", 2, 0.6, "translate_y", 7),
+    (0.8, "shear_y", 4, 0.8, "invert", 8),
+    (0.7, "shear_x", 9, 0.8, "translate_y", 3),
+    (0.8, "shear_y", 5, 0.7, "autocontrast", 3),
+    (0.7, "shear_x", 2, 0.1, "invert", 5),
+]
+
+
 class ImageNetPolicy(object):
     """
         Randomly choose one of the best 24 Sub-policies on ImageNet.
@@ -48,39 +151,13 @@ class ImageNetPolicy(object):
         loader = DataLoader(data, ...)
 
         Code extracted from: https://github.com/DeepVoltaire/AutoAugment
+
+        :param shear_translate: See :class:`SubPolicy`
     """
-    def __init__(self, fillcolor=(128, 128, 128)):
-        self.policies = [
-            SubPolicy(0.4, "posterize", 8, 0.6, "rotate", 9, fillcolor),
-            SubPolicy(0.6, "solarize", 5, 0.6, "autocontrast", 5, fillcolor),
-            SubPolicy(0.8, "equalize", 8, 0.6, "equalize", 3, fillcolor),
-            SubPolicy(0.6, "posterize", 7, 0.6, "posterize", 6, fillcolor),
-            SubPolicy(0.4, "equalize", 7, 0.2, "solarize", 4, fillcolor),
-
-            SubPolicy(0.4, "equalize", 4, 0.8, "rotate", 8, fillcolor),
-            SubPolicy(0.6, "solarize", 3, 0.6, "equalize", 7, fillcolor),
-            SubPolicy(0.8, "posterize", 5, 1.0, "equalize", 2, fillcolor),
-            SubPolicy(0.2, "rotate", 3, 0.6, "solarize", 8, fillcolor),
-            SubPolicy(0.6, "equalize", 8, 0.4, "posterize", 6, fillcolor),
-
-            SubPolicy(0.8, "rotate", 8, 0.4, "color", 0, fillcolor),
-            SubPolicy(0.4, "rotate", 9, 0.6, "equalize", 2, fillcolor),
-            SubPolicy(0.0, "equalize", 7, 0.8, "equalize", 8, fillcolor),
-            SubPolicy(0.6, "invert", 4, 1.0, "equalize", 8, fillcolor),
-            SubPolicy(0.6, "color", 4, 1.0, "contrast", 8, fillcolor),
-
-            SubPolicy(0.8, "rotate", 8, 1.0, "color", 2, fillcolor),
-            SubPolicy(0.8, "color", 8, 0.8, "solarize", 7, fillcolor),
-            SubPolicy(0.4, "sharpness", 7, 0.6, "invert", 8, fillcolor),
-            SubPolicy(0.6, "shear_x", 5, 1.0, "equalize", 9, fillcolor),
-            SubPolicy(0.4, "color", 0, 0.6, "equalize", 3, fillcolor),
-
-            SubPolicy(0.4, "equalize", 7, 0.2, "solarize", 4, fillcolor),
-            SubPolicy(0.6, "solarize", 5, 0.6, "autocontrast", 5, fillcolor),
-            SubPolicy(0.6, "invert", 4, 1.0, "equalize", 8, fillcolor),
-            SubPolicy(0.6, "color", 4, 1.0, "contrast", 8, fillcolor),
-            SubPolicy(0.8, "equalize", 8, 0.6, "equalize", 3, fillcolor)
-        ]
+    def __init__(self, fillcolor=(128, 128, 128), shear_translate=False):
+        self.policies = [SubPolicy(*policy, fillcolor=fillcolor,
+                                   shear_translate=shear_translate)
+                         for policy in IMAGENET_POLICIES]
 
     def __call__(self, img):
         policy_idx = random.randint(0, len(self.policies) - 1)
@@ -102,39 +179,13 @@ class CIFAR10Policy(object):
         >>>     transforms.Resize(256),
         >>>     CIFAR10Policy(),
         >>>     transforms.ToTensor()])
+
+        :param shear_translate: See :class:`SubPolicy`
     """
-    def __init__(self, fillcolor=(128, 128, 128)):
-        self.policies = [
-            SubPolicy(0.1, "invert", 7, 0.2, "contrast", 6, fillcolor),
-            SubPolicy(0.7, "rotate", 2, 0.3, "translate_x", 9, fillcolor),
-            SubPolicy(0.8, "sharpness", 1, 0.9, "sharpness", 3, fillcolor),
-            SubPolicy(0.5, "shear_y", 8, 0.7, "translateY", 9, fillcolor),
-            SubPolicy(0.5, "autocontrast", 8, 0.9, "equalize", 2, fillcolor),
-
-            SubPolicy(0.2, "shear_y", 7, 0.3, "posterize", 7, fillcolor),
-            SubPolicy(0.4, "color", 3, 0.6, "brightness", 7, fillcolor),
-            SubPolicy(0.3, "sharpness", 9, 0.7, "brightness", 9, fillcolor),
-            SubPolicy(0.6, "equalize", 5, 0.5, "equalize", 1, fillcolor),
-            SubPolicy(0.6, "contrast", 7, 0.6, "sharpness", 5, fillcolor),
-
-            SubPolicy(0.7, "color", 7, 0.5, "translate_x", 8, fillcolor),
-            SubPolicy(0.3, "equalize", 7, 0.4, "autocontrast", 8, fillcolor),
-            SubPolicy(0.4, "translateY", 3, 0.2, "sharpness", 6, fillcolor),
-            SubPolicy(0.9, "brightness", 6, 0.2, "color", 8, fillcolor),
-            SubPolicy(0.5, "solarize", 2, 0.0, "invert", 3, fillcolor),
-
-            SubPolicy(0.2, "equalize", 0, 0.6, "autocontrast", 0, fillcolor),
-            SubPolicy(0.2, "equalize", 8, 0.6, "equalize", 4, fillcolor),
-            SubPolicy(0.9, "color", 9, 0.6, "equalize", 6, fillcolor),
-            SubPolicy(0.8, "autocontrast", 4, 0.2, "solarize", 8, fillcolor),
-            SubPolicy(0.1, "brightness", 3, 0.7, "color", 0, fillcolor),
-
-            SubPolicy(0.4, "solarize", 5, 0.9, "autocontrast", 3, fillcolor),
-            SubPolicy(0.9, "translateY", 9, 0.7, "translateY", 9, fillcolor),
-            SubPolicy(0.9, "autocontrast", 2, 0.8, "solarize", 3, fillcolor),
-            SubPolicy(0.8, "equalize", 8, 0.1, "invert", 3, fillcolor),
-            SubPolicy(0.7, "translateY", 9, 0.9, "autocontrast", 1, fillcolor)
-        ]
+    def __init__(self, fillcolor=(128, 128, 128), shear_translate=False):
+        self.policies = [SubPolicy(*policy, fillcolor=fillcolor,
+                                   shear_translate=shear_translate)
+                         for policy in CIFAR10_POLICIES]
 
     def __call__(self, img):
         policy_idx = random.randint(0, len(self.policies) - 1)
@@ -156,39 +207,13 @@ class SVHNPolicy(object):
         >>>     transforms.Resize(256),
         >>>     SVHNPolicy(),
         >>>     transforms.ToTensor()])
+
+        :param shear_translate: See :class:`SubPolicy`
     """
-    def __init__(self, fillcolor=(128, 128, 128)):
-        self.policies = [
-            SubPolicy(0.9, "shear_x", 4, 0.2, "invert", 3, fillcolor),
-            SubPolicy(0.9, "shear_y", 8, 0.7, "invert", 5, fillcolor),
-            SubPolicy(0.6, "equalize", 5, 0.6, "solarize", 6, fillcolor),
-            SubPolicy(0.9, "invert", 3, 0.6, "equalize", 3, fillcolor),
-            SubPolicy(0.6, "equalize", 1, 0.9, "rotate", 3, fillcolor),
-
-            SubPolicy(0.9, "shear_x", 4, 0.8, "autocontrast", 3, fillcolor),
-            SubPolicy(0.9, "shear_y", 8, 0.4, "invert", 5, fillcolor),
-            SubPolicy(0.9, "shear_y", 5, 0.2, "solarize", 6, fillcolor),
-            SubPolicy(0.9, "invert", 6, 0.8, "autocontrast", 1, fillcolor),
-            SubPolicy(0.6, "equalize", 3, 0.9, "rotate", 3, fillcolor),
-
-            SubPolicy(0.9, "shear_x", 4, 0.3, "solarize", 3, fillcolor),
-            SubPolicy(0.8, "shear_y", 8, 0.7, "invert", 4, fillcolor),
-            SubPolicy(0.9, "equalize", 5, 0.6, "translate_y", 6, fillcolor),
-            SubPolicy(0.9, "invert", 4, 0.6, "equalize", 7, fillcolor),
-            SubPolicy(0.3, "contrast", 3, 0.8, "rotate", 4, fillcolor),
-
-            SubPolicy(0.8, "invert", 5, 0.0, "translate_y", 2, fillcolor),
-            SubPolicy(0.7, "shear_y", 6, 0.4, "solarize", 8, fillcolor),
-            SubPolicy(0.6, "invert", 4, 0.8, "rotate", 4, fillcolor),
-            SubPolicy(0.3, "shear_y", 7, 0.9, "translate_x", 3, fillcolor),
-            SubPolicy(0.1, "shear_x", 6, 0.6, "invert", 5, fillcolor),
-
-            SubPolicy(0.7, "solarize", 2, 0.6, "translate_y", 7, fillcolor),
-            SubPolicy(0.8, "shear_y", 4, 0.8, "invert", 8, fillcolor),
-            SubPolicy(0.7, "shear_x", 9, 0.8, "translate_y", 3, fillcolor),
-            SubPolicy(0.8, "shear_y", 5, 0.7, "autocontrast", 3, fillcolor),
-            SubPolicy(0.7, "shear_x", 2, 0.1, "invert", 5, fillcolor)
-        ]
+    def __init__(self, fillcolor=(128, 128, 128), shear_translate=False):
+        self.policies = [SubPolicy(*policy, fillcolor=fillcolor,
+                                   shear_translate=shear_translate)
+                         for policy in SVHN_POLICIES]
 
     def __call__(self, img):
         policy_idx = random.randint(0, len(self.policies) - 1)
@@ -207,35 +232,31 @@ def rotate_with_fill(img, magnitude):
 
 
 def shear_x(img, magnitude):
-    img.transform(
+    return img.transform(
         img.size, Image.AFFINE,
         (1, magnitude * random.choice([-1, 1]), 0, 0, 1, 0),
         Image.BICUBIC, fillcolor=(128, 128, 128))
-    return img
 
 
 def shear_y(img, magnitude):
-    img.transform(
+    return img.transform(
         img.size, Image.AFFINE,
         (1, 0, 0, magnitude * random.choice([-1, 1]), 1, 0),
         Image.BICUBIC, fillcolor=(128, 128, 128))
-    return img
 
 
 def translate_x(img, magnitude):
-    img.transform(
+    return img.transform(
         img.size, Image.AFFINE,
         (1, 0, magnitude * img.size[0] * random.choice([-1, 1]), 0, 1, 0),
         fillcolor=(128, 128, 128))
-    return img
 
 
 def translate_y(img, magnitude):
-    img.transform(
+    return img.transform(
         img.size, Image.AFFINE,
         (1, 0, 0, 0, 1, magnitude * img.size[1] * random.choice([-1, 1])),
         fillcolor=(128, 128, 128))
-    return img
 
 
 def rotate(img, magnitude):
@@ -282,26 +303,44 @@ def invert(img, magnitude):
     return ImageOps.invert(img)
 
 
+def skip_transform(img, magnitude):
+    # Draw the random sign like the skipped affine transform, so that the
+    # following operations see the same random numbers as before
+    random.choice([-1, 1])
+    return img
+
+
+# Magnitude of each operation for every magnitude index
+MAGNITUDE_RANGES = {
+    "shear_x": np.linspace(0, 0.3, 10),
+    "shear_y": np.linspace(0, 0.3, 10),
+    "translate_x": np.linspace(0, 150 / 331, 10),
+    "translate_y": np.linspace(0, 150 / 331, 10),
+    "rotate": np.linspace(0, 30, 10),
+    "color": np.linspace(0.0, 0.9, 10),
+    "posterize": np.round(np.linspace(8, 4, 10), 0).astype(int),
+    "solarize": np.linspace(256, 0, 10),
+    "contrast": np.linspace(0.0, 0.9, 10),
+    "sharpness": np.linspace(0.0, 0.9, 10),
+    "brightness": np.linspace(0.0, 0.9, 10),
+    "autocontrast": [0] * 10,
+    "equalize": [0] * 10,
+    "invert": [0] * 10
+}
+
+
 class SubPolicy(object):
-    def __init__(self, p1, operation1, magnitude_idx1, p2, operation2, magnitude_idx2,
-                 fillcolor=(128, 128, 128)):
-        ranges = {
-            "shear_x": np.linspace(0, 0.3, 10),
-            "shear_y": np.linspace(0, 0.3, 10),
-            "translate_x": np.linspace(0, 150 / 331, 10),
-            "translate_y": np.linspace(0, 150 / 331, 10),
-            "rotate": np.linspace(0, 30, 10),
-            "color": np.linspace(0.0, 0.9, 10),
-            "posterize": np.round(np.linspace(8, 4, 10), 0).astype(np.int),
-            "solarize": np.linspace(256, 0, 10),
-            "contrast": np.linspace(0.0, 0.9, 10),
-            "sharpness": np.linspace(0.0, 0.9, 10),
-            "brightness": np.linspace(0.0, 0.9, 10),
-            "autocontrast": [0] * 10,
-            "equalize": [0] * 10,
-            "invert": [0] * 10
-        }
+    """
+    Apply two operations, each with its own probability.
 
+    :param shear_translate: Whether to apply the shear_x/y and translate_x/y
+                            operations. Earlier versions of these operations
+                            discarded the transformed image and returned the
+                            input, and existing experiments were trained that
+                            way. Defaults to False to reproduce them.
+    """
+    def __init__(self, p1, operation1, magnitude_idx1, p2, operation2, magnitude_idx2,
+                 fillcolor=(128, 128, 128), shear_translate=False):
         func = {
             "shear_x": shear_x,
             "shear_y": shear_y,
@@ -318,15 +357,18 @@ class SubPolicy(object):
             "equalize": equalize,
             "invert": invert
         }
+        if not shear_translate:
+            for name in ("shear_x", "shear_y", "translate_x", "translate_y"):
+                func[name] = skip_transform
 
         self.op1name = operation1
         self.op2name = operation2
         self.p1 = p1
         self.operation1 = func[operation1]
-        self.magnitude1 = ranges[operation1][magnitude_idx1]
+        self.magnitude1 = MAGNITUDE_RANGES[operation1][magnitude_idx1]
         self.p2 = p2
         self.operation2 = func[operation2]
-        self.magnitude2 = ranges[operation2][magnitude_idx2]
+        self.magnitude2 = MAGNITUDE_RANGES[operation2][magnitude_idx2]
 
     def __call__(self, img):
         if random.random() < self.p1:
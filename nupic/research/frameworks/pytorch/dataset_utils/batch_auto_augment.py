@@ -0,0 +1,359 @@
+# ----------------------------------------------------------------------
+# Numenta Platform for Intelligent Computing (NuPIC)
+# Copyright (C) 2021, Numenta, Inc.  Unless you have an agreement
+# with Numenta, Inc., for a separate license for this software code, the
+# following terms and conditions apply:
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero Public License version 3 as
+# published by the Free Software Foundation.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.
+# See the GNU Affero Public License for more details.
+#
+# You should have received a copy of the GNU Affero Public License
+# along with this program.  If not, see http://www.gnu.org/licenses.
+#
+# http://numenta.org/licenses/
+# ----------------------------------------------------------------------
+
+"""
+Tensor implementation of the AutoAugment policies in :mod:`.auto_augment`.
+
+The policies are applied to a whole collated batch of uint8 images of shape
+(batch_size, channels, height, width), on any device, choosing a random
+sub-policy for each sample. Each operation follows the PIL implementation used
+by :class:`.auto_augment.SubPolicy`, including its rounding.
+
+These policies are library-only: the dataset factories keep applying the PIL
+policies in the DataLoader workers. On CPU the batch policies are slower than
+the PIL ones (see ``projects/imagenet/benchmark_auto_augment.py``); they are
+meant to be applied by the caller to uint8 batches already on the accelerator.
+"""
+
+import math
+
+import torch
+import torch.nn.functional as F
+
+from .auto_augment import (
+    CIFAR10_POLICIES,
+    IMAGENET_POLICIES,
+    MAGNITUDE_RANGES,
+    SVHN_POLICIES,
+)
+
+__all__ = [
+    "BatchPolicy",
+    "ImageNetBatchPolicy",
+    "CIFAR10BatchPolicy",
+    "SVHNBatchPolicy",
+]
+
+
+class BatchPolicy(object):
+    """
+    Apply a randomly chosen sub-policy to each image of a uint8 batch.
+
+    Typical usage, after collation and before normalization::
+
+        policy = ImageNetBatchPolicy()
+        images = policy(images.to(device))
+        images = normalize(images.float().div_(255))
+
+    :param policies: list of sub-policies as
+                     (p1, operation1, magnitude_idx1, p2, operation2, magnitude_idx2)
+    :param fillcolor: color used for the pixels outside of the transformed image
+    :param shear_translate: Whether to apply the shear and translate operations.
+                            See :class:`.auto_augment.SubPolicy`
+    """
+    def __init__(self, policies, fillcolor=(128, 128, 128), shear_translate=False):
+        self.fillcolor = fillcolor
+        self.shear_translate = shear_translate
+        self.operations = sorted({p[op] for p in policies for op in (1, 4)})
+
+        # Indexed by [policy, stage]
+        self.probs = torch.tensor([[p[0], p[3]] for p in policies])
+        self.ops = torch.tensor([[self.operations.index(p[1]),
+                                  self.operations.index(p[4])] for p in policies])
+        self.magnitudes = torch.tensor([[float(MAGNITUDE_RANGES[p[1]][p[2]]),
+                                         float(MAGNITUDE_RANGES[p[4]][p[5]])]
+                                        for p in policies])
+
+    def __call__(self, images):
+        images = images.clone()
+        batch_size = len(images)
+
+        policy_idx = torch.randint(len(self.probs), (batch_size,))
+        for stage in range(2):
+            apply = torch.rand(batch_size) < self.probs[policy_idx, stage]
+            ops = self.ops[policy_idx, stage]
+            magnitudes = self.magnitudes[policy_idx, stage]
+            for i, name in enumerate(self.operations):
+                if not self.shear_translate and name in SHEAR_TRANSLATE:
+                    continue
+                samples = torch.nonzero(apply & (ops == i), as_tuple=False).flatten()
+                if len(samples) == 0:
+                    continue
+                magnitude = magnitudes[samples].to(images.device)
+                samples = samples.to(images.device)
+                out = OPERATIONS[name](images.index_select(0, samples), magnitude,
+                                       self.fillcolor)
+                images.index_copy_(0, samples, out)
+        return images
+
+
+class ImageNetBatchPolicy(BatchPolicy):
+    """
+    Randomly choose one of the best 24 Sub-policies on ImageNet for each image
+    of the batch. See :class:`.auto_augment.ImageNetPolicy`
+    """
+    def __init__(self, fillcolor=(128, 128, 128), shear_translate=False):
+        super().__init__(IMAGENET_POLICIES, fillcolor, shear_translate)
+
+    def __repr__(self):
+        return "AutoAugment ImageNet Batch Policy"
+
+
+class CIFAR10BatchPolicy(BatchPolicy):
+    """
+    Randomly choose one of the best 25 Sub-policies on CIFAR10 for each image
+    of the batch. See :class:`.auto_augment.CIFAR10Policy`
+    """
+    def __init__(self, fillcolor=(128, 128, 128), shear_translate=False):
+        super().__init__(CIFAR10_POLICIES, fillcolor, shear_translate)
+
+    def __repr__(self):
+        return "AutoAugment CIFAR10 Batch Policy"
+
+
+class SVHNBatchPolicy(BatchPolicy):
+    """
+    Randomly choose one of the best 25 Sub-policies on SVHN for each image
+    of the batch. See :class:`.auto_augment.SVHNPolicy`
+    """
+    def __init__(self, fillcolor=(128, 128, 128), shear_translate=False):
+        super().__init__(SVHN_POLICIES, fillcolor, shear_translate)
+
+    def __repr__(self):
+        return "AutoAugment SVHN Batch Policy"
+
+
+def random_sign(magnitude):
+    sign = torch.randint(2, magnitude.shape, device=magnitude.device) * 2 - 1
+    return magnitude * sign
+
+
+def blend(degenerate, images, factor):
+    """
+    Same as `PIL.Image.blend(degenerate, images, factor)` for each image.
+    Both images must be float tensors
+    """
+    out = (images - degenerate).mul_(factor.view(-1, 1, 1, 1)).add_(degenerate)
+    # uint8 conversion truncates like PIL
+    return out.clamp_(0, 255).to(torch.uint8)
+
+
+def grayscale(images):
+    """
+    Same as `PIL.Image.convert("L")` on float images, keeping the channel
+    dimension. Float32 is exact for the fixed point coefficients used by PIL
+    """
+    if images.shape[1] == 1:
+        return images
+    r, g, b = images.unbind(dim=1)
+    gray = r * 19595 + g * 38470 + b * 7471 + 0x8000
+    return gray.div_(2 ** 16).floor_().unsqueeze(1)
+
+
+def affine(images, matrix, mode, fillcolor):
+    """
+    Same as `PIL.Image.transform(size, Image.AFFINE, matrix)` for each image.
+
+    :param matrix: tensor of shape (batch_size, 2, 3) mapping output pixel
+                   coordinates to input pixel coordinates
+    :param mode: "nearest" or "bilinear"
+    """
+    batch_size, channels, height, width = images.shape
+    device = images.device
+
+    ys, xs = torch.meshgrid(torch.arange(height, device=device) + 0.5,
+                            torch.arange(width, device=device) + 0.5)
+    coords = torch.stack((xs, ys, torch.ones_like(xs)), dim=-1).view(1, -1, 3)
+    coords = coords.matmul(matrix.transpose(1, 2))
+
+    if mode == "nearest":
+        # Gather the uint8 pixels directly, rounding down the input coordinates
+        # like PIL
+        x, y = coords.floor_().long().unbind(dim=-1)
+        inside = (x >= 0) & (x < width) & (y >= 0) & (y < height)
+        index = y.clamp_(0, height - 1) * width + x.clamp_(0, width - 1)
+        index = index.unsqueeze(1).expand(-1, channels, -1)
+        out = images.flatten(start_dim=2).gather(2, index)
+        fill = torch.tensor(fillcolor[:channels], dtype=images.dtype, device=device)
+        out = torch.where(inside.unsqueeze(1), out, fill.view(1, -1, 1))
+        return out.view_as(images)
+
+    size = torch.tensor([width, height], dtype=coords.dtype, device=device)
+    grid = (coords * (2 / size) - 1).view(batch_size, height, width, 2)
+
+    # Sample an extra channel of ones to find the pixels outside of the image
+    ones = images.new_ones((batch_size, 1, height, width), dtype=torch.float)
+    out = F.grid_sample(torch.cat((images.float(), ones), dim=1), grid,
+                        mode=mode, padding_mode="zeros", align_corners=False)
+    out, inside = out[:, :channels], out[:, channels:]
+
+    fill = torch.tensor(fillcolor[:channels], dtype=out.dtype, device=device)
+    out = out + (1 - inside) * fill.view(1, -1, 1, 1)
+    return out.round_().clamp_(0, 255).to(torch.uint8)
+
+
+def shear_x(images, magnitude, fillcolor):
+    matrix = images.new_zeros((len(images), 2, 3), dtype=torch.float)
+    matrix[:, 0, 0] = 1
+    matrix[:, 0, 1] = random_sign(magnitude)
+    matrix[:, 1, 1] = 1
+    # torch 1.6 grid_sample has no bicubic mode
+    return affine(images, matrix, "bilinear", fillcolor)
+
+
+def shear_y(images, magnitude, fillcolor):
+    matrix = images.new_zeros((len(images), 2, 3), dtype=torch.float)
+    matrix[:, 0, 0] = 1
+    matrix[:, 1, 0] = random_sign(magnitude)
+    matrix[:, 1, 1] = 1
+    return affine(images, matrix, "bilinear", fillcolor)
+
+
+def translate_x(images, magnitude, fillcolor):
+    matrix = images.new_zeros((len(images), 2, 3), dtype=torch.float)
+    matrix[:, 0, 0] = 1
+    matrix[:, 0, 2] = random_sign(magnitude) * images.shape[3]
+    matrix[:, 1, 1] = 1
+    return affine(images, matrix, "nearest", fillcolor)
+
+
+def translate_y(images, magnitude, fillcolor):
+    matrix = images.new_zeros((len(images), 2, 3), dtype=torch.float)
+    matrix[:, 0, 0] = 1
+    matrix[:, 1, 1] = 1
+    matrix[:, 1, 2] = random_sign(magnitude) * images.shape[2]
+    return affine(images, matrix, "nearest", fillcolor)
+
+
+def rotate(images, magnitude, fillcolor):
+    # Same matrix as `PIL.Image.rotate`, counter clockwise around the center
+    height, width = images.shape[2:]
+    center_x, center_y = width / 2, height / 2
+    angle = -magnitude * (math.pi / 180)
+    cos, sin = torch.cos(angle), torch.sin(angle)
+
+    matrix = torch.stack((
+        torch.stack((cos, sin, center_x - cos * center_x - sin * center_y), dim=1),
+        torch.stack((-sin, cos, center_y + sin * center_x - cos * center_y), dim=1),
+    ), dim=1)
+    return affine(images, matrix, "nearest", fillcolor)
+
+
+def color(images, magnitude, fillcolor):
+    images = images.float()
+    return blend(grayscale(images), images, 1 + random_sign(magnitude))
+
+
+def posterize(images, magnitude, fillcolor):
+    # Keep the `magnitude` most significant bits
+    mask = 256 - 2 ** (8 - magnitude.long())
+    mask = mask.to(torch.uint8).view(-1, 1, 1, 1)
+    return images & mask
+
+
+def solarize(images, magnitude, fillcolor):
+    # Invert the pixels above the threshold. Integer pixels are below a
+    # threshold if they are below its ceiling, which fits in uint8 unless the
+    # threshold is 256 and no pixel is inverted
+    threshold = magnitude.ceil().view(-1, 1, 1, 1)
+    above = images >= threshold.clamp(max=255).to(torch.uint8)
+    above &= threshold < 256
+    # 255 - x is x ^ 255 for uint8
+    return images ^ above.to(torch.uint8).mul_(255)
+
+
+def contrast(images, magnitude, fillcolor):
+    images = images.float()
+    mean = grayscale(images).mean(dim=(1, 2, 3), keepdim=True)
+    return blend(mean.add_(0.5).floor_(), images, 1 + random_sign(magnitude))
+
+
+def sharpness(images, magnitude, fillcolor):
+    # PIL ImageFilter.SMOOTH, the 3x3 kernel with 5 in the center and 1
+    # elsewhere over 13, leaving the border pixels unchanged
+    images = images.float()
+    smooth = F.avg_pool2d(images, 3, stride=1).mul_(9 / 13)
+    smooth.add_(images[:, :, 1:-1, 1:-1], alpha=4 / 13)
+    degenerate = images.clone()
+    degenerate[:, :, 1:-1, 1:-1] = smooth.add_(0.5).floor_()
+    return blend(degenerate, images, 1 + random_sign(magnitude))
+
+
+def brightness(images, magnitude, fillcolor):
+    factor = 1 + random_sign(magnitude)
+    out = images.float().mul_(factor.view(-1, 1, 1, 1))
+    return out.clamp_(0, 255).to(torch.uint8)
+
+
+def autocontrast(images, magnitude, fillcolor):
+    # Stretch each channel to the full range, unless it is a single color
+    flat = images.flatten(start_dim=2)
+    lo = flat.min(dim=2).values.view(*flat.shape[:2], 1, 1).float()
+    hi = flat.max(dim=2).values.view(*flat.shape[:2], 1, 1).float()
+    scale = 255 / (hi - lo).clamp_(min=1)
+    out = images.float().mul_(scale).sub_(lo * scale)
+    out = out.clamp_(0, 255).to(torch.uint8)
+    return torch.where(hi > lo, out, images)
+
+
+def equalize(images, magnitude, fillcolor):
+    # Same lookup table as `PIL.ImageOps.equalize` for each channel
+    batch_size, channels, height, width = images.shape
+    flat = images.reshape(batch_size * channels, -1).long()
+    offsets = torch.arange(0, len(flat) * 256, 256, device=images.device)
+    hist = torch.bincount((flat + offsets.unsqueeze(1)).flatten(),
+                          minlength=len(flat) * 256).view(-1, 256)
+
+    # Count of the last non empty bin
+    bins = torch.arange(256, device=images.device)
+    last = torch.where(hist > 0, bins, torch.zeros_like(bins))
+    last = last.max(dim=1, keepdim=True).values
+    step = (height * width - hist.gather(1, last)) // 255
+    lut = (step // 2 + hist.cumsum(dim=1) - hist) // step.clamp(min=1)
+    lut = lut.clamp_(max=255).to(torch.uint8)
+
+    out = lut.gather(1, flat)
+    out = torch.where(step > 0, out, images.view_as(out))
+    return out.view_as(images)
+
+
+def invert(images, magnitude, fillcolor):
+    return images ^ 255
+
+
+SHEAR_TRANSLATE = ("shear_x", "shear_y", "translate_x", "translate_y")
+
+OPERATIONS = {
+    "shear_x": shear_x,
+    "shear_y": shear_y,
+    "translate_x": translate_x,
+    "translate_y": translate_y,
+    "rotate": rotate,
+    "color": color,
+    "posterize": posterize,
+    "solarize": solarize,
+    "contrast": contrast,
+    "sharpness": sharpness,
+    "brightness": brightness,
+    "autocontrast": autocontrast,
+    "equalize": equalize,
+    "invert": invert,
+}
@@ -29,6 +29,7 @@ from torch.utils.data import DistributedSampler, Sampler
 __all__ = [
     "TaskDistributedSampler",
     "TaskRandomSampler",
+    "set_batch_size",
 ]
 
 
@@ -101,3 +102,26 @@ class TaskRandomSampler(Sampler):
 
     def __len__(self):
         return len(self.indices)
+
+
+def set_batch_size(loader, batch_size):
+    """
+    Change the batch size of a DataLoader in place, to be used between epochs.
+
+    The loader keeps its dataset, sampler and workers configuration, so the
+    sampler ordering (e.g. the epoch of a `DistributedSampler`,
+    `TaskDistributedSampler` or `UnpaddedDistributedSampler`) is unaffected
+    and the dataset does not need to be loaded again. The batch sampler is
+    queried by the main process on every epoch, so the new batch size applies
+    from the next iteration over the loader.
+
+    :param loader: DataLoader created with automatic batching
+    :param batch_size: new batch size
+    """
+    if not hasattr(loader.batch_sampler, "batch_size"):
+        raise ValueError("The loader must use automatic batching")
+
+    loader.batch_sampler.batch_size = batch_size
+    # DataLoader forbids setting `batch_size` once initialized. Keep it
+    # consistent with the batch sampler for code reading `loader.batch_size`
+    object.__setattr__(loader, "batch_size", batch_size)
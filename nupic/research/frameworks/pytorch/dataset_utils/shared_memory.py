@@ -0,0 +1,351 @@
+# ----------------------------------------------------------------------
+# Numenta Platform for Intelligent Computing (NuPIC)
+# Copyright (C) 2021, Numenta, Inc.  Unless you have an agreement
+# with Numenta, Inc., for a separate license for this software code, the
+# following terms and conditions apply:
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero Public License version 3 as
+# published by the Free Software Foundation.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.
+# See the GNU Affero Public License for more details.
+#
+# You should have received a copy of the GNU Affero Public License
+# along with this program.  If not, see http://www.gnu.org/licenses.
+#
+# http://numenta.org/licenses/
+# ----------------------------------------------------------------------
+
+import inspect
+import math
+import warnings
+from bisect import bisect
+from collections import namedtuple
+
+import torch
+import torch.distributed as dist
+import torch.nn.functional as F
+from torch.utils.data import DataLoader, Dataset, Sampler
+
+__all__ = [
+    "EpochBatch",
+    "EpochVariants",
+    "EpochBatchSampler",
+    "SharedTensorDataset",
+    "ResizeBatch",
+    "create_epoch_loader",
+    "has_random_transforms",
+]
+
+
+EpochBatch = namedtuple("EpochBatch", ["epoch", "indices"])
+EpochBatch.__doc__ = "Indices of a batch, yielded by :class:`EpochBatchSampler`"
+
+
+class EpochVariants(object):
+    """
+    Epoch dependent data loading arguments such as the batch size, image
+    resolution or the subset of the dataset to use.
+
+    :param defaults: dictionary of arguments used unless overridden
+    :param variants: A dictionary mapping epoch to the arguments overridden
+         from this epoch onward. For example:
+
+             variants={
+                  0: dict(batch_size=64, resolution=24),  # epoch  0-9
+                 10: dict(batch_size=128),                # epoch 10-19
+                 20: dict(resolution=None, subset=0.5),   # epoch 20-end
+             }
+    """
+
+    def __init__(self, defaults=None, variants=None):
+        self.defaults = dict(defaults or {})
+        self.variants = {int(k): dict(v) for k, v in (variants or {}).items()}
+        self.epochs = sorted(self.variants.keys())
+
+    def __call__(self, epoch):
+        """
+        :return: arguments to use for the given epoch
+        """
+        args = dict(self.defaults)
+        for start in self.epochs[:bisect(self.epochs, epoch)]:
+            args.update(self.variants[start])
+        return args
+
+
+class EpochBatchSampler(Sampler):
+    """
+    Batch sampler whose batch size and dataset subset may change from epoch to
+    epoch. Batches are yielded as :class:`EpochBatch` tuples, which
+    :class:`SharedTensorDataset` gathers in a single indexing operation. The
+    number of batches of any epoch is known ahead of time, see
+    :meth:`num_batches`. The method `set_epoch` must be called on each epoch.
+
+    When `torch.distributed` is initialized, every replica gets a disjoint
+    part of the (shuffled) indices, like :class:`DistributedSampler`.
+
+    :param num_samples: size of the dataset
+    :param variants: :class:`EpochVariants` with the "batch_size" and optional
+                     "subset" arguments. The subset is either a fraction of the
+                     dataset, sampled for each epoch, or a sequence of indices
+    :param shuffle: whether or not to shuffle the indices on every epoch
+    :param drop_last: whether or not to drop the last incomplete batch
+    :param seed: seed of the shuffling, combined with the epoch
+    """
+
+    def __init__(self, num_samples, variants, shuffle=True, drop_last=True,
+                 seed=0, num_replicas=None, rank=None):
+        self.num_samples = num_samples
+        self.variants = variants
+        self.shuffle = shuffle
+        self.drop_last = drop_last
+        self.seed = seed
+        self.num_replicas = num_replicas
+        self.rank = rank
+        self.epoch = 0
+
+    def set_epoch(self, epoch):
+        self.epoch = epoch
+
+    def num_batches(self, epoch):
+        """
+        :return: exact number of batches yielded during the given epoch
+        """
+        batch_size = self.variants(epoch)["batch_size"]
+        num_samples = self._num_replica_samples(epoch)
+        if self.drop_last:
+            return num_samples // batch_size
+        return math.ceil(num_samples / batch_size)
+
+    def __len__(self):
+        return self.num_batches(self.epoch)
+
+    def __iter__(self):
+        epoch = self.epoch
+        batch_size = self.variants(epoch)["batch_size"]
+        num_replicas, rank = self._replicas()
+
+        generator = torch.Generator()
+        generator.manual_seed(self.seed + epoch)
+        indices = self._subset_indices(epoch, generator)
+        if self.shuffle:
+            indices = indices[torch.randperm(len(indices), generator=generator)]
+
+        if num_replicas > 1:
+            # Add extra samples to make it evenly divisible
+            total_size = self._num_replica_samples(epoch) * num_replicas
+            indices = torch.cat((indices, indices[:total_size - len(indices)]))
+            indices = indices[rank:total_size:num_replicas]
+
+        for batch in self._split(indices, batch_size):
+            yield EpochBatch(epoch, batch)
+
+    def _split(self, indices, batch_size):
+        num_batches = len(indices) // batch_size
+        if not self.drop_last:
+            num_batches = math.ceil(len(indices) / batch_size)
+        for i in range(num_batches):
+            yield indices[i * batch_size:(i + 1) * batch_size]
+
+    def _subset_indices(self, epoch, generator):
+        subset = self.variants(epoch).get("subset", None)
+        if subset is None:
+            return torch.arange(self.num_samples)
+        if isinstance(subset, float):
+            # Random subset for each epoch
+            num_subset = int(subset * self.num_samples)
+            subset_generator = torch.Generator()
+            subset_generator.manual_seed(self.seed + epoch + 1)
+            return torch.randperm(self.num_samples,
+                                  generator=subset_generator)[:num_subset]
+        return torch.as_tensor(subset, dtype=torch.long)
+
+    def _subset_size(self, epoch):
+        subset = self.variants(epoch).get("subset", None)
+        if subset is None:
+            return self.num_samples
+        if isinstance(subset, float):
+            return int(subset * self.num_samples)
+        return len(subset)
+
+    def _num_replica_samples(self, epoch):
+        num_replicas, _ = self._replicas()
+        return math.ceil(self._subset_size(epoch) / num_replicas)
+
+    def _replicas(self):
+        num_replicas, rank = self.num_replicas, self.rank
+        if num_replicas is None or rank is None:
+            distributed = dist.is_available() and dist.is_initialized()
+            if num_replicas is None:
+                num_replicas = dist.get_world_size() if distributed else 1
+            if rank is None:
+                rank = dist.get_rank() if distributed else 0
+        return num_replicas, rank
+
+
+class SharedTensorDataset(Dataset):
+    """
+    Dataset of tensors (e.g. samples and targets) kept in shared memory, so
+    they are loaded once and shared by every worker and process on the node
+    without copies. Batches are gathered with a single indexing operation when
+    the dataset is indexed by a sequence of indices or an :class:`EpochBatch`,
+    instead of collating samples one at a time.
+
+    The dataset is meant for data with a fixed preprocessing. Random
+    augmentations applied by the transforms of the original dataset would be
+    frozen, so :meth:`from_dataset` refuses datasets with random transforms
+    unless explicitly allowed.
+
+    :param tensors: tensors with the same size in the first dimension
+    :param batch_transform: Optional callable `(tensors, epoch) -> tensors`
+                            applied to :class:`EpochBatch` batches
+    """
+
+    def __init__(self, *tensors, batch_transform=None):
+        assert all(len(t) == len(tensors[0]) for t in tensors)
+        self.tensors = tuple(t.share_memory_() for t in tensors)
+        self.batch_transform = batch_transform
+
+    @classmethod
+    def from_dataset(cls, dataset, batch_size=256, num_workers=0,
+                     allow_random_transforms=False, **kwargs):
+        """
+        Load every sample of the dataset into shared memory tensors.
+
+        :param dataset: map-style dataset returning tuples of tensors or numbers
+        :param batch_size: number of samples loaded at a time
+        :param num_workers: number of workers used to load the dataset
+        :param allow_random_transforms: whether or not to load a dataset with
+                                        random transforms, freezing the
+                                        augmentations drawn while loading
+        """
+        if has_random_transforms(dataset):
+            if not allow_random_transforms:
+                raise ValueError(
+                    "The dataset has random transforms, which would be applied "
+                    "only once when loaded into shared memory. Use a fixed "
+                    "preprocessing or set allow_random_transforms=True.")
+            warnings.warn("Loading a dataset with random transforms into shared "
+                          "memory: the augmentations drawn now are frozen.",
+                          stacklevel=2)
+
+        loader = DataLoader(dataset, batch_size=batch_size, shuffle=False,
+                            num_workers=num_workers)
+        tensors = None
+        start = 0
+        for batch in loader:
+            if tensors is None:
+                tensors = [torch.empty((len(dataset),) + t.shape[1:], dtype=t.dtype)
+                           for t in batch]
+            for tensor, t in zip(tensors, batch):
+                tensor[start:start + len(t)] = t
+            start += len(batch[0])
+        return cls(*tensors, **kwargs)
+
+    def __len__(self):
+        return len(self.tensors[0])
+
+    def __getitem__(self, index):
+        if isinstance(index, EpochBatch):
+            batch = tuple(t[index.indices] for t in self.tensors)
+            if self.batch_transform is not None:
+                batch = self.batch_transform(batch, index.epoch)
+            return batch
+        return tuple(t[index] for t in self.tensors)
+
+
+def has_random_transforms(dataset, num_loads=4):
+    """
+    Check whether the dataset applies random transforms to its samples, either
+    from the names of its (torchvision style) transforms or by loading its
+    first sample a few times.
+
+    :param dataset: map-style dataset returning tuples of tensors or numbers
+    :param num_loads: number of times the first sample is loaded
+    """
+    if any(type(t).__name__.startswith("Random") or type(t).__name__ in
+           RANDOM_TRANSFORMS for t in _iter_transforms(dataset)):
+        return True
+    if len(dataset) == 0:
+        return False
+
+    first = dataset[0]
+    for _ in range(num_loads - 1):
+        sample = dataset[0]
+        if any(not torch.equal(torch.as_tensor(a), torch.as_tensor(b))
+               for a, b in zip(first, sample)):
+            return True
+    return False
+
+
+# Random torchvision transforms whose name doesn't start with "Random"
+RANDOM_TRANSFORMS = {"ColorJitter", "AutoAugment", "RandAugment", "AugMix",
+                     "TrivialAugmentWide", "GaussianBlur", "ElasticTransform"}
+
+
+def _iter_transforms(obj):
+    # Datasets wrapped by Subset and ConcatDataset
+    for dataset in getattr(obj, "datasets", [getattr(obj, "dataset", None)]):
+        if dataset is not None:
+            yield from _iter_transforms(dataset)
+    for name in ("transform", "target_transform", "transforms"):
+        transform = getattr(obj, name, None)
+        if transform is None:
+            continue
+        if isinstance(transform, (list, tuple)):
+            for t in transform:
+                yield t
+                yield from _iter_transforms(t)
+        else:
+            yield transform
+            yield from _iter_transforms(transform)
+
+
+class ResizeBatch(object):
+    """
+    Batch transform resizing the images (first tensor of the batch) to the
+    "resolution" of the epoch's variant, if any.
+
+    :param variants: :class:`EpochVariants`
+    :param mode: interpolation mode, see `torch.nn.functional.interpolate`
+    """
+
+    def __init__(self, variants, mode="bilinear"):
+        self.variants = variants
+        self.mode = mode
+
+    def __call__(self, batch, epoch):
+        resolution = self.variants(epoch).get("resolution", None)
+        images = batch[0]
+        if resolution is None:
+            return batch
+        if isinstance(resolution, int):
+            resolution = (resolution, resolution)
+        if tuple(images.shape[-2:]) == tuple(resolution):
+            return batch
+
+        align_corners = False if self.mode in ("bilinear", "bicubic") else None
+        images = F.interpolate(images.float(), size=resolution, mode=self.mode,
+                               align_corners=align_corners).to(images.dtype)
+        return (images,) + tuple(batch[1:])
+
+
+def create_epoch_loader(dataset, sampler, num_workers=0, pin_memory=False):
+    """
+    Create a loader serving the :class:`EpochBatch` batches of the sampler.
+    Batches are gathered from the shared tensors directly, so workers are
+    rarely needed. When they are, they are kept alive between epochs where
+    supported (torch>=1.7).
+
+    :param dataset: :class:`SharedTensorDataset`
+    :param sampler: :class:`EpochBatchSampler`
+    """
+    kwargs = {}
+    if (num_workers > 0
+            and "persistent_workers" in inspect.signature(DataLoader).parameters):
+        kwargs.update(persistent_workers=True)
+    return DataLoader(dataset, sampler=sampler, batch_size=None,
+                      num_workers=num_workers, pin_memory=pin_memory, **kwargs)
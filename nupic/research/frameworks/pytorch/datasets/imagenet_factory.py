@@ -64,7 +64,7 @@ IMAGENET_NUM_CLASSES = {
 def imagenet(
     data_path, train_dir="train", val_dir="val", num_classes=1000,
     use_auto_augment=False, sample_transform=None, target_transform=None,
-    replicas_per_sample=1, train=True
+    replicas_per_sample=1, train=True, auto_augment_shear_translate=False
 ):
     """
     Create train and val set of Imagenet dataset.
@@ -76,6 +76,7 @@ def imagenet(
             train_dir=train_dir,
             num_classes=num_classes,
             use_auto_augment=use_auto_augment,
+            auto_augment_shear_translate=auto_augment_shear_translate,
             sample_transform=sample_transform,
             target_transform=target_transform,
             replicas_per_sample=replicas_per_sample,
@@ -92,7 +93,8 @@ def imagenet(
 
 def create_train_dataset(
     data_path, train_dir, num_classes=1000, use_auto_augment=False,
-    sample_transform=None, target_transform=None, replicas_per_sample=1
+    sample_transform=None, target_transform=None, replicas_per_sample=1,
+    auto_augment_shear_translate=False
 ):
     """
     Configure Imagenet training dataset
@@ -109,6 +111,9 @@ def create_train_dataset(
     :param replicas_per_sample: Number of replicas to create per sample
                                 in the batch (each replica is transformed
                                 independently). Used in maxup.
+    :param auto_augment_shear_translate: Whether the auto augment policy applies
+                                         its shear and translate operations.
+                                         See :class:`SubPolicy`
 
     :return: CachedDatasetFolder or HDF5Dataset
     """
@@ -117,7 +122,7 @@ def create_train_dataset(
             transforms=[
                 RandomResizedCrop(224),
                 transforms.RandomHorizontalFlip(),
-                ImageNetPolicy(),
+                ImageNetPolicy(shear_translate=auto_augment_shear_translate),
                 transforms.ToTensor(),
                 transforms.Normalize(
                     mean=[0.485, 0.456, 0.406], std=[0.229, 0.224, 0.225],
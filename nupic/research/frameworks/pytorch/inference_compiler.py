@@ -0,0 +1,222 @@
+# ----------------------------------------------------------------------
+# Numenta Platform for Intelligent Computing (NuPIC)
+# Copyright (C) 2021, Numenta, Inc.  Unless you have an agreement
+# with Numenta, Inc., for a separate license for this software code, the
+# following terms and conditions apply:
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero Public License version 3 as
+# published by the Free Software Foundation.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.
+# See the GNU Affero Public License for more details.
+#
+# You should have received a copy of the GNU Affero Public License
+# along with this program.  If not, see http://www.gnu.org/licenses.
+#
+# http://numenta.org/licenses/
+# ----------------------------------------------------------------------
+
+"""
+Compile trained models into frozen TorchScript modules for CPU inference.
+
+The model is simplified before being traced:
+
+- :class:`SparseWeightsBase` wrappers are replaced by the wrapped layer, with
+  the masked weights zeroed once
+- BatchNorm layers following a Conv2d or a Linear layer in a
+  :class:`torch.nn.Sequential` are folded into that layer
+- Dropout and Identity layers are removed
+
+Example::
+
+    compiled = compile_for_inference(model, torch.rand(1, 3, 32, 32))
+    report = inference_report(model, compiled, torch.rand(64, 3, 32, 32))
+"""
+
+import copy
+import time
+
+import numpy as np
+import torch
+import torch.nn as nn
+
+from nupic.research.frameworks.pytorch.remove_batchnorm import FUSE_MODULES_FUNCTIONS
+from nupic.torch.modules.sparse_weights import SparseWeightsBase
+
+__all__ = [
+    "compile_for_inference",
+    "fold_sequential_batchnorm",
+    "inference_report",
+    "remove_inference_noops",
+    "strip_sparse_weights",
+]
+
+NOOP_TYPES = (nn.Identity, nn.Dropout, nn.Dropout2d, nn.Dropout3d,
+              nn.AlphaDropout)
+
+
+def _is_plain_sequential(module):
+    """Whether the children of the module are only run in order by forward"""
+    return (isinstance(module, nn.Sequential)
+            and type(module).forward is nn.Sequential.forward)
+
+
+def _remove_child(parent, name):
+    if _is_plain_sequential(parent):
+        del parent._modules[name]
+    else:
+        setattr(parent, name, nn.Identity())
+
+
+def strip_sparse_weights(model):
+    """
+    Replace the :class:`SparseWeightsBase` wrappers of the model by the
+    layers they wrap, after zeroing the masked weights. The model is modified
+    in place.
+
+    :param model: model to modify
+    :return: the modified model
+    """
+    for parent in list(model.modules()):
+        for name, child in list(parent.named_children()):
+            if isinstance(child, SparseWeightsBase):
+                child.rezero_weights()
+                setattr(parent, name, child.module)
+    return model
+
+
+def fold_sequential_batchnorm(model):
+    """
+    Fold each BatchNorm layer directly following a Conv2d or a Linear layer in
+    a :class:`torch.nn.Sequential` into that layer. Only sequential containers
+    that don't override `forward` are considered since the execution order of
+    the children of other modules is not known. The model must be in eval mode
+    and is modified in place.
+
+    .. seealso:: :func:`remove_batchnorm.fuse_conv_linear_bn`
+
+    :param model: model to modify
+    :return: the modified model
+    """
+    for parent in list(model.modules()):
+        if not _is_plain_sequential(parent):
+            continue
+        children = list(parent.named_children())
+        for (name, module), (bn_name, bn) in zip(children, children[1:]):
+            fold = FUSE_MODULES_FUNCTIONS.get((type(module), type(bn)))
+            if fold is not None and bn.track_running_stats:
+                setattr(parent, name, fold(module, bn))
+                del parent._modules[bn_name]
+    return model
+
+
+def remove_inference_noops(model):
+    """
+    Remove the layers that do nothing during inference, such as dropout. The
+    model is modified in place.
+
+    :param model: model to modify
+    :return: the modified model
+    """
+    for parent in list(model.modules()):
+        for name, child in list(parent.named_children()):
+            if isinstance(child, NOOP_TYPES):
+                _remove_child(parent, name)
+    return model
+
+
+def compile_for_inference(model, example_input, freeze=True, optimize=True,
+                          check=True, epsilon=1e-4):
+    """
+    Simplify a copy of the model for inference then trace it into a
+    TorchScript module. The original model is not modified.
+
+    :param model: trained model
+    :param example_input: input used to trace the model, and to check the
+                          outputs of the compiled model against the original
+    :param freeze: Whether or not to freeze the traced module, inlining the
+                   parameters as constants (requires torch >= 1.8)
+    :param optimize: Whether or not to run `torch.jit.optimize_for_inference`
+                     on the frozen module (requires torch >= 1.10), fusing
+                     conv/relu and running convolutions with MKLDNN
+    :param check: Whether or not to check that the compiled model computes the
+                  same outputs as the original
+    :param epsilon: Tolerance of the output check
+    :return: compiled TorchScript module
+    :raises ValueError: if the outputs of the compiled model differ from the
+                        original by more than `epsilon`
+    """
+    compiled = copy.deepcopy(model).eval()
+    strip_sparse_weights(compiled)
+    fold_sequential_batchnorm(compiled)
+    remove_inference_noops(compiled)
+
+    with torch.no_grad():
+        compiled = torch.jit.trace(compiled, example_input, check_trace=False)
+    if freeze and hasattr(torch.jit, "freeze"):
+        compiled = torch.jit.freeze(compiled)
+        if optimize and hasattr(torch.jit, "optimize_for_inference"):
+            compiled = torch.jit.optimize_for_inference(compiled)
+
+    if check:
+        diff = _max_abs_diff(model, compiled, example_input)
+        if diff > epsilon:
+            raise ValueError(f"Compiled model outputs differ from the original "
+                             f"by {diff}, more than {epsilon}")
+    return compiled
+
+
+def _max_abs_diff(model, compiled, x):
+    training = model.training
+    model.eval()
+    with torch.no_grad():
+        diff = (model(x) - compiled(x)).abs().max().item()
+    model.train(training)
+    return diff
+
+
+def _latency(model, x, num_iterations, warmup):
+    times = []
+    with torch.no_grad():
+        for i in range(warmup + num_iterations):
+            start = time.perf_counter()
+            model(x)
+            if i >= warmup:
+                times.append(time.perf_counter() - start)
+    return float(np.median(times))
+
+
+def inference_report(model, compiled, example_input, num_iterations=50,
+                     warmup=5, epsilon=1e-4):
+    """
+    Compare the CPU latency and the outputs of a compiled model against the
+    original model.
+
+    :param model: original model
+    :param compiled: model compiled with :func:`compile_for_inference`
+    :param example_input: input batch
+    :param num_iterations: Number of timed forward passes for each model
+    :param warmup: Number of untimed forward passes run first
+    :param epsilon: Tolerance of the output check
+    :return: dict with the median ``original_latency`` and
+             ``compiled_latency`` in seconds, the ``speedup``, the
+             ``max_abs_diff`` of the outputs and whether the models are
+             ``equivalent`` within `epsilon`
+    """
+    training = model.training
+    model.eval()
+    original_latency = _latency(model, example_input, num_iterations, warmup)
+    compiled_latency = _latency(compiled, example_input, num_iterations, warmup)
+    model.train(training)
+
+    diff = _max_abs_diff(model, compiled, example_input)
+    return dict(
+        original_latency=original_latency,
+        compiled_latency=compiled_latency,
+        speedup=original_latency / compiled_latency,
+        max_abs_diff=diff,
+        equivalent=diff <= epsilon,
+    )
@@ -0,0 +1,209 @@
+# ----------------------------------------------------------------------
+# Numenta Platform for Intelligent Computing (NuPIC)
+# Copyright (C) 2021, Numenta, Inc.  Unless you have an agreement
+# with Numenta, Inc., for a separate license for this software code, the
+# following terms and conditions apply:
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero Public License version 3 as
+# published by the Free Software Foundation.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.
+# See the GNU Affero Public License for more details.
+#
+# You should have received a copy of the GNU Affero Public License
+# along with this program.  If not, see http://www.gnu.org/licenses.
+#
+# http://numenta.org/licenses/
+# ----------------------------------------------------------------------
+
+"""
+LR-range test of several models, optimizers and LR ranges in a single pass
+over the data. See section 4.1 of "A Disciplined Approach to Neural Network
+Hyper-Parameters" - https://arxiv.org/pdf/1803.09820.pdf
+"""
+
+import contextlib
+import copy
+import math
+import sys
+
+import torch
+import torch.nn.functional as F
+
+from nupic.research.frameworks.pytorch.lr_scheduler import LinearLRScheduler
+
+__all__ = [
+    "multi_lr_range_test",
+    "suggest_lr_bounds",
+]
+
+
+def multi_lr_range_test(
+    replicas,
+    loader,
+    device,
+    criterion=F.cross_entropy,
+    batches_in_epoch=sys.maxsize,
+    transform_to_device_fn=None,
+    smoothing=0.98,
+    min_lr_factor=10,
+):
+    """
+    Run the LR-range test for K independent replicas side by side. Every batch
+    is loaded and sent to the device once and used to train all the replicas,
+    each with its own model, optimizer and learning rate linearly increasing
+    from "min_lr" to "max_lr" over the test (see :class:`LinearLRScheduler`).
+    On GPU, each replica runs on its own CUDA stream so the kernels of small
+    models can overlap.
+
+    For example, comparing weight decays::
+
+        replicas = [
+            dict(
+                name=f"wd={wd}",
+                model=copy.deepcopy(model),
+                optimizer_class=torch.optim.SGD,
+                optimizer_args=dict(momentum=0.9, weight_decay=wd),
+                min_lr=0.001,
+                max_lr=10.0,
+            )
+            for wd in (0.0, 1e-4, 5e-4)
+        ]
+        results = multi_lr_range_test(replicas, train_loader, device)
+
+    :param replicas: list of dicts with the following fields:
+        - name: name of the replica in the results
+        - model: model to train, already on the device
+        - optimizer_class: optimizer class. Default SGD
+        - optimizer_args: optimizer constructor args, without the lr
+        - min_lr: starting learning rate
+        - max_lr: ending learning rate
+    :param loader: train dataset loader
+    :param device: device to use ('cpu' or 'cuda')
+    :param criterion: loss function to use
+    :param batches_in_epoch: Max number of mini batches to train on
+    :param transform_to_device_fn: Function for sending data and labels to the
+                                   device, see :func:`train_model`
+    :param smoothing: Exponential moving average factor used to smooth the loss
+    :param min_lr_factor: Ratio between the suggested max_lr and min_lr
+    :return: dict mapping each replica name to a dict with the learning rate,
+             loss and smoothed loss of every batch and the suggested LR bounds.
+             See :func:`suggest_lr_bounds`
+    """
+    device = torch.device(device)
+    num_batches = min(len(loader), batches_in_epoch)
+    names = [replica["name"] for replica in replicas]
+    assert len(set(names)) == len(names), "Replica names must be unique"
+
+    models, optimizers, schedulers = [], [], []
+    for replica in replicas:
+        model = replica["model"]
+        optimizer_class = replica.get("optimizer_class", torch.optim.SGD)
+        optimizer_args = copy.deepcopy(replica.get("optimizer_args", {}))
+        optimizer_args["lr"] = replica["min_lr"]
+        optimizer = optimizer_class(model.parameters(), **optimizer_args)
+        scheduler = LinearLRScheduler(
+            optimizer, min_lr=replica["min_lr"], max_lr=replica["max_lr"],
+            epochs=1, steps_per_epoch=num_batches,
+        )
+        model.train()
+        models.append(model)
+        optimizers.append(optimizer)
+        schedulers.append(scheduler)
+
+    if device.type == "cuda":
+        streams = [torch.cuda.Stream(device) for _ in replicas]
+    else:
+        streams = [None] * len(replicas)
+
+    # Keep the losses on the device until the end of the test
+    lr_history = [[] for _ in replicas]
+    loss_history = [[] for _ in replicas]
+    async_gpu = loader.pin_memory
+    for batch_idx, (data, target) in enumerate(loader):
+        if batch_idx >= num_batches:
+            break
+        if transform_to_device_fn is None:
+            data = data.to(device, non_blocking=async_gpu)
+            target = target.to(device, non_blocking=async_gpu)
+        else:
+            data, target = transform_to_device_fn(data, target, device,
+                                                  non_blocking=async_gpu)
+
+        for i, stream in enumerate(streams):
+            lr_history[i].append(optimizers[i].param_groups[0]["lr"])
+            with _stream_context(stream, data, target):
+                optimizers[i].zero_grad()
+                loss = criterion(models[i](data), target)
+                loss.backward()
+                optimizers[i].step()
+                schedulers[i].step()
+                loss_history[i].append(loss.detach())
+
+        if device.type == "cuda":
+            for stream in streams:
+                torch.cuda.current_stream(device).wait_stream(stream)
+
+    results = {}
+    for name, lrs, losses in zip(names, lr_history, loss_history):
+        losses = torch.stack(losses).cpu().tolist() if losses else []
+        results[name] = suggest_lr_bounds(lrs, losses, smoothing, min_lr_factor)
+    return results
+
+
+@contextlib.contextmanager
+def _stream_context(stream, *tensors):
+    """Run on a side stream once the tensors produced on the current stream
+    are ready"""
+    if stream is None:
+        yield
+        return
+    stream.wait_stream(torch.cuda.current_stream(stream.device))
+    for tensor in tensors:
+        tensor.record_stream(stream)
+    with torch.cuda.stream(stream):
+        yield
+
+
+def suggest_lr_bounds(lrs, losses, smoothing=0.98, min_lr_factor=10):
+    """
+    Suggest learning rate bounds for a cyclical schedule from a loss-vs-LR
+    curve. The loss is smoothed with a bias corrected exponential moving
+    average and the curve is cut once the smoothed loss diverges (4x its
+    minimum or NaN). The suggested max_lr is the learning rate at the minimum
+    of the smoothed loss and min_lr is `min_lr_factor` times lower. The
+    learning rate where the smoothed loss decreases the fastest is also
+    returned.
+
+    :param lrs: learning rate of every batch
+    :param losses: training loss of every batch
+    :param smoothing: Exponential moving average factor
+    :param min_lr_factor: Ratio between max_lr and min_lr
+    :return: dict with "lr", "loss", "smoothed_loss", "min_lr", "max_lr" and
+             "steepest_lr"
+    """
+    smoothed, average, best = [], 0.0, math.inf
+    for step, loss in enumerate(losses):
+        average = smoothing * average + (1 - smoothing) * loss
+        value = average / (1 - smoothing ** (step + 1))
+        if math.isnan(value) or value > 4 * best:
+            break
+        best = min(best, value)
+        smoothed.append(value)
+
+    result = dict(lr=list(lrs), loss=list(losses), smoothed_loss=smoothed,
+                  min_lr=None, max_lr=None, steepest_lr=None)
+    if len(smoothed) == 0:
+        return result
+
+    best_idx = min(range(len(smoothed)), key=smoothed.__getitem__)
+    result["max_lr"] = lrs[best_idx]
+    result["min_lr"] = lrs[best_idx] / min_lr_factor
+    if len(smoothed) > 1:
+        slopes = [smoothed[i + 1] - smoothed[i] for i in range(len(smoothed) - 1)]
+        steepest_idx = min(range(len(slopes)), key=slopes.__getitem__)
+        result["steepest_lr"] = lrs[steepest_idx + 1]
+    return result
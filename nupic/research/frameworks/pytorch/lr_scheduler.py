@@ -18,8 +18,13 @@
 #  http://numenta.org/licenses/
 #
 import copy
+import csv
+import numbers
+import warnings
 from bisect import bisect
 
+import numpy as np
+import torch
 from torch.optim.lr_scheduler import OneCycleLR, _LRScheduler
 
 
@@ -188,3 +193,196 @@ class LinearLRScheduler(_LRScheduler):
         lr_slope = (self.max_lr - self.min_lr) / (self.total_steps - 1)
         lr_delta = lr_slope * self.current_step
         return [self.min_lr + lr_delta]
+
+
+class ScheduleTable:
+    """
+    Dense table holding the optimizer hyperparameters (learning rate, momentum,
+    weight decay, ...) of every parameter group for every training step. Tuple
+    hyperparameters such as Adam's "betas" are split into one column per item.
+    Use :func:`compile_schedule` to create the table from LR schedulers.
+
+    :param columns: list of (key, index) pairs naming the columns, where index
+                    is the position in a tuple hyperparameter or None
+    :param values: array of shape (steps, param_groups, columns)
+    :param types: dict mapping each key to the type of its values
+    """
+
+    def __init__(self, columns, values, types):
+        self.columns = columns
+        self.values = values
+        self.types = types
+        self.keys = list(types.keys())
+        self._slices = {}
+        for i, (key, _) in enumerate(columns):
+            start, _ = self._slices.get(key, (i, i))
+            self._slices[key] = (start, i + 1)
+        self._fields = [(key, value_type) + self._slices[key]
+                        for key, value_type in types.items()]
+
+    def __len__(self):
+        return len(self.values)
+
+    def __getitem__(self, key):
+        """
+        Values of a hyperparameter for every step and parameter group, e.g. for
+        plotting. Tuple hyperparameters have an extra trailing dimension.
+        """
+        start, end = self._slices[key]
+        if self.types[key] is tuple:
+            return self.values[:, :, start:end]
+        return self.values[:, :, start]
+
+    def get_row(self, step):
+        """
+        Hyperparameters of every parameter group at the given step. Steps past
+        the end of the table keep the values of the last step.
+        """
+        row = self.values[min(step, len(self.values) - 1)].tolist()
+        return [
+            {
+                key: tuple(values[start:end]) if value_type is tuple
+                else value_type(values[start])
+                for key, value_type, start, end in self._fields
+            }
+            for values in row
+        ]
+
+    def apply(self, optimizer, step):
+        """Update the optimizer parameter groups with the values of a step"""
+        for group, values in zip(optimizer.param_groups, self.get_row(step)):
+            group.update(values)
+
+    def to_csv(self, path):
+        """
+        Export the table as csv with one line per step and parameter group,
+        suitable for plotting and diffing schedules
+        """
+        header = ["step", "param_group"] + [
+            key if index is None else f"{key}.{index}"
+            for key, index in self.columns
+        ]
+        with open(path, "w", newline="") as f:
+            writer = csv.writer(f)
+            writer.writerow(header)
+            for step, row in enumerate(self.values):
+                for group_idx, group_values in enumerate(row):
+                    writer.writerow([step, group_idx] + [
+                        repr(v) for v in group_values.tolist()
+                    ])
+
+
+def _is_hyperparameter(value):
+    if isinstance(value, (tuple, list)):
+        return len(value) > 0 and all(_is_hyperparameter(v) for v in value)
+    return isinstance(value, numbers.Number)
+
+
+def compile_schedule(optimizer, schedulers, total_steps, step_interval=1,
+                     keys=None):
+    """
+    Expand LR schedulers into a :class:`ScheduleTable` holding the optimizer
+    hyperparameters used at every training step. The schedulers are simulated
+    on an optimizer without parameters initialized from the parameter groups of
+    the given optimizer, which is not modified.
+
+    For example, the regime of :class:`ComposedLRScheduler` over a full run::
+
+        table = compile_schedule(
+            optimizer,
+            schedulers={0: lambda opt: ComposedLRScheduler(opt, **args)},
+            total_steps=epochs * steps_per_epoch,
+        )
+
+    :param optimizer: Optimizer whose hyperparameters are scheduled
+    :param schedulers: dict mapping the step at which a scheduler becomes active
+                       to a function creating it from an optimizer. The
+                       scheduler is created before the step, as done by
+                       :class:`MultiCycleLR` at the beginning of an epoch.
+    :param total_steps: Number of training steps (batches)
+    :param step_interval: Number of training steps between scheduler steps, i.e.
+                          `steps_per_epoch` for schedulers stepped once per epoch
+    :param keys: Optimizer hyperparameters to record. Default: all numerical
+                 optimizer defaults (lr, momentum, betas, weight_decay, ...)
+    :return: :class:`ScheduleTable` with `total_steps` rows
+    """
+    assert 0 in schedulers, "A scheduler must be active at step 0"
+    if keys is None:
+        keys = [k for k, v in optimizer.defaults.items() if _is_hyperparameter(v)]
+
+    param_groups = [
+        dict({k: v for k, v in group.items() if k != "params"},
+             params=[torch.zeros(1)])
+        for group in optimizer.param_groups
+    ]
+    shadow = torch.optim.Optimizer(param_groups, copy.deepcopy(optimizer.defaults))
+
+    rows = []
+    scheduler = None
+    with warnings.catch_warnings():
+        # Schedulers warn when stepped without calling "optimizer.step"
+        warnings.simplefilter("ignore")
+        for step in range(total_steps):
+            # Step the active scheduler after the previous batch before it is
+            # replaced, as done during training
+            if step > 0 and step % step_interval == 0:
+                scheduler.step()
+            if step in schedulers:
+                scheduler = schedulers[step](shadow)
+            rows.append([
+                [group[k] for k in keys] for group in shadow.param_groups
+            ])
+
+    types = {}
+    columns = []
+    for key, value in zip(keys, rows[0][0]):
+        if isinstance(value, (tuple, list)):
+            types[key] = tuple
+            columns.extend((key, i) for i in range(len(value)))
+        else:
+            types[key] = type(value)
+            columns.append((key, None))
+
+    values = np.array([
+        [
+            [v for value in group
+             for v in (value if isinstance(value, (tuple, list)) else (value,))]
+            for group in row
+        ]
+        for row in rows
+    ], dtype=np.float64)
+    return ScheduleTable(columns, values, types)
+
+
+class CompiledLRScheduler(_LRScheduler):
+    """
+    Applies a precompiled :class:`ScheduleTable` to the optimizer. Every call to
+    :meth:`step` sets the hyperparameters of the next training step in O(1),
+    regardless of the number of milestones or cycles of the compiled schedule.
+    Must be stepped after every batch.
+
+    :param optimizer: Wrapped optimizer
+    :param table: Schedule created by :func:`compile_schedule`
+    :param last_epoch: The index of last step. Default: -1.
+    """
+
+    def __init__(self, optimizer, table, last_epoch=-1):
+        self.table = table
+        super().__init__(optimizer, last_epoch=last_epoch)
+
+    def step(self, epoch=None):
+        self.last_epoch += 1
+        self.table.apply(self.optimizer, self.last_epoch)
+        self._last_lr = [group["lr"] for group in self.optimizer.param_groups]
+
+    def get_lr(self):
+        return [group["lr"] for group in self.table.get_row(self.last_epoch)]
+
+    def state_dict(self):
+        # The table is compiled from the config, there is no need to save it
+        return {key: value for key, value in self.__dict__.items()
+                if key not in ("optimizer", "table")}
+
+    def load_state_dict(self, state_dict):
+        super().load_state_dict(state_dict)
+        self.table.apply(self.optimizer, self.last_epoch)
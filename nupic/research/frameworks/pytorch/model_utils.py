@@ -27,6 +27,7 @@ import sys
 import time
 import warnings
 from collections.abc import Collection
+from concurrent.futures import ThreadPoolExecutor
 
 import numpy as np
 import torch
@@ -47,6 +48,7 @@ def train_model(
     post_batch_callback=None,
     transform_to_device_fn=None,
     progress_bar=None,
+    timer=None,
 ):
     """Train the given model by iterating through mini batches. An epoch ends
     after one pass through the training set, or if the number of mini batches
@@ -86,6 +88,10 @@ def train_model(
     :param progress_bar: Optional :class:`tqdm` progress bar args.
                          None for no progress bar
     :type progress_bar: dict or None
+    :param timer: Optional timer collecting the time spent on each phase of every
+                  batch: "data_loading", "to_device", "forward", "backward",
+                  "complexity_loss", "optimizer_step" and "post_batch"
+    :type timer: :class:`nupic.research.frameworks.pytorch.timing.PhaseTimer`
 
     :return: mean loss for epoch
     :rtype: float
@@ -111,10 +117,12 @@ def train_model(
                 "Mixed precision requires NVIDA APEX."
                 "Please install apex from https://www.github.com/nvidia/apex")
 
-    t0 = time.time()
+    clock = timer.clock if timer is not None else time.time
+    t0 = clock()
     for batch_idx, (data, target) in enumerate(loader):
         if batch_idx >= batches_in_epoch:
             break
+        t_loaded = clock()
 
         num_images = len(target)
         if transform_to_device_fn is None:
@@ -123,7 +131,7 @@ def train_model(
         else:
             data, target = transform_to_device_fn(data, target, device,
                                                   non_blocking=async_gpu)
-        t1 = time.time()
+        t1 = clock()
 
         if pre_batch_callback is not None:
             pre_batch_callback(model=model, batch_idx=batch_idx)
@@ -136,14 +144,14 @@ def train_model(
 
         del data, target, output
 
-        t2 = time.time()
+        t2 = clock()
         if use_amp:
             with amp.scale_loss(error_loss, optimizer) as scaled_loss:
                 scaled_loss.backward()
         else:
             error_loss.backward()
 
-        t3 = time.time()
+        t3 = clock()
 
         # Compute and backpropagate the complexity loss. This happens after
         # error loss has backpropagated, freeing its computation graph, so the
@@ -158,9 +166,9 @@ def train_model(
             else:
                 complexity_loss.backward()
 
-        t4 = time.time()
+        t4 = clock()
         optimizer.step()
-        t5 = time.time()
+        t5 = clock()
 
         if post_batch_callback is not None:
             time_string = ("Data: {:.3f}s, forward: {:.3f}s, backward: {:.3f}s,"
@@ -176,7 +184,13 @@ def train_model(
                                 num_images=num_images,
                                 time_string=time_string)
         del error_loss, complexity_loss
-        t0 = time.time()
+        t6 = clock()
+        if timer is not None:
+            timer.record(data_loading=t_loaded - t0, to_device=t1 - t_loaded,
+                         forward=t2 - t1, backward=t3 - t2,
+                         complexity_loss=t4 - t3, optimizer_step=t5 - t4,
+                         post_batch=t6 - t5)
+        t0 = t6
 
     if progress_bar is not None:
         loader.n = loader.total
@@ -194,6 +208,7 @@ def evaluate_model(
     progress=None,
     post_batch_callback=None,
     transform_to_device_fn=None,
+    timer=None,
 ):
     """Evaluate pre-trained model using given test dataset loader.
 
@@ -225,6 +240,9 @@ def evaluate_model(
                                    the data or targets, and determining what
                                    actually needs to get sent to the device.
     :type transform_to_device_fn: function
+    :param timer: Optional timer collecting the time spent on each phase of every
+                  batch: "data_loading", "to_device", "forward" and "post_batch"
+    :type timer: :class:`nupic.research.frameworks.pytorch.timing.PhaseTimer`
 
     :return: dictionary with computed "mean_accuracy", "mean_loss", "total_correct".
     :rtype: dict
@@ -242,10 +260,13 @@ def evaluate_model(
         loader = tqdm(loader, total=min(len(loader), batches_in_epoch),
                       **progress)
 
+    clock = timer.clock if timer is not None else time.time
+    t0 = clock()
     with torch.no_grad():
         for batch_idx, (data, target) in enumerate(loader):
             if batch_idx >= batches_in_epoch:
                 break
+            t_loaded = clock()
 
             if transform_to_device_fn is None:
                 data = data.to(device, non_blocking=async_gpu)
@@ -253,6 +274,7 @@ def evaluate_model(
             else:
                 data, target = transform_to_device_fn(data, target, device,
                                                       non_blocking=async_gpu)
+            t1 = clock()
 
             output = model(data)
             if active_classes is not None:
@@ -261,10 +283,16 @@ def evaluate_model(
             pred = output.max(1, keepdim=True)[1]
             correct += pred.eq(target.view_as(pred)).sum()
             total += len(data)
+            t2 = clock()
 
             if post_batch_callback is not None:
                 post_batch_callback(batch_idx=batch_idx, target=target, output=output,
                                     pred=pred)
+            t3 = clock()
+            if timer is not None:
+                timer.record(data_loading=t_loaded - t0, to_device=t1 - t_loaded,
+                             forward=t2 - t1, post_batch=t3 - t2)
+            t0 = t3
 
         complexity_loss = (complexity_loss_fn(model)
                            if complexity_loss_fn is not None
@@ -289,6 +317,128 @@ def evaluate_model(
     return result
 
 
+def evaluate_models(
+    models,
+    loader,
+    device,
+    batches_in_epoch=sys.maxsize,
+    criterion=F.nll_loss,
+    active_classes=None,
+    progress=None,
+    transform_to_device_fn=None,
+    num_threads=None,
+):
+    """Evaluate several models in a single pass over the test dataset loader.
+    Every batch is loaded and sent to the device once and fed to all the models,
+    so evaluating N models or checkpoints costs a single pass over the dataset.
+
+    :param models: list of pretrained pytorch models
+    :type models: list of torch.nn.Module
+    :param loader: test dataset loader
+    :type loader: :class:`torch.utils.data.DataLoader`
+    :param device: device to use ('cpu' or 'cuda')
+    :type device: :class:`torch.device`
+    :param batches_in_epoch: Max number of mini batches to test on
+    :type batches_in_epoch: int
+    :param criterion: loss function to use
+    :type criterion: function
+    :param active_classes: a list of indices of the heads that are active for a given
+                           task; only relevant if this function is being used in a
+                           continual learning scenario
+    :type active_classes: list of int or None
+    :param progress: Optional :class:`tqdm` progress bar args. None for no progress bar
+    :type progress: dict or None
+    :param transform_to_device_fn: Function for sending data and labels to the
+                                   device. See :func:`evaluate_model`
+    :type transform_to_device_fn: function
+    :param num_threads: Number of threads running the models in parallel on every
+                        batch. Useful on CPU when the models are too small to use
+                        all the cores. None to run the models sequentially
+    :type num_threads: int or None
+
+    :return: list with one dictionary per model with the same fields as
+             :func:`evaluate_model` ("mean_accuracy", "mean_loss", "total_correct",
+             "total_tested") and "agreement", the fraction of samples for which
+             the model predicts the same class as each of the models
+    :rtype: list of dict
+    """
+    num_models = len(models)
+    for model in models:
+        model.eval()
+    total = 0
+
+    # Perform accumulation on device, avoid paying performance cost of .item()
+    loss = torch.zeros(num_models, device=device)
+    correct = torch.zeros(num_models, dtype=torch.long, device=device)
+    agreement = torch.zeros(num_models, num_models, dtype=torch.long, device=device)
+
+    async_gpu = loader.pin_memory
+
+    if progress is not None:
+        loader = tqdm(loader, total=min(len(loader), batches_in_epoch),
+                      **progress)
+
+    def forward(model, data):
+        with torch.no_grad():
+            output = model(data)
+            if active_classes is not None:
+                output = output[:, active_classes]
+            return output
+
+    executor = None
+    if num_threads is not None and num_threads > 1:
+        executor = ThreadPoolExecutor(max_workers=num_threads)
+
+    try:
+        with torch.no_grad():
+            for batch_idx, (data, target) in enumerate(loader):
+                if batch_idx >= batches_in_epoch:
+                    break
+
+                if transform_to_device_fn is None:
+                    data = data.to(device, non_blocking=async_gpu)
+                    target = target.to(device, non_blocking=async_gpu)
+                else:
+                    data, target = transform_to_device_fn(data, target, device,
+                                                          non_blocking=async_gpu)
+
+                if executor is None:
+                    outputs = [forward(model, data) for model in models]
+                else:
+                    outputs = list(executor.map(forward, models,
+                                                [data] * num_models))
+
+                preds = []
+                for i, output in enumerate(outputs):
+                    loss[i] += criterion(output, target, reduction="sum")
+                    preds.append(output.max(1)[1])
+                preds = torch.stack(preds)
+                correct += preds.eq(target).sum(dim=1)
+                agreement += preds.unsqueeze(1).eq(preds.unsqueeze(0)).sum(dim=2)
+                total += len(target)
+    finally:
+        if executor is not None:
+            executor.shutdown()
+
+    if progress is not None:
+        loader.close()
+
+    loss = loss.tolist()
+    correct = correct.tolist()
+    agreement = agreement.tolist()
+
+    return [
+        {
+            "total_correct": correct[i],
+            "total_tested": total,
+            "mean_loss": loss[i] / total if total > 0 else 0,
+            "mean_accuracy": correct[i] / total if total > 0 else 0,
+            "agreement": [a / total if total > 0 else 0 for a in agreement[i]],
+        }
+        for i in range(num_models)
+    ]
+
+
 def aggregate_eval_results(results):
     """Aggregate multiple results from evaluate_model into a single result.
 
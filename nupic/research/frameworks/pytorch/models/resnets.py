@@ -27,13 +27,16 @@ https://github.com/pytorch/vision/blob/master/torchvision/models/resnet.py and
 https://github.com/meliketoy/wide-resnet.pytorch/ but with many modifications.
 """
 
+import inspect
 from collections import OrderedDict
 from functools import partial
 from itertools import zip_longest
 
+import torch
 import torch.nn as nn
 import torch.nn.quantized as nnq
 from torch.quantization import DeQuantStub, QuantStub, fuse_modules
+from torch.utils.checkpoint import checkpoint
 
 from nupic.torch.modules import Flatten
 
@@ -212,6 +215,143 @@ cf_dict = {
 }
 
 
+# torch >= 1.11 warns unless the checkpoint implementation is chosen explicitly
+_CHECKPOINT_KWARGS = (
+    dict(use_reentrant=True)
+    if "use_reentrant" in inspect.signature(checkpoint).parameters else {}
+)
+
+
+class _CheckpointSegment(object):
+    """
+    Runs a segment of consecutive blocks inside :func:`torch.utils.checkpoint`.
+
+    The segment is run twice: once without grad during the forward pass and once
+    more during the backward pass to recompute its activations. The second run
+    must neither update the running state of the segment a second time (BN
+    running stats, k-winners duty cycles, QAT observers) nor see the state
+    already updated by the first run, otherwise k-winners boosting would pick
+    different winners than the forward pass did. The state is therefore rolled
+    back to its initial value for the recomputation and restored afterwards.
+    The state is made of the buffers and the python counters of the modules,
+    such as ``KWinners2d.learning_iterations``.
+    """
+
+    def __init__(self, blocks):
+        self.blocks = blocks
+        self.modules = [m for block in blocks for m in block.modules()]
+        self.initial_state = None
+
+    def _run(self, x):
+        for block in self.blocks:
+            x = block(x)
+        return x
+
+    def _get_state(self):
+        buffers = [b.clone() for m in self.modules for b in m.buffers(recurse=False)]
+        counters = [
+            {k: v for k, v in vars(m).items()
+             if isinstance(v, (int, float)) and not isinstance(v, bool)}
+            for m in self.modules
+        ]
+        return buffers, counters
+
+    def _set_state(self, state):
+        buffers, counters = state
+        current = [b for m in self.modules for b in m.buffers(recurse=False)]
+        for b, value in zip(current, buffers):
+            # Bypass the version counter, the recomputed graph may have saved
+            # the buffers for backward (e.g. BN running stats). Observer
+            # buffers may also have been resized by the first forward pass.
+            b.data = value
+        for m, values in zip(self.modules, counters):
+            m.__dict__.update(values)
+
+    def __call__(self, x):
+        if not torch.is_grad_enabled():
+            # Forward pass
+            self.initial_state = self._get_state()
+            return self._run(x)
+
+        # Recomputation during the backward pass
+        updated_state = self._get_state()
+        self._set_state(self.initial_state)
+        out = self._run(x)
+        self._set_state(updated_state)
+        self.initial_state = None
+        return out
+
+
+class ResNetGroup(nn.Sequential):
+    """
+    A group of ResNet blocks which can recompute the activations of some of its
+    blocks during the backward pass instead of keeping them in memory
+    (activation checkpointing). Only the input of each checkpointed segment is
+    stored. The module hierarchy is the same as a plain :class:`nn.Sequential`,
+    so state dicts, :meth:`ResNet.fuse_model` and quantization aware training
+    are not affected.
+
+    Checkpointing only happens in training mode with grad enabled, evaluation
+    and inference run the blocks as usual.
+
+    :param blocks: ResNet blocks in this group
+    """
+
+    def __init__(self, *blocks):
+        super().__init__(*blocks)
+        self.checkpoint_segments = []
+
+    def set_checkpoint_segments(self, segments):
+        """
+        Select the blocks to recompute during the backward pass.
+
+        :param segments:
+            List of half open ``(start, end)`` ranges of block indices that are
+            recomputed together. A single int ``i`` is a shortcut for
+            ``(i, i + 1)`` and ``True`` checkpoints the whole group as a
+            single segment. ``None`` or an empty list disables checkpointing.
+        :type segments: list or bool or None
+        """
+        if segments is True:
+            segments = [(0, len(self))]
+        normalized = []
+        for segment in segments or []:
+            if isinstance(segment, int):
+                segment = (segment, segment + 1)
+            start, end = segment
+            if not 0 <= start < end <= len(self):
+                raise ValueError(f"Invalid checkpoint segment {segment} for a "
+                                 f"group with {len(self)} blocks")
+            normalized.append((start, end))
+        normalized.sort()
+        for (_, end), (start, _) in zip(normalized, normalized[1:]):
+            if start < end:
+                raise ValueError(f"Overlapping checkpoint segments {normalized}")
+        self.checkpoint_segments = normalized
+
+    def forward(self, x):
+        segments = getattr(self, "checkpoint_segments", None)
+        if not (segments and self.training and torch.is_grad_enabled()):
+            return super().forward(x)
+
+        blocks = list(self)
+        current = 0
+        for start, end in segments:
+            for block in blocks[current:start]:
+                x = block(x)
+            if x.requires_grad:
+                x = checkpoint(_CheckpointSegment(blocks[start:end]), x,
+                               **_CHECKPOINT_KWARGS)
+            else:
+                # Nothing to backpropagate through
+                for block in blocks[start:end]:
+                    x = block(x)
+            current = end
+        for block in blocks[current:]:
+            x = block(x)
+        return x
+
+
 def default_activation_layer(channels):
     """
     A wrapper function that takes the number of channels as an input. ReLU
@@ -265,6 +405,7 @@ class ResNet(nn.Module):
                  act_args=None,
                  norm_layer=nn.BatchNorm2d,
                  norm_args=None,
+                 checkpoint_plan=None,
                  deprecated_compatibility_mode=False):
         """
         :param conv_layer:
@@ -307,6 +448,12 @@ class ResNet(nn.Module):
             assigning different args to each layer.
         :type norm_args: dict or None
 
+        :param checkpoint_plan:
+            A dictionary mapping group names ("group1" to "group4") to the
+            segments of blocks recomputed during the backward pass. See
+            :meth:`set_checkpoint_plan`
+        :type checkpoint_plan: dict or None
+
         :param deprecated_compatibility_mode:
             Enables behavior required by SparseResNet
         :type deprecated_compatibility_mode: bool
@@ -379,6 +526,9 @@ class ResNet(nn.Module):
 
         self.dequant = DeQuantStub()
 
+        if checkpoint_plan:
+            self.set_checkpoint_plan(checkpoint_plan)
+
     def _make_group(self, block, planes, num_blocks, stride, conv_layer,
                     conv_args, act_layer, act_args, norm_layer, norm_args):
         strides = [stride] + [1] * (num_blocks - 1)
@@ -401,7 +551,32 @@ class ResNet(nn.Module):
                                 act_layer=act_layer, act_args=aa,
                                 norm_layer=norm_layer, norm_args=na))
             self.in_planes = planes * block.expansion
-        return nn.Sequential(*layers)
+        return ResNetGroup(*layers)
+
+    def set_checkpoint_plan(self, plan):
+        """
+        Select the blocks whose activations are recomputed during the backward
+        pass instead of being stored. Groups missing from the plan are not
+        checkpointed.
+
+        Example::
+
+            model.set_checkpoint_plan({
+                "group1": True,  # whole group as one segment
+                "group2": [0, (1, 3)],  # block 0, then blocks 1 and 2 together
+            })
+
+        :param plan:
+            A dictionary mapping group names to segments, see
+            :meth:`ResNetGroup.set_checkpoint_segments`
+        :type plan: dict or None
+        """
+        plan = dict(plan or {})
+        for name, group in self.features.named_children():
+            if isinstance(group, ResNetGroup):
+                group.set_checkpoint_segments(plan.pop(name, None))
+        if plan:
+            raise ValueError(f"Unknown groups in checkpoint plan: {sorted(plan)}")
 
     def forward(self, x):
         out = self.quant(x)
@@ -312,7 +312,9 @@ class SparseResNet(ResNetCore):
             linear_params_func=None,
             conv_params_func=None,
             activation_params_func=None,
-            batch_norm_args=None
+            batch_norm_args=None,
+            # Blocks recomputed during backward, see `ResNet.set_checkpoint_plan`
+            checkpoint_plan=None,
         )
         defaults.update(config or {})
         self.__dict__.update(defaults)
@@ -368,6 +370,7 @@ class SparseResNet(ResNetCore):
                 sparse_weights_type=self.linear_sparse_weights_type
             ),
             linear_args=as_kwarg(self.sparse_params["linear"]),
+            checkpoint_plan=self.checkpoint_plan,
             deprecated_compatibility_mode=True,
         )
 
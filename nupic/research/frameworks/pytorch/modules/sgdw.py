@@ -21,6 +21,10 @@
 import torch
 from torch.optim import Optimizer
 
+from nupic.torch.modules.sparse_weights import SparseWeightsBase
+
+from .weight_mask_layers import MaskedConv2d, MaskedLinear
+
 
 class _RequiredParameter(object):
     """Singleton class representing a required parameter for an Optimizer."""
@@ -160,3 +164,177 @@ class SGDW(Optimizer):
                     p.data.add_(-group["lr"], weight_decay)
 
         return loss
+
+
+def _foreach(name, tensors, *args, **kwargs):
+    """
+    Apply `torch._foreach_<name>` to a list of CUDA tensors. Falls back to a loop
+    over `Tensor.<name>` for CPU tensors, where the multi-tensor kernels are
+    plain loops, and on versions of torch without the kernel or overload. List
+    arguments are applied element-wise.
+    """
+    foreach_fn = getattr(torch, "_foreach_" + name, None)
+    if foreach_fn is not None and tensors[0].is_cuda:
+        try:
+            return foreach_fn(tensors, *args, **kwargs)
+        except (TypeError, RuntimeError):
+            pass
+    return [
+        getattr(t, name)(*[a[i] if isinstance(a, list) else a for a in args],
+                         **kwargs)
+        for i, t in enumerate(tensors)
+    ]
+
+
+def get_weight_masks(model):
+    """
+    Collect the sparsity masks of a model, to be used with :class:`MaskedSGDW`.
+
+    The masks of :class:`MaskedLinear` and :class:`MaskedConv2d` are shared with
+    the modules. The masks of :class:`SparseWeightsBase` modules are computed from
+    their `zero_mask`, so they must be collected again if `zero_mask` changes.
+
+    :param model: model with masked or sparse layers
+    :return: dict mapping each masked weight to a mask broadcastable to it, where
+             nonzero entries are trainable
+    """
+    masks = {}
+    for module in model.modules():
+        if isinstance(module, (MaskedLinear, MaskedConv2d)):
+            masks[module.weight] = module.weight_mask
+        elif isinstance(module, SparseWeightsBase):
+            weight = module.module.weight
+            zero_mask = module.zero_mask.bool().view(weight.shape)
+            masks[weight] = (~zero_mask).to(weight.dtype)
+    return masks
+
+
+class MaskedSGDW(SGDW):
+    r"""
+    SGDW with the sparsity masks applied in the optimizer step.
+
+    Momentum, parameter update and decoupled weight decay are computed for all
+    the parameters of a group together, using the multi-tensor (`_foreach`)
+    kernels when available. The momentum of the masked entries is zeroed
+    after the momentum update and the masked weights are zeroed after the weight
+    decay, so the masked entries never accumulate momentum nor move away from
+    zero. The result is the same as :class:`SGDW` followed by `rezero_weights`,
+    without the separate pass over the model.
+
+    Args:
+        params (iterable): iterable of parameters to optimize or dicts defining
+            parameter groups
+        masks (dict, optional): maps parameters to masks broadcastable to them.
+            Entries where the mask is zero are kept at zero. See
+            :func:`get_weight_masks`.
+        lr, momentum, weight_decay, dampening, nesterov: see :class:`SGDW`
+
+    Example:
+        >>> optimizer = MaskedSGDW(model.parameters(), get_weight_masks(model),
+        ...                        lr=0.1, momentum=0.9)
+        >>> loss_fn(model(input), target).backward()
+        >>> optimizer.step()
+    """
+
+    def __init__(
+        self,
+        params,
+        masks=None,
+        lr=required,
+        momentum=0,
+        dampening=0,
+        weight_decay=1e-2,
+        nesterov=False,
+    ):
+        super(MaskedSGDW, self).__init__(
+            params,
+            lr=lr,
+            momentum=momentum,
+            dampening=dampening,
+            weight_decay=weight_decay,
+            nesterov=nesterov,
+        )
+        self.set_masks(masks or {})
+
+    def set_masks(self, masks):
+        """
+        Replace the masks, e.g. after pruning. The masked weights and their
+        momentum are zeroed.
+
+        :param masks: dict mapping parameters to masks, see :func:`get_weight_masks`
+        """
+        self.masks = {p: mask.to(p.device, p.dtype) for p, mask in masks.items()}
+        for p, mask in self.masks.items():
+            p.data.mul_(mask)
+            buf = self.state.get(p, {}).get("momentum_buffer")
+            if buf is not None:
+                buf.mul_(mask)
+
+    def step(self, closure=None):
+        """Performs a single optimization step.
+
+        Arguments:
+            closure (callable, optional): A closure that reevaluates the model
+                and returns the loss.
+        """
+        loss = None
+        if closure is not None:
+            loss = closure()
+
+        for group in self.param_groups:
+            weight_decay = group["weight_decay"]
+            momentum = group["momentum"]
+            dampening = group["dampening"]
+            nesterov = group["nesterov"]
+
+            params = [p for p in group["params"] if p.grad is not None]
+            if len(params) == 0:
+                continue
+            data = [p.data for p in params]
+            grads = [p.grad.data for p in params]
+
+            masked = [i for i, p in enumerate(params) if p in self.masks]
+            masks = [self.masks[params[i]] for i in masked]
+
+            d_p = grads
+            if momentum != 0:
+                bufs = []
+                is_new = []
+                for p, grad in zip(params, grads):
+                    param_state = self.state[p]
+                    is_new.append("momentum_buffer" not in param_state)
+                    if is_new[-1]:
+                        param_state["momentum_buffer"] = torch.clone(grad).detach()
+                    bufs.append(param_state["momentum_buffer"])
+
+                old_bufs = [buf for buf, new in zip(bufs, is_new) if not new]
+                if len(old_bufs) > 0:
+                    _foreach("mul_", old_bufs, momentum)
+                    _foreach(
+                        "add_", old_bufs,
+                        [grad for grad, new in zip(grads, is_new) if not new],
+                        alpha=1 - dampening
+                    )
+                # Masked entries never accumulate momentum
+                if len(masked) > 0:
+                    _foreach("mul_", [bufs[i] for i in masked], masks)
+
+                if nesterov:
+                    d_p = _foreach("add", grads, bufs, alpha=momentum)
+                else:
+                    d_p = bufs
+
+            # Apply momentum
+            _foreach("add_", data, d_p, alpha=-group["lr"])
+
+            # Apply weight decay, scaled by alpha to round like SGDW
+            if weight_decay != 0:
+                decay = torch.tensor(weight_decay, dtype=data[0].dtype,
+                                     device=data[0].device)
+                _foreach("add_", data, decay, alpha=-group["lr"])
+
+            # Masked weights stay at zero
+            if len(masked) > 0:
+                _foreach("mul_", [data[i] for i in masked], masks)
+
+        return loss
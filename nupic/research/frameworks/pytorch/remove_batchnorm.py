@@ -41,11 +41,15 @@ def fold_batchnorm_conv(conv2d, bn_2d):
         bn_w = torch.ones(bn_2d.num_features)
         bn_b = torch.zeros(bn_2d.num_features)
 
+    if conv2d.bias is not None:
+        conv_b = conv2d.bias
+    else:
+        conv_b = torch.zeros_like(bn_2d.running_mean)
+
     folded = copy.deepcopy(conv2d)
     t = (bn_2d.running_var + bn_2d.eps).rsqrt()
     folded.weight = nn.Parameter(conv2d.weight * (bn_w * t).reshape((-1, 1, 1, 1)))
-    if conv2d.bias is not None:
-        folded.bias = nn.Parameter((conv2d.bias - bn_2d.running_mean) * t * bn_w + bn_b)
+    folded.bias = nn.Parameter((conv_b - bn_2d.running_mean) * t * bn_w + bn_b)
 
     return folded
 
@@ -59,10 +63,22 @@ def fold_batchnorm_linear(linear, bn_linear):
     assert (not (linear.training or bn_linear.training)), \
         "This function should only be called during inference"
 
+    if bn_linear.affine:
+        bn_w = bn_linear.weight
+        bn_b = bn_linear.bias
+    else:
+        bn_w = torch.ones(bn_linear.num_features)
+        bn_b = torch.zeros(bn_linear.num_features)
+
+    if linear.bias is not None:
+        linear_b = linear.bias
+    else:
+        linear_b = torch.zeros_like(bn_linear.running_mean)
+
     folded = copy.deepcopy(linear)
     t = (bn_linear.running_var + bn_linear.eps).rsqrt()
-    folded.bias = nn.Parameter((linear.bias - bn_linear.running_mean) * t)
-    folded.weight = nn.Parameter(linear.weight * t.reshape((-1, 1)))
+    folded.bias = nn.Parameter((linear_b - bn_linear.running_mean) * t * bn_w + bn_b)
+    folded.weight = nn.Parameter(linear.weight * (bn_w * t).reshape((-1, 1)))
 
     return folded
 
@@ -18,6 +18,7 @@
 #
 # http://numenta.org/licenses/
 # ----------------------------------------------------------------------
+import copy
 import io
 import os
 import pickle
@@ -26,6 +27,7 @@ import torch
 
 from nupic.research.frameworks.pytorch.model_utils import (
     deserialize_state_dict,
+    evaluate_models,
     set_module_attr,
 )
 from nupic.torch.modules.sparse_weights import SparseWeightsBase
@@ -217,6 +219,49 @@ def load_multi_state(
     return model
 
 
+def evaluate_checkpoints(
+    model,
+    checkpoint_paths,
+    loader,
+    device,
+    models_per_pass=None,
+    load_checkpoint_args=None,
+    **kwargs,
+):
+    """
+    Evaluate a sweep of checkpoints of the same model. The checkpoints are loaded
+    into copies of the model and evaluated together with :func:`evaluate_models`,
+    so the validation set is loaded once per `models_per_pass` checkpoints
+    instead of once per checkpoint.
+
+    :param model: model used as template for loading the checkpoints
+    :param checkpoint_paths: list of paths to the checkpoints
+    :param loader: test dataset loader
+    :param device: device to use ('cpu' or 'cuda')
+    :param models_per_pass: Max number of checkpoints evaluated in a single pass
+                            over the loader, limiting the memory used by the copies
+                            of the model. None to evaluate all of them at once
+    :param load_checkpoint_args: args passed to :func:`load_state_from_checkpoint`
+    :param kwargs: args passed to :func:`evaluate_models`
+    :return: dict mapping each checkpoint path to its evaluation results
+    """
+    load_checkpoint_args = load_checkpoint_args or {}
+    models_per_pass = models_per_pass or len(checkpoint_paths)
+
+    results = {}
+    for i in range(0, len(checkpoint_paths), models_per_pass):
+        paths = checkpoint_paths[i:i + models_per_pass]
+        models = [
+            load_state_from_checkpoint(copy.deepcopy(model), path, device=device,
+                                       **load_checkpoint_args)
+            for path in paths
+        ]
+        results.update(zip(paths, evaluate_models(models, loader, device, **kwargs)))
+        del models
+
+    return results
+
+
 # -------------------
 # Supplemental utils
 # -------------------
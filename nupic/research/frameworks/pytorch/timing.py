@@ -0,0 +1,129 @@
+# ----------------------------------------------------------------------
+# Numenta Platform for Intelligent Computing (NuPIC)
+# Copyright (C) 2021, Numenta, Inc.  Unless you have an agreement
+# with Numenta, Inc., for a separate license for this software code, the
+# following terms and conditions apply:
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero Public License version 3 as
+# published by the Free Software Foundation.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.
+# See the GNU Affero Public License for more details.
+#
+# You should have received a copy of the GNU Affero Public License
+# along with this program.  If not, see http://www.gnu.org/licenses.
+#
+# http://numenta.org/licenses/
+# ----------------------------------------------------------------------
+
+import time
+from collections import defaultdict
+
+import numpy as np
+import torch
+
+__all__ = [
+    "PhaseTimer",
+]
+
+
+class PhaseTimer(object):
+    """
+    Low overhead timer collecting the time spent on each phase of a training or
+    evaluation loop, for every batch. Each call to :meth:`mark` records the time
+    elapsed since the previous mark under the given phase name.
+
+    Example::
+
+        timer = PhaseTimer()
+        timer.start()
+        for data, target in loader:
+            timer.mark("data_loading")
+            output = model(data)
+            timer.mark("forward")
+
+        print(timer.summary())
+
+    :param synchronize: Whether or not to synchronize the device before taking
+                        each timestamp. Required to measure the actual time spent
+                        on asynchronous CUDA kernels at the cost of a sync per mark
+    :param device: Device to synchronize. Only CUDA devices are synchronized
+    :param percentiles: Percentiles reported by :meth:`summary`
+    """
+
+    def __init__(self, synchronize=False, device=None, percentiles=(50, 90, 99)):
+        device = torch.device(device) if device is not None else None
+        self.synchronize = (synchronize and device is not None
+                            and device.type == "cuda")
+        self.device = device
+        self.percentiles = percentiles
+        self.times = defaultdict(list)
+        self._last = None
+
+    def start(self):
+        """Start timing the first phase"""
+        if self.synchronize:
+            torch.cuda.synchronize(self.device)
+        self._last = time.perf_counter()
+
+    def mark(self, phase):
+        """
+        Record the time elapsed since the previous mark under the given phase
+        """
+        if self.synchronize:
+            torch.cuda.synchronize(self.device)
+        now = time.perf_counter()
+        self.times[phase].append(now - self._last)
+        self._last = now
+
+    def clock(self):
+        """
+        Return the current time, after synchronizing the device if required.
+        Loops that already take their own timestamps use it with
+        :meth:`record` instead of calling :meth:`mark` for every phase.
+        """
+        if self.synchronize:
+            torch.cuda.synchronize(self.device)
+        return time.perf_counter()
+
+    def record(self, **durations):
+        """
+        Record the given durations (in seconds) of one batch, by phase name
+        """
+        for phase, duration in durations.items():
+            self.times[phase].append(duration)
+
+    def reset(self):
+        """Discard all collected times"""
+        self.times = defaultdict(list)
+        self._last = None
+
+    @property
+    def num_batches(self):
+        return max((len(t) for t in self.times.values()), default=0)
+
+    def summary(self, prefix=""):
+        """
+        Aggregate the collected times (in seconds) per phase
+
+        :param prefix: Prefix added to every key
+        :return: dictionary with the total, mean and percentiles for every phase
+                 as "{prefix}{phase}_{stat}" and the total time of all phases as
+                 "{prefix}total"
+        """
+        result = {}
+        total = 0.0
+        for phase, times in self.times.items():
+            times = np.array(times)
+            phase_total = float(times.sum())
+            total += phase_total
+            result[f"{prefix}{phase}_total"] = phase_total
+            result[f"{prefix}{phase}_mean"] = float(times.mean())
+            for p, value in zip(self.percentiles,
+                                np.percentile(times, self.percentiles)):
+                result[f"{prefix}{phase}_p{p}"] = float(value)
+        result[f"{prefix}total"] = total
+        return result
@@ -18,3 +18,4 @@
 #  http://numenta.org/licenses/
 #
 from .qat_kwinners import *
+from .quantized_kwinners import *
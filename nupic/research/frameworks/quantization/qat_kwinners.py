@@ -151,6 +151,10 @@ class QATKWinners2d(KWinners2d):
         )
         qat_kwinners.boost_strength = mod.boost_strength
         qat_kwinners.duty_cycle = mod.duty_cycle
+        # The size is only known after the first forward pass
+        qat_kwinners.n = mod.n
+        qat_kwinners.k = mod.k
+        qat_kwinners.k_inference = mod.k_inference
         return qat_kwinners
 
 
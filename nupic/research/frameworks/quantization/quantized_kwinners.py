@@ -0,0 +1,202 @@
+# ----------------------------------------------------------------------
+# Numenta Platform for Intelligent Computing (NuPIC)
+# Copyright (C) 2021, Numenta, Inc.  Unless you have an agreement
+# with Numenta, Inc., for a separate license for this software code, the
+# following terms and conditions apply:
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero Public License version 3 as
+# published by the Free Software Foundation.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.
+# See the GNU Affero Public License for more details.
+#
+# You should have received a copy of the GNU Affero Public License
+# along with this program.  If not, see http://www.gnu.org/licenses.
+#
+# http://numenta.org/licenses/
+# ----------------------------------------------------------------------
+
+import torch
+from nupic.torch.modules import KWinners, KWinners2d
+
+from .qat_kwinners import QATKWinners, QATKWinners2d
+
+__all__ = [
+    "quantized_kwinners",
+    "quantized_kwinners2d",
+    "QuantizedKWinners",
+    "QuantizedKWinners2d",
+    "QUANTIZED_KWINNER_MODULE_MAPPING"
+]
+
+
+def _winners(boosted, k: int, break_ties: bool, relu: bool):
+    """
+    Mask of the k winners of the boosted activations along dim 1, using the same
+    rules as the nupic.torch k-winners: either exactly k winners, or every
+    activation tied with the k-th largest one
+    """
+    if k == 0:
+        return torch.zeros_like(boosted, dtype=torch.bool)
+    if break_ties:
+        _, indices = boosted.topk(k, dim=1, sorted=False)
+        winners = torch.zeros_like(boosted).scatter(1, indices, 1.0) > 0
+        if relu:
+            winners = winners & (boosted > 0)
+    else:
+        threshold = boosted.kthvalue(boosted.shape[1] - k + 1, dim=1,
+                                     keepdim=True)[0]
+        if relu:
+            threshold = threshold.clamp(min=0)
+        winners = boosted >= threshold
+    return winners
+
+
+def _keep_winners(x, winners):
+    """Set the losers of the quantized tensor to the zero point"""
+    zero_point = x.q_zero_point()
+    x_int = x.int_repr()
+    out_int = torch.where(winners, x_int, torch.full_like(x_int, zero_point))
+    return torch._make_per_tensor_quantized_tensor(out_int, x.q_scale(), zero_point)
+
+
+def quantized_kwinners(x, duty_cycles, k: int, boost_strength: float,
+                       break_ties: bool = False, relu: bool = False):
+    """
+    Apply k-winners to a quantized tensor without leaving the quantized domain.
+
+    The winners are chosen on the integer representation centered at the zero
+    point, which preserves the ordering of the float values, and the losers are
+    set to the zero point. The output keeps the input quantization parameters,
+    which represent every output value exactly.
+
+    :param x: per tensor quantized input of shape (batch_size, n)
+    :param duty_cycles: duty cycles of the float k-winners module
+    :param k: number of winners
+    :param boost_strength: boost strength, 0 to disable boosting
+    :param break_ties: whether to select exactly k winners
+    :param relu: whether to only select positive winners
+    """
+    boosted = x.int_repr().float() - x.q_zero_point()
+    if boost_strength > 0.0:
+        target_density = float(k) / x.size(1)
+        boosted = boosted * torch.exp((target_density - duty_cycles) * boost_strength)
+    return _keep_winners(x, _winners(boosted, k, break_ties, relu))
+
+
+def quantized_kwinners2d(x, duty_cycles, k: int, boost_strength: float,
+                         local: bool = True, break_ties: bool = False,
+                         relu: bool = False):
+    """
+    Apply k-winners to a quantized 4D tensor without leaving the quantized
+    domain. See :func:`quantized_kwinners`
+
+    :param x: per tensor quantized input of shape (batch_size, C, H, W)
+    :param duty_cycles: duty cycles of the float k-winners module
+    :param k: number of winners
+    :param boost_strength: boost strength, 0 to disable boosting
+    :param local: whether to choose the winners across the channels at each
+                  location instead of across the whole layer
+    :param break_ties: whether to select exactly k winners
+    :param relu: whether to only select positive winners
+    """
+    boosted = x.int_repr().float() - x.q_zero_point()
+    if boost_strength > 0.0:
+        if local:
+            target_density = float(k) / x.size(1)
+        else:
+            target_density = float(k) / (x.size(1) * x.size(2) * x.size(3))
+        boosted = boosted * torch.exp((target_density - duty_cycles) * boost_strength)
+
+    if local:
+        winners = _winners(boosted, k, break_ties, relu)
+    else:
+        winners = _winners(boosted.flatten(start_dim=1), k, break_ties, relu)
+        winners = winners.view(boosted.shape)
+    return _keep_winners(x, winners)
+
+
+class QuantizedKWinners(KWinners):
+    """
+    Quantized version of :class:`QATKWinners` for inference, operating on
+    quantized tensors. Use :meth:`from_float` to convert a trained
+    :class:`QATKWinners`. Compatible with :func:`torch.jit.script`
+    """
+    _FLOAT_MODULE = QATKWinners
+
+    def forward(self, x):
+        if self.training:
+            raise RuntimeError("QuantizedKWinners is for inference only")
+        return quantized_kwinners(x, self.duty_cycle, int(self.k_inference),
+                                  float(self.boost_strength), self.break_ties,
+                                  self.relu)
+
+    @classmethod
+    def from_float(cls, mod):
+        assert type(mod) is cls._FLOAT_MODULE, \
+            cls.__name__ + ".from_float only works for " + cls._FLOAT_MODULE.__name__
+
+        kwinners = cls(
+            n=mod.n,
+            percent_on=mod.percent_on,
+            k_inference_factor=mod.k_inference_factor,
+            boost_strength_factor=mod.boost_strength_factor,
+            duty_cycle_period=mod.duty_cycle_period,
+            break_ties=mod.break_ties,
+            relu=mod.relu,
+            inplace=mod.inplace,
+        )
+        kwinners.boost_strength = mod.boost_strength
+        kwinners.duty_cycle = mod.duty_cycle
+        return kwinners.eval()
+
+
+class QuantizedKWinners2d(KWinners2d):
+    """
+    Quantized version of :class:`QATKWinners2d` for inference, operating on
+    quantized tensors. Use :meth:`from_float` to convert a trained
+    :class:`QATKWinners2d`, which must have seen its input shape already.
+    Compatible with :func:`torch.jit.script`
+    """
+    _FLOAT_MODULE = QATKWinners2d
+
+    def forward(self, x):
+        if self.training:
+            raise RuntimeError("QuantizedKWinners2d is for inference only")
+        return quantized_kwinners2d(x, self.duty_cycle, int(self.k_inference),
+                                    float(self.boost_strength), self.local,
+                                    self.break_ties, self.relu)
+
+    @classmethod
+    def from_float(cls, mod):
+        assert type(mod) is cls._FLOAT_MODULE, \
+            cls.__name__ + ".from_float only works for " + cls._FLOAT_MODULE.__name__
+        assert mod.n > 0, \
+            "The k-winners size is only known after the first forward pass"
+
+        kwinners = cls(
+            channels=mod.channels,
+            percent_on=mod.percent_on,
+            k_inference_factor=mod.k_inference_factor,
+            boost_strength_factor=mod.boost_strength_factor,
+            duty_cycle_period=mod.duty_cycle_period,
+            local=mod.local,
+            break_ties=mod.break_ties,
+            relu=mod.relu,
+            inplace=mod.inplace,
+        )
+        kwinners.boost_strength = mod.boost_strength
+        kwinners.duty_cycle = mod.duty_cycle
+        kwinners.n = int(mod.n)
+        kwinners.k = int(mod.k)
+        kwinners.k_inference = int(mod.k_inference)
+        return kwinners.eval()
+
+
+QUANTIZED_KWINNER_MODULE_MAPPING = {
+    QATKWinners: QuantizedKWinners,
+    QATKWinners2d: QuantizedKWinners2d
+}
@@ -18,5 +18,6 @@
 #  http://numenta.org/licenses/
 #
 
+from .local_connection import LocalConnection
 from .sigopt_experiment import SigOptExperiment
 from .common_experiments import *
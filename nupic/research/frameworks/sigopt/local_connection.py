@@ -0,0 +1,516 @@
+# ----------------------------------------------------------------------
+# Numenta Platform for Intelligent Computing (NuPIC)
+# Copyright (C) 2021, Numenta, Inc.  Unless you have an agreement
+# with Numenta, Inc., for a separate license for this software code, the
+# following terms and conditions apply:
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero Public License version 3 as
+# published by the Free Software Foundation.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.
+# See the GNU Affero Public License for more details.
+#
+# You should have received a copy of the GNU Affero Public License
+# along with this program.  If not, see http://www.gnu.org/licenses.
+#
+# http://numenta.org/licenses/
+# ----------------------------------------------------------------------
+
+"""
+Offline replacement for the SigOpt API connection.
+
+:class:`LocalConnection` implements the subset of the ``sigopt.Connection``
+API used by :class:`SigOptExperiment`. Experiments are stored as json files in
+a local directory and suggestions come from a Gaussian-process optimizer with
+expected improvement, so several processes (e.g. ray trials) can share an
+experiment without network access.
+"""
+
+import json
+import math
+import os
+import time
+from types import SimpleNamespace
+
+import numpy as np
+from filelock import FileLock
+from scipy import linalg, stats
+
+__all__ = [
+    "LocalConnection",
+]
+
+
+class _Space(object):
+    """
+    Maps SigOpt parameter assignments to and from the unit hypercube. Double
+    and int parameters use one dimension, optionally in log space, categorical
+    parameters are one-hot encoded.
+    """
+
+    def __init__(self, parameters):
+        self.parameters = []
+        self.dims = 0
+        for param in parameters:
+            param = dict(param)
+            if param["type"] == "categorical":
+                param["values"] = [v["name"] if isinstance(v, dict) else v
+                                   for v in param["categorical_values"]]
+                param["width"] = len(param["values"])
+            else:
+                low = param["bounds"]["min"]
+                high = param["bounds"]["max"]
+                param["log"] = param.get("transformation") == "log"
+                if param["log"]:
+                    low, high = math.log(low), math.log(high)
+                param["low"], param["high"] = low, high
+                param["width"] = 1
+            param["offset"] = self.dims
+            self.dims += param["width"]
+            self.parameters.append(param)
+
+    def encode(self, assignments):
+        x = np.zeros(self.dims)
+        for param in self.parameters:
+            value = assignments[param["name"]]
+            i = param["offset"]
+            if param["type"] == "categorical":
+                x[i + param["values"].index(value)] = 1.0
+            else:
+                if param["log"]:
+                    value = math.log(value)
+                span = param["high"] - param["low"]
+                x[i] = (value - param["low"]) / span if span > 0 else 0.5
+        return x
+
+    def decode(self, x):
+        assignments = {}
+        for param in self.parameters:
+            i = param["offset"]
+            if param["type"] == "categorical":
+                value = param["values"][int(np.argmax(x[i:i + param["width"]]))]
+            else:
+                value = param["low"] + float(x[i]) * (param["high"] - param["low"])
+                if param["log"]:
+                    value = math.exp(value)
+                if param["type"] == "int":
+                    value = int(round(value))
+                else:
+                    value = float(value)
+                low, high = param["bounds"]["min"], param["bounds"]["max"]
+                value = min(max(value, low), high)
+            assignments[param["name"]] = value
+        return assignments
+
+    def sample(self, rng, num):
+        return rng.uniform(size=(num, self.dims))
+
+
+def _gp_expected_improvement(x, y, candidates, noise=1e-4):
+    """
+    Fit a Gaussian process with an RBF kernel to the (normalized) observations
+    and return the expected improvement of each candidate. The length scale is
+    chosen by maximizing the marginal likelihood over a small grid.
+    """
+    y_mean, y_std = y.mean(), y.std()
+    y = (y - y_mean) / (y_std if y_std > 0 else 1.0)
+
+    def kernel(a, b, length_scale):
+        sq_dist = ((a[:, None, :] - b[None, :, :]) ** 2).sum(-1)
+        return np.exp(-0.5 * sq_dist / length_scale ** 2)
+
+    best = None
+    for length_scale in (0.05, 0.1, 0.2, 0.4, 0.8, 1.6):
+        k = kernel(x, x, length_scale) + noise * np.eye(len(x))
+        try:
+            chol = linalg.cho_factor(k, lower=True)
+        except linalg.LinAlgError:
+            continue
+        alpha = linalg.cho_solve(chol, y)
+        log_likelihood = (-0.5 * y @ alpha
+                          - np.log(np.diag(chol[0])).sum())
+        if best is None or log_likelihood > best[0]:
+            best = (log_likelihood, length_scale, chol, alpha)
+
+    _, length_scale, chol, alpha = best
+    k_star = kernel(candidates, x, length_scale)
+    mean = k_star @ alpha
+    v = linalg.cho_solve(chol, k_star.T)
+    var = np.clip(1.0 - (k_star * v.T).sum(-1), 1e-12, None)
+    std = np.sqrt(var)
+
+    improvement = mean - y.max() - 0.01
+    z = improvement / std
+    return improvement * stats.norm.cdf(z) + std * stats.norm.pdf(z)
+
+
+def _suggest(experiment, rng):
+    """
+    Suggest new assignments for the experiment. The first suggestions are
+    random. Afterwards, the candidate maximizing the expected improvement of
+    the first metric is chosen. Open suggestions count as observations of the
+    worst value seen so far ("constant liar"), which spreads out parallel
+    suggestions.
+
+    :return: tuple (assignments, task)
+    """
+    config = experiment["config"]
+    space = _Space(config["parameters"])
+    tasks = config.get("tasks")
+
+    # Cycle through the tasks of multitask experiments
+    task = None
+    if tasks:
+        task = tasks[len(experiment["suggestions"]) % len(tasks)]
+
+    metric = config["metrics"][0]
+    sign = -1.0 if metric.get("objective") == "minimize" else 1.0
+
+    x, y, failed = [], [], []
+    for observation in experiment["observations"]:
+        point = space.encode(observation["assignments"])
+        if tasks:
+            point = np.append(point, observation["task"]["cost"])
+        value = _metric_value(observation, metric["name"])
+        if observation.get("failed") or value is None:
+            failed.append(point)
+        else:
+            x.append(point)
+            y.append(sign * value)
+
+    num_initial = max(5, 2 * space.dims)
+    if len(x) < num_initial:
+        return space.decode(space.sample(rng, 1)[0]), task
+
+    liar = min(y)
+    for suggestion in experiment["suggestions"]:
+        if suggestion["state"] == "open":
+            point = space.encode(suggestion["assignments"])
+            if tasks:
+                point = np.append(point, suggestion["task"]["cost"])
+            x.append(point)
+            y.append(liar)
+    for point in failed:
+        x.append(point)
+        y.append(liar)
+
+    x, y = np.stack(x), np.array(y)
+
+    # Random candidates and local perturbations of the best points
+    candidates = [space.sample(rng, 2048)]
+    for point in x[np.argsort(y)[-5:], :space.dims]:
+        local = point + rng.normal(scale=0.05, size=(256, space.dims))
+        candidates.append(np.clip(local, 0.0, 1.0))
+    candidates = np.concatenate(candidates)
+    if tasks:
+        candidates = np.hstack(
+            (candidates, np.full((len(candidates), 1), task["cost"]))
+        )
+
+    scores = _gp_expected_improvement(x, y, candidates)
+    return space.decode(candidates[np.argmax(scores)]), task
+
+
+def _metric_value(observation, name):
+    for value in observation.get("values") or []:
+        if value["name"] == name:
+            return value["value"]
+    return observation.get("value")
+
+
+def _to_namespace(obj):
+    """Expose the stored dictionaries through attributes, like sigopt objects"""
+    if isinstance(obj, dict) and "assignments" not in obj:
+        return SimpleNamespace(**{k: _to_namespace(v) for k, v in obj.items()})
+    if isinstance(obj, dict):
+        obj = dict(obj)
+        assignments = obj.pop("assignments")
+        namespace = _to_namespace(obj)
+        namespace.assignments = dict(assignments)
+        return namespace
+    if isinstance(obj, list):
+        return [_to_namespace(v) for v in obj]
+    return obj
+
+
+class LocalConnection(object):
+    """
+    Drop-in replacement for ``sigopt.Connection`` storing experiments in
+    ``root_dir``. Only the calls used by :class:`SigOptExperiment` are
+    supported, e.g.::
+
+        conn = LocalConnection("~/nta/sigopt")
+        experiment = conn.experiments().create(**sigopt_config)
+        suggestion = conn.experiments(experiment.id).suggestions().create()
+
+    :param root_dir: directory holding one json file per experiment
+    :param seed: seed of the random suggestions
+    """
+
+    def __init__(self, root_dir, seed=None):
+        self.root_dir = os.path.abspath(os.path.expanduser(root_dir))
+        self.seed = seed
+        os.makedirs(self.root_dir, exist_ok=True)
+
+    def experiments(self, experiment_id=None):
+        return _ExperimentResource(self, experiment_id)
+
+    def experiment_path(self, experiment_id):
+        return os.path.join(self.root_dir, f"experiment_{experiment_id}.json")
+
+    def has_experiment(self, experiment_id):
+        return os.path.exists(self.experiment_path(experiment_id))
+
+    def create_experiment(self, sigopt_config, experiment_id=None):
+        """
+        Create an experiment from the SigOpt config. A new id is assigned
+        unless `experiment_id` is given, in which case an existing experiment
+        with this id is returned as is.
+        """
+        config = {k: v for k, v in sigopt_config.items() if k != "experiment_id"}
+        with FileLock(os.path.join(self.root_dir, "experiments.lock")):
+            if experiment_id is not None and self.has_experiment(experiment_id):
+                return self.load(experiment_id)
+            if experiment_id is None:
+                ids = [int(f[len("experiment_"):-len(".json")])
+                       for f in os.listdir(self.root_dir)
+                       if f.startswith("experiment_") and f.endswith(".json")]
+                experiment_id = max(ids, default=0) + 1
+            experiment = dict(id=experiment_id, config=config, created=time.time(),
+                              next_id=1, suggestions=[], observations=[],
+                              training_runs=[])
+            self._save(experiment)
+        return experiment
+
+    def update(self, experiment_id, fn):
+        """
+        Apply `fn` to the stored experiment while holding its lock. The
+        experiment is saved afterwards.
+
+        :return: the value returned by `fn`
+        """
+        path = self.experiment_path(experiment_id)
+        with FileLock(path + ".lock"):
+            experiment = self.load(experiment_id)
+            ret = fn(experiment)
+            self._save(experiment)
+        return ret
+
+    def load(self, experiment_id):
+        path = self.experiment_path(experiment_id)
+        if not os.path.exists(path):
+            raise KeyError(f"Unknown local SigOpt experiment: {experiment_id}")
+        with open(path) as f:
+            return json.load(f)
+
+    def rng(self, experiment):
+        seed = self.seed
+        if seed is None:
+            seed = int(time.time() * 1e6) % 2 ** 32
+        return np.random.RandomState(
+            (seed + 7919 * len(experiment["suggestions"])) % 2 ** 32
+        )
+
+    def _save(self, experiment):
+        path = self.experiment_path(experiment["id"])
+        tmp_path = path + ".tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(experiment, f, indent=1)
+        os.replace(tmp_path, path)
+
+
+def _new_id(experiment):
+    new_id = experiment["next_id"]
+    experiment["next_id"] += 1
+    return str(new_id)
+
+
+class _ExperimentResource(object):
+
+    def __init__(self, conn, experiment_id):
+        self.conn = conn
+        self.experiment_id = experiment_id
+
+    def create(self, **sigopt_config):
+        return _to_namespace(_experiment_details(
+            self.conn.create_experiment(sigopt_config)
+        ))
+
+    def fetch(self):
+        return _to_namespace(_experiment_details(
+            self.conn.load(self.experiment_id)
+        ))
+
+    def suggestions(self, suggestion_id=None):
+        return _SuggestionResource(self.conn, self.experiment_id, suggestion_id)
+
+    def observations(self):
+        return _ObservationResource(self.conn, self.experiment_id)
+
+    def best_assignments(self):
+        return _BestAssignmentsResource(self.conn, self.experiment_id)
+
+    def training_runs(self, training_run_id=None):
+        return _TrainingRunResource(self.conn, self.experiment_id, training_run_id)
+
+
+def _experiment_details(experiment):
+    config = experiment["config"]
+    return dict(
+        id=experiment["id"],
+        name=config.get("name"),
+        parameters=config.get("parameters"),
+        metrics=config.get("metrics"),
+        observation_budget=config.get("observation_budget"),
+        parallel_bandwidth=config.get("parallel_bandwidth"),
+        metadata=config.get("metadata"),
+        progress=dict(
+            observation_count=len(experiment["observations"]),
+            open_suggestion_count=sum(s["state"] == "open"
+                                      for s in experiment["suggestions"]),
+        ),
+    )
+
+
+class _SuggestionResource(object):
+
+    def __init__(self, conn, experiment_id, suggestion_id=None):
+        self.conn = conn
+        self.experiment_id = experiment_id
+        self.suggestion_id = suggestion_id
+
+    def create(self):
+        def create_suggestion(experiment):
+            assignments, task = _suggest(experiment, self.conn.rng(experiment))
+            suggestion = dict(id=_new_id(experiment), assignments=assignments,
+                              task=task, state="open", created=time.time())
+            experiment["suggestions"].append(suggestion)
+            return suggestion
+
+        return _to_namespace(self.conn.update(self.experiment_id,
+                                              create_suggestion))
+
+    def fetch(self, state=None):
+        experiment = self.conn.load(self.experiment_id)
+        data = [s for s in experiment["suggestions"]
+                if s["state"] != "deleted" and state in (None, s["state"])
+                and self.suggestion_id in (None, s["id"])]
+        return SimpleNamespace(data=_to_namespace(data))
+
+    def delete(self, state=None):
+        def delete_suggestions(experiment):
+            for s in experiment["suggestions"]:
+                if state not in (None, s["state"]) or s["state"] == "deleted":
+                    continue
+                if self.suggestion_id in (None, s["id"]):
+                    s["state"] = "deleted"
+
+        self.conn.update(self.experiment_id, delete_suggestions)
+
+
+class _ObservationResource(object):
+
+    def __init__(self, conn, experiment_id):
+        self.conn = conn
+        self.experiment_id = experiment_id
+
+    def create(self, suggestion=None, assignments=None, value=None, values=None,
+               task=None, failed=False):
+        def create_observation(experiment):
+            nonlocal assignments, task
+            if suggestion is not None:
+                s = next(s for s in experiment["suggestions"]
+                         if s["id"] == str(suggestion))
+                s["state"] = "closed"
+                assignments, task = s["assignments"], s["task"]
+            if isinstance(task, str):
+                task = next(t for t in experiment["config"].get("tasks", [])
+                            if t["name"] == task)
+            observation = dict(id=_new_id(experiment), suggestion=suggestion,
+                               assignments=assignments, value=value,
+                               values=values, task=task, failed=failed,
+                               created=time.time())
+            experiment["observations"].append(observation)
+            return observation
+
+        return _to_namespace(self.conn.update(self.experiment_id,
+                                              create_observation))
+
+    def fetch(self):
+        experiment = self.conn.load(self.experiment_id)
+        return SimpleNamespace(data=_to_namespace(experiment["observations"]))
+
+
+class _BestAssignmentsResource(object):
+
+    def __init__(self, conn, experiment_id):
+        self.conn = conn
+        self.experiment_id = experiment_id
+
+    def fetch(self):
+        experiment = self.conn.load(self.experiment_id)
+        metric = experiment["config"]["metrics"][0]
+        sign = -1.0 if metric.get("objective") == "minimize" else 1.0
+        tasks = experiment["config"].get("tasks")
+        full_cost = max(t["cost"] for t in tasks) if tasks else None
+
+        best = None
+        for observation in experiment["observations"]:
+            value = _metric_value(observation, metric["name"])
+            if observation.get("failed") or value is None:
+                continue
+            # Only full cost tasks are considered for multitask experiments
+            if tasks and observation["task"]["cost"] != full_cost:
+                continue
+            if best is None or sign * value > sign * best[0]:
+                best = (value, observation)
+
+        data = []
+        if best is not None:
+            data.append(best[1])
+        return SimpleNamespace(data=_to_namespace(data))
+
+
+class _TrainingRunResource(object):
+
+    def __init__(self, conn, experiment_id, training_run_id=None):
+        self.conn = conn
+        self.experiment_id = experiment_id
+        self.training_run_id = training_run_id
+
+    def create(self, suggestion=None):
+        def create_training_run(experiment):
+            training_run = dict(id=_new_id(experiment), suggestion=suggestion,
+                                checkpoints=[])
+            experiment["training_runs"].append(training_run)
+            return training_run
+
+        return _to_namespace(self.conn.update(self.experiment_id,
+                                              create_training_run))
+
+    def checkpoints(self):
+        return _CheckpointResource(self.conn, self.experiment_id,
+                                   self.training_run_id)
+
+
+class _CheckpointResource(object):
+
+    def __init__(self, conn, experiment_id, training_run_id):
+        self.conn = conn
+        self.experiment_id = experiment_id
+        self.training_run_id = training_run_id
+
+    def create(self, values):
+        def create_checkpoint(experiment):
+            training_run = next(t for t in experiment["training_runs"]
+                                if t["id"] == str(self.training_run_id))
+            checkpoint = dict(id=_new_id(experiment), values=values,
+                              created=time.time())
+            training_run["checkpoints"].append(checkpoint)
+            return checkpoint
+
+        return _to_namespace(self.conn.update(self.experiment_id,
+                                              create_checkpoint))
@@ -20,7 +20,12 @@
 
 import os
 
-from sigopt import Connection
+from .local_connection import LocalConnection
+
+try:
+    from sigopt import Connection
+except ImportError:
+    Connection = None
 
 
 class SigOptExperiment:
@@ -37,6 +42,12 @@ class SigOptExperiment:
         and config for an existing experiment.  The SigOpt API key should be
         defined in the environment variable 'SIGOPT_KEY'.
 
+        Set the environment variable 'SIGOPT_BACKEND=local' to run offline
+        instead. Experiments are then stored in 'SIGOPT_LOCAL_DIR' (default
+        '~/nta/sigopt') and suggested by a local Bayesian optimizer, see
+        :class:`LocalConnection`. Unknown experiment ids are created locally
+        from the sigopt_config, so existing configs run unchanged.
+
         :param experiment_id: (int) An existing experiment id.
         :param sigopt_config: (dict) The config used to create experiment id.
         """
@@ -45,10 +56,21 @@ class SigOptExperiment:
         self.conn = None
         self.training_run = None
 
+        if os.environ.get("SIGOPT_BACKEND", "hosted") == "local":
+            self.conn = LocalConnection(
+                os.environ.get("SIGOPT_LOCAL_DIR", "~/nta/sigopt"))
+            if (experiment_id is not None and sigopt_config is not None
+                    and not self.conn.has_experiment(experiment_id)):
+                self.conn.create_experiment(sigopt_config, experiment_id)
+            return
+
         self.api_key = os.environ.get("SIGOPT_KEY", None)
         if self.api_key is None:
             self.api_key = os.environ.get("SIGOPT_DEV_KEY", None)
         assert self.api_key is not None, "No SigOpt API key!"
+        if Connection is None:
+            raise ImportError("sigopt is not installed. Install it or set "
+                              "SIGOPT_BACKEND=local to run offline")
 
         try:
             self.conn = Connection(client_token=self.api_key)
@@ -77,8 +99,12 @@ class SigOptExperiment:
         self.experiment_id = experiment.id
         self.sigopt_config = sigopt_config
         sigopt_config["experiment_id"] = experiment.id
-        print("Created experiment: https://app.sigopt.com/experiment/"
-              + str(experiment.id))
+        if isinstance(self.conn, LocalConnection):
+            print("Created local experiment: "
+                  + self.conn.experiment_path(experiment.id))
+        else:
+            print("Created experiment: https://app.sigopt.com/experiment/"
+                  + str(experiment.id))
 
         return self.experiment_id
 
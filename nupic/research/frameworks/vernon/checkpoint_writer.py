@@ -0,0 +1,227 @@
+# ----------------------------------------------------------------------
+# Numenta Platform for Intelligent Computing (NuPIC)
+# Copyright (C) 2021, Numenta, Inc.  Unless you have an agreement
+# with Numenta, Inc., for a separate license for this software code, the
+# following terms and conditions apply:
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero Public License version 3 as
+# published by the Free Software Foundation.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.
+# See the GNU Affero Public License for more details.
+#
+# You should have received a copy of the GNU Affero Public License
+# along with this program.  If not, see http://www.gnu.org/licenses.
+#
+# http://numenta.org/licenses/
+# ----------------------------------------------------------------------
+"""
+Background checkpoint writer used by the vernon multiprocess runner.
+
+Checkpoints are serialized and written by a background thread directly into
+the checkpoint directory using the same layout as ray tune
+("checkpoint_{epoch}/checkpoint") so the training loop never waits on
+serialization or disk I/O and the experiment state is never copied between
+processes.
+"""
+import io
+import logging
+import os
+import pickle
+import queue
+import re
+import shutil
+import threading
+
+import torch
+
+from nupic.research.frameworks.pytorch.model_utils import serialize_state_dict
+
+__all__ = [
+    "CheckpointWriter",
+    "StateDictSnapshot",
+    "get_checkpoint_file",
+    "get_latest_checkpoint",
+    "list_checkpoints",
+]
+
+CHECKPOINT_DIR_REGEX = re.compile(r"^checkpoint_(\d+)$")
+CHECKPOINT_FILE_NAME = "checkpoint"
+
+logger = logging.getLogger(__name__)
+
+
+def get_checkpoint_file(checkpoint_dir, epoch):
+    """
+    Return the checkpoint file path used to store the given epoch
+    """
+    return os.path.join(checkpoint_dir, f"checkpoint_{epoch}", CHECKPOINT_FILE_NAME)
+
+
+def list_checkpoints(checkpoint_dir):
+    """
+    List all complete checkpoints found in the given directory. Partially
+    written checkpoints are ignored.
+
+    :param checkpoint_dir: Directory containing "checkpoint_{epoch}" folders
+    :return: list of (epoch, checkpoint_file) tuples sorted by epoch
+    """
+    if not os.path.isdir(checkpoint_dir):
+        return []
+
+    checkpoints = []
+    for name in os.listdir(checkpoint_dir):
+        match = CHECKPOINT_DIR_REGEX.match(name)
+        if match is None:
+            continue
+        checkpoint_file = os.path.join(checkpoint_dir, name, CHECKPOINT_FILE_NAME)
+        if os.path.isfile(checkpoint_file):
+            checkpoints.append((int(match.group(1)), checkpoint_file))
+
+    return sorted(checkpoints)
+
+
+def get_latest_checkpoint(checkpoint_dir):
+    """
+    Find the checkpoint with the highest epoch in the given directory
+
+    :param checkpoint_dir: Directory containing "checkpoint_{epoch}" folders
+    :return: checkpoint file or None when no checkpoints are found
+    """
+    checkpoints = list_checkpoints(checkpoint_dir)
+    if len(checkpoints) == 0:
+        return None
+    return checkpoints[-1][1]
+
+
+def _copy_to_cpu(obj):
+    if torch.is_tensor(obj):
+        return obj.detach().to("cpu", copy=True)
+    if isinstance(obj, dict):
+        copy = type(obj)((k, _copy_to_cpu(v)) for k, v in obj.items())
+        if hasattr(obj, "_metadata"):
+            # Module versions used by `load_state_dict`
+            copy._metadata = obj._metadata
+        return copy
+    if isinstance(obj, list) or type(obj) is tuple:
+        return type(obj)(_copy_to_cpu(v) for v in obj)
+    return obj
+
+
+class StateDictSnapshot(object):
+    """
+    CPU copy of a state dict, taken when the checkpoint is requested and
+    serialized later by the :class:`CheckpointWriter` thread into the same
+    byte array as :func:`serialize_state_dict`.
+
+    :param state_dict: model, optimizer, lr_scheduler, ... state dict
+    """
+
+    def __init__(self, state_dict):
+        self.state_dict = _copy_to_cpu(state_dict)
+
+    def serialize(self):
+        with io.BytesIO() as buffer:
+            serialize_state_dict(buffer, self.state_dict)
+            return buffer.getvalue()
+
+
+class CheckpointWriter(object):
+    """
+    Stream experiment checkpoints to disk from a background thread.
+
+    The state passed to :meth:`save` must already be a CPU snapshot, i.e. the
+    state returned by `get_state(serialize=False)` whose state dicts are
+    :class:`StateDictSnapshot`, so it can be serialized and written while
+    training continues. Each checkpoint is first written to a temporary file
+    and then atomically renamed so readers never see a partially written
+    checkpoint.
+
+    :param checkpoint_dir: Directory where the checkpoints will be saved
+    :param keep_checkpoints_num: Number of most recent checkpoints to keep.
+                                 Keep all checkpoints when None
+    :param on_saved: Optional callback called from the writer thread after the
+                     checkpoint is saved. "function(epoch, checkpoint_file)"
+    :param max_pending: Maximum number of checkpoints waiting to be written.
+                        :meth:`save` blocks when the writer falls behind to
+                        bound the memory used by pending snapshots
+    """
+
+    def __init__(self, checkpoint_dir, keep_checkpoints_num=None, on_saved=None,
+                 max_pending=1):
+        assert keep_checkpoints_num is None or keep_checkpoints_num > 0
+        self.checkpoint_dir = checkpoint_dir
+        self.keep_checkpoints_num = keep_checkpoints_num
+        self.on_saved = on_saved
+        self._error = None
+        self._pending = queue.Queue(maxsize=max_pending)
+        self._thread = threading.Thread(target=self._run, name="CheckpointWriter",
+                                        daemon=True)
+        self._thread.start()
+
+    def save(self, epoch, state):
+        """
+        Queue the given experiment state to be saved as the checkpoint for the
+        given epoch. Returns as soon as the state is queued.
+        """
+        self._check_error()
+        self._pending.put((epoch, state))
+
+    def close(self, raise_error=True):
+        """
+        Wait until all pending checkpoints are written and stop the writer
+        thread. Re-raises any exception raised while writing, or only logs it
+        when `raise_error` is False.
+        """
+        if self._thread.is_alive():
+            self._pending.put(None)
+            self._thread.join()
+        if raise_error:
+            self._check_error()
+        elif self._error is not None:
+            logger.error("Failed to save checkpoint", exc_info=self._error)
+
+    def _check_error(self):
+        if self._error is not None:
+            raise RuntimeError("Failed to save checkpoint") from self._error
+
+    def _run(self):
+        while True:
+            item = self._pending.get()
+            if item is None:
+                break
+            if self._error is not None:
+                # Drop remaining checkpoints after the first failure
+                continue
+
+            epoch, state = item
+            try:
+                checkpoint_file = self._write(epoch, state)
+                self._remove_old_checkpoints()
+                if self.on_saved is not None:
+                    self.on_saved(epoch, checkpoint_file)
+            except Exception as ex:
+                self._error = ex
+
+    def _write(self, epoch, state):
+        checkpoint_file = get_checkpoint_file(self.checkpoint_dir, epoch)
+        os.makedirs(os.path.dirname(checkpoint_file), exist_ok=True)
+        state = {k: v.serialize() if isinstance(v, StateDictSnapshot) else v
+                 for k, v in state.items()}
+        tmp_file = f"{checkpoint_file}.tmp"
+        with open(tmp_file, mode="wb") as f:
+            pickle.dump(state, f, protocol=pickle.HIGHEST_PROTOCOL)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_file, checkpoint_file)
+        return checkpoint_file
+
+    def _remove_old_checkpoints(self):
+        if self.keep_checkpoints_num is None:
+            return
+        checkpoints = list_checkpoints(self.checkpoint_dir)
+        for _, checkpoint_file in checkpoints[:-self.keep_checkpoints_num]:
+            shutil.rmtree(os.path.dirname(checkpoint_file), ignore_errors=True)
@@ -81,7 +81,7 @@ class ExperimentBase(
     def insert_pre_experiment_result(cls, result, pre_experiment_result):
         pass
 
-    def get_state(self):
+    def get_state(self, serialize=True):
         return {}
 
     def set_state(self, state):
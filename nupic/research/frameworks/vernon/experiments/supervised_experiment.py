@@ -22,6 +22,7 @@
 import io
 import sys
 import time
+from functools import partial
 from pprint import pformat
 
 import torch
@@ -30,13 +31,18 @@ from torch.nn.modules.batchnorm import _BatchNorm
 from torch.optim.lr_scheduler import OneCycleLR
 from torch.utils.data import DataLoader
 
-from nupic.research.frameworks.pytorch.lr_scheduler import ComposedLRScheduler
+from nupic.research.frameworks.pytorch.lr_scheduler import (
+    CompiledLRScheduler,
+    ComposedLRScheduler,
+    compile_schedule,
+)
 from nupic.research.frameworks.pytorch.model_utils import (
     deserialize_state_dict,
     evaluate_model,
     serialize_state_dict,
     train_model,
 )
+from nupic.research.frameworks.vernon.checkpoint_writer import StateDictSnapshot
 from nupic.research.frameworks.vernon.experiment_utils import create_lr_scheduler
 from nupic.research.frameworks.vernon.experiments.components.experiment_base import (
     ExperimentBase,
@@ -114,6 +120,10 @@ class SupervisedExperiment(ExperimentBase):
                                  passed to the constructor
             - lr_scheduler_step_every_batch: Whether to step the lr-scheduler after
                                              after every batch (e.g. for OneCycleLR)
+            - compile_lr_scheduler: Whether to expand the lr-scheduler into a table
+                                    of the optimizer hyperparameters for every
+                                    batch before training.
+                                    See :class:`CompiledLRScheduler`
             - loss_function: Loss function. See "torch.nn.functional"
             - epochs: Number of epochs to train
             - batches_in_epoch: Number of batches per epoch.
@@ -221,7 +231,8 @@ class SupervisedExperiment(ExperimentBase):
             self.logger.info("steps_per_epoch=%s", self.total_batches)
 
         self.step_lr_every_batch = config.get("lr_scheduler_step_every_batch", False)
-        if isinstance(self.lr_scheduler, (OneCycleLR, ComposedLRScheduler)):
+        if isinstance(self.lr_scheduler, (OneCycleLR, ComposedLRScheduler,
+                                          CompiledLRScheduler)):
             self.step_lr_every_batch = True
 
         # Set train and validate methods.
@@ -266,17 +277,33 @@ class SupervisedExperiment(ExperimentBase):
         :param config:
             - lr_scheduler_class: (optional) Class of lr-scheduler
             - lr_scheduler_args: (optional) dict of args to pass to lr-class
+            - compile_lr_scheduler: (optional) whether to compile the lr-scheduler
+                                    into a :class:`CompiledLRScheduler`
         :param optimizer: torch optimizer
         :param total_batches: number of batches/steps in an epoch
         """
         lr_scheduler_class = config.get("lr_scheduler_class", None)
         if lr_scheduler_class is not None:
             lr_scheduler_args = config.get("lr_scheduler_args", {})
-            return create_lr_scheduler(
-                optimizer=optimizer,
+            create_fn = partial(
+                create_lr_scheduler,
                 lr_scheduler_class=lr_scheduler_class,
                 lr_scheduler_args=lr_scheduler_args,
                 steps_per_epoch=total_batches)
+            if not config.get("compile_lr_scheduler", False):
+                return create_fn(optimizer)
+
+            step_every_batch = (
+                config.get("lr_scheduler_step_every_batch", False)
+                or issubclass(lr_scheduler_class, (OneCycleLR, ComposedLRScheduler))
+            )
+            table = compile_schedule(
+                optimizer,
+                schedulers={0: create_fn},
+                total_steps=config.get("epochs", 1) * total_batches,
+                step_interval=1 if step_every_batch else total_batches,
+            )
+            return CompiledLRScheduler(optimizer, table)
 
     def create_loaders(self, config):
         """Create and assign train and val dataloaders"""
@@ -500,43 +527,43 @@ class SupervisedExperiment(ExperimentBase):
                if k1 in result}
         }
 
-    def get_state(self):
+    def get_state(self, serialize=True):
         """
         Get experiment serialized state as a dictionary of  byte arrays
+        :param serialize: When False, the states are returned as CPU snapshots
+                          to be serialized later, see `StateDictSnapshot`
         :return: dictionary with "model", "optimizer" and "lr_scheduler" states
         """
+        def serialized(state_dict):
+            if not serialize:
+                return StateDictSnapshot(state_dict)
+            with io.BytesIO() as buffer:
+                serialize_state_dict(buffer, state_dict)
+                return buffer.getvalue()
+
         state = {
             "current_epoch": self.current_epoch,
         }
 
         # Save state into a byte array to avoid ray's GPU serialization issues
         # See https://github.com/ray-project/ray/issues/5519
-        with io.BytesIO() as buffer:
-            model = self.model
-            if hasattr(model, "module"):
-                # DistributedDataParallel
-                model = model.module
-            serialize_state_dict(buffer, model.state_dict())
-            state["model"] = buffer.getvalue()
-
-        with io.BytesIO() as buffer:
-            serialize_state_dict(buffer, self.optimizer.state_dict())
-            state["optimizer"] = buffer.getvalue()
+        model = self.model
+        if hasattr(model, "module"):
+            # DistributedDataParallel
+            model = model.module
+        state["model"] = serialized(model.state_dict())
+        state["optimizer"] = serialized(self.optimizer.state_dict())
 
         if self.lr_scheduler is not None:
-            with io.BytesIO() as buffer:
-                state_dict = self.lr_scheduler.state_dict()
-                if "anneal_func" in state_dict:
-                    # FIXME: This is a workaround for a PyTorch bug.
-                    # https://github.com/pytorch/pytorch/issues/42376
-                    del state_dict["anneal_func"]
-                serialize_state_dict(buffer, state_dict)
-                state["lr_scheduler"] = buffer.getvalue()
+            state_dict = self.lr_scheduler.state_dict()
+            if "anneal_func" in state_dict:
+                # FIXME: This is a workaround for a PyTorch bug.
+                # https://github.com/pytorch/pytorch/issues/42376
+                del state_dict["anneal_func"]
+            state["lr_scheduler"] = serialized(state_dict)
 
         if self.mixed_precision:
-            with io.BytesIO() as buffer:
-                serialize_state_dict(buffer, amp.state_dict())
-                state["amp"] = buffer.getvalue()
+            state["amp"] = serialized(amp.state_dict())
 
         return state
 
@@ -581,6 +608,8 @@ class SupervisedExperiment(ExperimentBase):
             elif isinstance(self.lr_scheduler, OneCycleLR):
                 steps_per_epoch = self.lr_scheduler.total_steps // self.epochs
                 self.current_epoch = last_epoch // steps_per_epoch
+            elif isinstance(self.lr_scheduler, CompiledLRScheduler):
+                self.current_epoch = last_epoch // self.total_batches
             else:
                 self.current_epoch = last_epoch
 
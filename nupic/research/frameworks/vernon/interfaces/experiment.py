@@ -115,9 +115,11 @@ class Experiment(abc.ABC):
         """
 
     @abc.abstractmethod
-    def get_state(self) -> dict:
+    def get_state(self, serialize: bool = True) -> dict:
         """
         Get experiment serialized state as a dictionary of  byte arrays
+        :param serialize: When False, the states are returned as CPU snapshots
+                          to be serialized later, see `StateDictSnapshot`
         :return: dictionary with "model", "optimizer" and "lr_scheduler" states
         """
 
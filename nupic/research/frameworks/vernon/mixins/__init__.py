@@ -27,6 +27,7 @@ from .knowledge_distillation import KnowledgeDistillation, KnowledgeDistillation
 from .legacy_imagenet_config import LegacyImagenetConfig
 from .load_preprocessed_data import LoadPreprocessedData
 from .log_backprop_structure import LogBackpropStructure
+from .log_batch_timing import LogBatchTiming
 from .log_covariance import LogCovariance
 from .log_every_learning_rate import LogEveryLearningRate
 from .log_every_loss import LogEveryLoss
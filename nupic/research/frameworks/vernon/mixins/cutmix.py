@@ -60,7 +60,11 @@ class CutMix(object):
                           from the distribution Beta(mixup_alpha, mixup_beta).
                           If α and β are set to 1,
                           λ is sampled from a uniform distribution.
-            - cutmix_prob: Probability to apply cutmix at each batch.
+            - cutmix_prob: Probability to apply cutmix at each batch, or to each
+                           sample if cutmix_per_sample is set.
+            - cutmix_per_sample: Whether to draw a different lambda and bounding
+                                 box for each sample instead of a single box for
+                                 the whole batch. Defaults to False.
         """
         super().setup_experiment(config)
 
@@ -68,6 +72,21 @@ class CutMix(object):
         self.mixup_alpha = config.get("mixup_alpha", 1.0)
         self.mixup_beta = config.get("mixup_beta", 1.0)
         self.cutmix_prob = config.get("cutmix_prob", 1.0)
+        self.cutmix_per_sample = config.get("cutmix_per_sample", False)
+
+    def cutmix(self, data):
+        """
+        Mix the batch with either a single bounding box or one box per sample,
+        depending on `cutmix_per_sample`.
+
+        :return: tuple with the mixed images, the index of the sample each patch
+                 comes from and the ratio of each image that was kept
+        """
+        if self.cutmix_per_sample:
+            return cutmix_batch(data, self.mixup_alpha, self.mixup_beta,
+                                self.cutmix_prob)
+        return cutmix_single_box(data, self.mixup_alpha, self.mixup_beta,
+                                 self.cutmix_prob)
 
     def transform_data_to_device(self, data, target, device, non_blocking):
         """
@@ -85,13 +104,7 @@ class CutMix(object):
         target = target.to(self.device, non_blocking=non_blocking)
 
         # transform the data - generate mixed sample
-        lam = np.random.beta(self.mixup_alpha, self.mixup_beta)
-        rand_index = torch.randperm(data.shape[0], device=self.device)
-        # draw and apply the bounding boxes to batch
-        bbx1, bby1, bbx2, bby2 = rand_bbox(data.shape, lam)
-        data[:, :, bbx1:bbx2, bby1:bby2] = data[rand_index, :, bbx1:bbx2, bby1:bby2]
-        # adjust lambda to exactly match pixel ratio
-        lam = 1 - ((bbx2 - bbx1) * (bby2 - bby1) / (data.shape[-1] * data.shape[-2]))
+        data, rand_index, lam = self.cutmix(data)
         # combine the targets, will require one hot
         ohe_target = F.one_hot(target, num_classes=self.num_classes)
         ohe_target_patches = F.one_hot(target[rand_index], num_classes=self.num_classes)
@@ -149,7 +162,11 @@ class CutMixKnowledgeDistillation(CutMix):
                           from the distribution Beta(mixup_alpha, mixup_beta).
                           If α and β are set to 1,
                           λ is sampled from a uniform distribution.
-            - cutmix_prob: Probability to apply cutmix at each batch.
+            - cutmix_prob: Probability to apply cutmix at each batch, or to each
+                           sample if cutmix_per_sample is set.
+            - cutmix_per_sample: Whether to draw a different lambda and bounding
+                                 box for each sample instead of a single box for
+                                 the whole batch. Defaults to False.
             - teacher_model_class: Class for pretrained model to be used as teacher
                                    in knowledge distillation.
         """
@@ -182,15 +199,10 @@ class CutMixKnowledgeDistillation(CutMix):
                                                     non_blocking)
 
         data = data.to(self.device, non_blocking=non_blocking)
+        target = target.to(self.device, non_blocking=non_blocking)
 
         # transform the data - generate mixed sample
-        lam = np.random.beta(self.mixup_alpha, self.mixup_beta)
-        rand_index = torch.randperm(data.shape[0], device=self.device)
-        # draw and apply the bounding boxes to batch
-        bbx1, bby1, bbx2, bby2 = rand_bbox(data.shape, lam)
-        data[:, :, bbx1:bbx2, bby1:bby2] = data[rand_index, :, bbx1:bbx2, bby1:bby2]
-        # adjust lambda to exactly match pixel ratio
-        lam = 1 - ((bbx2 - bbx1) * (bby2 - bby1) / (data.shape[-1] * data.shape[-2]))
+        data, rand_index, lam = self.cutmix(data)
 
         # recalculate softmax target
         with torch.no_grad():
@@ -229,8 +241,8 @@ def rand_bbox(shape, lam):
     width = shape[2]
     height = shape[3]
     cut_rat = np.sqrt(1. - lam)
-    cut_w = np.int(width * cut_rat)
-    cut_h = np.int(height * cut_rat)
+    cut_w = int(width * cut_rat)
+    cut_h = int(height * cut_rat)
 
     # uniform
     cx = np.random.randint(width)
@@ -244,6 +256,90 @@ def rand_bbox(shape, lam):
     return bbx1, bby1, bbx2, bby2
 
 
+def cutmix_single_box(data, mixup_alpha=1.0, mixup_beta=1.0, cutmix_prob=1.0):
+    """
+    Applies CutMix to a batch of images by pasting the same bounding box,
+    drawn with a single lambda, from a shuffled copy of the batch.
+
+    :param data: batch of images of shape (batch_size, channels, height, width),
+                 modified in place
+    :param mixup_alpha: alpha parameter of the beta distribution for lambda
+    :param mixup_beta: beta parameter of the beta distribution for lambda
+    :param cutmix_prob: probability to apply cutmix to the batch
+
+    :return: tuple with the mixed images, the index of the sample each patch
+             comes from and the ratio of the images that was kept, adjusted to
+             exactly match the pixel ratio
+    """
+    rand_index = torch.randperm(data.shape[0], device=data.device)
+    if cutmix_prob < 1.0 and np.random.rand() >= cutmix_prob:
+        return data, rand_index, 1.
+
+    lam = np.random.beta(mixup_alpha, mixup_beta)
+    # draw and apply the bounding boxes to batch
+    bbx1, bby1, bbx2, bby2 = rand_bbox(data.shape, lam)
+    data[:, :, bbx1:bbx2, bby1:bby2] = data[rand_index, :, bbx1:bbx2, bby1:bby2]
+    # adjust lambda to exactly match pixel ratio
+    lam = 1 - ((bbx2 - bbx1) * (bby2 - bby1) / (data.shape[-1] * data.shape[-2]))
+    return data, rand_index, lam
+
+
+def cutmix_batch(data, mixup_alpha=1.0, mixup_beta=1.0, cutmix_prob=1.0):
+    """
+    Applies CutMix to a batch of images with a different lambda and bounding
+    box for each sample. Everything is computed on the device of the batch: the
+    boxes are turned into masks with broadcasted comparisons and the images are
+    mixed in place with a single `lerp_`.
+
+    :param data: batch of images of shape (batch_size, channels, height, width),
+                 modified in place
+    :param mixup_alpha: alpha parameter of the beta distribution for lambda
+    :param mixup_beta: beta parameter of the beta distribution for lambda
+    :param cutmix_prob: probability to apply cutmix to each sample
+
+    :return: tuple with the mixed images, the index of the sample each patch
+             comes from and the ratio of each image that was kept, of shape
+             (batch_size, 1), adjusted to exactly match the pixel ratio
+    """
+    batch_size, height, width = data.shape[0], data.shape[2], data.shape[3]
+    device = data.device
+
+    beta = torch.distributions.Beta(torch.tensor(float(mixup_alpha), device=device),
+                                    torch.tensor(float(mixup_beta), device=device))
+    lam = beta.sample((batch_size,))
+    if cutmix_prob < 1.0:
+        apply = torch.rand(batch_size, device=device) < cutmix_prob
+        lam = torch.where(apply, lam, torch.ones_like(lam))
+    rand_index = torch.randperm(batch_size, device=device)
+
+    # draw the bounding boxes, same as `rand_bbox` for each sample
+    cut_rat = torch.sqrt(1. - lam)
+    cut_h = (height * cut_rat).long() // 2
+    cut_w = (width * cut_rat).long() // 2
+    cx = torch.randint(height, (batch_size,), device=device)
+    cy = torch.randint(width, (batch_size,), device=device)
+    bbx1 = (cx - cut_h).clamp(0, height).unsqueeze(1)
+    bbx2 = (cx + cut_h).clamp(0, height).unsqueeze(1)
+    bby1 = (cy - cut_w).clamp(0, width).unsqueeze(1)
+    bby2 = (cy + cut_w).clamp(0, width).unsqueeze(1)
+
+    # build the masks of shape (batch_size, 1, height, width)
+    rows = torch.arange(height, device=device)
+    cols = torch.arange(width, device=device)
+    in_rows = (rows >= bbx1) & (rows < bbx2)
+    in_cols = (cols >= bby1) & (cols < bby2)
+    mask = (in_rows.unsqueeze(2) & in_cols.unsqueeze(1)).unsqueeze(1)
+
+    # a 0/1 weight selects either image exactly, and unlike `torch.where`
+    # avoids allocating a new batch
+    mask = mask.to(data.dtype)
+    data.lerp_(data.index_select(0, rand_index), mask)
+
+    # adjust lambda to exactly match pixel ratio
+    lam = 1. - mask.mean(dim=(1, 2, 3), dtype=torch.float)
+    return data, rand_index, lam.unsqueeze(1)
+
+
 def soft_cross_entropy(output, target, reduction="mean"):
     """ Cross entropy that accepts soft targets
     Args:
@@ -48,6 +48,8 @@ class LegacyImagenetConfig(
                 val_dir=config.get("val_dir", "val"),
                 num_classes=config.get("num_classes", 1000),
                 use_auto_augment=config.get("use_auto_augment", False),
+                auto_augment_shear_translate=config.get(
+                    "auto_augment_shear_translate", False),
                 sample_transform=config.get("sample_transform", None),
                 target_transform=config.get("target_transform", None),
                 replicas_per_sample=config.get("replicas_per_sample", 1),
@@ -0,0 +1,81 @@
+# ----------------------------------------------------------------------
+# Numenta Platform for Intelligent Computing (NuPIC)
+# Copyright (C) 2021, Numenta, Inc.  Unless you have an agreement
+# with Numenta, Inc., for a separate license for this software code, the
+# following terms and conditions apply:
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero Public License version 3 as
+# published by the Free Software Foundation.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.
+# See the GNU Affero Public License for more details.
+#
+# You should have received a copy of the GNU Affero Public License
+# along with this program.  If not, see http://www.gnu.org/licenses.
+#
+# http://numenta.org/licenses/
+# ----------------------------------------------------------------------
+
+from functools import partial
+
+from nupic.research.frameworks.pytorch.timing import PhaseTimer
+
+__all__ = [
+    "LogBatchTiming",
+]
+
+
+class LogBatchTiming:
+    """
+    Include the time spent on each phase of the training and validation loops
+    (data loading, host to device copy, forward, backward, optimizer step, ...)
+    in the result dict, aggregated per epoch into totals, means and percentiles.
+
+    Training times are reported as "train_time_{phase}_{stat}" and validation
+    times as "val_time_{phase}_{stat}". Comparing "train_time_data_loading_total"
+    to "train_time_total" tells whether the epoch is input bound or compute bound.
+
+    Requires `train_model_func` and `evaluate_model_func` to accept a `timer`
+    argument like :func:`train_model` and :func:`evaluate_model`.
+    """
+    def setup_experiment(self, config):
+        """
+        :param config:
+            - timing_synchronize: Whether to synchronize the device before every
+                                  timestamp. Needed to attribute asynchronous CUDA
+                                  work to the right phase. Default False
+            - timing_percentiles: Percentiles to report. Default (50, 90, 99)
+        """
+        super().setup_experiment(config)
+        timer_args = dict(
+            synchronize=config.get("timing_synchronize", False),
+            device=self.device,
+            percentiles=config.get("timing_percentiles", (50, 90, 99)),
+        )
+        self.train_timer = PhaseTimer(**timer_args)
+        self.val_timer = PhaseTimer(**timer_args)
+        self.train_model = partial(self.train_model, timer=self.train_timer)
+        self.evaluate_model = partial(self.evaluate_model, timer=self.val_timer)
+
+    def run_epoch(self):
+        self.train_timer.reset()
+        self.val_timer.reset()
+
+        result = super().run_epoch()
+
+        if self.train_timer.num_batches > 0:
+            result.update(self.train_timer.summary(prefix="train_time_"))
+        if self.val_timer.num_batches > 0:
+            result.update(self.val_timer.summary(prefix="val_time_"))
+
+        return result
+
+    @classmethod
+    def get_execution_order(cls):
+        eo = super().get_execution_order()
+        eo["setup_experiment"].append("LogBatchTiming: Create phase timers")
+        eo["run_epoch"].append("LogBatchTiming: Add phase timing to result")
+        return eo
@@ -28,6 +28,10 @@ class LRRangeTest(object):
     validation/test loss still decreases, is considered to be a reasonable choice
     for your max_lr in a cyclical lr-schedule. The same author recommends using 10-20
     times lower this amount for your min_lr.
+
+    To compare several optimizers, weight decays or model variants at once, see
+    :func:`nupic.research.frameworks.pytorch.lr_range_test.multi_lr_range_test`,
+    which trains all of them on the same batches in a single pass over the data.
     """
 
     # List the required mixins that should be accompanied with this class.
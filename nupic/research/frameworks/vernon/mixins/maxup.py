@@ -19,9 +19,11 @@
 # http://numenta.org/licenses/
 # ----------------------------------------------------------------------
 
-import numpy as np
+from functools import partial
+
 import torch
 import torch.nn.functional as F
+from torch.nn.parallel import DistributedDataParallel
 
 
 class MaxupStandard(object):
@@ -30,8 +32,32 @@ class MaxupStandard(object):
     concatenates into m different batches;
     learns from batch with worst loss.
 
+    All replicas are scored in a single forward pass, with the replica
+    dimension folded into the batch dimension. See :func:`score_replicas` for
+    the effect on batch norm layers.
+
     Paper: https://arxiv.org/pdf/2002.09024.pdf
     """
+    def setup_experiment(self, config):
+        """
+        Add following variables to config
+
+        :param config: Dictionary containing the configuration parameters
+
+            - maxup_chunk_size: Maximum number of images scored per forward pass.
+                                Defaults to all replicas of the batch at once.
+            - maxup_reuse_output: Score one replica per forward pass with
+                                  gradients, and reuse the output of the worst
+                                  replica in the training step instead of running
+                                  the model on it again. Holds the activations of
+                                  two replicas at a time, and waits for the loss
+                                  of each replica. Ignored with
+                                  DistributedDataParallel. Defaults to False.
+        """
+        super().setup_experiment(config)
+        self.maxup_chunk_size = config.get("maxup_chunk_size", None)
+        self.maxup_reuse_output = config.get("maxup_reuse_output", False)
+
     def transform_data_to_device(self, data, target, device, non_blocking):
         """
         :param data: input to the model, as specified by dataloader
@@ -50,26 +76,30 @@ class MaxupStandard(object):
         data = data.to(self.device, non_blocking=non_blocking)
         target = target.to(self.device, non_blocking=non_blocking)
 
-        # calculate loss for all the different variants of the batch
-        losses = []
-        replicas_per_sample = data.shape[1]
-        for dim in range(replicas_per_sample):
-            data_variant = data[:, dim, :, :, :]
-            with torch.no_grad():
-                output = self.model(data_variant)
-                losses.append(self.loss_function(output, target).item())
+        loss_function = partial(self._loss_function, reduction="none")
+        if (self.maxup_reuse_output
+                and not isinstance(self.model, DistributedDataParallel)):
+            data_variant = select_worst_replica(self.model, data, target,
+                                                loss_function)
+        else:
+            # calculate loss for all the different variants of the batch
+            losses = score_replicas(self.model, data, target, loss_function,
+                                    self.maxup_chunk_size)
 
-        # choose the max loss
-        max_loss_dim = np.argmax(losses)
+            # choose the max loss, without leaving the device
+            max_loss_dim = losses.mean(dim=0).argmax()
 
-        # regular training with the max loss
-        data_variant = data[:, max_loss_dim, :, :, :]
+            # regular training with the max loss
+            data_variant = data.index_select(1, max_loss_dim.view(1)).squeeze(1)
 
-        return data_variant, target
+        # let other mixins (e.g. knowledge distillation) compute their targets
+        return super().transform_data_to_device(data_variant, target, device,
+                                                non_blocking)
 
     @classmethod
     def get_execution_order(cls):
         eo = super().get_execution_order()
+        eo["setup_experiment"].append("MaxupStandard parameters")
         eo["transform_data_to_device"].insert(0, "If not training: {")
         eo["transform_data_to_device"].append(
             "} else: { MaxupStandard: Choose data variant }"
@@ -84,8 +114,24 @@ class MaxupPerSample(object):
     with highest loss. Equivalent to formal description
     in the methods section of the paper.
 
+    All replicas are scored in a single forward pass, with the replica
+    dimension folded into the batch dimension. See :func:`score_replicas` for
+    the effect on batch norm layers.
+
     Paper: https://arxiv.org/pdf/2002.09024.pdf
     """
+    def setup_experiment(self, config):
+        """
+        Add following variables to config
+
+        :param config: Dictionary containing the configuration parameters
+
+            - maxup_chunk_size: Maximum number of images scored per forward pass.
+                                Defaults to all replicas of the batch at once.
+        """
+        super().setup_experiment(config)
+        self.maxup_chunk_size = config.get("maxup_chunk_size", None)
+
     def transform_data_to_device(self, data, target, device, non_blocking):
         """
         :param data: input to the model, as specified by dataloader
@@ -98,7 +144,6 @@ class MaxupPerSample(object):
             return super().transform_data_to_device(data, target, device,
                                                     non_blocking)
 
-        # calculate loss for all the tranformed versions of the image
         if len(data.shape) < 5:
             raise ValueError("Define replicas_per_sample > 1")
 
@@ -106,31 +151,24 @@ class MaxupPerSample(object):
         target = target.to(self.device, non_blocking=non_blocking)
 
         # calculate loss for all the tranformed versions of the image
-        losses = []
-        one_hot_target = None
-        replicas_per_sample = data.shape[1]
-        for dim in range(replicas_per_sample):
-            data_variant = data[:, dim, :, :, :]
-
-            # calculate cross entropy per sample
-            with torch.no_grad():
-                output = self.model(data_variant)
-                if one_hot_target is None:
-                    one_hot_target = F.one_hot(target, num_classes=output.shape[-1])
-                losses.append(sample_cross_entropy(output, one_hot_target))
-
-        # 0-dim is number of maxup images, 1-dim is batch size
-        losses = torch.stack(losses)
-        # get max over the 0-dim, number of replicas per sample
-        max_indices = torch.argmax(losses, dim=0)
+        loss_function = partial(self._loss_function, reduction="none")
+        losses = score_replicas(self.model, data, target, loss_function,
+                                self.maxup_chunk_size)
+
+        # get max over the 1-dim, number of replicas per sample
+        max_indices = torch.argmax(losses, dim=1)
         # use max indices to select locally
-        data_variant = data[range(len(target)), max_indices, :, :, :]
+        samples = torch.arange(len(target), device=data.device)
+        data_variant = data[samples, max_indices]
 
-        return data_variant, target
+        # let other mixins (e.g. knowledge distillation) compute their targets
+        return super().transform_data_to_device(data_variant, target, device,
+                                                non_blocking)
 
     @classmethod
     def get_execution_order(cls):
         eo = super().get_execution_order()
+        eo["setup_experiment"].append("MaxupPerSample parameters")
         eo["transform_data_to_device"].insert(0, "If not training: {")
         eo["transform_data_to_device"].append(
             "} else: { MaxupPerSample: Choose data variant }"
@@ -138,10 +176,115 @@ class MaxupPerSample(object):
         return eo
 
 
+def score_replicas(model, data, target, loss_function=None, chunk_size=None):
+    """
+    Compute the loss of every replica of every sample without gradients.
+    The replicas are folded into the batch dimension, replica by replica, so
+    the model runs once per chunk instead of once per replica.
+
+    In training mode, batch norm layers normalize each chunk with its own
+    statistics and update their running statistics once per chunk. By default
+    the statistics are computed over all the replicas together. A chunk size
+    equal to the batch size normalizes every replica on its own, as with one
+    forward pass per replica.
+
+    The Maxup mixins score the replicas with the experiment's `loss_function`
+    against the targets from the dataloader, not with `error_loss`, which
+    other mixins (e.g. knowledge distillation or cutmix) replace with losses
+    expecting soft targets.
+
+    :param model: model used to score the replicas
+    :param data: batch of shape (batch_size, replicas_per_sample, ...)
+    :param target: class indices of shape (batch_size,)
+    :param loss_function: callable (output, target) returning the loss of each
+                          sample. Defaults to :func:`sample_cross_entropy` of
+                          the one hot targets
+    :param chunk_size: maximum number of images per forward pass. None scores
+                       all the replicas at once
+    :return: per sample losses of shape (batch_size, replicas_per_sample)
+    """
+    if loss_function is None:
+        loss_function = hard_sample_cross_entropy
+
+    batch_size, replicas_per_sample = data.shape[:2]
+    folded_data = data.transpose(0, 1).reshape(batch_size * replicas_per_sample,
+                                               *data.shape[2:])
+    folded_target = target.repeat(replicas_per_sample)
+    chunk_size = chunk_size or len(folded_data)
+
+    losses = []
+    with torch.no_grad():
+        for i in range(0, len(folded_data), chunk_size):
+            output = model(folded_data[i:i + chunk_size])
+            losses.append(loss_function(output, folded_target[i:i + chunk_size]))
+
+    return torch.cat(losses).view(replicas_per_sample, batch_size).t()
+
+
+def select_worst_replica(model, data, target, loss_function):
+    """
+    Run the model on each replica of the batch with gradients, and return the
+    replica with the highest mean loss. Its output is kept and returned by the
+    next call of the model on that replica, so the training step does not
+    compute it again.
+
+    :param model: model used to score the replicas
+    :param data: batch of shape (batch_size, replicas_per_sample, ...)
+    :param target: class indices of shape (batch_size,)
+    :param loss_function: callable (output, target) returning the loss of each
+                          sample
+    :return: the worst replica, of shape (batch_size, ...)
+    """
+    worst_loss, worst_output, worst_replica = None, None, None
+    for i in range(data.shape[1]):
+        output = model(data[:, i])
+        with torch.no_grad():
+            loss = loss_function(output, target).mean()
+        if worst_loss is None or loss > worst_loss:
+            worst_loss, worst_output, worst_replica = loss, output, i
+        del output
+
+    data_variant = data[:, worst_replica]
+    model.forward = ReuseOutput(model, data_variant, worst_output)
+    return data_variant
+
+
+class ReuseOutput(object):
+    """
+    Replaces the forward of a model for one call. If that call is on the given
+    data, return the given output instead of running the model.
+    """
+    def __init__(self, model, data, output):
+        self.model = model
+        self.data = data
+        self.output = output
+        # Forward already replaced on the instance, e.g. by apex amp
+        self.forward = model.__dict__.get("forward")
+
+    def __call__(self, data, *args, **kwargs):
+        if self.forward is None:
+            del self.model.forward
+        else:
+            self.model.forward = self.forward
+        if data is self.data:
+            return self.output
+        return self.model.forward(data, *args, **kwargs)
+
+
 def sample_cross_entropy(output, target):
     """ Cross entropy of a single sample. Accepts soft targets
     :param output: predictions for neural network
     :param targets: targets, can be soft
     :return: cross entropy per sample, not aggregated
     """
-    return torch.sum(-target * F.log_softmax(output), dim=1)
+    return torch.sum(-target * F.log_softmax(output, dim=1), dim=1)
+
+
+def hard_sample_cross_entropy(output, target):
+    """ Cross entropy of a single sample, with class indices as targets
+    :param output: predictions for neural network
+    :param target: class indices
+    :return: cross entropy per sample, not aggregated
+    """
+    one_hot_target = F.one_hot(target, num_classes=output.shape[-1])
+    return sample_cross_entropy(output, one_hot_target)
@@ -20,9 +20,14 @@
 # ----------------------------------------------------------------------
 
 import copy
+from functools import partial
 
 from torch.optim.lr_scheduler import OneCycleLR
 
+from nupic.research.frameworks.pytorch.lr_scheduler import (
+    CompiledLRScheduler,
+    compile_schedule,
+)
 from nupic.research.frameworks.vernon.experiment_utils import create_lr_scheduler
 
 
@@ -38,6 +43,9 @@ class MultiCycleLR:
             - multi_cycle_lr_args: A list of (epoch, dict) pairs.
                                    The dicts don't need to include epoch
                                    counts, this is inferred from the config.
+            - compile_lr_scheduler: Whether to compile all the cycles into a
+                                    single :class:`CompiledLRScheduler` instead
+                                    of creating a OneCycleLR per cycle.
         """
         config = copy.deepcopy(config)
 
@@ -81,6 +89,23 @@ class MultiCycleLR:
         self.logger.info("MultiCycleLR regime: "
                          f"{self.multi_cycle_args_by_epoch}")
 
+        self.compile_lr_scheduler = config.get("compile_lr_scheduler", False)
+        if self.compile_lr_scheduler:
+            table = compile_schedule(
+                self.optimizer,
+                schedulers={
+                    epoch * self.total_batches: partial(
+                        create_lr_scheduler,
+                        lr_scheduler_class=OneCycleLR,
+                        lr_scheduler_args=args,
+                        steps_per_epoch=self.total_batches)
+                    for epoch, args in self.multi_cycle_args_by_epoch.items()
+                },
+                total_steps=config["epochs"] * self.total_batches,
+            )
+            self.lr_scheduler = CompiledLRScheduler(self.optimizer, table)
+            return
+
         # Set it immediately, rather than waiting for the pre_epoch, in case a
         # restore is occurring.
         args = self.multi_cycle_args_by_epoch[0]
@@ -93,7 +118,7 @@ class MultiCycleLR:
     def pre_epoch(self):
         super().pre_epoch()
 
-        if self.current_epoch != 0 and \
+        if not self.compile_lr_scheduler and self.current_epoch != 0 and \
            self.current_epoch in self.multi_cycle_args_by_epoch:
 
             args = self.multi_cycle_args_by_epoch[self.current_epoch]
@@ -19,9 +19,12 @@
 # http://numenta.org/licenses/
 # ----------------------------------------------------------------------
 
+import copy
+
 import torch
 import torch.nn.intrinsic as nni
 from torch.quantization import (
+    DEFAULT_MODULE_MAPPING,
     DEFAULT_QAT_MODULE_MAPPING,
     DEFAULT_QCONFIG_PROPAGATE_WHITE_LIST,
     FakeQuantize,
@@ -35,7 +38,11 @@ from torch.quantization import (
 )
 from torch.quantization.quantize import _propagate_qconfig_helper, add_observer_
 
-from nupic.research.frameworks.quantization import QATKWINNER_MODULE_MAPPING
+from nupic.research.frameworks.pytorch.restore_utils import get_state_dict
+from nupic.research.frameworks.quantization import (
+    QATKWINNER_MODULE_MAPPING,
+    QUANTIZED_KWINNER_MODULE_MAPPING,
+)
 
 QAT_QUANTIZED_MODULE_MAPPING = dict(DEFAULT_QAT_MODULE_MAPPING)
 QAT_QUANTIZED_MODULE_MAPPING.update(QATKWINNER_MODULE_MAPPING)
@@ -43,6 +50,8 @@ QAT_QCONFIG_PROPAGATE_WHITE_LIST = (
     set(DEFAULT_QCONFIG_PROPAGATE_WHITE_LIST)
     | set(QATKWINNER_MODULE_MAPPING.keys())
 )
+QUANTIZED_MODULE_MAPPING = dict(DEFAULT_MODULE_MAPPING)
+QUANTIZED_MODULE_MAPPING.update(QUANTIZED_KWINNER_MODULE_MAPPING)
 
 
 class QuantizationAware(object):
@@ -121,6 +130,27 @@ class QuantizationAware(object):
             self.model.apply(nni.qat.freeze_bn_stats)
             self.batch_norm_frozen = True
 
+    @classmethod
+    def create_qat_model(cls, config, checkpoint_file=None):
+        """
+        Create the model prepared for quantization aware training, on the CPU
+        and in eval mode, optionally loading a checkpoint saved while training
+        this experiment. Use :func:`convert_to_quantized` to get the int8 model.
+
+        :param config: experiment configuration
+        :param checkpoint_file: experiment checkpoint with the QAT model state
+        """
+        # The checkpoint holds the QAT model state, load it after preparing
+        model = cls.create_model({**config, "checkpoint_file": None}, device=None)
+        prepare_for_qat(model,
+                        config.get("quantize_weights_per_channel", True),
+                        config.get("fuse_relu", False))
+        if checkpoint_file is not None:
+            model.load_state_dict(get_state_dict(checkpoint_file, device="cpu"))
+        model.cpu()
+        model.eval()
+        return model
+
     @classmethod
     def get_execution_order(cls):
         eo = super().get_execution_order()
@@ -165,6 +195,19 @@ def prepare_for_qat(model, quantize_weights_per_channel, fuse_relu):
     convert(model, QAT_QUANTIZED_MODULE_MAPPING, inplace=True)
 
 
+def convert_to_quantized(model, inplace=False):
+    """
+    Convert a model prepared with :func:`prepare_for_qat` and trained into a
+    quantized model for CPU inference, including k-winners
+    """
+    if not inplace:
+        model = copy.deepcopy(model)
+    model.cpu()
+    model.eval()
+    convert(model, QUANTIZED_MODULE_MAPPING, inplace=True)
+    return model
+
+
 def debug_pre_fwd(name, class_name):
     """
     Hook is attached to the operations at the computational graph
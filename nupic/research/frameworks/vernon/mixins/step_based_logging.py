@@ -77,8 +77,8 @@ class StepBasedLogging(
             self.log_timestep_freq > 0
             and (self.current_timestep % self.log_timestep_freq) == 0)
 
-    def get_state(self):
-        state = super().get_state()
+    def get_state(self, serialize=True):
+        state = super().get_state(serialize=serialize)
         state["current_timestep"] = self.current_timestep
         return state
 
@@ -21,11 +21,14 @@
 
 from collections.abc import Sequence
 
+from nupic.research.frameworks.pytorch.dataset_utils.samplers import set_batch_size
+
 
 class VaryBatchSize(object):
     """
     This mixin enables loading the training data with varying batch-sizes from
-    epoch to epoch.
+    epoch to epoch. The batch size of the train dataloader is changed in place,
+    keeping its dataset and sampler.
 
     :param config:
         - batch_sizes: list of batch sizes; the last one will be used for the remainder
@@ -54,9 +57,7 @@ class VaryBatchSize(object):
         super().pre_epoch()
         if 0 < self.current_epoch < len(self.batch_sizes):
             batch_size = self.batch_sizes[self.current_epoch]
-            self.train_loader = self.create_train_dataloader(
-                {**self.config, "batch_size": batch_size}
-            )
+            set_batch_size(self.train_loader, batch_size)
 
             self.logger.info("Setting batch_size=%s (variant %s)", batch_size,
                              self.current_epoch)
@@ -18,6 +18,7 @@
 #  http://numenta.org/licenses/
 #
 import collections
+import functools
 import os
 import pickle
 import time
@@ -25,6 +26,10 @@ import time
 import torch.distributed as dist
 import torch.multiprocessing as mp
 
+from nupic.research.frameworks.vernon.checkpoint_writer import (
+    CheckpointWriter,
+    get_latest_checkpoint,
+)
 from nupic.research.frameworks.vernon.distributed import ImagenetExperiment
 from nupic.research.frameworks.vernon.experiment_utils import get_free_port
 
@@ -42,6 +47,22 @@ def terminate_processes(context):
         p.join()
 
 
+def get_checkpoint_dir(config):
+    """
+    Return the directory used to store the experiment checkpoints. Defaults to
+    the experiment "logdir" when "checkpoint_dir" is not specified
+    """
+    return config.get("checkpoint_dir", config.get("logdir", None))
+
+
+def checkpoint_saved(queue, epoch, checkpoint_file):
+    """
+    Notify the head process that a checkpoint was saved. Only the checkpoint
+    location is sent through the queue.
+    """
+    queue.put((epoch, None, checkpoint_file))
+
+
 def worker(rank, world_size, dist_url, config, queue):
     """
     Main distributed training worker process
@@ -65,7 +86,11 @@ def worker(rank, world_size, dist_url, config, queue):
     dist.barrier()
 
     # Check if restoring experiment from checkpoint
-    checkpoint_file = config.get("checkpoint_file", None)
+    checkpoint_dir = get_checkpoint_dir(config)
+    checkpoint_file = config.get("checkpoint_file",
+                                 config.get("restore_checkpoint_file", None))
+    if checkpoint_file is None and config.get("restore", False):
+        checkpoint_file = get_latest_checkpoint(checkpoint_dir)
     if checkpoint_file is not None:
         with open(checkpoint_file, mode="rb") as f:
             state = pickle.load(f)
@@ -76,19 +101,40 @@ def worker(rank, world_size, dist_url, config, queue):
     checkpoint_at_end = config.get("checkpoint_at_end", False)
     checkpoint_freq = config.get("checkpoint_freq", 0)
 
+    # Checkpoints are streamed to disk by a background thread on rank 0
+    writer = None
+    if rank == 0 and (checkpoint_at_end or checkpoint_freq > 0):
+        assert checkpoint_dir is not None, \
+            "Either 'checkpoint_dir' or 'logdir' is required for checkpointing"
+        writer = CheckpointWriter(
+            checkpoint_dir=checkpoint_dir,
+            keep_checkpoints_num=config.get("keep_checkpoints_num", None),
+            on_saved=functools.partial(checkpoint_saved, queue),
+        )
+
     # Run experiment
-    while not exp.should_stop():
-        result = exp.run_epoch()
-        epoch = exp.get_current_epoch()
-        should_checkpoint = False
-        if rank == 0:
-            if checkpoint_at_end and exp.should_stop():
-                should_checkpoint = True
-            elif checkpoint_freq > 0 and (epoch % checkpoint_freq) == 0:
-                should_checkpoint = True
-
-        checkpoint = exp.get_state() if should_checkpoint else None
-        queue.put((epoch, result, checkpoint))
+    try:
+        while not exp.should_stop():
+            result = exp.run_epoch()
+            epoch = exp.get_current_epoch()
+            queue.put((epoch, result, None))
+
+            if writer is not None:
+                # The state is only copied to CPU here, it is serialized by the
+                # writer thread
+                if checkpoint_at_end and exp.should_stop():
+                    writer.save(epoch, exp.get_state(serialize=False))
+                elif checkpoint_freq > 0 and (epoch % checkpoint_freq) == 0:
+                    writer.save(epoch, exp.get_state(serialize=False))
+    except BaseException:
+        # Keep the pending checkpoints, without hiding the training error
+        if writer is not None:
+            writer.close(raise_error=False)
+        raise
+
+    # Wait for pending checkpoints before signaling this worker is done
+    if writer is not None:
+        writer.close()
 
     exp.stop_experiment()
 
@@ -106,7 +152,7 @@ def head(_, config, world_size, logger, on_checkpoint, queue, results):
     :param logger: Optional result logger callback reporting the results on
                    each epoch. "function(result)"
     :param on_checkpoint: Optional checkpoint callback called whenever a
-                          checkpoint is available. "function(epoch, checkpoint)"
+                          checkpoint is saved. "function(epoch, checkpoint_file)"
     :param queue: Queue shared with workers used to pass results between
                   worker and head processes
     :param results: Multiprocessing managed list used to return the results back
@@ -124,12 +170,15 @@ def head(_, config, world_size, logger, on_checkpoint, queue, results):
             # The worker process returns None when it is done
             pending_workers -= 1
         else:
-            epoch, data, checkpoint = item
-            worker_results[epoch].append(data)
-            if on_checkpoint is not None and checkpoint is not None:
-                on_checkpoint(epoch, checkpoint)
+            epoch, data, checkpoint_file = item
+            if checkpoint_file is not None:
+                # Checkpoints are written directly to disk by the worker
+                if on_checkpoint is not None:
+                    on_checkpoint(epoch, checkpoint_file)
+                continue
 
             # Aggregated worker results at the end of each epoch
+            worker_results[epoch].append(data)
             epoch_result = worker_results[epoch]
             if len(epoch_result) == world_size:
                 epoch_result = experiment_class.aggregate_results(epoch_result)
@@ -147,12 +196,18 @@ def head(_, config, world_size, logger, on_checkpoint, queue, results):
 def run(config, logger=None, on_checkpoint=None):
     """
     Run ImagenetExperiment distributed training using torch.multiprocessing
-    given it's configuration
+    given it's configuration.
+
+    Checkpoints are saved by the rank 0 worker into "checkpoint_dir" (defaults to
+    "logdir") using a background thread. Use "keep_checkpoints_num" to limit the
+    number of checkpoints kept on disk and "restore" to resume the experiment
+    from the latest checkpoint found in "checkpoint_dir".
+
     :param config: Experiment configuration
     :param logger: Optional result logger callback reporting the results on
                    each epoch. "function(result)"
     :param on_checkpoint: Optional checkpoint callback called whenever a
-                          checkpoint is available. "function(epoch, checkpoint)"
+                          checkpoint is saved. "function(epoch, checkpoint_file)"
     :return: List with all results.
     """
     if logger is not None:
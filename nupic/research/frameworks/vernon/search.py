@@ -19,9 +19,44 @@
 #
 import os
 import pickle
+import sqlite3
+import time
+import traceback
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
 from copy import deepcopy
 
 import numpy as np
+import torch
+import torch.multiprocessing as mp
+
+
+def _set_nested(config, keys, value):
+    """Set the value of a nested dictionary given the path of keys"""
+    for key in keys[:-1]:
+        config = config[key]
+    config[keys[-1]] = value
+
+
+def _get_nested(config, keys):
+    """Get the value of a nested dictionary given the path of keys"""
+    for key in keys:
+        config = config[key]
+    return config
+
+
+def _find_options(config, option_class, path=()):
+    """
+    Recursively find all instances of `option_class` in a nested config
+
+    :return: list with the path of keys (tuple) of each option found
+    """
+    found = []
+    for key, value in config.items():
+        if value.__class__ == option_class:
+            found.append(path + (key,))
+        elif isinstance(value, dict):
+            found.extend(_find_options(value, option_class, path + (key,)))
+    return found
 
 
 class SearchOption:
@@ -36,16 +71,15 @@ class SearchOption:
 class SequentialSearch(SearchOption):
     """Pick sequentially from a list with size equal to number of trials"""
 
-    def expand_in_place(self, config, index, k1, k2=None):
+    def expand_in_place(self, config, index, *keys):
         """
         Updates config in place with one of the elements in a list
 
         :param config: (dict) Config (or kwargs) from the experiment
         :param index: (int) Position of the element to be selected in the list
-        :param k1: (str) Argument from config that will be updated
-        :param k2: (str) Argument from config that will be updated. Secondary key
-                         used if argument to be updated is in an nested dictionary.
-                         k1 is the key for the outer dict, and k2 for the inner dict
+        :param keys: (str) Path of the argument from config that will be updated.
+                           Use more than one key if the argument to be updated is
+                           in a nested dictionary, from the outer to the inner dict
         """
         if index >= len(self.elements):
             raise ValueError(
@@ -56,24 +90,20 @@ class SequentialSearch(SearchOption):
         print(f"***** seed {element}")
 
         # assign
-        if k2 is None:
-            config[k1] = element
-        else:
-            config[k1][k2] = element
+        _set_nested(config, keys, element)
 
 
 class RandomSearch(SearchOption):
     """Sample from a list of options or a stochastic function"""
 
-    def expand_in_place(self, config, k1, k2=None):
+    def expand_in_place(self, config, *keys):
         """
         Updates config in place with a random element selected from a list or function.
 
         :param config: (dict) Config (or kwargs) from the experiment
-        :param k1: (str) Argument from config that will be updated
-        :param k2: (str) Argument from config that will be updated. Secondary key
-                         used if argument to be updated is in an nested dictionary.
-                         k1 is the key for the outer dict, and k2 for the inner dict
+        :param keys: (str) Path of the argument from config that will be updated.
+                           Use more than one key if the argument to be updated is
+                           in a nested dictionary, from the outer to the inner dict
         """
         if callable(self.elements):
             element = self.elements()
@@ -85,34 +115,27 @@ class RandomSearch(SearchOption):
             )
 
         # assign
-        if k2 is None:
-            config[k1] = element
-        else:
-            config[k1][k2] = element
+        _set_nested(config, keys, element)
 
 
 class GridSearch(SearchOption):
     """Expand one experiment per option"""
 
-    def expand_to_list(self, config, k1, k2=None):
+    def expand_to_list(self, config, *keys):
         """
         Returns a list of experiment, with each one containing one of the
         possible elements of the grid search.
 
         :param config: (dict) Config (or kwargs) from the experiment
-        :param k1: (str) Argument from config that will be updated
-        :param k2: (str) Argument from config that will be updated. Secondary key
-                         used if argument to be updated is in an nested dictionary.
-                         k1 is the key for the outer dict, and k2 for the inner dict
+        :param keys: (str) Path of the argument from config that will be updated.
+                           Use more than one key if the argument to be updated is
+                           in a nested dictionary, from the outer to the inner dict
         :return: returns a copy of the original config with the parameter updated
         """
         expanded_list = []
         for el in self.elements:
             expanded_config = deepcopy(config)
-            if k2 is None:
-                expanded_config[k1] = el
-            else:
-                expanded_config[k1][k2] = el
+            _set_nested(expanded_config, keys, el)
             expanded_list.append(expanded_config)
 
         return expanded_list
@@ -184,16 +207,15 @@ class TrialsCollection:
         with open(self.path_completed, "rb") as f:
             self.completed = pickle.load(f)
 
-    @staticmethod  # noqa: C901
+    @staticmethod
     def expand_trials(base_config, num_samples=1):
         """
         Convert experiments using SearchOption into a list of experiments
         List of experiments can be executed in parallel or sequentially
 
-        Iterates through main dictionary, and through dictionaries within the main dict
-        This picks up nested arguments such as in optimizer_args and lr_scheduler
-        Only supports two levels
-        TODO: replace for cleaner and more flexible recursive approach
+        Recursively iterates through the main dictionary and all dictionaries
+        nested within it, picking up nested arguments at any depth such as in
+        optimizer_args, lr_scheduler_args or their sub-schedulers
         """
 
         # expand all grid search
@@ -201,24 +223,12 @@ class TrialsCollection:
         trials = []
         while len(stack) != 0:
             config = stack.pop()
-            pending_analysis = False
-            # first level
-            for k1, v1 in config.items():
-                if pending_analysis:
-                    break
-                elif v1.__class__ == GridSearch:
-                    stack.extend(v1.expand_to_list(config, k1))
-                    pending_analysis = True
-                elif type(v1) == dict:
-                    # second level
-                    for k2, v2 in v1.items():
-                        if pending_analysis:
-                            break
-                        elif v2.__class__ == GridSearch:
-                            stack.extend(v2.expand_to_list(config, k1, k2))
-                            pending_analysis = True
-
-            if not pending_analysis:
+            grid_options = _find_options(config, GridSearch)
+            if len(grid_options) > 0:
+                keys = grid_options[0]
+                option = _get_nested(config, keys)
+                stack.extend(option.expand_to_list(config, *keys))
+            else:
                 trials.append(config)
 
         # multiply by num_samples
@@ -229,18 +239,221 @@ class TrialsCollection:
 
         # replace all sample from and random search
         for index, config in enumerate(expanded_trials):
-            # first level
-            for k1, v1 in config.items():
-                if v1.__class__ == RandomSearch:
-                    v1.expand_in_place(config, k1)
-                elif v1.__class__ == SequentialSearch:
-                    v1.expand_in_place(config, index, k1)
-                elif type(v1) == dict:
-                    # second level
-                    for k2, v2 in v1.items():
-                        if v2.__class__ == RandomSearch:
-                            v2.expand_in_place(config, k1, k2)
-                        elif v2.__class__ == SequentialSearch:
-                            v2.expand_in_place(config, index, k1, k2)
+            for keys in _find_options(config, RandomSearch):
+                _get_nested(config, keys).expand_in_place(config, *keys)
+            for keys in _find_options(config, SequentialSearch):
+                _get_nested(config, keys).expand_in_place(config, index, *keys)
 
         return expanded_trials
+
+
+def run_experiment(config):
+    """
+    Run a single (non distributed) experiment until it stops
+
+    :param config: (dict) Trial config. Must contain "experiment_class"
+    :return: result of the last iteration
+    """
+    exp = config["experiment_class"]()
+    exp.setup_experiment(config)
+    result = None
+    while not exp.should_stop():
+        result = exp.run_iteration()
+    exp.stop_experiment()
+    return result
+
+
+def _init_trial_process(num_threads):
+    """Limit the number of threads used by each trial process"""
+    os.environ["OMP_NUM_THREADS"] = str(num_threads)
+    torch.set_num_threads(num_threads)
+
+
+def _run_trial(trial_fn, trial_id, config):
+    """Run trial in the worker process catching any exception"""
+    try:
+        return trial_id, trial_fn(config), None
+    except Exception:
+        return trial_id, None, traceback.format_exc()
+
+
+class LocalTrialScheduler:
+    """
+    Run trials in parallel on the local machine without ray using a process pool.
+
+    Trial configs, status and final results are stored in a SQLite database
+    located at "{local_dir}/{experiment_name}.db" so a sweep can be resumed
+    exactly where it stopped. Trials found running when the scheduler is
+    restored are considered interrupted and are executed again.
+
+    Example::
+
+        scheduler = LocalTrialScheduler(config, num_trials=4, max_concurrent=8)
+        scheduler.run()
+        results = scheduler.get_results()
+
+    :param config: (dict) Config (or kwargs) from the original experiment
+    :param num_trials: (int) Number of trials required for each configuration.
+                             Equivalent to num_samples on Ray
+    :param max_concurrent: (int) Maximum number of trials running in parallel
+    :param cpus_per_trial: (int) Number of threads used by each trial. Defaults
+                                 to spread all available CPUs across trials
+    :param restore: (bool) Whether or not continue from previous experiment,
+                           based on experiment_name
+    :param trial_fn: Function used to run each trial. "function(config) -> result"
+                     Defaults to :func:`run_experiment`
+    """
+
+    PENDING = "PENDING"
+    RUNNING = "RUNNING"
+    COMPLETED = "COMPLETED"
+    ERROR = "ERROR"
+
+    def __init__(self, config, num_trials=1, max_concurrent=1,
+                 cpus_per_trial=None, restore=True, trial_fn=run_experiment):
+        # all experiments are required a name for later retrieval
+        if "experiment_name" not in config:
+            self.name = "".join([chr(np.random.randint(97, 123)) for _ in range(10)])
+        else:
+            self.name = config["experiment_name"]
+
+        if cpus_per_trial is None:
+            cpus_per_trial = max(1, (os.cpu_count() or 1) // max_concurrent)
+
+        self.max_concurrent = max_concurrent
+        self.cpus_per_trial = cpus_per_trial
+        self.trial_fn = trial_fn
+
+        path = config["local_dir"]
+        os.makedirs(path, exist_ok=True)
+        self.path = os.path.join(path, self.name + ".db")
+
+        restored = restore and os.path.exists(self.path)
+        if not restore and os.path.exists(self.path):
+            os.remove(self.path)
+
+        self.db = sqlite3.connect(self.path)
+        with self.db:
+            self.db.execute(
+                "CREATE TABLE IF NOT EXISTS trials ("
+                "id INTEGER PRIMARY KEY, "
+                "status TEXT NOT NULL, "
+                "config BLOB NOT NULL, "
+                "result BLOB, "
+                "error TEXT, "
+                "start_time REAL, "
+                "end_time REAL)"
+            )
+
+        if restored:
+            # Trials interrupted while running must run again
+            with self.db:
+                self.db.execute("UPDATE trials SET status=? WHERE status=?",
+                                (self.PENDING, self.RUNNING))
+        else:
+            trials = TrialsCollection.expand_trials(config, num_trials)
+            with self.db:
+                self.db.executemany(
+                    "INSERT INTO trials (id, status, config) VALUES (?, ?, ?)",
+                    [(i, self.PENDING, pickle.dumps(trial))
+                     for i, trial in enumerate(trials)]
+                )
+
+    def count(self, status=None):
+        """Number of trials with the given status or all trials when None"""
+        if status is None:
+            row = self.db.execute("SELECT COUNT(*) FROM trials").fetchone()
+        else:
+            row = self.db.execute("SELECT COUNT(*) FROM trials WHERE status=?",
+                                  (status,)).fetchone()
+        return row[0]
+
+    def report_progress(self):
+        """Report number of experiments completed"""
+        print(f"***** Trials completed: {self.count(self.COMPLETED)}/{self.count()}")
+
+    def retry_failed(self):
+        """Mark all failed trials as pending so they will run again"""
+        with self.db:
+            self.db.execute("UPDATE trials SET status=?, error=NULL WHERE status=?",
+                            (self.PENDING, self.ERROR))
+
+    def run(self):
+        """
+        Run all pending trials using up to `max_concurrent` processes. Blocks
+        until all trials are done.
+        """
+        pending = self.db.execute(
+            "SELECT id, config FROM trials WHERE status=? ORDER BY id",
+            (self.PENDING,)
+        ).fetchall()
+        pending.reverse()
+        if len(pending) == 0:
+            return
+
+        print(f"***** Experiment {self.name} started")
+        executor = ProcessPoolExecutor(
+            max_workers=self.max_concurrent,
+            mp_context=mp.get_context("spawn"),
+            initializer=_init_trial_process,
+            initargs=(self.cpus_per_trial,),
+        )
+        running = set()
+        try:
+            while len(pending) > 0 or len(running) > 0:
+                # Keep all worker processes busy
+                while len(pending) > 0 and len(running) < self.max_concurrent:
+                    trial_id, config = pending.pop()
+                    with self.db:
+                        self.db.execute(
+                            "UPDATE trials SET status=?, start_time=? WHERE id=?",
+                            (self.RUNNING, time.time(), trial_id)
+                        )
+                    running.add(executor.submit(_run_trial, self.trial_fn,
+                                                trial_id, pickle.loads(config)))
+
+                done, running = wait(running, return_when=FIRST_COMPLETED)
+                for future in done:
+                    trial_id, result, error = future.result()
+                    self._update_trial(trial_id, result, error)
+                self.report_progress()
+        finally:
+            # Do not wait for running trials when interrupted
+            executor.shutdown(wait=len(running) == 0)
+
+        print(f"***** Experiment {self.name} finished: "
+              f"{self.count(self.COMPLETED)} trials completed")
+
+    def _update_trial(self, trial_id, result, error):
+        if error is None:
+            status = self.COMPLETED
+            print(f"***** Trial {trial_id} completed")
+        else:
+            status = self.ERROR
+            print(f"***** Trial {trial_id} failed:\n{error}")
+
+        with self.db:
+            self.db.execute(
+                "UPDATE trials SET status=?, result=?, error=?, end_time=? "
+                "WHERE id=?",
+                (status, pickle.dumps(result), error, time.time(), trial_id)
+            )
+
+    def get_results(self):
+        """
+        Returns the trials stored in the database
+
+        :return: list of dict with "id", "status", "config", "result" and "error"
+        """
+        rows = self.db.execute(
+            "SELECT id, status, config, result, error FROM trials ORDER BY id"
+        ).fetchall()
+        return [dict(id=trial_id,
+                     status=status,
+                     config=pickle.loads(config),
+                     result=pickle.loads(result) if result is not None else None,
+                     error=error)
+                for trial_id, status, config, result, error in rows]
+
+    def close(self):
+        self.db.close()
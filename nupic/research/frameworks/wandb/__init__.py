@@ -19,4 +19,5 @@
 # http://numenta.org/licenses/
 # ----------------------------------------------------------------------
 
+from .log_transport import *
 from .ray_wandb import *
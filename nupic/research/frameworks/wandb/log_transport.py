@@ -0,0 +1,240 @@
+# ----------------------------------------------------------------------
+# Numenta Platform for Intelligent Computing (NuPIC)
+# Copyright (C) 2021, Numenta, Inc.  Unless you have an agreement
+# with Numenta, Inc., for a separate license for this software code, the
+# following terms and conditions apply:
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero Public License version 3 as
+# published by the Free Software Foundation.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.
+# See the GNU Affero Public License for more details.
+#
+# You should have received a copy of the GNU Affero Public License
+# along with this program.  If not, see http://www.gnu.org/licenses.
+#
+# http://numenta.org/licenses/
+# ----------------------------------------------------------------------
+
+import importlib.util
+import json
+import logging
+import os
+import threading
+from collections import deque
+
+__all__ = [
+    "LogTransport",
+    "WandbSink",
+    "LocalDirectorySink",
+    "create_sink",
+    "wandb_enabled",
+]
+
+logger = logging.getLogger(__name__)
+
+
+def wandb_enabled(wandb_args=None):
+    """
+    Whether results should be logged with wandb: wandb is installed and not
+    explicitly disabled, either with `WANDB_MODE=disabled` or `mode="disabled"` in
+    the `wandb.init` arguments. Offline mode, custom hosts and missing credentials
+    are left to `wandb.init`.
+
+    :param wandb_args: (optional) arguments passed to `wandb.init`
+    """
+    mode = (wandb_args or {}).get("mode") or os.environ.get("WANDB_MODE", "")
+    if mode == "disabled":
+        return False
+    return importlib.util.find_spec("wandb") is not None
+
+
+class WandbSink(object):
+    """Sends each record of a batch with `wandb.log`."""
+
+    def write(self, records):
+        import wandb
+
+        for step, metrics, commit in records:
+            wandb.log(metrics, step=step, commit=commit)
+
+    def close(self):
+        pass
+
+
+class LocalDirectorySink(object):
+    """
+    Appends the records, one json object per line, to `metrics.jsonl` in the given
+    directory. Values that can't be serialized are saved as their repr.
+    """
+
+    def __init__(self, directory, filename="metrics.jsonl"):
+        os.makedirs(directory, exist_ok=True)
+        self.path = os.path.join(directory, filename)
+        self._file = open(self.path, "a")
+
+    def write(self, records):
+        for step, metrics, commit in records:
+            line = dict(_step=step, _commit=commit, **metrics)
+            self._file.write(json.dumps(line, default=repr) + "\n")
+        self._file.flush()
+
+    def close(self):
+        self._file.close()
+
+
+def create_sink(local_dir, wandb_args=None):
+    """
+    Create a `WandbSink` unless wandb is disabled or not installed, in which case
+    a `LocalDirectorySink` writing to `local_dir` is created instead.
+
+    :param local_dir: directory used when wandb is disabled
+    :param wandb_args: (optional) arguments passed to `wandb.init`
+    """
+    if wandb_enabled(wandb_args):
+        return WandbSink()
+    logger.info(f"wandb is disabled, logging to {local_dir}")
+    return LocalDirectorySink(local_dir)
+
+
+class LogTransport(object):
+    """
+    Logs results in a background thread so slow logging never stalls training.
+
+    Records are appended to a bounded queue and written to the sink in batches
+    by a daemon thread. Consecutive records of the same step, or uncommitted
+    records followed by a record without step, are coalesced into one record as
+    `wandb.log` would do with incremental logging. When the queue is full, `log`
+    waits up to `block_timeout` seconds for the thread to catch up, and then drops
+    the oldest record. Errors raised by the sink are logged and the batch is
+    dropped. The number of dropped records and failed batches is logged on
+    `close`.
+
+    Values are written after `log` returns, so they should not be modified
+    afterwards (e.g. log `tensor.item()` rather than the tensor).
+
+    :param sink: object with `write(records)` and `close()` methods, where records
+                 is a list of (step, metrics, commit) tuples
+    :param max_queue_size: maximum number of records waiting to be written
+    :param max_batch_size: maximum number of records written at once
+    :param flush_interval: seconds to wait for more records before writing a batch
+    :param block_timeout: seconds `log` waits when the queue is full, long
+                          enough for the thread to start writing its next batch
+    """
+
+    def __init__(self, sink, max_queue_size=1000, max_batch_size=100,
+                 flush_interval=1.0, block_timeout=1.0):
+        self.sink = sink
+        self.max_queue_size = max_queue_size
+        self.max_batch_size = max_batch_size
+        self.flush_interval = flush_interval
+        self.block_timeout = block_timeout
+
+        self.dropped = 0
+        self.errors = 0
+        self._records = deque()
+        self._in_flight = 0
+        self._flushing = 0
+        self._closed = False
+        self._cond = threading.Condition()
+        self._thread = threading.Thread(
+            target=self._run, name="LogTransport", daemon=True
+        )
+        self._thread.start()
+
+    def log(self, metrics, step=None, commit=None):
+        """Queue the metrics to be logged. Returns without waiting for the sink."""
+        with self._cond:
+            if self._closed:
+                raise RuntimeError("LogTransport is closed")
+            if len(self._records) >= self.max_queue_size:
+                self._cond.wait_for(
+                    lambda: len(self._records) < self.max_queue_size,
+                    timeout=self.block_timeout,
+                )
+                if len(self._records) >= self.max_queue_size:
+                    self._records.popleft()
+                    self.dropped += 1
+                    if self.dropped == 1:
+                        logger.warning("Logging queue is full, dropping records")
+            self._records.append((step, dict(metrics), commit))
+            self._cond.notify_all()
+
+    def flush(self, timeout=None):
+        """
+        Wait until all queued records are written.
+
+        :return: False if the timeout expired before all records were written
+        """
+        with self._cond:
+            self._flushing += 1
+            self._cond.notify_all()
+            try:
+                return self._cond.wait_for(
+                    lambda: not self._records and not self._in_flight,
+                    timeout=timeout,
+                )
+            finally:
+                self._flushing -= 1
+
+    def close(self, timeout=None):
+        """Write the queued records, stop the thread and close the sink."""
+        self.flush(timeout)
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+        self._thread.join(timeout)
+        self.sink.close()
+        if self.dropped:
+            logger.warning(f"Dropped {self.dropped} records, the logging queue "
+                           f"was full")
+        if self.errors:
+            logger.warning(f"Failed to log {self.errors} batches")
+
+    def _run(self):
+        while True:
+            with self._cond:
+                self._cond.wait_for(lambda: self._records or self._closed)
+                if self._closed and not self._records:
+                    return
+                # Give the producers some time to fill a batch
+                self._cond.wait_for(
+                    lambda: (len(self._records) >= self.max_batch_size
+                             or self._flushing or self._closed),
+                    timeout=self.flush_interval,
+                )
+                size = min(len(self._records), self.max_batch_size)
+                batch = [self._records.popleft() for _ in range(size)]
+                self._in_flight = size
+                self._cond.notify_all()
+
+            try:
+                self.sink.write(coalesce(batch))
+            except Exception:
+                self.errors += 1
+                logger.exception(f"Failed to log {len(batch)} records")
+
+            with self._cond:
+                self._in_flight = 0
+                self._cond.notify_all()
+
+
+def coalesce(records):
+    """
+    Merge consecutive (step, metrics, commit) records logged to the same row: the
+    same step, or no step after an uncommitted record without step.
+    """
+    merged = []
+    for step, metrics, commit in records:
+        if merged:
+            last_step, last_metrics, last_commit = merged[-1]
+            if (step is not None and step == last_step) or (
+                step is None and last_step is None and last_commit is False
+            ):
+                merged[-1] = (step, {**last_metrics, **metrics}, commit)
+                continue
+        merged.append((step, metrics, commit))
+    return merged
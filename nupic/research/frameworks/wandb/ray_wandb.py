@@ -31,6 +31,8 @@ import wandb
 from ray import tune
 from ray.tune.utils import flatten_dict
 
+from .log_transport import LogTransport, create_sink, wandb_enabled
+
 __all__ = [
     "log",
     "WandbLogger",
@@ -45,6 +47,9 @@ else:
     WANDB_DIR = None
 CONFIG_NAME = "ray_wandb_config.json"
 
+# Background transport used by `log`, started by `WorkerLogger`.
+_transport = None
+
 
 def log(log_dict, commit=False, step=None, sync=True, *args, **kwargs):
     """
@@ -76,10 +81,14 @@ def log(log_dict, commit=False, step=None, sync=True, *args, **kwargs):
                    (defaults to true if step is not specified)
     :param step: The global step in processing. This persists any non-committed earlier
                  steps but defaults to not committing the specified step
-    :param sync: If set to False, process calls to log in a separate thread
+    :param sync: If set to False, process calls to log in a separate thread. Ignored
+                 when `WorkerLogger` started a background transport, where all calls
+                 are processed in a separate thread.
     """
 
-    if wandb.run:
+    if _transport is not None:
+        _transport.log(log_dict, step=step, commit=commit)
+    elif wandb.run:
         wandb.log(log_dict, commit=commit, step=step, sync=sync, *args, **kwargs)
 
 
@@ -134,6 +143,12 @@ class WandbLogger(tune.logger.Logger):
     and returns a dictionary of {timestep: result}. If you provide this
     function, you convert from an epoch-based time series to your own
     timestep-based time series, logging multiple timesteps for each epoch.
+
+    Results are sent to wandb by a background `LogTransport`, so a slow connection
+    never stalls the trainer. Its arguments can be given in
+    `env_config["wandb_transport"]`. When wandb is disabled (`WANDB_MODE=disabled`
+    or `mode="disabled"` in `env_config["wandb"]`), results are written to
+    `wandb_local/metrics.jsonl` in the trial directory instead.
     """
 
     # Only the following types are able to be logged through this class.
@@ -165,7 +180,10 @@ class WandbLogger(tune.logger.Logger):
             enable_run_resume(wandb_config)
 
         # This will create a new run-directory.
-        wandb.init(**self.config.get("env_config", {}).get("wandb", {}))
+        if wandb_enabled(wandb_config):
+            wandb.init(**wandb_config)
+        sink = create_sink(os.path.join(self.logdir, "wandb_local"), wandb_config)
+        self._transport = LogTransport(sink, **env_config.get("wandb_transport", {}))
 
         # Get result_to_time_series_fn.
         experiment_class = self.config.get("experiment_class", None)
@@ -187,7 +205,7 @@ class WandbLogger(tune.logger.Logger):
         """
 
         config = deepcopy(result.get("config"))
-        if config and self._config is None:
+        if config and self._config is None and wandb.run:
             for k in config.keys():
                 if wandb.config.get(k) is None:
                     s = repr(config[k])
@@ -197,6 +215,7 @@ class WandbLogger(tune.logger.Logger):
                     except (ValueError, SyntaxError):
                         # Non-serializable
                         wandb.config[k] = s
+        if config and self._config is None:
             self._config = config
 
         tmp = result.copy()
@@ -213,17 +232,19 @@ class WandbLogger(tune.logger.Logger):
                     if not isinstance(value, self.accepted_types):
                         continue
                     metrics[key] = value
-                wandb.log(metrics, step=t)
+                self._transport.log(metrics, step=t)
         else:
             metrics = {}
             for key, value in flatten_dict(tmp, delimiter="/").items():
                 if not isinstance(value, self.accepted_types):
                     continue
                 metrics[key] = value
-            wandb.log(metrics)
+            self._transport.log(metrics)
 
     def close(self):
-        wandb.join()
+        self._transport.close()
+        if wandb.run:
+            wandb.join()
 
 
 class WorkerLogger(object):
@@ -236,6 +257,10 @@ class WorkerLogger(object):
     To keep all logs managed under the same run across the head and worker nodes, try
     using `wandb.util.generate_id()` to get a unique run-id that can be passed to both
     this mixin and the ray based `WandbLogger`.
+
+    Calls to `log` are sent by a background `LogTransport`, so they never wait for
+    the network. When wandb is disabled, they are written to
+    `wandb_local/rank_{rank}/metrics.jsonl` in the experiment's logdir.
     """
 
     def setup_experiment(self, config):
@@ -252,7 +277,9 @@ class WorkerLogger(object):
                          to keep results together
             - wandb_for_worker_ranks: list of integers denoting the ranks of
                                       processes to init wandb
+            - wandb_transport: (optional) dict of arguments for the `LogTransport`
         """
+        global _transport
         super().setup_experiment(config)
         for rank in config.get("wandb_for_worker_ranks", []):
 
@@ -260,11 +287,20 @@ class WorkerLogger(object):
             self.logger.info(f"Setting up wandb on rank {rank}")
             self.logger.info(f"wandb_agrs:\n{pformat(wandb_args)}")
             if self.rank == rank:
-                wandb.init(**wandb_args)
+                if wandb_enabled(wandb_args):
+                    wandb.init(**wandb_args)
+                sink = create_sink(os.path.join(
+                    self.logdir or os.getcwd(), "wandb_local", f"rank_{rank}"
+                ), wandb_args)
+                _transport = LogTransport(sink, **config.get("wandb_transport", {}))
 
     def stop_experiment(self):
         """Finalize wandb logging."""
+        global _transport
         super().stop_experiment()
+        if _transport is not None:
+            _transport.close()
+            _transport = None
         if wandb.run:
             wandb.join()
 
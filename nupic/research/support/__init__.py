@@ -18,5 +18,6 @@
 #  http://numenta.org/licenses/
 #
 from .parse_config import parse_config
+from .ray_results import ResultsStore
 from .ray_utils import load_ray_tune_experiment, load_ray_tune_experiments
 from .aws_utils import s3_create_presigned_url
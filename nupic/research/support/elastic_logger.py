@@ -17,18 +17,27 @@
 #
 #  http://numenta.org/licenses/
 #
+import logging
 import os
 import re
 import subprocess
+import threading
+import time
+from collections import deque
 from datetime import datetime
+from functools import lru_cache
 
 from elasticsearch import Elasticsearch, helpers
 from elasticsearch.client.xpack import SqlClient
+from elasticsearch.exceptions import SerializationError
 from elasticsearch.helpers import BulkIndexError
+from elasticsearch.serializer import JSONSerializer
 from pandas import DataFrame
 from pandas.io.json import json_normalize
 from ray.tune.logger import Logger
 
+logger = logging.getLogger(__name__)
+
 
 def create_elastic_client(**kwargs):
     """
@@ -60,6 +69,272 @@ def create_elastic_client(**kwargs):
     return Elasticsearch(**elasticsearch_args)
 
 
+@lru_cache(maxsize=None)
+def get_git_info():
+    """
+    Returns the last git commit information of the current working directory. The
+    git commands run once per process, the result is cached.
+
+    :return: dict with "remote", "branch", "sha", "user" and "root" (the top level
+             directory of the repository)
+    :rtype: dict
+    """
+    def git(*args):
+        return subprocess.check_output(["git"] + list(args)).decode("ascii").strip()
+
+    return {
+        "remote": git("ls-remote", "--get-url"),
+        "branch": git("rev-parse", "--abbrev-ref", "HEAD"),
+        "sha": git("rev-parse", "HEAD"),
+        "user": git("log", "-n", "1", "--pretty=format:%an"),
+        "root": git("rev-parse", "--show-toplevel"),
+    }
+
+
+class ElasticsearchSink(object):
+    """
+    Index documents with the elasticsearch bulk API. Raises an exception if any
+    document fails to index, so the caller can retry. Documents with an `_id`
+    field are indexed with that id, so retrying a partially indexed batch
+    overwrites the documents already indexed instead of duplicating them.
+
+    Any object with the same `write(documents)` and `close()` methods can replace
+    this sink, e.g. :class:`FileSink` or a stub for tests.
+    """
+
+    def __init__(self, client, index, doc_type):
+        self.client = client
+        self.index = index
+        self.doc_type = doc_type
+
+    def write(self, documents):
+        results = helpers.parallel_bulk(client=self.client,
+                                        actions=documents,
+                                        index=self.index,
+                                        doc_type=self.doc_type)
+        errors = [status for success, status in results if not success]
+        if errors:
+            raise BulkIndexError("{} document(s) failed to index.".
+                                 format(len(errors)), errors)
+
+    def close(self):
+        pass
+
+
+class FileSink(object):
+    """
+    Local stand-in for :class:`ElasticsearchSink` appending the documents to a
+    file, one json document per line, serialized as elasticsearch would.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.serializer = JSONSerializer()
+
+    def write(self, documents):
+        lines = [self.serializer.dumps(doc) + "\n" for doc in documents]
+        with open(self.path, "a") as f:
+            f.writelines(lines)
+
+    def close(self):
+        pass
+
+
+class AsyncIndexer(object):
+    """
+    Writes documents to a sink from a background thread.
+
+    Documents are queued and written in batches. A batch that can't be written
+    after `max_retries` attempts, or that doesn't fit in the queue, is appended
+    to the spill file instead. While the spill file has documents, new batches
+    are appended to it as well. Every `retry_interval` seconds the spilled
+    documents are written again, so nothing is lost when the sink is unreachable.
+    The spill file is also replayed when a new indexer starts with the same file.
+
+    Before being replayed, the spill file is renamed to "<spill_path>.replaying"
+    and this file is only removed once all its documents are written. If the
+    process is killed during a replay, the next indexer replays it again.
+    Documents with stable `_id`s are then overwritten rather than duplicated.
+
+    Documents are spilled with the elasticsearch serializer. A document it can't
+    serialize could never be indexed, it is logged and dropped.
+
+    :param sink: object with `write(documents)` and `close()` methods
+    :param spill_path: path of the json lines file used to keep the documents
+                       that could not be written
+    :param max_queue_size: maximum number of documents kept in memory
+    :param max_batch_size: maximum number of documents per write
+    :param max_retries: number of attempts before spilling a batch
+    :param retry_interval: seconds between attempts, doubled on each retry
+    :param serializer: serializer used for the spill file, defaults to the
+                       elasticsearch :class:`JSONSerializer`
+    """
+
+    def __init__(self, sink, spill_path, max_queue_size=10000, max_batch_size=500,
+                 max_retries=3, retry_interval=1.0, serializer=None):
+        self.sink = sink
+        self.spill_path = spill_path
+        self.serializer = serializer or JSONSerializer()
+        self.max_queue_size = max_queue_size
+        self.max_batch_size = max_batch_size
+        self.max_retries = max_retries
+        self.retry_interval = retry_interval
+
+        self._queue = deque()
+        self._in_flight = 0
+        self._flush_requested = False
+        self._closed = False
+        self._cond = threading.Condition()
+        self._spill_lock = threading.Lock()
+        self._next_replay = 0
+        self._thread = threading.Thread(
+            target=self._run, name="AsyncIndexer", daemon=True
+        )
+        self._thread.start()
+
+    @property
+    def replay_path(self):
+        return self.spill_path + ".replaying"
+
+    @property
+    def spilled(self):
+        """Number of documents waiting in the spill files"""
+        with self._spill_lock:
+            count = 0
+            for path in (self.replay_path, self.spill_path):
+                if os.path.exists(path):
+                    with open(path) as f:
+                        count += sum(1 for _ in f)
+            return count
+
+    def _has_spilled(self):
+        return os.path.exists(self.replay_path) or os.path.exists(self.spill_path)
+
+    def put(self, document):
+        """Queue a document, never waits for the sink."""
+        with self._cond:
+            if self._closed:
+                raise RuntimeError("AsyncIndexer is closed")
+            if len(self._queue) < self.max_queue_size:
+                self._queue.append(document)
+                if len(self._queue) >= self.max_batch_size:
+                    self._cond.notify_all()
+                return
+        self._spill([document])
+
+    def flush(self):
+        """Ask the background thread to write the queued documents now."""
+        with self._cond:
+            self._flush_requested = True
+            self._cond.notify_all()
+
+    def wait(self, timeout=None):
+        """
+        Wait until the queued documents are written or spilled.
+
+        :return: False if the timeout expired first
+        """
+        self.flush()
+        with self._cond:
+            return self._cond.wait_for(
+                lambda: not self._queue and not self._in_flight, timeout=timeout
+            )
+
+    def close(self, timeout=None):
+        """
+        Write the queued documents, waiting at most `timeout` seconds for the
+        sink. The documents that could not be written are kept in the spill file.
+        """
+        self.wait(timeout)
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+        self._thread.join(timeout)
+        with self._cond:
+            documents = list(self._queue)
+            self._queue.clear()
+        if documents:
+            self._spill(documents)
+        self.sink.close()
+
+    def _run(self):
+        while True:
+            with self._cond:
+                self._cond.wait_for(
+                    lambda: (len(self._queue) >= self.max_batch_size
+                             or self._flush_requested or self._closed),
+                    timeout=self.retry_interval,
+                )
+                closed = self._closed
+                size = min(len(self._queue), self.max_batch_size)
+                batch = [self._queue.popleft() for _ in range(size)]
+                self._in_flight = size
+                if not self._queue:
+                    self._flush_requested = False
+
+            if self._has_spilled() and time.time() >= self._next_replay:
+                self._replay()
+            if batch:
+                # Keep the documents in order while there are spilled documents
+                if self._has_spilled() or not self._write(batch):
+                    self._spill(batch)
+
+            with self._cond:
+                self._in_flight = 0
+                self._cond.notify_all()
+                if closed and not self._queue:
+                    return
+
+    def _write(self, documents, retries=None):
+        retries = self.max_retries if retries is None else retries
+        for attempt in range(retries):
+            try:
+                self.sink.write(documents)
+                return True
+            except Exception as e:
+                logger.warning(f"Failed to index {len(documents)} documents: {e}")
+                if attempt + 1 < retries and not self._closed:
+                    time.sleep(self.retry_interval * 2 ** attempt)
+        self._next_replay = time.time() + self.retry_interval
+        return False
+
+    def _serialize(self, documents):
+        lines = []
+        for doc in documents:
+            try:
+                lines.append(self.serializer.dumps(doc) + "\n")
+            except SerializationError as e:
+                logger.error(f"Dropping document {doc.get('_id')}: {e}")
+        return lines
+
+    def _spill(self, documents):
+        lines = self._serialize(documents)
+        with self._spill_lock:
+            with open(self.spill_path, "a") as f:
+                f.writelines(lines)
+
+    def _replay(self):
+        """Write the spilled documents, keeping the ones that failed"""
+        while self._has_spilled():
+            with self._spill_lock:
+                # Documents spilled from now on go to a new spill file, replayed
+                # after this one
+                if not os.path.exists(self.replay_path):
+                    os.replace(self.spill_path, self.replay_path)
+            with open(self.replay_path) as f:
+                documents = [self.serializer.loads(line) for line in f
+                             if line.strip()]
+
+            for i in range(0, len(documents), self.max_batch_size):
+                if not self._write(documents[i:i + self.max_batch_size], retries=1):
+                    # Keep the remaining documents for the next replay
+                    with open(self.replay_path + ".tmp", "w") as f:
+                        f.writelines(self._serialize(documents[i:]))
+                    os.replace(self.replay_path + ".tmp", self.replay_path)
+                    return
+            os.remove(self.replay_path)
+
+
 class ElasticsearchLogger(Logger):
     """
     Elasticsearch Logging interface for `ray.tune`.
@@ -83,44 +358,59 @@ class ElasticsearchLogger(Logger):
     The elasticsearch index name is based on the current results root path. You
     may override this behavior and use a specific index name for your experiment
     using the configuration key `elasticsearch_index`.
+
+    Results are indexed by an :class:`AsyncIndexer` in a background thread, so
+    the trial never waits for elasticsearch. Each result is indexed with the id
+    `{trial_id}_{training_iteration}`, so results indexed again after a failure
+    replace the previous copy. Results that can't be indexed are
+    kept in `elasticsearch_spill.jsonl` in the trial directory and indexed again
+    later, or by the next logger using the same trial directory. The following
+    optional configuration keys control the indexing:
+
+        - **elasticsearch_sink**: object replacing :class:`ElasticsearchSink`,
+                                  e.g. :class:`FileSink`
+        - **elasticsearch_indexer**: dict of extra :class:`AsyncIndexer` arguments
+        - **elasticsearch_close_timeout**: seconds to wait for the remaining
+                                           results on close (default 60)
     """
 
     def _init(self):
-
-        elasticsearch_args = self.config.get("elasticsearch_client", {})
-        self.client = create_elastic_client(**elasticsearch_args)
-
-        # Save git information
-        self.git_remote = subprocess.check_output(
-            ["git", "ls-remote", "--get-url"]).decode("ascii").strip()
-        self.git_branch = subprocess.check_output(
-            ["git", "rev-parse", "--abbrev-ref", "HEAD"]).decode("ascii").strip()
-        self.git_sha = subprocess.check_output(
-            ["git", "rev-parse", "HEAD"]).decode("ascii").strip()
-        self.git_user = subprocess.check_output(
-            ["git", "log", "-n", "1", "--pretty=format:%an"]).decode("ascii").strip()
+        git_info = get_git_info()
+        self.git_remote = git_info["remote"]
+        self.git_branch = git_info["branch"]
+        self.git_sha = git_info["sha"]
+        self.git_user = git_info["user"]
 
         # Check for elasticsearch index name in configuration
         index_name = self.config.get("elasticsearch_index")
         if index_name is None:
             # Create default index name based on log path and git repo name
-            git_root = subprocess.check_output(
-                ["git", "rev-parse", "--show-toplevel"]).decode("ascii").strip()
             repo_name = os.path.basename(self.git_remote).rstrip(".git")
-            path_name = os.path.relpath(self.config["path"], git_root)
+            path_name = os.path.relpath(self.config["path"], git_info["root"])
             index_name = os.path.join(repo_name, path_name)
 
             # slugify index name
             index_name = re.sub(r"[\W_]+", "-", index_name)
 
         self.index_name = index_name
+        self.experiment_name = self.config["name"]
+
+        sink = self.config.get("elasticsearch_sink")
+        if sink is None:
+            elasticsearch_args = self.config.get("elasticsearch_client", {})
+            self.client = create_elastic_client(**elasticsearch_args)
+            sink = ElasticsearchSink(self.client, self.index_name,
+                                     self.experiment_name)
+        self.indexer = AsyncIndexer(
+            sink, os.path.join(self.logdir, "elasticsearch_spill.jsonl"),
+            **self.config.get("elasticsearch_indexer", {})
+        )
+        self.close_timeout = self.config.get("elasticsearch_close_timeout", 60)
 
         self.logdir = os.path.basename(self.logdir)
-        self.experiment_name = self.config["name"]
-        self.buffer = []
 
     def on_result(self, result):
-        """Given a result, appends it to the existing log."""
+        """Given a result, queues it to be indexed."""
         log_entry = {
             "git": {
                 "remote": self.git_remote,
@@ -135,23 +425,19 @@ class ElasticsearchLogger(Logger):
         result["timestamp"] = datetime.utcfromtimestamp(timestamp).isoformat()
 
         log_entry.update(result)
-        self.buffer.append(log_entry)
+
+        # Stable id, indexing the same result again overwrites it
+        trial_id = result.get("trial_id")
+        iteration = result.get("training_iteration")
+        if trial_id is not None and iteration is not None:
+            log_entry["_id"] = f"{trial_id}_{iteration}"
+        self.indexer.put(log_entry)
 
     def close(self):
-        self.flush()
+        self.indexer.close(timeout=self.close_timeout)
 
     def flush(self):
-        if len(self.buffer) > 0:
-            results = helpers.parallel_bulk(client=self.client,
-                                            actions=self.buffer,
-                                            index=self.index_name,
-                                            doc_type=self.experiment_name)
-            errors = [status for success, status in results if not success]
-            if errors:
-                raise BulkIndexError("{} document(s) failed to index.".
-                                     format(len(errors)), errors)
-
-            self.buffer.clear()
+        self.indexer.flush()
 
 
 def elastic_dsl(client, dsl, index, **kwargs):
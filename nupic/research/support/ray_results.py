@@ -0,0 +1,357 @@
+# ----------------------------------------------------------------------
+# Numenta Platform for Intelligent Computing (NuPIC)
+# Copyright (C) 2021, Numenta, Inc.  Unless you have an agreement
+# with Numenta, Inc., for a separate license for this software code, the
+# following terms and conditions apply:
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero Public License version 3 as
+# published by the Free Software Foundation.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.
+# See the GNU Affero Public License for more details.
+#
+# You should have received a copy of the GNU Affero Public License
+# along with this program.  If not, see http://www.gnu.org/licenses.
+#
+# http://numenta.org/licenses/
+# ----------------------------------------------------------------------
+import glob
+import json
+import multiprocessing
+import os
+import pickle
+import warnings
+from numbers import Number
+
+import numpy as np
+
+RESULT_FILE = "result.json"
+INDEX_FILE = ".results_index.pkl"
+INDEX_VERSION = 1
+
+
+class _Missing(object):
+    """Placeholder for the values a result did not report"""
+
+    def __reduce__(self):
+        return "MISSING"
+
+    def __repr__(self):
+        return "MISSING"
+
+
+MISSING = _Missing()
+
+
+def _flatten(row, prefix=()):
+    """Flatten nested result dictionaries into columns keyed by their path"""
+    flat = {}
+    for key, value in row.items():
+        key = prefix + (key,)
+        if isinstance(value, dict) and value:
+            flat.update(_flatten(value, key))
+        else:
+            flat[key] = value
+    return flat
+
+
+def _extend_columns(columns, length, rows):
+    """
+    Append the flattened rows to the columns, padding with MISSING.
+
+    :return: new length of the columns
+    """
+    for row in rows:
+        for key, value in _flatten(row).items():
+            column = columns.get(key)
+            if column is None:
+                column = columns[key] = [MISSING] * length
+            column.append(value)
+        length += 1
+        for column in columns.values():
+            if len(column) < length:
+                column.append(MISSING)
+    return length
+
+
+def _to_array(values):
+    """Convert a column to a numpy array, using NaN for missing numbers"""
+    array = np.asarray(values)
+    if array.dtype.kind in "biuf":
+        return array
+    if all(v is MISSING or v is None or isinstance(v, Number) for v in values):
+        return np.array([np.nan if v is MISSING or v is None else v
+                         for v in values], dtype=float)
+    array = np.empty(len(values), dtype=object)
+    array[:] = [None if v is MISSING else v for v in values]
+    return array
+
+
+def _read_new_results(task):
+    """
+    Parse the complete lines appended to a trial result file since the last
+    read. Partially written lines are left for the next read. The file is
+    read again from the beginning when it was replaced or truncated.
+
+    :param task: tuple (trial name, result file, offset, inode)
+    :return: tuple (trial name, new columns, number of new results, new offset,
+             inode, reset)
+    """
+    name, path, offset, inode = task
+    stat = os.stat(path)
+    reset = stat.st_ino != inode or stat.st_size < offset
+    if reset:
+        offset = 0
+
+    with open(path, "rb") as f:
+        f.seek(offset)
+        data = f.read(stat.st_size - offset)
+
+    end = data.rfind(b"\n") + 1
+    rows = (json.loads(line) for line in data[:end].splitlines() if line.strip())
+    columns = {}
+    length = _extend_columns(columns, 0, rows)
+    return name, columns, length, offset + end, stat.st_ino, reset
+
+
+class ResultsStore(object):
+    """
+    Incrementally indexed store of the trial results of a ray tune experiment.
+
+    Trials are discovered from the experiment states and their ``result.json``
+    files are parsed in a process pool. The store remembers how far each
+    result file was read, so :meth:`refresh` only parses the lines appended
+    since the last call. Results are kept in columns, one per (flattened)
+    metric. With `persist`, the index is saved next to the experiment results
+    to be reused by later sessions.
+
+    Example::
+
+        store = ResultsStore("~/nta/results/my_experiment", persist=True)
+        store.refresh()
+        table = store.table(["experiment_tag", "training_iteration", "mean_accuracy"])
+
+    :param experiment_path: ray tune experiment directory
+    :param num_workers: number of processes used to parse the result files.
+                        Default to the number of CPUs
+    :param index_file: where to save the index. Default to ".results_index.pkl"
+                       in the experiment directory
+    :param persist: whether or not to load and save the index file. Default to
+                    False, which leaves the experiment directory untouched
+    """
+
+    def __init__(self, experiment_path, num_workers=None, index_file=None,
+                 persist=False):
+        self.experiment_path = os.path.abspath(os.path.expanduser(experiment_path))
+        self.num_workers = num_workers or os.cpu_count() or 1
+        self.index_file = index_file or os.path.join(self.experiment_path,
+                                                     INDEX_FILE)
+        self.persist = persist
+
+        # Experiment state file -> ((mtime, size), trials)
+        self._states = {}
+        # Trial name -> dict with the trial tags, result offset and columns
+        self._trials = {}
+        # Trial name -> list of result dictionaries, built on demand
+        self._rows = {}
+
+        if self.persist:
+            self._load_index()
+
+    @property
+    def trials(self):
+        """Names of the trial directories found so far"""
+        return list(self._trials.keys())
+
+    def result_file(self, trial):
+        return os.path.join(self.experiment_path, trial, RESULT_FILE)
+
+    def results(self, trial):
+        """
+        :param trial: trial directory name
+        :return: list of the results reported by the trial so far
+        """
+        rows = self._rows.get(trial)
+        if rows is None:
+            entry = self._trials.get(trial)
+            if entry is None:
+                return []
+            rows = self._rows[trial] = [{} for _ in range(entry["length"])]
+            for key, column in entry["columns"].items():
+                for row, value in zip(rows, column):
+                    if value is MISSING:
+                        continue
+                    for k in key[:-1]:
+                        row = row.setdefault(k, {})
+                    row[key[-1]] = value
+        return rows
+
+    def refresh(self):
+        """
+        Read the experiment states and every line appended to the trial result
+        files since the last refresh.
+
+        :return: number of new results
+        """
+        trials, states_changed = self._scan_experiment_states()
+        for name in set(self._trials.keys()) - set(trials.keys()):
+            del self._trials[name]
+            self._rows.pop(name, None)
+
+        tasks = []
+        for name, tags in trials.items():
+            entry = self._trials.get(name)
+            if entry is None:
+                entry = self._trials[name] = dict(offset=0, inode=None, length=0,
+                                                  columns={})
+            entry.update(tags)
+
+            try:
+                stat = os.stat(self.result_file(name))
+            except OSError:
+                continue
+            if stat.st_ino == entry["inode"] and stat.st_size == entry["offset"]:
+                continue
+            tasks.append((name, self.result_file(name), entry["offset"],
+                          entry["inode"]))
+
+        num_results = 0
+        for name, columns, length, offset, inode, reset in self._map(
+            _read_new_results, tasks
+        ):
+            entry = self._trials[name]
+            if reset:
+                entry["columns"] = {}
+                entry["length"] = 0
+            for key, column in entry["columns"].items():
+                column.extend(columns.pop(key, [MISSING] * length))
+            for key, column in columns.items():
+                entry["columns"][key] = [MISSING] * entry["length"] + column
+            entry["length"] += length
+            entry["offset"] = offset
+            entry["inode"] = inode
+            self._rows.pop(name, None)
+            num_results += length
+
+        if self.persist and (num_results > 0 or states_changed):
+            self.save()
+
+        return num_results
+
+    def table(self, columns=None):
+        """
+        Columnar view of the results of all trials. Nested results are
+        flattened into "parent/child" columns. Two extra columns identify the
+        rows: "trial" with the trial directory name and "experiment_tag".
+        Missing values are NaN in numeric columns and None otherwise.
+
+        :param columns: list of columns to include. Default to all
+        :return: dict mapping column names to numpy arrays of equal length
+        """
+        entries = [(name, entry) for name, entry in self._trials.items()
+                   if entry["length"] > 0]
+        if columns is None:
+            columns = {"trial": None, "experiment_tag": None}
+            for _, entry in entries:
+                columns.update((self._column_name(k), None) for k in entry["columns"])
+
+        table = {}
+        for column in columns:
+            key = tuple(column.split("/"))
+            values = []
+            for name, entry in entries:
+                if key in entry["columns"]:
+                    values.extend(entry["columns"][key])
+                elif column == "trial":
+                    values.extend([name] * entry["length"])
+                elif column == "experiment_tag":
+                    values.extend([entry.get(column)] * entry["length"])
+                else:
+                    values.extend([MISSING] * entry["length"])
+            table[column] = _to_array(values)
+        return table
+
+    def to_dataframe(self, columns=None):
+        """:return: :meth:`table` as a pandas DataFrame"""
+        import pandas as pd
+        return pd.DataFrame(self.table(columns))
+
+    def save(self):
+        """Save the index so later sessions only read new results"""
+        index = dict(version=INDEX_VERSION, states=self._states, trials=self._trials)
+        tmp_file = self.index_file + ".tmp"
+        try:
+            with open(tmp_file, "wb") as f:
+                pickle.dump(index, f, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(tmp_file, self.index_file)
+        except OSError as e:
+            warnings.warn(f"Unable to save results index {self.index_file}: {e}",
+                          stacklevel=2)
+
+    def _load_index(self):
+        if not os.path.exists(self.index_file):
+            return
+        try:
+            with open(self.index_file, "rb") as f:
+                index = pickle.load(f)
+        except Exception as e:
+            warnings.warn(f"Ignoring results index {self.index_file}: {e}",
+                          stacklevel=2)
+            return
+        if index.get("version") == INDEX_VERSION:
+            self._states = index["states"]
+            self._trials = index["trials"]
+
+    def _scan_experiment_states(self):
+        """
+        Collect the trials of every experiment state, only parsing the states
+        that changed since the last scan.
+
+        :return: tuple (dict mapping trial names to their tags, states changed)
+        """
+        paths = sorted(glob.glob(
+            os.path.join(self.experiment_path, "experiment_state*.json")
+        ))
+        changed = set(self._states.keys()) != set(paths)
+        states = {}
+        for path in paths:
+            stat = os.stat(path)
+            stamp = (stat.st_mtime_ns, stat.st_size)
+            cached = self._states.get(path)
+            if cached is not None and cached[0] == stamp:
+                states[path] = cached
+                continue
+
+            with open(path) as f:
+                experiment_state = json.load(f)
+            trials = {}
+            for checkpoint in experiment_state.get("checkpoints", []):
+                # Make logs relative to experiment path
+                name = os.path.basename(checkpoint["logdir"])
+                trials[name] = dict(
+                    experiment_tag=checkpoint.get("experiment_tag"),
+                    trial_id=checkpoint.get("trial_id"),
+                )
+            states[path] = (stamp, trials)
+            changed = True
+
+        self._states = states
+        trials = {}
+        for _, state_trials in states.values():
+            trials.update(state_trials)
+        return trials, changed
+
+    def _map(self, fn, tasks):
+        num_workers = min(self.num_workers, len(tasks))
+        if num_workers <= 1:
+            return list(map(fn, tasks))
+        chunksize = max(1, len(tasks) // (4 * num_workers))
+        with multiprocessing.Pool(num_workers) as pool:
+            return list(pool.imap_unordered(fn, tasks, chunksize=chunksize))
+
+    @staticmethod
+    def _column_name(key):
+        return "/".join(str(k) for k in key)
@@ -26,9 +26,11 @@ import torch
 from ray.tune.suggest.variant_generator import format_vars, generate_variants
 from ray.tune.trial_runner import _TuneFunctionDecoder
 
+from nupic.research.support.ray_results import ResultsStore
+
 
 def load_ray_tune_experiments(
-    experiment_path, load_results=False
+    experiment_path, load_results=False, num_workers=None, persist=False
 ):
     """Load multiple ray tune experiment states. This is useful if you want
     to collect the results from multiple runs into one collection
@@ -37,6 +39,13 @@ def load_ray_tune_experiments(
     :type experiment_path: str
     :param load_results: Whether or not to load experiment results
     :type load_results: bool
+    :param num_workers: Number of processes used to parse the results.
+                        See :class:`ResultsStore`
+    :type num_workers: int
+    :param persist: Whether or not to save the results index in the experiment
+                    directory, so later calls only parse new results.
+                    See :class:`ResultsStore`
+    :type persist: bool
 
     :return: list of dictionaries with ray tune experiment state results
     :rtype: list(dict)
@@ -47,8 +56,15 @@ def load_ray_tune_experiments(
     if not experiment_state_paths:
         raise RuntimeError("No experiment state found: " + experiment_path)
 
+    results_store = None
+    if load_results:
+        results_store = ResultsStore(experiment_path, num_workers=num_workers,
+                                     persist=persist)
+        results_store.refresh()
+
     experiment_states = [
-        load_ray_tune_experiment(experiment_path, filename, load_results)
+        load_ray_tune_experiment(experiment_path, filename, load_results,
+                                 results_store=results_store)
         for filename in experiment_state_paths
     ]
 
@@ -56,7 +72,8 @@ def load_ray_tune_experiments(
 
 
 def load_ray_tune_experiment(
-    experiment_path, experiment_filename=None, load_results=False
+    experiment_path, experiment_filename=None, load_results=False,
+    results_store=None
 ):
     """Load ray tune experiment state.
 
@@ -66,6 +83,9 @@ def load_ray_tune_experiment(
     :type experiment_filename: str
     :param load_results: Whether or not to load experiment results
     :type load_results: bool
+    :param results_store: Refreshed results store used to load the results.
+                          None to create one for the experiment path
+    :type results_store: :class:`ResultsStore`
 
     :return: dictionary with ray tune experiment state results
     :rtype: dict
@@ -87,6 +107,10 @@ def load_ray_tune_experiment(
     if "checkpoints" not in experiment_state:
         raise RuntimeError("Experiment state is invalid; no checkpoints found!")
 
+    if load_results and results_store is None:
+        results_store = ResultsStore(experiment_path)
+        results_store.refresh()
+
     all_experiments = experiment_state["checkpoints"]
     for experiment in all_experiments:
         # Make logs relative to experiment path
@@ -96,17 +120,16 @@ def load_ray_tune_experiment(
 
         if load_results:
             # Load results
-            result_file = os.path.join(logpath, "result.json")
-            if not result_file:
+            result_file = results_store.result_file(os.path.basename(logpath))
+            if not os.path.exists(result_file):
                 print("No results for experiment:", experiment["experiment_tag"])
                 continue
 
-            with open(result_file) as f:
-                rows = f.readlines()
-                if not rows:
-                    print("No data for experiment:", experiment["experiment_tag"])
-                    continue
-                experiment["results"] = [json.loads(s) for s in rows]
+            rows = results_store.results(os.path.basename(logpath))
+            if not rows:
+                print("No data for experiment:", experiment["experiment_tag"])
+                continue
+            experiment["results"] = list(rows)
 
     return experiment_state
 
@@ -124,10 +147,12 @@ def get_last_checkpoint(results_dir):
 
     for file_path in experiment_state_json:
         with open(file_path, mode="r") as f:
-            experiment_state = json.load(f, cls=_TuneFunctionDecoder)
+            experiment_state = json.load(f)
 
-        # Get newest checkpoint from last experiment
+        # Get newest checkpoint from last experiment. Only the last trial is
+        # decoded, the other trials' checkpoint managers are never used
         checkpoint = next(reversed(experiment_state["checkpoints"]))
+        checkpoint = json.loads(json.dumps(checkpoint), cls=_TuneFunctionDecoder)
         newest_checkpoint = checkpoint["checkpoint_manager"].newest_checkpoint
 
         # Update checkpoint location
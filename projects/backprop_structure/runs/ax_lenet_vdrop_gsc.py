@@ -194,8 +194,9 @@ class MyAxClient(CoreAxClient):
                 generation_strategy=generation_strategy
             )
 
-    def get_next_trial(self):
-        return super().get_next_trial(
+    def get_next_trials(self, n, model_gen_options=None):
+        return super().get_next_trials(
+            n,
             model_gen_options={
                 "acquisition_function_kwargs": {
                     "random_scalarization": True,
@@ -0,0 +1,82 @@
+# ----------------------------------------------------------------------
+# Numenta Platform for Intelligent Computing (NuPIC)
+# Copyright (C) 2021, Numenta, Inc.  Unless you have an agreement
+# with Numenta, Inc., for a separate license for this software code, the
+# following terms and conditions apply:
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero Public License version 3 as
+# published by the Free Software Foundation.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.
+# See the GNU Affero Public License for more details.
+#
+# You should have received a copy of the GNU Affero Public License
+# along with this program.  If not, see http://www.gnu.org/licenses.
+#
+# http://numenta.org/licenses/
+# ----------------------------------------------------------------------
+
+"""
+Compare the samples/sec of the PIL AutoAugment ImageNet policy, applied to one
+image at a time as in the DataLoader workers, against the tensor policy applied
+to a whole uint8 batch.
+"""
+
+import argparse
+import time
+
+import numpy as np
+import torch
+from PIL import Image
+
+from nupic.research.frameworks.pytorch.dataset_utils import (
+    ImageNetBatchPolicy,
+    ImageNetPolicy,
+)
+
+
+def benchmark(fn, num_samples, steps, warmup=2):
+    for i in range(warmup + steps):
+        if i == warmup:
+            t0 = time.perf_counter()
+        fn()
+    return num_samples * steps / (time.perf_counter() - t0)
+
+
+def main(args):
+    torch.set_num_threads(args.threads)
+    images = torch.randint(0, 256, (args.batch_size, 3, args.image_size,
+                                    args.image_size), dtype=torch.uint8)
+    pil_images = [Image.fromarray(image.permute(1, 2, 0).numpy())
+                  for image in images]
+
+    pil_policy = ImageNetPolicy()
+    batch_policy = ImageNetBatchPolicy()
+
+    def run_pil():
+        # Include the conversion to tensor done by the workers
+        return [torch.from_numpy(np.asarray(pil_policy(image)))
+                for image in pil_images]
+
+    def run_batch():
+        return batch_policy(images.to(args.device))
+
+    print(f"batch_size={args.batch_size}, image_size={args.image_size}, "
+          f"threads={args.threads}, device={args.device}")
+    pil = benchmark(run_pil, args.batch_size, args.steps)
+    batch = benchmark(run_batch, args.batch_size, args.steps)
+    print(f"PIL per image: {pil:10.1f} samples/s")
+    print(f"tensor batch:  {batch:10.1f} samples/s ({batch / pil:.2f}x)")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("-b", "--batch-size", type=int, default=128)
+    parser.add_argument("-i", "--image-size", type=int, default=224)
+    parser.add_argument("-s", "--steps", type=int, default=5)
+    parser.add_argument("-t", "--threads", type=int, default=1)
+    parser.add_argument("-d", "--device", default="cpu")
+    main(parser.parse_args())
@@ -0,0 +1,91 @@
+# ----------------------------------------------------------------------
+# Numenta Platform for Intelligent Computing (NuPIC)
+# Copyright (C) 2021, Numenta, Inc.  Unless you have an agreement
+# with Numenta, Inc., for a separate license for this software code, the
+# following terms and conditions apply:
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero Public License version 3 as
+# published by the Free Software Foundation.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.
+# See the GNU Affero Public License for more details.
+#
+# You should have received a copy of the GNU Affero Public License
+# along with this program.  If not, see http://www.gnu.org/licenses.
+#
+# http://numenta.org/licenses/
+# ----------------------------------------------------------------------
+
+"""
+Compare the throughput of the opt-in per-sample CutMix (`cutmix_per_sample`)
+against the default, which pastes a single bounding box for the whole batch.
+"""
+
+import argparse
+import time
+from functools import partial
+
+import torch
+import torch.nn.functional as F
+
+from nupic.research.frameworks.vernon.mixins.cutmix import (
+    cutmix_batch,
+    cutmix_single_box,
+)
+
+
+def cutmix_per_batch(data, target, num_classes):
+    data, rand_index, lam = cutmix_single_box(data)
+    ohe_target = F.one_hot(target, num_classes=num_classes)
+    ohe_target_patches = F.one_hot(target[rand_index], num_classes=num_classes)
+    return data, lam * ohe_target + (1. - lam) * ohe_target_patches
+
+
+def cutmix_per_sample(data, target, num_classes):
+    data, rand_index, lam = cutmix_batch(data)
+    ohe_target = F.one_hot(target, num_classes=num_classes)
+    ohe_target_patches = F.one_hot(target[rand_index], num_classes=num_classes)
+    return data, lam * ohe_target + (1. - lam) * ohe_target_patches
+
+
+def benchmark(fn, data, target, steps, warmup=3):
+    for i in range(warmup + steps):
+        if i == warmup:
+            if data.is_cuda:
+                torch.cuda.synchronize()
+            t0 = time.perf_counter()
+        fn(data, target)
+    if data.is_cuda:
+        torch.cuda.synchronize()
+    return len(data) * steps / (time.perf_counter() - t0)
+
+
+def main(args):
+    torch.set_num_threads(args.threads)
+    device = torch.device(args.device)
+    data = torch.rand(args.batch_size, 3, args.image_size, args.image_size,
+                      device=device)
+    target = torch.randint(args.num_classes, (args.batch_size,), device=device)
+
+    print(f"device={device}, batch_size={args.batch_size}, "
+          f"image_size={args.image_size}, threads={args.threads}")
+    per_batch = benchmark(partial(cutmix_per_batch, num_classes=args.num_classes),
+                          data, target, args.steps)
+    per_sample = benchmark(partial(cutmix_per_sample, num_classes=args.num_classes),
+                           data, target, args.steps)
+    print(f"per batch:  {per_batch:10.1f} images/s")
+    print(f"per sample: {per_sample:10.1f} images/s ({per_sample / per_batch:.2f}x)")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("-b", "--batch-size", type=int, default=128)
+    parser.add_argument("-i", "--image-size", type=int, default=224)
+    parser.add_argument("-n", "--num-classes", type=int, default=1000)
+    parser.add_argument("-s", "--steps", type=int, default=20)
+    parser.add_argument("-t", "--threads", type=int, default=4)
+    parser.add_argument("-d", "--device", default="cpu")
+    main(parser.parse_args())
@@ -0,0 +1,119 @@
+# ----------------------------------------------------------------------
+# Numenta Platform for Intelligent Computing (NuPIC)
+# Copyright (C) 2021, Numenta, Inc.  Unless you have an agreement
+# with Numenta, Inc., for a separate license for this software code, the
+# following terms and conditions apply:
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero Public License version 3 as
+# published by the Free Software Foundation.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.
+# See the GNU Affero Public License for more details.
+#
+# You should have received a copy of the GNU Affero Public License
+# along with this program.  If not, see http://www.gnu.org/licenses.
+#
+# http://numenta.org/licenses/
+# ----------------------------------------------------------------------
+
+"""
+Compare the CPU time spent scoring Maxup replicas with one forward pass per
+replica against folding the replicas into the batch dimension. Also compare
+a whole MaxupStandard training step with and without reusing the output of
+the worst replica.
+"""
+
+import argparse
+import time
+from functools import partial
+
+import torch
+import torch.nn.functional as F
+from torchvision.models import resnet18
+
+from nupic.research.frameworks.vernon.mixins.maxup import (
+    score_replicas,
+    select_worst_replica,
+)
+
+
+def score_replicas_loop(model, data, target):
+    """
+    Score each replica with a separate forward pass, synchronizing on every
+    loss as MaxupStandard used to
+    """
+    losses = []
+    with torch.no_grad():
+        for dim in range(data.shape[1]):
+            output = model(data[:, dim])
+            losses.append(F.cross_entropy(output, target).item())
+    return losses
+
+
+def train_step(model, data, target, reuse_output):
+    """
+    MaxupStandard training step, on the worst replica
+    """
+    loss_function = partial(F.cross_entropy, reduction="none")
+    if reuse_output:
+        data_variant = select_worst_replica(model, data, target, loss_function)
+    else:
+        losses = score_replicas(model, data, target, loss_function)
+        data_variant = data[:, losses.mean(dim=0).argmax()]
+    model.zero_grad()
+    F.cross_entropy(model(data_variant), target).backward()
+
+
+def benchmark(fn, steps, warmup=2):
+    for i in range(warmup + steps):
+        if i == warmup:
+            t0 = time.perf_counter()
+        fn()
+    return (time.perf_counter() - t0) / steps
+
+
+def main(args):
+    torch.set_num_threads(args.threads)
+    torch.manual_seed(42)
+    model = resnet18(num_classes=100)
+    model.train()
+
+    print(f"batch_size={args.batch_size}, image_size={args.image_size}, "
+          f"threads={args.threads}")
+    for replicas in args.replicas:
+        data = torch.randn(args.batch_size, replicas, 3,
+                           args.image_size, args.image_size)
+        target = torch.randint(100, (args.batch_size,))
+
+        loop = benchmark(
+            partial(score_replicas_loop, model, data, target), args.steps)
+        folded = benchmark(
+            partial(score_replicas, model, data, target),
+            args.steps)
+        chunked = benchmark(
+            partial(score_replicas, model, data, target,
+                    chunk_size=args.batch_size),
+            args.steps)
+        print(f"m={replicas:2d}: loop {loop * 1000:8.2f} ms, "
+              f"folded {folded * 1000:8.2f} ms ({loop / folded:.2f}x), "
+              f"chunked {chunked * 1000:8.2f} ms ({loop / chunked:.2f}x)")
+
+        step = benchmark(
+            partial(train_step, model, data, target, False), args.steps)
+        reuse = benchmark(
+            partial(train_step, model, data, target, True), args.steps)
+        print(f"       training step {step * 1000:8.2f} ms, "
+              f"reusing the output {reuse * 1000:8.2f} ms ({step / reuse:.2f}x)")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("-b", "--batch-size", type=int, default=8)
+    parser.add_argument("-i", "--image-size", type=int, default=64)
+    parser.add_argument("-m", "--replicas", type=int, nargs="+", default=[2, 4, 8])
+    parser.add_argument("-s", "--steps", type=int, default=10)
+    parser.add_argument("-t", "--threads", type=int, default=4)
+    main(parser.parse_args())
@@ -0,0 +1,183 @@
+# ----------------------------------------------------------------------
+# Numenta Platform for Intelligent Computing (NuPIC)
+# Copyright (C) 2021, Numenta, Inc.  Unless you have an agreement
+# with Numenta, Inc., for a separate license for this software code, the
+# following terms and conditions apply:
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero Public License version 3 as
+# published by the Free Software Foundation.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.
+# See the GNU Affero Public License for more details.
+#
+# You should have received a copy of the GNU Affero Public License
+# along with this program.  If not, see http://www.gnu.org/licenses.
+#
+# http://numenta.org/licenses/
+# ----------------------------------------------------------------------
+
+"""
+Export a model trained with quantization aware training (see the
+QuantizationAware mixin) to an int8 CPU model, including k-winners, and
+compare its accuracy, latency and size against the fp32 model on local data
+"""
+
+import argparse
+import copy
+import io
+import os
+
+import torch
+from torch.quantization import disable_fake_quant, disable_observer
+
+from experiments import CONFIGS
+from nupic.research.frameworks.pytorch.model_utils import (
+    evaluate_model,
+    set_random_seed,
+)
+from nupic.research.frameworks.pytorch.timing import PhaseTimer
+from nupic.research.frameworks.vernon.mixins.quantization_aware import (
+    convert_to_quantized,
+)
+
+
+def model_size(model):
+    """Size in bytes of the serialized model state"""
+    with io.BytesIO() as buffer:
+        torch.save(model.state_dict(), buffer)
+        return len(buffer.getvalue())
+
+
+def measure(model, loader, criterion, batches, desc):
+    """Accuracy and forward latency percentiles (ms/batch) on the CPU"""
+    timer = PhaseTimer(percentiles=(50, 90))
+    results = evaluate_model(
+        model=model, loader=loader, device="cpu", criterion=criterion,
+        batches_in_epoch=batches, timer=timer,
+        progress={"desc": desc, "leave": False},
+    )
+    summary = timer.summary()
+    return dict(
+        accuracy=results["mean_accuracy"],
+        latency_p50=summary["forward_p50"] * 1000,
+        latency_p90=summary["forward_p90"] * 1000,
+        size=model_size(model),
+    )
+
+
+def export(config):
+    """
+    Convert the QAT checkpoint of the experiment into an int8 model
+
+    :param config: Imagenet Experiment configuration using the QuantizationAware
+                   mixin, with the checkpoint file of the model to export
+    :return: tuple with the quantized model and a dict with the fp32 and int8
+             results
+    """
+    torch.backends.quantized.engine = config["backend"]
+    experiment_class = config["experiment_class"]
+    model = experiment_class.create_qat_model(config, config["checkpoint_file"])
+
+    # fp32 baseline: same weights without the fake quantization
+    fp32_model = copy.deepcopy(model)
+    fp32_model.apply(disable_observer)
+    fp32_model.apply(disable_fake_quant)
+
+    q_model = convert_to_quantized(model, inplace=True)
+
+    val_loader = experiment_class.create_validation_dataloader(config)
+    loss_function = config.get("loss_function", torch.nn.functional.cross_entropy)
+    results = {
+        "fp32": measure(fp32_model, val_loader, loss_function, config["batches"],
+                        "testing (fp32)"),
+        "int8": measure(q_model, val_loader, loss_function, config["batches"],
+                        "testing (int8)"),
+    }
+    return q_model, results
+
+
+def main(args):
+    # Get experiment configuration
+    config = copy.deepcopy(CONFIGS[args.name])
+    config.update(vars(args))
+    config["workers"] = args.workers
+    config["val_batch_size"] = args.batch_size
+
+    # Replace dynamic seed (i.e. 'tune.sample_from') with constant
+    seed = config.get("seed", 42)
+    if not isinstance(seed, int):
+        seed = 42
+        config["seed"] = seed
+    set_random_seed(seed)
+    torch.set_num_threads(args.threads)
+
+    q_model, results = export(config)
+
+    print("=" * 60)
+    print(f"{args.name} ({args.backend}, batch size {args.batch_size}, "
+          f"{args.threads} threads)")
+    print(f"{'':6}{'accuracy':>10}{'p50 ms':>10}{'p90 ms':>10}{'size MB':>10}")
+    for name, r in results.items():
+        print(f"{name:6}{r['accuracy']:10.4f}{r['latency_p50']:10.2f}"
+              f"{r['latency_p90']:10.2f}{r['size'] / 2**20:10.2f}")
+    speedup = results["fp32"]["latency_p50"] / results["int8"]["latency_p50"]
+    ratio = results["fp32"]["size"] / results["int8"]["size"]
+    print(f"int8 speedup: {speedup:.2f}x, size reduction: {ratio:.2f}x")
+    print("=" * 60)
+
+    # Save quantized model
+    output_file_name = os.path.join(args.output, f"{args.name}.{args.backend}.pt")
+    print(f"Saving quantized model '{args.name}' to '{output_file_name}'")
+    torch.jit.save(torch.jit.script(q_model), output_file_name)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        formatter_class=argparse.ArgumentDefaultsHelpFormatter, description=__doc__
+    )
+    parser.add_argument(
+        "-e",
+        "--experiment",
+        dest="name",
+        help="QAT experiment used to train the model",
+        choices=CONFIGS.keys(),
+    )
+    parser.add_argument(
+        "--checkpoint-file",
+        dest="checkpoint_file",
+        required=True,
+        help="Experiment checkpoint with the QAT model",
+    )
+    parser.add_argument(
+        "-w", "--workers", default=4, type=int, help="Number of dataloader workers"
+    )
+    parser.add_argument(
+        "-o", "--output", default=os.getcwd(), help="Quantized model destination"
+    )
+    parser.add_argument(
+        "-b",
+        "--backend",
+        choices=["qnnpack", "fbgemm"],
+        help="Pytorch Quantization backend",
+        default="fbgemm",
+    )
+    parser.add_argument(
+        "--batch-size", default=32, type=int, help="Evaluation batch size"
+    )
+    parser.add_argument(
+        "-n", "--batches", default=50, type=int,
+        help="Number of validation batches used for the comparison"
+    )
+    parser.add_argument(
+        "-t", "--threads", default=1, type=int, help="Number of CPU threads"
+    )
+
+    args = parser.parse_args()
+    if args.name is None:
+        parser.print_help()
+        exit(1)
+
+    main(args)
@@ -73,21 +73,10 @@ def create_trials(config):
         logdir = tempfile.mkdtemp(dir=local_dir, prefix=log_prefix)
         variant["logdir"] = logdir
 
-    return trials
-
+        # Checkpoints are saved by the workers in the same location as ray.tune
+        variant.setdefault("checkpoint_dir", logdir)
 
-def save_checkpoint(config, epoch, checkpoint):
-    """
-    Callback responsible to save experiment checkpoint.
-    It will store the checkpoint in the same location as ray.tune
-    """
-    import pickle
-    logdir = config["logdir"]
-    checkpoint_dir = os.path.join(logdir, f"checkpoint_{epoch}")
-    os.makedirs(checkpoint_dir, exist_ok=True)
-    checkpoint_file = os.path.join(checkpoint_dir, "checkpoint")
-    with open(checkpoint_file, mode="wb") as f:
-        pickle.dump(checkpoint, f)
+    return trials
 
 
 def log_results(queue, results):
@@ -139,11 +128,7 @@ def run_trial(config):
     queue = multiprocessing.SimpleQueue()
     ctx = multiprocessing.spawn(log_background_task, args=(config, queue), join=False)
     try:
-        result = run(
-            config=config,
-            logger=partial(log_results, queue),
-            on_checkpoint=partial(save_checkpoint, config),
-        )
+        result = run(config=config, logger=partial(log_results, queue))
     except Exception as ex:
         # Terminate background process on error
         terminate_processes(ctx)
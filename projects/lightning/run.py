@@ -46,8 +46,9 @@ def main(args):
                          for k, v in vars(args).items()
                          if k in valid_trainer_args})
 
-    if hasattr(lightning_model_class, "trainer_requirements"):
-        trainer_args.update(lightning_model_class.trainer_requirements)
+    # Combine the requirements of the model class and its mixins
+    for cls in reversed(lightning_model_class.__mro__):
+        trainer_args.update(vars(cls).get("trainer_requirements", {}))
 
     trainer = pl.Trainer(**trainer_args)
     trainer.fit(model)
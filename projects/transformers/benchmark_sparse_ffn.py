@@ -0,0 +1,94 @@
+# ----------------------------------------------------------------------
+# Numenta Platform for Intelligent Computing (NuPIC)
+# Copyright (C) 2021, Numenta, Inc.  Unless you have an agreement
+# with Numenta, Inc., for a separate license for this software code, the
+# following terms and conditions apply:
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero Public License version 3 as
+# published by the Free Software Foundation.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.
+# See the GNU Affero Public License for more details.
+#
+# You should have received a copy of the GNU Affero Public License
+# along with this program.  If not, see http://www.gnu.org/licenses.
+#
+# http://numenta.org/licenses/
+# ----------------------------------------------------------------------
+
+"""
+Compare training steps/sec of a tiny BERT whose feed-forward layers are
+sparsified with SparsifyFCLayersCallback (rezero the whole model after every
+step) against MaskedGradientSparsifyCallback (masked gradients).
+"""
+
+import argparse
+import time
+
+import torch
+from transformers import BertConfig, BertForMaskedLM
+
+from callbacks import MaskedGradientSparsifyCallback, SparsifyFCLayersCallback
+
+
+def create_model(args):
+    config = BertConfig(
+        vocab_size=args.vocab_size,
+        hidden_size=args.hidden_size,
+        num_hidden_layers=args.num_layers,
+        num_attention_heads=args.num_heads,
+        intermediate_size=4 * args.hidden_size,
+    )
+    return BertForMaskedLM(config)
+
+
+def benchmark(args, callback):
+    torch.manual_seed(42)
+    model = create_model(args)
+    callback.on_init_end(None, None, None, model=model)
+    model.train()
+    optimizer = torch.optim.AdamW(model.parameters(), lr=1e-4, weight_decay=0.01)
+
+    input_ids = torch.randint(args.vocab_size, (args.batch_size, args.seq_length))
+    labels = torch.randint(args.vocab_size, (args.batch_size, args.seq_length))
+    for i in range(args.warmup + args.steps):
+        if i == args.warmup:
+            t0 = time.perf_counter()
+        loss = model(input_ids=input_ids, labels=labels).loss
+        loss.backward()
+        optimizer.step()
+        optimizer.zero_grad()
+        callback.on_step_end(None, None, None, model=model)
+    return args.steps / (time.perf_counter() - t0)
+
+
+def main(args):
+    torch.set_num_threads(args.threads)
+    print(f"hidden_size={args.hidden_size}, num_layers={args.num_layers}, "
+          f"batch_size={args.batch_size}, seq_length={args.seq_length}, "
+          f"sparsity={args.sparsity}")
+
+    rezero = benchmark(args, SparsifyFCLayersCallback(
+        sparsity=args.sparsity, num_sparse_layers=args.num_layers))
+    masked = benchmark(args, MaskedGradientSparsifyCallback(
+        sparsity=args.sparsity, num_sparse_layers=args.num_layers))
+    print(f"rezero weights:    {rezero:8.2f} steps/sec")
+    print(f"masked gradients:  {masked:8.2f} steps/sec ({masked / rezero:.2f}x)")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("-b", "--batch-size", type=int, default=8)
+    parser.add_argument("-l", "--seq-length", type=int, default=64)
+    parser.add_argument("--hidden-size", type=int, default=128)
+    parser.add_argument("--num-layers", type=int, default=4)
+    parser.add_argument("--num-heads", type=int, default=2)
+    parser.add_argument("--vocab-size", type=int, default=1000)
+    parser.add_argument("--sparsity", type=float, default=0.8)
+    parser.add_argument("-s", "--steps", type=int, default=50)
+    parser.add_argument("-w", "--warmup", type=int, default=5)
+    parser.add_argument("-t", "--threads", type=int, default=4)
+    main(parser.parse_args())
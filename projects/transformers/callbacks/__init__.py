@@ -19,4 +19,8 @@
 # http://numenta.org/licenses/
 # ----------------------------------------------------------------------
 
-from .sparsity import SparsifyFCLayersCallback
+from .sparsity import (
+    MaskedGradientLinear,
+    MaskedGradientSparsifyCallback,
+    SparsifyFCLayersCallback,
+)
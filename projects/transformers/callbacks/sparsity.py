@@ -19,10 +19,15 @@
 # http://numenta.org/licenses/
 # ----------------------------------------------------------------------
 
+import torch
+import torch.nn.functional as F
+from torch import nn
 from transformers import TrainerCallback
 
 from nupic.torch.modules import SparseWeights, rezero_weights
 
+OPTIMIZER_MOMENTS = ("exp_avg", "exp_avg_sq", "momentum_buffer")
+
 
 class SparsifyFCLayersCallback(TrainerCallback):
     """
@@ -49,3 +54,116 @@ class SparsifyFCLayersCallback(TrainerCallback):
     def on_step_end(self, args, state, control, model, **kwargs):
         """Rezero weights"""
         model.apply(rezero_weights)
+
+
+class _MaskGradient(torch.autograd.Function):
+    """Identity in the forward pass, masks the gradient in the backward pass"""
+
+    @staticmethod
+    def forward(ctx, weight, mask):
+        ctx.save_for_backward(mask)
+        return weight.view_as(weight)
+
+    @staticmethod
+    def backward(ctx, grad):
+        mask, = ctx.saved_tensors
+        return grad * mask, None
+
+
+class MaskedGradientLinear(nn.Linear):
+    """
+    Linear layer with a fixed random sparse weight mask stored as a buffer. As
+    in :class:`SparseWeights`, every output unit keeps the same number of
+    non-zero weights. The masked weights are zeroed once, and their gradients
+    are masked by `forward` during the backward pass, so optimizer updates
+    never move them away from zero and no rezeroing is needed after each step.
+    Since the masking is part of the module, it holds after the module is
+    copied, pickled or its weight replaced.
+
+    :param in_features: size of each input sample
+    :param out_features: size of each output sample
+    :param bias: whether to learn an additive bias
+    :param sparsity: fraction of weights of each output unit set to zero
+    """
+
+    def __init__(self, in_features, out_features, bias=True, sparsity=0.5):
+        super().__init__(in_features, out_features, bias=bias)
+        assert 0 <= sparsity < 1
+
+        num_zeros = int(round(sparsity * in_features))
+        zero_idx = torch.rand(out_features, in_features).argsort(dim=1)
+        weight_mask = torch.ones(out_features, in_features)
+        weight_mask.scatter_(1, zero_idx[:, :num_zeros], 0.0)
+        self.register_buffer("weight_mask", weight_mask)
+        self.sparsity = sparsity
+
+        self.rezero_weights()
+
+    @classmethod
+    def from_dense(cls, linear, sparsity=0.5):
+        """
+        Create a sparse copy of a dense :class:`torch.nn.Linear` layer.
+        """
+        module = cls(linear.in_features, linear.out_features,
+                     bias=linear.bias is not None, sparsity=sparsity)
+        module.to(linear.weight.device)
+        with torch.no_grad():
+            module.weight.copy_(linear.weight)
+            if linear.bias is not None:
+                module.bias.copy_(linear.bias)
+        module.rezero_weights()
+        return module
+
+    def forward(self, x):
+        return F.linear(x, _MaskGradient.apply(self.weight, self.weight_mask),
+                        self.bias)
+
+    def rezero_weights(self):
+        with torch.no_grad():
+            self.weight.mul_(self.weight_mask)
+
+    def rezero_optimizer_state(self, optimizer):
+        """
+        Zero the optimizer moments of the masked weights in place. Only needed
+        when the optimizer state was created before the mask was applied, e.g.
+        when resuming from a dense checkpoint.
+        """
+        state = optimizer.state.get(self.weight, {})
+        for name in OPTIMIZER_MOMENTS:
+            if torch.is_tensor(state.get(name)):
+                state[name].mul_(self.weight_mask)
+
+    def extra_repr(self):
+        return f"{super().extra_repr()}, sparsity={self.sparsity}"
+
+
+class MaskedGradientSparsifyCallback(TrainerCallback):
+    """
+    Sparsifies the hidden and output fully connected layer for a
+    BERT HuggingFace model using :class:`MaskedGradientLinear`. Unlike
+    :class:`SparsifyFCLayersCallback`, the masked weights are kept at zero by
+    masking their gradients, avoiding a walk over the whole model after every
+    optimizer step.
+    """
+
+    def __init__(self, sparsity: float = 0.5, num_sparse_layers: int = 12):
+        self.sparsity = sparsity
+        self.num_sparse_layers = num_sparse_layers
+
+    def on_init_end(self, args, state, control, model, **kwargs):
+        """Replace linear layers with sparse layers"""
+        for idx in range(self.num_sparse_layers):
+            layer = model.bert.encoder.layer[idx]
+            layer.intermediate.dense = MaskedGradientLinear.from_dense(
+                layer.intermediate.dense, sparsity=self.sparsity)
+            layer.output.dense = MaskedGradientLinear.from_dense(
+                layer.output.dense, sparsity=self.sparsity)
+
+    def on_train_begin(self, args, state, control, model, optimizer=None,
+                       **kwargs):
+        """Zero optimizer moments of masked weights loaded from a checkpoint"""
+        if optimizer is None:
+            return
+        for module in model.modules():
+            if isinstance(module, MaskedGradientLinear):
+                module.rezero_optimizer_state(optimizer)
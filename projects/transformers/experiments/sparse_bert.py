@@ -24,7 +24,7 @@ Base Transformers Experiment configuration.
 
 from copy import deepcopy
 
-from callbacks import SparsifyFCLayersCallback
+from callbacks import MaskedGradientSparsifyCallback, SparsifyFCLayersCallback
 
 from .base import debug_bert
 
@@ -37,7 +37,19 @@ sparse_debug_bert.update(
 
 )
 
+# Same as sparse_debug_bert, keeping the masked weights at zero by masking their
+# gradients instead of rezeroing them after every step. Not compatible with
+# checkpoints from sparse_debug_bert, whose sparse layers use SparseWeights.
+sparse_debug_bert_masked_grad = deepcopy(sparse_debug_bert)
+sparse_debug_bert_masked_grad.update(
+
+    run_name="sparsity=0.2_debug_bert_masked_grad",
+    trainer_callbacks=[MaskedGradientSparsifyCallback(sparsity=0.80)]
+
+)
+
 # Export configurations in this file
 CONFIGS = dict(
     sparse_debug_bert=sparse_debug_bert,
+    sparse_debug_bert_masked_grad=sparse_debug_bert_masked_grad,
 )
@@ -33,6 +33,7 @@ import os
 import sys
 from hashlib import blake2b
 
+import torch
 import transformers
 from datasets import concatenate_datasets, load_dataset, load_from_disk
 from datasets.dataset_dict import DatasetDict
@@ -53,6 +54,7 @@ from transformers.trainer_utils import get_last_checkpoint, is_main_process
 from experiments import CONFIGS
 from nupic.research.frameworks.pytorch.model_utils import count_nonzero_params
 from run_args import DataTrainingArguments, ModelArguments
+from token_cache import TokenCache
 
 logger = logging.getLogger(__name__)
 MODEL_CONFIG_CLASSES = list(MODEL_FOR_MASKED_LM_MAPPING.keys())
@@ -148,6 +150,10 @@ def main():    # noqa: C901
     # In distributed training, the load_dataset function guarantee that only one local
     # process can concurrently download the dataset.
 
+    # Grouped texts can be read from the memory-mapped token cache instead, in
+    # which case datasets are only loaded if they are missing from the cache
+    use_token_cache = data_args.use_token_cache and not data_args.line_by_line
+
     tokenized_datasets, dataset_path = None, None
     if data_args.dataset_name is not None:
 
@@ -176,10 +182,10 @@ def main():    # noqa: C901
         if os.path.exists(dataset_path) and data_args.reuse_tokenized_data:
             logger.info(f"Loading cached tokenized data ...")
             tokenized_datasets = load_from_disk(dataset_path)
-        else:
+        elif not use_token_cache:
             datasets = load_datasets(data_args)
 
-    else:
+    elif not use_token_cache:
         # If dataset not available in Hub, look for train and validation files.
         data_files = {}
         if data_args.train_file is not None:
@@ -251,6 +257,15 @@ def main():    # noqa: C901
 
     model.resize_token_embeddings(len(tokenizer))
 
+    if use_token_cache and tokenized_datasets is None:
+        # Only the main process builds the cache, the others wait and memory map it
+        if not is_main_process(training_args.local_rank):
+            torch.distributed.barrier()
+        tokenized_datasets = load_token_cache(data_args, tokenizer)
+        if is_main_process(training_args.local_rank) \
+           and training_args.local_rank != -1:
+            torch.distributed.barrier()
+
     # Preprocessing the datasets. First tokenize all the texts, if not already tokenized
     if tokenized_datasets is None:
         if training_args.do_train:
@@ -271,7 +286,8 @@ def main():    # noqa: C901
             tokenized_datasets.save_to_disk(dataset_path)
 
     # Verifying fingerprint for caching
-    logger.info(f"Dataset fingerprint: {tokenized_datasets['train']._fingerprint}")
+    if hasattr(tokenized_datasets["train"], "_fingerprint"):
+        logger.info(f"Dataset fingerprint: {tokenized_datasets['train']._fingerprint}")
 
     # Data collator will take care of randomly masking the tokens.
     assert hasattr(transformers, data_args.data_collator), \
@@ -400,6 +416,78 @@ def load_datasets(data_args):
     return datasets
 
 
+def get_max_seq_length(tokenizer, data_args):
+    """Length of the blocks the concatenated texts are split into"""
+    if data_args.max_seq_length is None:
+        max_seq_length = tokenizer.model_max_length
+        if max_seq_length > 1024:
+            logger.warn(
+                f"The tokenizer picked seems to have a very large "
+                f"`model_max_length` ({tokenizer.model_max_length}). "
+                f"Picking 1024 instead. You can change that default value by "
+                f"passing --max_seq_length xxx. "
+            )
+            max_seq_length = 1024
+    else:
+        if data_args.max_seq_length > tokenizer.model_max_length:
+            logger.warn(
+                f"The max_seq_length passed ({data_args.max_seq_length}) is larger "
+                f"than the maximum length for the model "
+                f"({tokenizer.model_max_length}). "
+                f"Using max_seq_length={tokenizer.model_max_length}. "
+            )
+        max_seq_length = min(data_args.max_seq_length, tokenizer.model_max_length)
+    return max_seq_length
+
+
+def load_token_cache(data_args, tokenizer):
+    """
+    Load the tokenized and grouped datasets from the memory-mapped token cache.
+    Datasets are only loaded and tokenized if they are missing from the cache.
+    """
+    if data_args.dataset_name is not None:
+        data_key = [data_args.dataset_name, data_args.dataset_config_name,
+                    data_args.validation_split_percentage]
+    else:
+        data_key = [data_args.train_file, data_args.validation_file]
+
+    token_cache = TokenCache(
+        cache_root=data_args.tokenized_data_cache_dir,
+        tokenizer=tokenizer,
+        block_size=get_max_seq_length(tokenizer, data_args),
+        data_key=data_key,
+        num_workers=data_args.preprocessing_num_workers,
+    )
+    logger.info(f"Token cache folder: {token_cache.path}")
+
+    if data_args.dataset_name is None:
+        files = dict(train=data_args.train_file, validation=data_args.validation_file)
+        files = {split: path for split, path in files.items() if path is not None}
+        if data_args.overwrite_cache:
+            for split in files:
+                token_cache.clear(split)
+        return {split: token_cache.build(split, [path])
+                for split, path in files.items()}
+
+    splits = ["train", "validation"]
+    if data_args.overwrite_cache:
+        for split in splits:
+            token_cache.clear(split)
+    if all(token_cache.is_built(split) for split in splits):
+        return {split: token_cache.load(split) for split in splits}
+
+    # Split the datasets in contiguous shards tokenized in parallel
+    datasets = load_datasets(data_args)
+    num_shards = data_args.preprocessing_num_workers or 1
+    return {
+        split: token_cache.build(split, [
+            datasets[split].shard(num_shards, idx, contiguous=True)
+            for idx in range(num_shards)
+        ])
+        for split in splits
+    }
+
+
 def preprocess_datasets(datasets, tokenizer, column_names, text_column_name, data_args):
     """Tokenize datasets and applies remaining preprocessing steps"""
 
@@ -448,25 +536,7 @@ def preprocess_datasets(datasets, tokenizer, column_names, text_column_name, dat
             load_from_cache_file=not data_args.overwrite_cache,
         )
 
-        if data_args.max_seq_length is None:
-            max_seq_length = tokenizer.model_max_length
-            if max_seq_length > 1024:
-                logger.warn(
-                    f"The tokenizer picked seems to have a very large "
-                    f"`model_max_length` ({tokenizer.model_max_length}). "
-                    f"Picking 1024 instead. You can change that default value by "
-                    f"passing --max_seq_length xxx. "
-                )
-                max_seq_length = 1024
-        else:
-            if data_args.max_seq_length > tokenizer.model_max_length:
-                logger.warn(
-                    f"The max_seq_length passed ({data_args.max_seq_length}) is larger "
-                    f"than the maximum length for the model "
-                    f"({tokenizer.model_max_length}). "
-                    f"Using max_seq_length={tokenizer.model_max_length}. "
-                )
-            max_seq_length = min(data_args.max_seq_length, tokenizer.model_max_length)
+        max_seq_length = get_max_seq_length(tokenizer, data_args)
 
         # Main data processing function that will concatenate all texts from our dataset
         # and generate chunks of max_seq_length.
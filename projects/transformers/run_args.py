@@ -120,6 +120,17 @@ class DataTrainingArguments:
                     "turning off caching in the datasets lib to avoid redundancy. "
         }
     )
+    use_token_cache: bool = field(
+        default=False,
+        metadata={
+            "help": "Whether to read the grouped texts from a memory-mapped cache of "
+                    "int32 token blocks in tokenized_data_cache_dir, keyed by the "
+                    "tokenizer vocabulary, max_seq_length and dataset names or "
+                    "files. Missing data is tokenized once and appended to the "
+                    "cache, later runs skip preprocessing entirely. Not used with "
+                    "line_by_line."
+        }
+    )
     dataset_name: Optional[str] = field(
         default="wikitext",
         metadata={"help": "The name of the dataset to use (via the datasets library)."}
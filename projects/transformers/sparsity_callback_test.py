@@ -0,0 +1,143 @@
+# ----------------------------------------------------------------------
+# Numenta Platform for Intelligent Computing (NuPIC)
+# Copyright (C) 2021, Numenta, Inc.  Unless you have an agreement
+# with Numenta, Inc., for a separate license for this software code, the
+# following terms and conditions apply:
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero Public License version 3 as
+# published by the Free Software Foundation.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.
+# See the GNU Affero Public License for more details.
+#
+# You should have received a copy of the GNU Affero Public License
+# along with this program.  If not, see http://www.gnu.org/licenses.
+#
+# http://numenta.org/licenses/
+# ----------------------------------------------------------------------
+import copy
+import pickle
+import unittest
+
+import torch
+from transformers import BertConfig, BertForMaskedLM
+
+from callbacks import MaskedGradientLinear, MaskedGradientSparsifyCallback
+
+
+def train_steps(model, optimizer, inputs, steps=5):
+    for _ in range(steps):
+        optimizer.zero_grad()
+        model(inputs).sum().backward()
+        optimizer.step()
+
+
+class MaskedGradientLinearTest(unittest.TestCase):
+
+    def setUp(self):
+        torch.manual_seed(42)
+
+    def test_mask(self):
+        linear = MaskedGradientLinear(20, 8, sparsity=0.75)
+        zeros = (linear.weight == 0).sum(dim=1)
+        self.assertTrue((zeros == 15).all())
+        self.assertTrue(torch.equal(linear.weight == 0, linear.weight_mask == 0))
+
+    def test_masked_weights_stay_zero(self):
+        for optimizer_class in (torch.optim.Adam, torch.optim.AdamW):
+            with self.subTest(optimizer=optimizer_class.__name__):
+                linear = MaskedGradientLinear(20, 8, sparsity=0.5)
+                initial = linear.weight.detach().clone()
+                optimizer = optimizer_class(linear.parameters(), lr=0.1,
+                                            weight_decay=0.01)
+                train_steps(linear, optimizer, torch.randn(4, 20))
+
+                masked = linear.weight_mask == 0
+                self.assertTrue((linear.weight[masked] == 0).all())
+                self.assertTrue((linear.weight[~masked] != initial[~masked]).all())
+
+                state = optimizer.state[linear.weight]
+                self.assertTrue((state["exp_avg"][masked] == 0).all())
+                self.assertTrue((state["exp_avg_sq"][masked] == 0).all())
+
+    def test_mask_after_copy(self):
+        """The gradient mask holds for copies and replaced weights"""
+        linear = MaskedGradientLinear(20, 8, sparsity=0.5)
+        copied = copy.deepcopy(linear)
+        unpickled = pickle.loads(pickle.dumps(linear))
+        replaced = MaskedGradientLinear(20, 8, sparsity=0.5)
+        replaced.weight = torch.nn.Parameter(replaced.weight.detach().clone())
+
+        for module in (copied, unpickled, replaced):
+            optimizer = torch.optim.AdamW(module.parameters(), lr=0.1)
+            train_steps(module, optimizer, torch.randn(4, 20))
+            masked = module.weight_mask == 0
+            self.assertTrue((module.weight[masked] == 0).all())
+
+    def test_from_dense(self):
+        dense = torch.nn.Linear(20, 8)
+        linear = MaskedGradientLinear.from_dense(dense, sparsity=0.5)
+        mask = linear.weight_mask.bool()
+        self.assertTrue(torch.equal(linear.weight[mask], dense.weight[mask]))
+        self.assertTrue(torch.equal(linear.bias, dense.bias))
+
+    def test_rezero_optimizer_state(self):
+        # Optimizer state created by a dense model, e.g. from a checkpoint
+        dense = torch.nn.Linear(20, 8)
+        optimizer = torch.optim.Adam(dense.parameters(), lr=0.1)
+        train_steps(dense, optimizer, torch.randn(4, 20))
+
+        linear = MaskedGradientLinear.from_dense(dense, sparsity=0.5)
+        dense_state = optimizer.state[dense.weight]
+        optimizer.param_groups[0]["params"][0] = linear.weight
+        optimizer.state[linear.weight] = optimizer.state.pop(dense.weight)
+        optimizer.param_groups[0]["params"][1] = linear.bias
+        optimizer.state[linear.bias] = optimizer.state.pop(dense.bias)
+        linear.rezero_optimizer_state(optimizer)
+
+        masked = linear.weight_mask == 0
+        self.assertTrue((dense_state["exp_avg"][masked] == 0).all())
+        self.assertTrue((dense_state["exp_avg_sq"][masked] == 0).all())
+
+        train_steps(linear, optimizer, torch.randn(4, 20))
+        self.assertTrue((linear.weight[masked] == 0).all())
+
+
+class MaskedGradientSparsifyCallbackTest(unittest.TestCase):
+
+    def setUp(self):
+        torch.manual_seed(42)
+
+    def test_sparse_bert(self):
+        config = BertConfig(vocab_size=100, hidden_size=16, num_hidden_layers=2,
+                            num_attention_heads=2, intermediate_size=32)
+        model = BertForMaskedLM(config)
+        callback = MaskedGradientSparsifyCallback(sparsity=0.8,
+                                                  num_sparse_layers=2)
+        callback.on_init_end(args=None, state=None, control=None, model=model)
+
+        sparse_layers = [m for m in model.modules()
+                         if isinstance(m, MaskedGradientLinear)]
+        self.assertEqual(len(sparse_layers), 4)
+
+        optimizer = torch.optim.AdamW(model.parameters(), lr=0.01)
+        callback.on_train_begin(args=None, state=None, control=None, model=model,
+                                optimizer=optimizer)
+        input_ids = torch.randint(100, (4, 8))
+        for _ in range(5):
+            optimizer.zero_grad()
+            model(input_ids=input_ids, labels=input_ids).loss.backward()
+            optimizer.step()
+
+        for layer in sparse_layers:
+            masked = layer.weight_mask == 0
+            self.assertTrue((layer.weight[masked] == 0).all())
+            self.assertTrue((optimizer.state[layer.weight]["exp_avg"][masked] == 0)
+                            .all())
+
+
+if __name__ == "__main__":
+    unittest.main(verbosity=2)
@@ -0,0 +1,311 @@
+# ----------------------------------------------------------------------
+# Numenta Platform for Intelligent Computing (NuPIC)
+# Copyright (C) 2021, Numenta, Inc.  Unless you have an agreement
+# with Numenta, Inc., for a separate license for this software code, the
+# following terms and conditions apply:
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero Public License version 3 as
+# published by the Free Software Foundation.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.
+# See the GNU Affero Public License for more details.
+#
+# You should have received a copy of the GNU Affero Public License
+# along with this program.  If not, see http://www.gnu.org/licenses.
+#
+# http://numenta.org/licenses/
+# ----------------------------------------------------------------------
+
+"""
+Content-addressed, memory-mapped cache of tokenized text grouped in blocks of
+``block_size`` tokens. The cache location is derived from the tokenizer
+vocabulary, the block size and a key describing the data, so every run and
+configuration sharing these reuses the same tokens without preprocessing.
+
+Each split is stored as a flat ``int32`` file of full blocks and a json
+manifest listing the shards already tokenized, along with the remainder tokens
+that do not fill a block yet. Shards added later are tokenized and appended to
+the existing blocks.
+"""
+
+import json
+import logging
+import os
+import shutil
+from hashlib import blake2b
+from itertools import chain
+from multiprocessing import Pool
+
+import numpy as np
+import torch
+from torch.utils.data import Dataset
+
+__all__ = [
+    "TokenCache",
+    "TokenBlockDataset",
+    "tokenizer_hash",
+]
+
+logger = logging.getLogger(__name__)
+
+TOKENS_FILE = "tokens.bin"
+MANIFEST_FILE = "manifest.json"
+TOKEN_DTYPE = np.int32
+
+# Tokenizer used by the worker processes, set once per process by
+# `_init_worker` to avoid pickling it for every shard
+_worker_tokenizer = None
+
+
+def _digest(*items):
+    return blake2b(
+        json.dumps(items, sort_keys=True).encode(), digest_size=20
+    ).hexdigest()
+
+
+def tokenizer_hash(tokenizer):
+    """Hash of the tokenizer vocabulary and the options changing its output"""
+    return _digest(
+        type(tokenizer).__name__,
+        sorted(tokenizer.get_vocab().items()),
+        tokenizer.all_special_tokens,
+        getattr(tokenizer, "do_lower_case", None),
+    )
+
+
+def shard_digest(shard):
+    """
+    Identify a shard without reading it: text files by path, size and
+    modification time, HF datasets by their fingerprint and lists of texts
+    by their content.
+    """
+    if isinstance(shard, str):
+        stat = os.stat(shard)
+        return _digest(os.path.abspath(shard), stat.st_size, stat.st_mtime_ns)
+    if hasattr(shard, "_fingerprint"):
+        return _digest(shard._fingerprint)
+    return _digest(list(shard))
+
+
+def _iter_texts(shard, text_column_name, batch_size):
+    if isinstance(shard, str):
+        with open(shard, encoding="utf-8") as f:
+            lines = (line.rstrip("\n") for line in f)
+            batch = []
+            for line in lines:
+                batch.append(line)
+                if len(batch) == batch_size:
+                    yield batch
+                    batch = []
+            if batch:
+                yield batch
+    elif hasattr(shard, "column_names"):
+        for i in range(0, len(shard), batch_size):
+            yield shard[i:i + batch_size][text_column_name]
+    else:
+        shard = list(shard)
+        for i in range(0, len(shard), batch_size):
+            yield shard[i:i + batch_size]
+
+
+def _init_worker(tokenizer):
+    global _worker_tokenizer
+    _worker_tokenizer = tokenizer
+
+
+def _tokenize_shard(args):
+    """Tokenize every text of a shard and concatenate all the token ids"""
+    shard, text_column_name, batch_size = args
+    chunks = []
+    for texts in _iter_texts(shard, text_column_name, batch_size):
+        input_ids = _worker_tokenizer(
+            texts, return_attention_mask=False, return_token_type_ids=False,
+        )["input_ids"]
+        chunks.append(np.fromiter(chain.from_iterable(input_ids), dtype=TOKEN_DTYPE))
+    if not chunks:
+        return np.empty(0, dtype=TOKEN_DTYPE)
+    return np.concatenate(chunks)
+
+
+class TokenBlockDataset(Dataset):
+    """
+    Dataset of token blocks read through a memory map of a :class:`TokenCache`
+    split. The memory map is opened lazily so the dataset can be sent to
+    dataloader workers without copying the tokens.
+
+    :param path: split directory of the cache
+    :param special_token_ids: ids used to compute the ``special_tokens_mask``
+    """
+
+    def __init__(self, path, special_token_ids=()):
+        with open(os.path.join(path, MANIFEST_FILE)) as f:
+            manifest = json.load(f)
+        self.path = path
+        self.block_size = manifest["block_size"]
+        self.num_blocks = manifest["num_blocks"]
+        self.special_token_ids = np.array(sorted(special_token_ids),
+                                          dtype=TOKEN_DTYPE)
+        self._tokens = None
+
+    @property
+    def tokens(self):
+        if self._tokens is None:
+            if self.num_blocks == 0:
+                self._tokens = np.empty((0, self.block_size), dtype=TOKEN_DTYPE)
+            else:
+                self._tokens = np.memmap(
+                    os.path.join(self.path, TOKENS_FILE), dtype=TOKEN_DTYPE,
+                    mode="r", shape=(self.num_blocks, self.block_size),
+                )
+        return self._tokens
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        state["_tokens"] = None
+        return state
+
+    def __len__(self):
+        return self.num_blocks
+
+    def __getitem__(self, index):
+        block = np.asarray(self.tokens[index])
+        input_ids = torch.from_numpy(block.astype(np.int64))
+        special_tokens_mask = np.isin(block, self.special_token_ids)
+        return dict(
+            input_ids=input_ids,
+            attention_mask=torch.ones_like(input_ids),
+            special_tokens_mask=torch.from_numpy(special_tokens_mask.astype(np.int64)),
+        )
+
+
+class TokenCache:
+    """
+    On-disk cache of tokenized text grouped in blocks of ``block_size`` tokens.
+
+    Every text is tokenized with the special tokens added by the tokenizer,
+    all the texts of the split are concatenated and the concatenation is split
+    in blocks. Unlike the ``group_texts`` preprocessing in `run.py`, which
+    drops a remainder for every batch of 1000 texts, only the remainder at the
+    end of the split is dropped. Only the ``input_ids`` are kept: blocks have
+    no ``token_type_ids``.
+
+    :param cache_root: directory holding all the caches
+    :param tokenizer: HF tokenizer used to tokenize the texts
+    :param block_size: number of tokens per block
+    :param data_key: json serializable description of the data, e.g. the
+                     dataset names and configs
+    :param text_column_name: column holding the text in HF datasets
+    :param num_workers: number of processes tokenizing shards in parallel
+    :param batch_size: number of texts sent to the tokenizer at once
+    """
+
+    def __init__(self, cache_root, tokenizer, block_size, data_key,
+                 text_column_name="text", num_workers=None, batch_size=1000):
+        self.tokenizer = tokenizer
+        self.block_size = block_size
+        self.text_column_name = text_column_name
+        self.num_workers = num_workers
+        self.batch_size = batch_size
+        self.path = os.path.join(
+            os.path.abspath(cache_root),
+            _digest(tokenizer_hash(tokenizer), block_size, data_key),
+        )
+
+    def split_path(self, split):
+        return os.path.join(self.path, split)
+
+    def is_built(self, split):
+        return os.path.exists(os.path.join(self.split_path(split), MANIFEST_FILE))
+
+    def load(self, split):
+        """Memory map a split already built"""
+        return TokenBlockDataset(self.split_path(split),
+                                 self.tokenizer.all_special_ids)
+
+    def clear(self, split):
+        shutil.rmtree(self.split_path(split), ignore_errors=True)
+
+    def build(self, split, shards):
+        """
+        Tokenize the shards missing from the split and append their blocks.
+        Shards are identified by :func:`shard_digest`. If the shards already in
+        the cache are not a prefix of ``shards``, the split is rebuilt.
+
+        :param split: name of the split, e.g. "train"
+        :param shards: list of text file paths, HF datasets or lists of texts
+        :return: :class:`TokenBlockDataset` of the split
+        """
+        path = self.split_path(split)
+        digests = [shard_digest(shard) for shard in shards]
+        manifest = self._read_manifest(split)
+        done = manifest["shards"]
+        if digests[:len(done)] != done or "tail" not in manifest:
+            logger.info(f"Shards of split {split} changed, rebuilding {path}")
+            self.clear(split)
+            manifest = self._read_manifest(split)
+            done = manifest["shards"]
+
+        new_shards = list(zip(shards, digests))[len(done):]
+        if new_shards or not self.is_built(split):
+            os.makedirs(path, exist_ok=True)
+            logger.info(f"Tokenizing {len(new_shards)} shard(s) into {path}")
+            self._append(split, manifest, new_shards)
+        return self.load(split)
+
+    def _read_manifest(self, split):
+        path = os.path.join(self.split_path(split), MANIFEST_FILE)
+        if not os.path.exists(path):
+            return dict(block_size=self.block_size, num_blocks=0, shards=[],
+                        tail=[])
+        with open(path) as f:
+            return json.load(f)
+
+    def _write_manifest(self, split, manifest):
+        path = os.path.join(self.split_path(split), MANIFEST_FILE)
+        with open(path + ".tmp", "w") as f:
+            json.dump(manifest, f)
+        os.replace(path + ".tmp", path)
+
+    def _append(self, split, manifest, new_shards):
+        path = self.split_path(split)
+        # The tail is kept in the manifest, so that it is committed along with
+        # the list of shards it belongs to
+        tail = np.array(manifest.get("tail", []), dtype=TOKEN_DTYPE)
+
+        args = [(shard, self.text_column_name, self.batch_size)
+                for shard, _ in new_shards]
+        pool = None
+        if self.num_workers is not None and self.num_workers > 1 and len(args) > 1:
+            pool = Pool(self.num_workers, initializer=_init_worker,
+                        initargs=(self.tokenizer,))
+            results = pool.imap(_tokenize_shard, args)
+        else:
+            _init_worker(self.tokenizer)
+            results = map(_tokenize_shard, args)
+
+        itemsize = np.dtype(TOKEN_DTYPE).itemsize
+        try:
+            with open(os.path.join(path, TOKENS_FILE), "ab") as f:
+                # Drop blocks written by an interrupted build
+                f.truncate(manifest["num_blocks"] * self.block_size * itemsize)
+                for tokens, (_, digest) in zip(results, new_shards):
+                    tokens = np.concatenate([tail, tokens])
+                    num_blocks = len(tokens) // self.block_size
+                    end = num_blocks * self.block_size
+                    f.write(tokens[:end].tobytes())
+                    f.flush()
+                    tail = tokens[end:]
+
+                    manifest["tail"] = tail.tolist()
+                    manifest["num_blocks"] += num_blocks
+                    manifest["shards"].append(digest)
+                    self._write_manifest(split, manifest)
+        finally:
+            if pool is not None:
+                pool.close()
+                pool.join()
+        if not new_shards:
+            self._write_manifest(split, manifest)
@@ -0,0 +1,139 @@
+# ----------------------------------------------------------------------
+# Numenta Platform for Intelligent Computing (NuPIC)
+# Copyright (C) 2021, Numenta, Inc.  Unless you have an agreement
+# with Numenta, Inc., for a separate license for this software code, the
+# following terms and conditions apply:
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero Public License version 3 as
+# published by the Free Software Foundation.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.
+# See the GNU Affero Public License for more details.
+#
+# You should have received a copy of the GNU Affero Public License
+# along with this program.  If not, see http://www.gnu.org/licenses.
+#
+# http://numenta.org/licenses/
+# ----------------------------------------------------------------------
+import os
+import tempfile
+import unittest
+
+import numpy as np
+import torch
+from transformers import BertTokenizerFast
+
+from token_cache import TokenCache
+
+VOCAB_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                          "scripts", "bert-base-uncased-vocab.txt")
+
+TEXTS = [
+    "The quick brown fox jumps over the lazy dog.",
+    "",
+    "Sparse networks are robust to noise.",
+    "Memory mapped token blocks are shared between runs and configurations.",
+] * 5
+
+
+class TokenCacheTest(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.tokenizer = BertTokenizerFast(vocab_file=VOCAB_FILE)
+        self.shards = []
+        for i in range(3):
+            path = os.path.join(self.tmp_dir.name, f"shard{i}.txt")
+            with open(path, "w") as f:
+                f.write("\n".join(TEXTS[i:]) + "\n")
+            self.shards.append(path)
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def create_cache(self, block_size=16, num_workers=None):
+        return TokenCache(os.path.join(self.tmp_dir.name, "cache"),
+                          self.tokenizer, block_size, data_key="test",
+                          num_workers=num_workers)
+
+    def expected_blocks(self, shards, block_size):
+        input_ids = []
+        for path in shards:
+            with open(path) as f:
+                lines = f.read().splitlines()
+            input_ids += sum(self.tokenizer(lines)["input_ids"], [])
+        end = len(input_ids) // block_size * block_size
+        return torch.tensor(input_ids[:end]).view(-1, block_size)
+
+    def test_blocks_match_grouped_texts(self):
+        dataset = self.create_cache().build("train", self.shards)
+        expected = self.expected_blocks(self.shards, 16)
+        self.assertEqual(len(dataset), len(expected))
+        actual = torch.stack([dataset[i]["input_ids"] for i in range(len(dataset))])
+        self.assertTrue(torch.equal(actual, expected))
+
+        item = dataset[0]
+        special = torch.tensor(self.tokenizer.all_special_ids)
+        expected_mask = (item["input_ids"].unsqueeze(-1) == special).any(-1)
+        self.assertTrue(torch.equal(item["special_tokens_mask"].bool(), expected_mask))
+        self.assertTrue(torch.equal(item["attention_mask"],
+                                    torch.ones_like(item["input_ids"])))
+
+    def test_incremental_append(self):
+        cache = self.create_cache()
+        cache.build("train", self.shards[:1])
+        dataset = cache.build("train", self.shards)
+        expected = self.expected_blocks(self.shards, 16)
+        actual = torch.stack([dataset[i]["input_ids"] for i in range(len(dataset))])
+        self.assertTrue(torch.equal(actual, expected))
+
+    def test_interrupted_append(self):
+        cache = self.create_cache()
+        cache.build("train", self.shards[:1])
+
+        # Interrupt the build after the blocks of the next shard are written,
+        # before they are committed to the manifest
+        write_manifest = cache._write_manifest
+
+        def interrupt(split, manifest):
+            raise KeyboardInterrupt
+
+        cache._write_manifest = interrupt
+        with self.assertRaises(KeyboardInterrupt):
+            cache.build("train", self.shards)
+        cache._write_manifest = write_manifest
+
+        dataset = cache.build("train", self.shards)
+        expected = self.expected_blocks(self.shards, 16)
+        actual = torch.stack([dataset[i]["input_ids"] for i in range(len(dataset))])
+        self.assertTrue(torch.equal(actual, expected))
+
+    def test_reuse_and_keys(self):
+        cache = self.create_cache()
+        cache.build("train", self.shards)
+        tokens_file = os.path.join(cache.split_path("train"), "tokens.bin")
+        mtime = os.stat(tokens_file).st_mtime_ns
+
+        # Same tokenizer, block size and data key reuse the cache
+        self.assertEqual(self.create_cache().path, cache.path)
+        dataset = self.create_cache().build("train", self.shards)
+        self.assertEqual(os.stat(tokens_file).st_mtime_ns, mtime)
+        self.assertEqual(len(dataset), len(self.expected_blocks(self.shards, 16)))
+
+        # A different block size uses a different cache
+        self.assertNotEqual(self.create_cache(block_size=32).path, cache.path)
+
+    def test_multiprocess_build(self):
+        serial = self.create_cache().build("train", self.shards)
+        parallel = self.create_cache(block_size=16, num_workers=2)
+        parallel.path += "_parallel"
+        dataset = parallel.build("train", self.shards)
+        self.assertTrue(np.array_equal(np.asarray(serial.tokens),
+                                       np.asarray(dataset.tokens)))
+
+
+if __name__ == "__main__":
+    unittest.main(verbosity=2)
@@ -0,0 +1,231 @@
+# ----------------------------------------------------------------------
+# Numenta Platform for Intelligent Computing (NuPIC)
+# Copyright (C) 2021, Numenta, Inc.  Unless you have an agreement
+# with Numenta, Inc., for a separate license for this software code, the
+# following terms and conditions apply:
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero Public License version 3 as
+# published by the Free Software Foundation.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.
+# See the GNU Affero Public License for more details.
+#
+# You should have received a copy of the GNU Affero Public License
+# along with this program.  If not, see http://www.gnu.org/licenses.
+#
+# http://numenta.org/licenses/
+# ----------------------------------------------------------------------
+
+import json
+import os
+import random
+import tempfile
+import unittest
+from types import SimpleNamespace
+
+import ray
+
+from nupic.research.frameworks.ax import AxService, NonblockingAxSearch
+
+
+def toy_objective(x):
+    return (x - 3.0) ** 2
+
+
+class ToyTrial(object):
+    def __init__(self, index, parameters):
+        self.index = index
+        self.arm = SimpleNamespace(parameters=parameters)
+        self.status = SimpleNamespace(is_candidate=True, is_running=False,
+                                      is_completed=False)
+        self.loss = None
+
+    def mark_running(self, no_runner_required=False):
+        assert self.status.is_candidate
+        self.status = SimpleNamespace(is_candidate=False, is_running=True,
+                                      is_completed=False)
+
+    def mark_completed(self):
+        assert self.status.is_running
+        self.status = SimpleNamespace(is_candidate=False, is_running=False,
+                                      is_completed=True)
+
+
+class ToyAxClient(object):
+    """
+    Stands in for a CoreAxClient: trials are sampled around the best trial
+    so far and serialized as plain json.
+    """
+    supports_batch_generation = True
+
+    def __init__(self, serialized_filepath=None):
+        self.serialized_filepath = serialized_filepath
+        self.experiment = SimpleNamespace(trials={})
+        self.batch_sizes = []
+        self.num_saves = 0
+        if serialized_filepath is not None and os.path.exists(serialized_filepath):
+            with open(serialized_filepath) as f:
+                for trial_index, parameters, running, loss in json.load(f):
+                    self.add_trial(parameters)
+                    if running or loss is not None:
+                        self.experiment.trials[trial_index].mark_running()
+                    if loss is not None:
+                        self.complete_trial(trial_index, {"loss": (loss, None)})
+
+    def get_next_trials(self, n):
+        self.batch_sizes.append(n)
+        completed = [t for t in self.experiment.trials.values()
+                     if t.status.is_completed]
+        center = 5.0
+        if completed:
+            center = min(completed, key=lambda t: t.loss).arm.parameters["x"]
+        self.last_batch = [dict(x=center + random.gauss(0.0, 1.0))
+                           for _ in range(n)]
+        return [self.add_trial(parameters) for parameters in self.last_batch]
+
+    def generation_to_json(self):
+        return self.last_batch
+
+    def attach_generation(self, serialized):
+        return [self.add_trial(parameters)[1] for parameters in serialized]
+
+    def add_trial(self, parameters):
+        trial = ToyTrial(len(self.experiment.trials), parameters)
+        self.experiment.trials[trial.index] = trial
+        return parameters, trial.index
+
+    def complete_trial(self, trial_index, raw_data, metadata=None):
+        trial = self.experiment.trials[trial_index]
+        trial.loss = raw_data["loss"][0]
+        trial.mark_completed()
+
+    def save(self):
+        self.num_saves += 1
+        with open(self.serialized_filepath, "w") as f:
+            json.dump([(t.index, t.arm.parameters, t.status.is_running, t.loss)
+                       for t in self.experiment.trials.values()], f)
+
+    def get_stats(self):
+        return self.batch_sizes, self.num_saves
+
+    def get_trial_statuses(self):
+        return [("completed" if t.status.is_completed
+                 else "running" if t.status.is_running
+                 else "candidate")
+                for t in self.experiment.trials.values()]
+
+
+def metric_function(result):
+    return {"loss": (result["loss"], None)}
+
+
+class AxServiceTest(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        ray.init(local_mode=True)
+
+    @classmethod
+    def tearDownClass(cls):
+        ray.shutdown()
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.serialized_filepath = os.path.join(self.tmp.name, "ax.json")
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def run_search(self, ax_service, num_trials, max_concurrent):
+        search = NonblockingAxSearch(ax_service.frontend, metric_function,
+                                     max_concurrent=max_concurrent)
+        live, num_suggested, num_completed = [], 0, 0
+        while num_completed < num_trials:
+            while num_suggested < num_trials:
+                config = search.suggest(f"trial_{num_suggested}")
+                if config is None:
+                    break
+                live.append((f"trial_{num_suggested}", config))
+                num_suggested += 1
+
+            # Complete the oldest half of the running trials
+            for trial_id, config in live[:max(1, len(live) // 2)]:
+                search.on_trial_complete(
+                    trial_id, result=dict(loss=toy_objective(config["x"])))
+                num_completed += 1
+            live = live[max(1, len(live) // 2):]
+
+    def test_batched_suggestions(self):
+        ax_service = AxService(ToyAxClient, self.serialized_filepath,
+                               snapshot_every=20)
+        self.run_search(ax_service, num_trials=64, max_concurrent=8)
+
+        batch_sizes, num_saves = ray.get(ax_service.backend.get_stats.remote())
+        self.assertEqual(batch_sizes[0], 8)
+        self.assertLess(len(batch_sizes), 64)
+        self.assertGreaterEqual(sum(batch_sizes), 64)
+
+        # Generated, dispatched and completed trials are journaled, full
+        # snapshots are only saved every 20 journal entries
+        self.assertLessEqual(num_saves, (len(batch_sizes) + 2 * 64) // 20)
+        self.assertTrue(os.path.exists(self.serialized_filepath + ".journal"))
+
+    def test_saves_with_one_completion_at_a_time(self):
+        ax_service = AxService(ToyAxClient, self.serialized_filepath,
+                               snapshot_every=20)
+        search = NonblockingAxSearch(ax_service.frontend, metric_function,
+                                     max_concurrent=4)
+        live, num_suggested, num_completed = [], 0, 0
+        while num_completed < 40:
+            config = search.suggest(f"trial_{num_suggested}")
+            if config is not None:
+                live.append((f"trial_{num_suggested}", config))
+                num_suggested += 1
+            elif len(live) > 0:
+                # Each completion frees a single slot
+                trial_id, config = live.pop(0)
+                search.on_trial_complete(
+                    trial_id, result=dict(loss=toy_objective(config["x"])))
+                num_completed += 1
+
+        batch_sizes, num_saves = ray.get(ax_service.backend.get_stats.remote())
+        self.assertGreater(len(batch_sizes), 30)
+        # Roughly 3 journal entries per trial, one snapshot per 20 entries
+        self.assertLessEqual(num_saves, (len(batch_sizes) + 2 * 40) // 20)
+
+    def test_prefetched_trials_stay_candidates(self):
+        ax_service = AxService(ToyAxClient, self.serialized_filepath)
+        self.run_search(ax_service, num_trials=64, max_concurrent=8)
+
+        statuses = ray.get(ax_service.backend.get_trial_statuses.remote())
+        self.assertEqual(statuses.count("completed"), 64)
+        self.assertEqual(statuses.count("running"), 0)
+        # Trials prefetched at the end of the search were never dispatched
+        self.assertEqual(statuses.count("candidate"), len(statuses) - 64)
+
+    def test_resume_from_snapshot_and_journal(self):
+        ax_service = AxService(ToyAxClient, self.serialized_filepath,
+                               snapshot_every=50)
+        self.run_search(ax_service, num_trials=30, max_concurrent=4)
+        # Dispatch a trial without completing it
+        search = NonblockingAxSearch(ax_service.frontend, metric_function,
+                                     max_concurrent=1)
+        self.assertIsNotNone(search.suggest("trial_30"))
+        statuses = ray.get(ax_service.backend.get_trial_statuses.remote())
+        self.assertEqual(statuses.count("running"), 1)
+        self.assertTrue(os.path.exists(self.serialized_filepath))
+        self.assertGreater(
+            os.path.getsize(self.serialized_filepath + ".journal"), 0)
+
+        ax_service = AxService(ToyAxClient, self.serialized_filepath)
+        self.assertEqual(
+            ray.get(ax_service.backend.get_trial_statuses.remote()),
+            statuses
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,50 @@
+# ----------------------------------------------------------------------
+# Numenta Platform for Intelligent Computing (NuPIC)
+# Copyright (C) 2021, Numenta, Inc.  Unless you have an agreement
+# with Numenta, Inc., for a separate license for this software code, the
+# following terms and conditions apply:
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero Public License version 3 as
+# published by the Free Software Foundation.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.
+# See the GNU Affero Public License for more details.
+#
+# You should have received a copy of the GNU Affero Public License
+# along with this program.  If not, see http://www.gnu.org/licenses.
+#
+# http://numenta.org/licenses/
+# ----------------------------------------------------------------------
+
+
+import unittest
+
+import torch
+
+from nupic.research.frameworks.backprop_structure.networks.lenet_vdrop import (
+    mnist_lenet_vdrop,
+)
+
+
+class LeNetVDropTest(unittest.TestCase):
+
+    def test_forward_backward(self):
+        torch.manual_seed(42)
+        model = mnist_lenet_vdrop()
+        model.train()
+        x = torch.randn(8, 1, 28, 28)
+        loss = model(x).sum() + model.vdrop_data.regularization()
+        loss.backward()
+        for name, param in model.named_parameters():
+            self.assertIsNotNone(param.grad, name)
+
+        model.eval()
+        with torch.no_grad():
+            self.assertEqual(model(x).shape, (8, 10))
+
+
+if __name__ == "__main__":
+    unittest.main(verbosity=2)
@@ -0,0 +1,111 @@
+# ----------------------------------------------------------------------
+# Numenta Platform for Intelligent Computing (NuPIC)
+# Copyright (C) 2021, Numenta, Inc.  Unless you have an agreement
+# with Numenta, Inc., for a separate license for this software code, the
+# following terms and conditions apply:
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero Public License version 3 as
+# published by the Free Software Foundation.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.
+# See the GNU Affero Public License for more details.
+#
+# You should have received a copy of the GNU Affero Public License
+# along with this program.  If not, see http://www.gnu.org/licenses.
+#
+# http://numenta.org/licenses/
+# ----------------------------------------------------------------------
+
+import json
+import os
+import tempfile
+import unittest
+
+import numpy as np
+import pandas as pd
+
+from nupic.research.frameworks.dynamic_sparse.common import browser
+
+
+def create_experiment(path, num_trials=4, epochs=5):
+    """Create a fake ray tune experiment results directory"""
+    checkpoints = []
+    for i in range(num_trials):
+        logdir = os.path.join(path, f"trial_{i}")
+        os.makedirs(logdir)
+        progress = pd.DataFrame(dict(
+            mean_accuracy=np.random.rand(epochs),
+            training_iteration=range(1, epochs + 1),
+            time_this_iter_s=np.random.rand(epochs),
+            hostname=["localhost"] * epochs,
+            done=[False] * (epochs - 1) + [True],
+        ))
+        progress.to_csv(os.path.join(logdir, "progress.csv"), index=False)
+        with open(os.path.join(logdir, "params.json"), "w") as f:
+            json.dump(dict(lr=0.1 * i, seed=i, optim_args=dict(momentum=0.9)), f)
+        checkpoints.append(dict(logdir=logdir, experiment_tag=f"{i}_lr={0.1 * i}"))
+
+    with open(os.path.join(path, "experiment_state-0.json"), "w") as f:
+        json.dump(dict(checkpoints=checkpoints), f)
+
+
+class ResultsCacheTest(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.path = self.tmp_dir.name
+        create_experiment(self.path)
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def test_same_dataframe(self):
+        expected = browser.load(self.path)
+        self.assertFalse(os.path.exists(os.path.join(self.path, ".browser_cache")))
+        first = browser.load(self.path, use_cache=True, num_workers=2)
+        cached = browser.load(self.path, use_cache=True, num_workers=2)
+        pd.testing.assert_frame_equal(expected, first)
+        pd.testing.assert_frame_equal(expected, cached)
+
+    def test_only_changed_trials_are_parsed(self):
+        cache = browser.ResultsCache(self.path, num_workers=1)
+        exp_dirs = [f"trial_{i}" for i in range(4)]
+        cache.update(exp_dirs)
+        self.assertEqual(len(cache.index), 4)
+        self.assertTrue(all(cache._is_valid(d) for d in exp_dirs))
+
+        # Append a new epoch to one of the trials
+        csv = os.path.join(self.path, "trial_2", "progress.csv")
+        progress = pd.read_csv(csv)
+        last = progress.iloc[-1:].copy()
+        last["mean_accuracy"] = 2.0
+        last["training_iteration"] = 6
+        pd.concat([progress, last], ignore_index=True).to_csv(csv, index=False)
+
+        self.assertFalse(cache._is_valid("trial_2"))
+        self.assertTrue(cache._is_valid("trial_1"))
+
+        df = browser.load(self.path, use_cache=True)
+        trial = df[df["seed"] == 2]
+        self.assertEqual(trial["epochs"].item(), 6)
+        self.assertEqual(trial["mean_accuracy_max"].item(), 2.0)
+        self.assertEqual(len(df), 4)
+        pd.testing.assert_frame_equal(df, browser.load(self.path))
+
+    def test_shared_cache_dir(self):
+        """Trials of different experiments with the same names don't collide"""
+        with tempfile.TemporaryDirectory() as other_path:
+            create_experiment(other_path)
+            cache_dir = os.path.join(self.path, "shared_cache")
+            df = browser.load_many([self.path, other_path], use_cache=True,
+                                   cache_dir=cache_dir, num_workers=1)
+            expected = browser.load_many([self.path, other_path])
+            pd.testing.assert_frame_equal(df, expected)
+            self.assertEqual(len(os.listdir(cache_dir)), 9)
+
+
+if __name__ == "__main__":
+    unittest.main(verbosity=2)
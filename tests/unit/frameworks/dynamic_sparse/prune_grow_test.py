@@ -0,0 +1,167 @@
+# ----------------------------------------------------------------------
+# Numenta Platform for Intelligent Computing (NuPIC)
+# Copyright (C) 2021, Numenta, Inc.  Unless you have an agreement
+# with Numenta, Inc., for a separate license for this software code, the
+# following terms and conditions apply:
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero Public License version 3 as
+# published by the Free Software Foundation.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.
+# See the GNU Affero Public License for more details.
+#
+# You should have received a copy of the GNU Affero Public License
+# along with this program.  If not, see http://www.gnu.org/licenses.
+#
+# http://numenta.org/licenses/
+# ----------------------------------------------------------------------
+
+import unittest
+
+import torch
+
+from nupic.research.frameworks.dynamic_sparse.models import (
+    DSNNHeb,
+    DSNNMixedHeb,
+    PruneGrowEngine,
+    SparseModule,
+)
+from nupic.research.frameworks.dynamic_sparse.networks import MLPHeb
+
+
+def create_modules(shapes, on_perc=0.4):
+    modules = []
+    for pos, shape in enumerate(shapes):
+        m = torch.nn.Linear(shape[1], shape[0], bias=False)
+        with torch.no_grad():
+            m.weight *= (torch.rand(shape) < on_perc).float()
+        m.coactivations = torch.rand(shape)
+        module = SparseModule(m=m, pos=pos, on_perc=on_perc)
+        module.mask = (m.weight != 0).float()
+        module.save_num_params()
+        modules.append(module)
+    return modules
+
+
+class PruneGrowEngineTest(unittest.TestCase):
+    def setUp(self):
+        torch.manual_seed(42)
+        self.model = DSNNMixedHeb(network=MLPHeb())
+        self.model.setup()
+        self.modules = create_modules([(10, 20), (30, 7), (5, 5), (1, 40)])
+        self.engine = PruneGrowEngine(self.modules, torch.device("cpu"))
+
+        self.weight = self.engine.weights()
+        self.corr = self.engine.coactivations()
+        self.active = self.weight != 0
+        self.nonactive = (self.weight == 0) & self.engine.valid
+
+    def per_module(self, fn, *args):
+        """Run a per module function of the model on every module"""
+        masks = []
+        for module in self.modules:
+            weight = module.m.weight.detach()
+            masks.append(fn(weight, module.m.coactivations, weight != 0, *args))
+        return masks
+
+    def assert_masks_equal(self, packed, masks):
+        for unpacked, mask in zip(self.engine.unpack(packed), masks):
+            self.assertTrue(torch.equal(unpacked, mask.bool()))
+
+    def test_magnitude_mask(self):
+        for perc in [0, 0.2, 0.5, 1]:
+            packed = self.engine.magnitude_mask(
+                self.weight, self.active, self.engine.row_values([perc] * 4)
+            )
+            masks = self.per_module(
+                lambda w, c, a, p=perc: self.model._get_magnitude_mask(w, a, p)
+            )
+            self.assert_masks_equal(packed, masks)
+
+    def test_hebbian_mask(self):
+        for perc, inverse in zip([0, 0.3, 1, 0.3, 1], [0, 0, 0, 1, 1]):
+            packed = self.engine.hebbian_mask(
+                self.corr, self.active, self.engine.row_values([perc] * 4), inverse
+            )
+            if inverse:
+                fn = self.model._get_inverse_hebbian_mask
+            else:
+                fn = self.model._get_hebbian_mask
+            masks = self.per_module(fn, perc)
+            self.assert_masks_equal(packed, masks)
+
+    def test_add_masks(self):
+        num_add = torch.tensor([7, 0, 3, 12])
+        packed = self.engine.hebbian_add_mask(self.corr, self.nonactive, num_add)
+        inverse = self.engine.hebbian_add_mask(
+            self.corr, self.nonactive, num_add, inverse=True
+        )
+        hebbian_masks, inverse_masks = [], []
+        for module, n in zip(self.modules, num_add.tolist()):
+            nonactive = module.m.weight == 0
+            corr = module.m.coactivations
+            if n > 0:
+                hebbian_masks.append(
+                    self.model._get_hebbian_add_mask(corr, nonactive, n)
+                )
+            else:
+                hebbian_masks.append(torch.zeros_like(nonactive))
+            inverse_masks.append(self.model._get_inverse_add_mask(corr, nonactive, n))
+        self.assert_masks_equal(packed, hebbian_masks)
+        self.assert_masks_equal(inverse, inverse_masks)
+
+        # random growth adds exactly num_add nonactive synapses, capped per module
+        num_add = torch.tensor([7, 0, 3, 1000])
+        add_mask = self.engine.random_add_mask(self.nonactive, num_add)
+        self.assertFalse((add_mask & ~self.nonactive).any())
+        expected = torch.min(num_add, self.nonactive.sum(dim=1))
+        self.assertTrue(torch.equal(add_mask.sum(dim=1), expected))
+
+    def test_rewire(self):
+        weight_prune_perc = [0.3, None, 0.5, 0.2]
+        hebbian_prune_perc = [0.2, 0.4, None, None]
+        for module, wprune, hprune in zip(
+            self.modules, weight_prune_perc, hebbian_prune_perc
+        ):
+            module.weight_prune = wprune
+            module.hebbian_prune = hprune
+
+        expected = [self.model.prune(module) for module in self.modules]
+        new_mask, keep_mask, _, num_add = self.engine.rewire(
+            self.model._batched_prune,
+            self.model._batched_grow,
+            [module.num_params for module in self.modules],
+        )
+        self.assert_masks_equal(keep_mask, expected)
+
+        # masks are views of the flat engine mask, and weights are masked
+        self.assert_masks_equal(new_mask, [module.mask for module in self.modules])
+        for module, mask in zip(self.modules, self.engine.mask_views):
+            self.assertIs(module.mask, mask)
+            self.assertEqual(module.mask.sum().item(), module.num_params)
+            self.assertFalse((module.m.weight[module.mask == 0] != 0).any())
+        self.assertTrue(torch.equal(
+            num_add, torch.tensor([module.num_params for module in self.modules])
+            - keep_mask.sum(dim=1)
+        ))
+
+    def test_rewire_without_pruning(self):
+        """The base model keeps all the active synapses"""
+        model = DSNNHeb(network=MLPHeb())
+        model.setup()
+        new_mask, keep_mask, add_mask, num_add = self.engine.rewire(
+            model._batched_prune,
+            model._batched_grow,
+            [module.num_params for module in self.modules],
+        )
+        self.assertTrue(torch.equal(keep_mask, self.active))
+        self.assertTrue(torch.equal(new_mask, self.active))
+        self.assertFalse(add_mask.any())
+        self.assertFalse(num_add.any())
+
+
+if __name__ == "__main__":
+    unittest.main(verbosity=2)
@@ -0,0 +1,131 @@
+# ----------------------------------------------------------------------
+# Numenta Platform for Intelligent Computing (NuPIC)
+# Copyright (C) 2021, Numenta, Inc.  Unless you have an agreement
+# with Numenta, Inc., for a separate license for this software code, the
+# following terms and conditions apply:
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero Public License version 3 as
+# published by the Free Software Foundation.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.
+# See the GNU Affero Public License for more details.
+#
+# You should have received a copy of the GNU Affero Public License
+# along with this program.  If not, see http://www.gnu.org/licenses.
+#
+# http://numenta.org/licenses/
+# ----------------------------------------------------------------------
+
+import unittest
+
+import pytorch_lightning as pl
+import torch
+from torch.utils.data import Dataset
+
+from nupic.research.frameworks.lightning.mixins import SharedMemoryData
+from nupic.research.frameworks.lightning.models import SupervisedModel
+
+
+class ToyNet(torch.nn.Module):
+    def __init__(self, num_classes=4):
+        super().__init__()
+        self.classifier = torch.nn.Sequential(
+            torch.nn.AdaptiveAvgPool2d(2),
+            torch.nn.Flatten(),
+            torch.nn.Linear(4, num_classes),
+        )
+
+    def forward(self, x):
+        return self.classifier(x)
+
+
+class ToyDataset(Dataset):
+    def __init__(self, train=True, transform=None):
+        generator = torch.Generator().manual_seed(0 if train else 1)
+        self.images = torch.rand(64 if train else 32, 1, 8, 8,
+                                 generator=generator)
+        self.targets = torch.randint(4, (len(self.images),), generator=generator)
+        self.transform = transform
+
+    def __len__(self):
+        return len(self.images)
+
+    def __getitem__(self, index):
+        image = self.images[index]
+        if self.transform is not None:
+            image = self.transform(image)
+        return image, self.targets[index]
+
+
+class RandomNoise(object):
+    def __call__(self, image):
+        return image + 0.1 * torch.randn_like(image)
+
+
+class SharedMemoryModel(SharedMemoryData, SupervisedModel):
+    def training_step(self, batch, batch_idx):
+        self.train_batch_shapes.append((self.current_epoch,
+                                        tuple(batch[0].shape)))
+        return super().training_step(batch, batch_idx)
+
+
+def create_trainer(model_class, **kwargs):
+    trainer_args = dict(
+        logger=False,
+        checkpoint_callback=False,
+        weights_summary=None,
+        progress_bar_refresh_rate=0,
+        num_sanity_val_steps=0,
+        **kwargs,
+    )
+    for cls in reversed(model_class.__mro__):
+        trainer_args.update(vars(cls).get("trainer_requirements", {}))
+    return pl.Trainer(**trainer_args)
+
+
+class SharedMemoryDataTest(unittest.TestCase):
+
+    def setUp(self):
+        self.config = dict(
+            model_class=ToyNet,
+            dataset_class=ToyDataset,
+            epochs=3,
+            batch_size=8,
+            optimizer_args=dict(lr=0.1),
+            data_variants={
+                1: dict(batch_size=16, resolution=4),
+                2: dict(resolution=None, subset=0.5),
+            },
+        )
+
+    def test_fit(self):
+        model = SharedMemoryModel(self.config)
+        model.train_batch_shapes = []
+        trainer = create_trainer(SharedMemoryModel, max_epochs=3)
+        trainer.fit(model)
+
+        expected = ([(0, (8, 1, 8, 8))] * 8
+                    + [(1, (16, 1, 4, 4))] * 4
+                    + [(2, (16, 1, 8, 8))] * 2)
+        self.assertEqual(model.train_batch_shapes, expected)
+        self.assertEqual([model.compute_steps_in_epoch(epoch)
+                          for epoch in range(3)], [8, 4, 2])
+        self.assertTrue(model.train_dataset.tensors[0].is_shared())
+
+    def test_random_transforms(self):
+        self.config.update(dataset_args=dict(transform=RandomNoise()))
+        model = SharedMemoryModel(self.config)
+        with self.assertRaises(ValueError):
+            model.setup("fit")
+
+        self.config.update(shared_memory_allow_random_transforms=True)
+        model = SharedMemoryModel(self.config)
+        with self.assertWarns(UserWarning):
+            model.setup("fit")
+
+
+if __name__ == "__main__":
+    unittest.main()
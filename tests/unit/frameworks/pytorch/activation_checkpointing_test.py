@@ -0,0 +1,125 @@
+# ----------------------------------------------------------------------
+# Numenta Platform for Intelligent Computing (NuPIC)
+# Copyright (C) 2021, Numenta, Inc.  Unless you have an agreement
+# with Numenta, Inc., for a separate license for this software code, the
+# following terms and conditions apply:
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero Public License version 3 as
+# published by the Free Software Foundation.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.
+# See the GNU Affero Public License for more details.
+#
+# You should have received a copy of the GNU Affero Public License
+# along with this program.  If not, see http://www.gnu.org/licenses.
+#
+# http://numenta.org/licenses/
+# ----------------------------------------------------------------------
+
+import copy
+import unittest
+
+import torch
+
+from nupic.research.frameworks.pytorch.activation_checkpointing import (
+    estimate_activation_memory,
+    measure_block_footprints,
+    plan_activation_checkpointing,
+    profile_checkpoint_plans,
+)
+from nupic.research.frameworks.pytorch.models.resnets import resnet18
+from nupic.research.frameworks.pytorch.models.sparse_resnets import (
+    resnet18 as sparse_resnet18,
+)
+
+ALL_GROUPS = {"group1": True, "group2": True, "group3": True, "group4": True}
+
+
+def train_step(model, x):
+    torch.manual_seed(42)
+    model.zero_grad()
+    model(x).sum().backward()
+    grads = [p.grad.clone() for p in model.parameters()]
+    buffers = [b.clone() for b in model.buffers()]
+    return grads, buffers
+
+
+class ActivationCheckpointingTest(unittest.TestCase):
+
+    def setUp(self):
+        torch.manual_seed(18)
+        self.x = torch.rand(4, 3, 64, 64)
+
+    def assert_same_step(self, model, plan):
+        checkpointed = copy.deepcopy(model)
+        checkpointed.set_checkpoint_plan(plan)
+        expected_grads, expected_buffers = train_step(model, self.x)
+        grads, buffers = train_step(checkpointed, self.x)
+        for expected, actual in zip(expected_grads, grads):
+            self.assertTrue(torch.allclose(expected, actual, atol=1e-6))
+        for expected, actual in zip(expected_buffers, buffers):
+            self.assertTrue(torch.equal(expected, actual))
+
+    def test_same_gradients(self):
+        """Checkpointing should not change the gradients nor the BN stats"""
+        model = resnet18(num_classes=10).train()
+        self.assert_same_step(model, ALL_GROUPS)
+        self.assert_same_step(model, {"group1": [0, 1], "group3": [(0, 2)]})
+
+    def test_same_gradients_kwinners(self):
+        """
+        The duty cycles of the k-winners should be updated once per step, and
+        the recomputation should pick the same winners as the forward pass
+        """
+        model = sparse_resnet18(dict(num_classes=10, defaults_sparse=True))
+        model.train()
+        # Make boosting depend on the duty cycles
+        train_step(model, self.x)
+        self.assert_same_step(model, ALL_GROUPS)
+
+    def test_checkpoint_plan(self):
+        model = resnet18(num_classes=10)
+        model.set_checkpoint_plan({"group2": [1, 0], "group4": True})
+        self.assertEqual(model.features.group2.checkpoint_segments,
+                         [(0, 1), (1, 2)])
+        self.assertEqual(model.features.group4.checkpoint_segments, [(0, 2)])
+        self.assertEqual(model.features.group1.checkpoint_segments, [])
+
+        with self.assertRaises(ValueError):
+            model.set_checkpoint_plan({"group1": [(0, 2), (1, 2)]})
+        with self.assertRaises(ValueError):
+            model.set_checkpoint_plan({"group1": [(0, 3)]})
+        with self.assertRaises(ValueError):
+            model.set_checkpoint_plan({"group5": True})
+
+        # Plans are also accepted by the constructors
+        model = sparse_resnet18(dict(num_classes=10, checkpoint_plan=ALL_GROUPS))
+        self.assertEqual(model.features.group3.checkpoint_segments, [(0, 2)])
+
+    def test_budget(self):
+        model = resnet18(num_classes=10)
+        footprints = measure_block_footprints(model, self.x)
+        self.assertTrue(all(f["activation_bytes"] > 0 for f in footprints.values()))
+
+        _, peak = estimate_activation_memory(footprints, {})
+        budget = int(peak * 0.9)
+        plan = plan_activation_checkpointing(footprints, budget)
+        self.assertTrue(plan)
+        self.assertLessEqual(estimate_activation_memory(footprints, plan)[1],
+                             budget)
+        with self.assertRaises(ValueError):
+            plan_activation_checkpointing(footprints, 1)
+
+        report = profile_checkpoint_plans(model, self.x, {"none": {},
+                                                          "budget": plan},
+                                          num_steps=1)
+        self.assertEqual([r["plan"] for r in report], ["none", "budget"])
+        self.assertLess(report[1]["stored_bytes"], report[0]["stored_bytes"])
+        self.assertLessEqual(report[1]["peak_bytes"], budget)
+
+
+if __name__ == "__main__":
+    unittest.main(verbosity=2)
@@ -0,0 +1,142 @@
+# ----------------------------------------------------------------------
+# Numenta Platform for Intelligent Computing (NuPIC)
+# Copyright (C) 2021, Numenta, Inc.  Unless you have an agreement
+# with Numenta, Inc., for a separate license for this software code, the
+# following terms and conditions apply:
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero Public License version 3 as
+# published by the Free Software Foundation.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.
+# See the GNU Affero Public License for more details.
+#
+# You should have received a copy of the GNU Affero Public License
+# along with this program.  If not, see http://www.gnu.org/licenses.
+#
+# http://numenta.org/licenses/
+# ----------------------------------------------------------------------
+
+import unittest
+
+import numpy as np
+import torch
+import torch.nn.functional as F
+from PIL import Image, ImageEnhance, ImageOps
+
+from nupic.research.frameworks.pytorch.dataset_utils import (
+    CIFAR10BatchPolicy,
+    ImageNetBatchPolicy,
+    SVHNBatchPolicy,
+)
+from nupic.research.frameworks.pytorch.dataset_utils import (
+    batch_auto_augment as batch_aa,
+)
+from nupic.research.frameworks.pytorch.dataset_utils.auto_augment import (
+    SubPolicy,
+    rotate_with_fill,
+)
+
+
+def to_pil(image):
+    return Image.fromarray(image.permute(1, 2, 0).numpy())
+
+
+def from_pil(image):
+    return torch.from_numpy(np.array(image)).permute(2, 0, 1)
+
+
+class BatchAutoAugmentTest(unittest.TestCase):
+
+    def setUp(self):
+        torch.manual_seed(42)
+        images = torch.randint(0, 256, (4, 3, 37, 41), dtype=torch.uint8)
+        # Smooth the noise and vary the range, closer to natural images
+        images = F.avg_pool2d(images.float(), 5, 1, 2).round().to(torch.uint8)
+        images[1] //= 4
+        images[2] = images[2] // 2 + 60
+        self.images = images
+
+    def magnitude(self, value):
+        return torch.full((len(self.images),), float(value))
+
+    def assert_same_as_pil(self, op, magnitude, pil_op, max_diff=0,
+                           max_diff_ratio=0.0):
+        out = op(self.images, self.magnitude(magnitude), (128, 128, 128))
+        self.assertEqual(out.dtype, torch.uint8)
+        for image, out_image in zip(self.images, out):
+            expected = from_pil(pil_op(to_pil(image)))
+            diff = (out_image.int() - expected.int()).abs()
+            self.assertLessEqual(diff.max().item(), max_diff)
+            self.assertLessEqual((diff > 0).float().mean().item(), max_diff_ratio)
+
+    def test_color_ops(self):
+        self.assert_same_as_pil(batch_aa.invert, 0, ImageOps.invert)
+        self.assert_same_as_pil(batch_aa.equalize, 0, ImageOps.equalize)
+        self.assert_same_as_pil(batch_aa.autocontrast, 0, ImageOps.autocontrast,
+                                max_diff=1, max_diff_ratio=0.05)
+        for bits in [4, 6, 8]:
+            self.assert_same_as_pil(batch_aa.posterize, bits,
+                                    lambda img, b=bits: ImageOps.posterize(img, b))
+        for threshold in [256, 170.67, 28.44]:
+            self.assert_same_as_pil(batch_aa.solarize, threshold,
+                                    lambda img, t=threshold: ImageOps.solarize(img, t))
+
+    def test_enhance_ops(self):
+        enhancers = {
+            "color": ImageEnhance.Color,
+            "contrast": ImageEnhance.Contrast,
+            "sharpness": ImageEnhance.Sharpness,
+            "brightness": ImageEnhance.Brightness,
+        }
+        for name, enhancer in enhancers.items():
+            op = getattr(batch_aa, name)
+            out = op(self.images, self.magnitude(0.5), None)
+            # The factor is either 1.5 or 0.5, picked for each image
+            for image, out_image in zip(self.images, out):
+                candidates = [from_pil(enhancer(to_pil(image)).enhance(factor))
+                              for factor in (0.5, 1.5)]
+                self.assertTrue(any(torch.equal(out_image, c) for c in candidates),
+                                name)
+
+    def test_geometric_ops(self):
+        self.assert_same_as_pil(batch_aa.rotate, 30,
+                                lambda img: rotate_with_fill(img, 30),
+                                max_diff=255, max_diff_ratio=0.05)
+
+        out = batch_aa.translate_x(self.images, self.magnitude(0.25), (128, 128, 128))
+        shift = round(0.25 * self.images.shape[3])
+        for image, out_image in zip(self.images, out):
+            # Moved either left or right, filled with gray
+            left = torch.equal(out_image[:, :, :-shift], image[:, :, shift:])
+            right = torch.equal(out_image[:, :, shift:], image[:, :, :-shift])
+            self.assertTrue(left or right)
+            self.assertEqual((out_image == 128).all(dim=0).sum().item(),
+                             shift * self.images.shape[2])
+
+    def test_shear_translate_flag(self):
+        image = to_pil(self.images[0])
+        for name in ["shear_x", "shear_y", "translate_x", "translate_y"]:
+            policy = SubPolicy(1.0, name, 9, 1.0, name, 9)
+            self.assertTrue(torch.equal(from_pil(policy(image)), self.images[0]))
+            policy = SubPolicy(1.0, name, 9, 1.0, name, 9, shear_translate=True)
+            self.assertFalse(torch.equal(from_pil(policy(image)), self.images[0]))
+
+            policy = batch_aa.BatchPolicy([(1.0, name, 9, 1.0, name, 9)])
+            self.assertTrue(torch.equal(policy(self.images), self.images))
+            policy = batch_aa.BatchPolicy([(1.0, name, 9, 1.0, name, 9)],
+                                          shear_translate=True)
+            self.assertFalse(torch.equal(policy(self.images), self.images))
+
+    def test_policies(self):
+        for policy in [ImageNetBatchPolicy(), CIFAR10BatchPolicy(),
+                       SVHNBatchPolicy()]:
+            out = policy(self.images)
+            self.assertEqual(out.shape, self.images.shape)
+            self.assertEqual(out.dtype, torch.uint8)
+
+
+if __name__ == "__main__":
+    unittest.main(verbosity=2)
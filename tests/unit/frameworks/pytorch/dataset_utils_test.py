@@ -22,8 +22,16 @@ import unittest
 from unittest import TestCase
 
 import torch
+from torch.utils.data import DataLoader, DistributedSampler, TensorDataset
 
-from nupic.research.frameworks.pytorch.dataset_utils import ProgressiveRandomResizedCrop
+from nupic.research.frameworks.pytorch.dataset_utils import (
+    ProgressiveRandomResizedCrop,
+    TaskDistributedSampler,
+    set_batch_size,
+)
+from nupic.research.frameworks.pytorch.distributed_sampler import (
+    UnpaddedDistributedSampler,
+)
 from nupic.research.frameworks.pytorch.test_utils import FakeDataLoader
 
 
@@ -59,5 +67,44 @@ class ProgressiveRandomResizedCropTest(TestCase):
         self.assertTrue(batches == 4)
 
 
+class SetBatchSizeTest(TestCase):
+    def setUp(self):
+        self.dataset = TensorDataset(torch.arange(50))
+
+    def check_batch_sizes(self, sampler, drop_last):
+        loader = DataLoader(self.dataset, batch_size=4, sampler=sampler,
+                            drop_last=drop_last)
+        for epoch, batch_size in enumerate([4, 8, 3]):
+            set_batch_size(loader, batch_size)
+            sampler.set_epoch(epoch)
+            batches = [x for x, in loader]
+
+            self.assertEqual(loader.batch_size, batch_size)
+            self.assertEqual(len(batches), len(loader))
+            self.assertTrue(all(len(x) == batch_size for x in batches[:-1]))
+
+            # Same ordering as the sampler for the epoch
+            indices = torch.cat(batches).tolist()
+            expected = list(sampler)
+            if drop_last:
+                expected = expected[:len(expected) // batch_size * batch_size]
+            self.assertEqual(indices, expected)
+
+    def test_distributed_sampler(self):
+        sampler = DistributedSampler(self.dataset, num_replicas=2, rank=1)
+        self.check_batch_sizes(sampler, drop_last=True)
+
+    def test_unpadded_distributed_sampler(self):
+        sampler = UnpaddedDistributedSampler(self.dataset, num_replicas=3, rank=0)
+        self.check_batch_sizes(sampler, drop_last=False)
+
+    def test_task_distributed_sampler(self):
+        task_indices = [list(range(0, 25)), list(range(25, 50))]
+        sampler = TaskDistributedSampler(self.dataset, task_indices,
+                                         num_replicas=2, rank=0)
+        sampler.set_active_tasks([0, 1])
+        self.check_batch_sizes(sampler, drop_last=True)
+
+
 if __name__ == "__main__":
     unittest.main()
@@ -0,0 +1,151 @@
+# ----------------------------------------------------------------------
+# Numenta Platform for Intelligent Computing (NuPIC)
+# Copyright (C) 2021, Numenta, Inc.  Unless you have an agreement
+# with Numenta, Inc., for a separate license for this software code, the
+# following terms and conditions apply:
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero Public License version 3 as
+# published by the Free Software Foundation.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.
+# See the GNU Affero Public License for more details.
+#
+# You should have received a copy of the GNU Affero Public License
+# along with this program.  If not, see http://www.gnu.org/licenses.
+#
+# http://numenta.org/licenses/
+# ----------------------------------------------------------------------
+
+import unittest
+
+import torch
+import torch.nn as nn
+import torch.nn.functional as F
+
+from nupic.research.frameworks.pytorch.inference_compiler import (
+    compile_for_inference,
+    fold_sequential_batchnorm,
+    inference_report,
+    remove_inference_noops,
+    strip_sparse_weights,
+)
+from nupic.research.frameworks.pytorch.models import LeSparseNet, NoSoDenseNetCIFAR
+from nupic.research.frameworks.pytorch.models.sparse_resnets import resnet18
+from nupic.torch.modules.sparse_weights import SparseWeightsBase, rezero_weights
+
+
+def train_randomly(model, input_shape, num_classes, num_samples=16):
+    """Train on random inputs so the batch norm and duty cycles learn something"""
+    x = torch.randn((num_samples,) + input_shape)
+    targets = torch.randint(0, num_classes, (num_samples,))
+    optimizer = torch.optim.SGD(model.parameters(), lr=0.01, momentum=0.5)
+    model.train()
+    for _ in range(5):
+        optimizer.zero_grad()
+        F.cross_entropy(model(x), targets).backward()
+        optimizer.step()
+        model.apply(rezero_weights)
+    model.eval()
+
+
+def graph_ops(compiled):
+    return str(compiled.inlined_graph)
+
+
+class InferenceCompilerTest(unittest.TestCase):
+
+    def setUp(self):
+        torch.manual_seed(42)
+
+    def assert_compiled(self, model, input_shape):
+        x = torch.randn((8,) + input_shape)
+        compiled = compile_for_inference(model, x)
+        report = inference_report(model, compiled, torch.randn((8,) + input_shape),
+                                  num_iterations=2, warmup=1)
+        self.assertTrue(report["equivalent"], report)
+        self.assertGreater(report["compiled_latency"], 0)
+        # The original model is not modified
+        self.assertTrue(any(isinstance(m, SparseWeightsBase)
+                            for m in model.modules()))
+        return compiled
+
+    def test_le_sparse_net(self):
+        model = LeSparseNet(
+            input_shape=(1, 32, 32),
+            cnn_out_channels=(8, 8),
+            cnn_weight_percent_on=(1.0, 0.5),
+            linear_n=(50,),
+            linear_weight_percent_on=(0.5,),
+            dropout=0.5,
+            use_softmax=False,
+        )
+        train_randomly(model, (1, 32, 32), 10)
+        compiled = self.assert_compiled(model, (1, 32, 32))
+        ops = graph_ops(compiled)
+        self.assertNotIn("batch_norm", ops)
+        self.assertNotIn("dropout", ops)
+
+    def test_sparse_resnet(self):
+        model = resnet18(dict(num_classes=10, defaults_sparse=True))
+        train_randomly(model, (3, 32, 32), 10)
+        compiled = self.assert_compiled(model, (3, 32, 32))
+        self.assertNotIn("batch_norm", graph_ops(compiled))
+
+    def test_not_so_densenet(self):
+        model = NoSoDenseNetCIFAR(
+            block_config=(2, 2, 2, 2),
+            dense_sparse_weights=([1.0, 0.5],) * 4,
+            transition_sparse_weights=(0.5, 0.5, 0.5),
+            classifier_sparse_weights=0.5,
+        )
+        train_randomly(model, (3, 32, 32), 10)
+        self.assert_compiled(model, (3, 32, 32))
+
+    def test_fold_affine_batchnorm(self):
+        """Fold affine batch norm into layers without bias"""
+        model = nn.Sequential(
+            nn.Conv2d(3, 4, kernel_size=3, bias=False),
+            nn.BatchNorm2d(4),
+            nn.ReLU(),
+            nn.Flatten(),
+            nn.Dropout(0.5),
+            nn.Linear(4 * 6 * 6, 5, bias=False),
+            nn.BatchNorm1d(5),
+        )
+        for bn in (model[1], model[6]):
+            nn.init.uniform_(bn.weight)
+            nn.init.uniform_(bn.bias)
+            nn.init.uniform_(bn.running_mean)
+            nn.init.uniform_(bn.running_var, 0.5, 1.5)
+        model.eval()
+
+        x = torch.randn(8, 3, 8, 8)
+        expected = model(x)
+        folded = remove_inference_noops(
+            fold_sequential_batchnorm(strip_sparse_weights(model)))
+        self.assertEqual([type(m) for m in folded],
+                         [nn.Conv2d, nn.ReLU, nn.Flatten, nn.Linear])
+        self.assertTrue(torch.allclose(folded(x), expected, atol=1e-5))
+
+    def test_keep_batchnorm_of_custom_sequential(self):
+        """Sequential subclasses overriding forward are not folded"""
+        class Residual(nn.Sequential):
+            def forward(self, x):
+                return x + self[1](x) + self[0](x)
+
+        model = nn.Sequential(Residual(nn.Linear(5, 5), nn.BatchNorm1d(5)))
+        nn.init.uniform_(model[0][1].running_mean)
+        model.eval()
+
+        x = torch.randn(8, 5)
+        expected = model(x)
+        fold_sequential_batchnorm(model)
+        self.assertEqual([type(m) for m in model[0]], [nn.Linear, nn.BatchNorm1d])
+        self.assertTrue(torch.allclose(model(x), expected))
+
+
+if __name__ == "__main__":
+    unittest.main(verbosity=2)
@@ -0,0 +1,88 @@
+# ----------------------------------------------------------------------
+# Numenta Platform for Intelligent Computing (NuPIC)
+# Copyright (C) 2021, Numenta, Inc.  Unless you have an agreement
+# with Numenta, Inc., for a separate license for this software code, the
+# following terms and conditions apply:
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero Public License version 3 as
+# published by the Free Software Foundation.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.
+# See the GNU Affero Public License for more details.
+#
+# You should have received a copy of the GNU Affero Public License
+# along with this program.  If not, see http://www.gnu.org/licenses.
+#
+# http://numenta.org/licenses/
+# ----------------------------------------------------------------------
+
+import unittest
+
+import torch
+from nupic.torch.modules import KWinners, KWinners2d
+
+from nupic.research.frameworks.quantization import (
+    QATKWinners,
+    QATKWinners2d,
+    QuantizedKWinners,
+    QuantizedKWinners2d,
+)
+
+
+class QuantizedKWinnersTest(unittest.TestCase):
+
+    def setUp(self):
+        torch.manual_seed(42)
+        self.qconfig = torch.quantization.get_default_qat_qconfig("fbgemm")
+
+    def check_quantized(self, kwinners, qat_class, quantized_class, x):
+        # Train duty cycles
+        kwinners.train()
+        for _ in range(5):
+            kwinners(torch.randn_like(x))
+        kwinners.eval()
+
+        qat = qat_class.from_float(kwinners, self.qconfig)
+        quantized = quantized_class.from_float(qat.eval())
+
+        qx = torch.quantize_per_tensor(x, 0.05, 128, torch.quint8)
+        out = quantized(qx)
+        self.assertTrue(out.is_quantized)
+        self.assertEqual(out.q_scale(), qx.q_scale())
+        self.assertEqual(out.q_zero_point(), qx.q_zero_point())
+
+        expected = kwinners(qx.dequantize())
+        self.assertTrue(torch.equal(out.dequantize(), expected))
+
+        scripted = torch.jit.script(quantized)
+        self.assertTrue(torch.equal(scripted(qx).int_repr(), out.int_repr()))
+
+    def test_kwinners(self):
+        kwinners = KWinners(n=64, percent_on=0.1, k_inference_factor=1.5,
+                            boost_strength=1.0, boost_strength_factor=0.9,
+                            relu=True)
+        self.check_quantized(kwinners, QATKWinners, QuantizedKWinners,
+                             torch.randn(16, 64))
+
+    def test_kwinners2d(self):
+        kwinners = KWinners2d(channels=8, percent_on=0.25, k_inference_factor=1.0,
+                              boost_strength=1.0, boost_strength_factor=0.9,
+                              local=True)
+        self.check_quantized(kwinners, QATKWinners2d, QuantizedKWinners2d,
+                             torch.randn(4, 8, 5, 5))
+
+    def test_training_not_supported(self):
+        kwinners = KWinners(n=10, percent_on=0.2)
+        qat = QATKWinners.from_float(kwinners, self.qconfig)
+        quantized = QuantizedKWinners.from_float(qat)
+        quantized.train()
+        qx = torch.quantize_per_tensor(torch.randn(2, 10), 0.05, 128, torch.quint8)
+        with self.assertRaises(RuntimeError):
+            quantized(qx)
+
+
+if __name__ == "__main__":
+    unittest.main(verbosity=2)
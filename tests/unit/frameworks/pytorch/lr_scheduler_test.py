@@ -17,6 +17,9 @@
 #
 #  http://numenta.org/licenses/
 #
+import csv
+import os
+import tempfile
 import unittest
 
 import numpy as np
@@ -24,7 +27,11 @@ import torch
 import torch.optim
 from torch.optim.lr_scheduler import OneCycleLR, StepLR
 
-from nupic.research.frameworks.pytorch.lr_scheduler import ComposedLRScheduler
+from nupic.research.frameworks.pytorch.lr_scheduler import (
+    CompiledLRScheduler,
+    ComposedLRScheduler,
+    compile_schedule,
+)
 
 
 class ComposedLRSchedulerTest(unittest.TestCase):
@@ -174,5 +181,174 @@ class ComposedLRSchedulerTest(unittest.TestCase):
         self.assertEqual(expected, actual)
 
 
+HYPERPARAMETERS = ["lr", "momentum", "dampening", "weight_decay", "nesterov"]
+
+
+def composed_schedulers(steps_per_epoch):
+    return {
+        0: dict(
+            lr_scheduler_class=OneCycleLR,
+            lr_scheduler_args=dict(
+                epochs=4, max_lr=2.0, steps_per_epoch=steps_per_epoch,
+            ),
+            optimizer_args=dict(weight_decay=1e-04),
+        ),
+        4: dict(
+            lr_scheduler_class=StepLR,
+            lr_scheduler_args=dict(step_size=2, gamma=0.1),
+            optimizer_args=dict(weight_decay=1e-05, momentum=0.9, nesterov=True),
+        ),
+        8: dict(
+            lr_scheduler_class=OneCycleLR,
+            lr_scheduler_args=dict(
+                epochs=2, max_lr=1.0, steps_per_epoch=steps_per_epoch,
+                cycle_momentum=False,
+            ),
+        ),
+    }
+
+
+def create_optimizer():
+    params = [torch.zeros(1), torch.zeros(1)]
+    return torch.optim.SGD(
+        [dict(params=params[:1]), dict(params=params[1:], weight_decay=0.0)],
+        lr=1.0, momentum=0.5, weight_decay=0.0001,
+    )
+
+
+def record(optimizer):
+    return [{k: group[k] for k in HYPERPARAMETERS}
+            for group in optimizer.param_groups]
+
+
+class CompiledLRSchedulerTest(unittest.TestCase):
+    def test_composed_scheduler(self):
+        steps_per_epoch = 7
+        total_steps = 10 * steps_per_epoch
+
+        optimizer = create_optimizer()
+        scheduler = ComposedLRScheduler(
+            optimizer, steps_per_epoch=steps_per_epoch,
+            schedulers=composed_schedulers(steps_per_epoch))
+        expected = []
+        for _ in range(total_steps):
+            expected.append(record(optimizer))
+            optimizer.step()
+            scheduler.step()
+
+        optimizer = create_optimizer()
+        table = compile_schedule(
+            optimizer,
+            schedulers={0: lambda opt: ComposedLRScheduler(
+                opt, steps_per_epoch=steps_per_epoch,
+                schedulers=composed_schedulers(steps_per_epoch))},
+            total_steps=total_steps,
+        )
+        self.assertEqual(len(table), total_steps)
+        self.assertEqual(optimizer.param_groups[0]["lr"], 1.0)
+
+        scheduler = CompiledLRScheduler(optimizer, table)
+        actual = []
+        for _ in range(total_steps):
+            actual.append(record(optimizer))
+            optimizer.step()
+            scheduler.step()
+
+        # Exactly the same values, types included
+        self.assertEqual(expected, actual)
+        self.assertEqual([[type(v) for v in g.values()] for g in expected[-1]],
+                         [[type(v) for v in g.values()] for g in actual[-1]])
+
+    def test_epoch_scheduler(self):
+        steps_per_epoch = 3
+        optimizer = create_optimizer()
+        table = compile_schedule(
+            optimizer,
+            schedulers={0: lambda opt: StepLR(opt, step_size=2, gamma=0.1)},
+            total_steps=6 * steps_per_epoch,
+            step_interval=steps_per_epoch,
+        )
+        expected = np.repeat([1.0, 1.0, 0.1, 0.1, 0.01, 0.01], steps_per_epoch)
+        self.assertTrue(np.allclose(table["lr"][:, 0], expected))
+
+    def test_multiple_cycles(self):
+        steps_per_epoch = 5
+        cycles = {
+            0: dict(epochs=3, max_lr=2.0, final_div_factor=100),
+            3: dict(epochs=2, max_lr=1.0, div_factor=100),
+        }
+
+        # Create a new OneCycleLR at the beginning of every cycle, as MultiCycleLR
+        optimizer = create_optimizer()
+        expected = []
+        for epoch in range(5):
+            if epoch in cycles:
+                scheduler = OneCycleLR(optimizer, steps_per_epoch=steps_per_epoch,
+                                       **cycles[epoch])
+            for _ in range(steps_per_epoch):
+                expected.append(record(optimizer))
+                optimizer.step()
+                scheduler.step()
+
+        optimizer = create_optimizer()
+        table = compile_schedule(
+            optimizer,
+            schedulers={
+                epoch * steps_per_epoch: lambda opt, args=args: OneCycleLR(
+                    opt, steps_per_epoch=steps_per_epoch, **args)
+                for epoch, args in cycles.items()
+            },
+            total_steps=5 * steps_per_epoch,
+        )
+        scheduler = CompiledLRScheduler(optimizer, table)
+        actual = []
+        for _ in range(5 * steps_per_epoch):
+            actual.append(record(optimizer))
+            optimizer.step()
+            scheduler.step()
+
+        self.assertEqual(expected, actual)
+
+    def test_state_dict(self):
+        optimizer = create_optimizer()
+        table = compile_schedule(
+            optimizer,
+            schedulers={0: lambda opt: OneCycleLR(opt, max_lr=1.0, total_steps=20)},
+            total_steps=20,
+        )
+        scheduler = CompiledLRScheduler(optimizer, table)
+        for _ in range(7):
+            optimizer.step()
+            scheduler.step()
+        state_dict = scheduler.state_dict()
+        self.assertNotIn("table", state_dict)
+
+        optimizer2 = create_optimizer()
+        scheduler2 = CompiledLRScheduler(optimizer2, table)
+        scheduler2.load_state_dict(state_dict)
+        self.assertEqual(record(optimizer), record(optimizer2))
+        self.assertEqual(scheduler.get_last_lr(), scheduler2.get_last_lr())
+
+    def test_export(self):
+        optimizer = torch.optim.Adam([torch.zeros(1)], lr=0.1)
+        table = compile_schedule(
+            optimizer,
+            schedulers={0: lambda opt: OneCycleLR(opt, max_lr=1.0, total_steps=10)},
+            total_steps=10,
+        )
+        self.assertEqual(table["betas"].shape, (10, 1, 2))
+        self.assertIsInstance(table.get_row(3)[0]["betas"], tuple)
+
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            path = os.path.join(tmp_dir, "schedule.csv")
+            table.to_csv(path)
+            with open(path) as f:
+                rows = list(csv.DictReader(f))
+        self.assertEqual(len(rows), 10)
+        self.assertEqual([float(row["lr"]) for row in rows],
+                         table["lr"][:, 0].tolist())
+        self.assertIn("betas.0", rows[0])
+
+
 if __name__ == "__main__":
     unittest.main()
@@ -22,11 +22,15 @@ import unittest
 
 import torch
 import torch.nn
+import torch.nn.functional as F
+from torch.utils.data import DataLoader, TensorDataset
 
 from nupic.research.frameworks.pytorch.model_compare import compare_models
 from nupic.research.frameworks.pytorch.model_utils import (
     count_nonzero_params,
     deserialize_state_dict,
+    evaluate_model,
+    evaluate_models,
     serialize_state_dict,
 )
 from nupic.research.frameworks.pytorch.models.le_sparse_net import LeSparseNet
@@ -140,5 +144,41 @@ class ModelSerializationTest(unittest.TestCase):
         self.assertTrue(compare_models(model1, model2, (32,)))
 
 
+class EvaluateModelsTest(unittest.TestCase):
+
+    def setUp(self):
+        torch.manual_seed(42)
+        data = torch.randn(100, 32)
+        target = torch.randint(2, (100,))
+        self.loader = DataLoader(TensorDataset(data, target), batch_size=16)
+        self.models = [simple_linear_net() for _ in range(3)]
+
+    def test_same_as_evaluate_model(self):
+        for num_threads in (None, 3):
+            results = evaluate_models(self.models, self.loader, "cpu",
+                                      criterion=F.cross_entropy,
+                                      num_threads=num_threads)
+            self.assertEqual(len(results), 3)
+            for model, result in zip(self.models, results):
+                expected = evaluate_model(model, self.loader, "cpu",
+                                          criterion=F.cross_entropy)
+                self.assertEqual(result["total_correct"], expected["total_correct"])
+                self.assertEqual(result["total_tested"], 100)
+                self.assertAlmostEqual(result["mean_loss"], expected["mean_loss"],
+                                       places=5)
+                self.assertEqual(result["mean_accuracy"], expected["mean_accuracy"])
+
+    def test_agreement(self):
+        models = self.models + [self.models[0]]
+        results = evaluate_models(models, self.loader, "cpu",
+                                  criterion=F.cross_entropy, batches_in_epoch=3)
+        self.assertEqual(results[0]["total_tested"], 48)
+        for i, result in enumerate(results):
+            self.assertEqual(result["agreement"][i], 1.0)
+            for j, other in enumerate(results):
+                self.assertEqual(result["agreement"][j], other["agreement"][i])
+        self.assertEqual(results[0]["agreement"][3], 1.0)
+
+
 if __name__ == "__main__":
     unittest.main()
@@ -0,0 +1,101 @@
+# ----------------------------------------------------------------------
+# Numenta Platform for Intelligent Computing (NuPIC)
+# Copyright (C) 2021, Numenta, Inc.  Unless you have an agreement
+# with Numenta, Inc., for a separate license for this software code, the
+# following terms and conditions apply:
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero Public License version 3 as
+# published by the Free Software Foundation.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.
+# See the GNU Affero Public License for more details.
+#
+# You should have received a copy of the GNU Affero Public License
+# along with this program.  If not, see http://www.gnu.org/licenses.
+#
+# http://numenta.org/licenses/
+# ----------------------------------------------------------------------
+import copy
+import math
+import unittest
+
+import torch
+from torch.utils.data import DataLoader, TensorDataset
+
+from nupic.research.frameworks.pytorch.lr_range_test import (
+    multi_lr_range_test,
+    suggest_lr_bounds,
+)
+
+
+def create_loader(num_batches=20, batch_size=16):
+    torch.manual_seed(18)
+    data = torch.randn(num_batches * batch_size, 8)
+    target = (data[:, 0] > 0).long()
+    return DataLoader(TensorDataset(data, target), batch_size=batch_size)
+
+
+class MultiLRRangeTest(unittest.TestCase):
+
+    def setUp(self):
+        torch.manual_seed(42)
+        self.model = torch.nn.Sequential(
+            torch.nn.Linear(8, 16), torch.nn.ReLU(), torch.nn.Linear(16, 2),
+        )
+        self.loader = create_loader()
+
+    def create_replicas(self):
+        return [
+            dict(name="sgd", model=copy.deepcopy(self.model),
+                 optimizer_args=dict(momentum=0.9), min_lr=0.001, max_lr=1.0),
+            dict(name="sgd_wd", model=copy.deepcopy(self.model),
+                 optimizer_args=dict(momentum=0.9, weight_decay=0.01),
+                 min_lr=0.01, max_lr=10.0),
+            dict(name="adam", model=copy.deepcopy(self.model),
+                 optimizer_class=torch.optim.Adam, min_lr=1e-4, max_lr=0.1),
+        ]
+
+    def test_curves(self):
+        results = multi_lr_range_test(self.create_replicas(), self.loader, "cpu")
+        self.assertEqual(list(results.keys()), ["sgd", "sgd_wd", "adam"])
+
+        sgd_wd = results["sgd_wd"]
+        self.assertEqual(len(sgd_wd["lr"]), 20)
+        self.assertEqual(len(sgd_wd["loss"]), 20)
+        self.assertAlmostEqual(sgd_wd["lr"][0], 0.01)
+        self.assertAlmostEqual(sgd_wd["lr"][-1], 10.0)
+        for result in results.values():
+            self.assertIsNotNone(result["max_lr"])
+            self.assertAlmostEqual(result["min_lr"], result["max_lr"] / 10)
+            self.assertGreaterEqual(result["max_lr"], result["lr"][0])
+            self.assertLessEqual(result["max_lr"], result["lr"][-1])
+
+    def test_replicas_are_independent(self):
+        """Training side by side gives the same curve as training alone"""
+        replicas = self.create_replicas()
+        results = multi_lr_range_test(replicas, self.loader, "cpu",
+                                      batches_in_epoch=10)
+        alone = multi_lr_range_test(self.create_replicas()[1:2], self.loader, "cpu",
+                                    batches_in_epoch=10)
+        self.assertEqual(len(results["sgd_wd"]["loss"]), 10)
+        self.assertEqual(results["sgd_wd"]["loss"], alone["sgd_wd"]["loss"])
+        self.assertEqual(results["sgd_wd"]["lr"], alone["sgd_wd"]["lr"])
+
+    def test_suggest_lr_bounds(self):
+        lrs = [0.1 * (i + 1) for i in range(10)]
+        losses = [1.0, 0.9, 0.7, 0.4, 0.3, 0.25, 0.3, 5.0, 50.0, float("nan")]
+        result = suggest_lr_bounds(lrs, losses, smoothing=0.0, min_lr_factor=20)
+        self.assertEqual(result["smoothed_loss"], losses[:7])
+        self.assertAlmostEqual(result["max_lr"], 0.6)
+        self.assertAlmostEqual(result["min_lr"], 0.03)
+        self.assertAlmostEqual(result["steepest_lr"], 0.4)
+
+        result = suggest_lr_bounds([0.1], [math.nan])
+        self.assertIsNone(result["max_lr"])
+
+
+if __name__ == "__main__":
+    unittest.main(verbosity=2)
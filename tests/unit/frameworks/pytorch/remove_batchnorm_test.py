@@ -25,7 +25,11 @@ import torch.nn.functional as F
 
 from nupic.research.frameworks.pytorch.model_compare import compare_models
 from nupic.research.frameworks.pytorch.models import LeSparseNet
-from nupic.research.frameworks.pytorch.remove_batchnorm import remove_batchnorm
+from nupic.research.frameworks.pytorch.remove_batchnorm import (
+    fold_batchnorm_conv,
+    fold_batchnorm_linear,
+    remove_batchnorm,
+)
 from nupic.torch.models.sparse_cnn import gsc_sparse_cnn
 from nupic.torch.modules.sparse_weights import rezero_weights
 
@@ -75,6 +79,15 @@ def train_randomly(model, in_channels=1, num_samples=20):
         model.apply(rezero_weights)
 
 
+def init_batchnorm(bn):
+    """Random batch norm statistics and affine parameters"""
+    nn.init.uniform_(bn.running_mean, -1.0, 1.0)
+    nn.init.uniform_(bn.running_var, 0.5, 1.5)
+    if bn.affine:
+        nn.init.uniform_(bn.weight, 0.5, 1.5)
+        nn.init.uniform_(bn.bias, -1.0, 1.0)
+
+
 class RemoveBatchnormTest(unittest.TestCase):
 
     def test_simple_cnn(self):
@@ -144,6 +157,30 @@ class RemoveBatchnormTest(unittest.TestCase):
         self.assertEqual(actual_modules, expected_modules)
         self.assertTrue(compare_models(model, model2, (3, 32, 32)))
 
+    def test_fold_without_bias(self):
+        """Layers without bias get the bias of the batch norm"""
+        for affine in (True, False):
+            for layer, bn, x, fold in (
+                (nn.Conv2d(3, 4, 3, bias=False), nn.BatchNorm2d(4, affine=affine),
+                 torch.randn(8, 3, 8, 8), fold_batchnorm_conv),
+                (nn.Linear(6, 4, bias=False), nn.BatchNorm1d(4, affine=affine),
+                 torch.randn(8, 6), fold_batchnorm_linear),
+            ):
+                init_batchnorm(bn)
+                model = nn.Sequential(layer, bn).eval()
+                folded = fold(layer, bn)
+                self.assertIsNotNone(folded.bias)
+                self.assertTrue(torch.allclose(folded(x), model(x), atol=1e-5))
+
+    def test_fold_affine_linear(self):
+        """The affine parameters of BatchNorm1d are folded into the linear layer"""
+        layer, bn = nn.Linear(6, 4), nn.BatchNorm1d(4)
+        init_batchnorm(bn)
+        model = nn.Sequential(layer, bn).eval()
+        x = torch.randn(8, 6)
+        folded = fold_batchnorm_linear(layer, bn)
+        self.assertTrue(torch.allclose(folded(x), model(x), atol=1e-5))
+
     def test_gsc(self):
         """
         Compare the GSC network after batchnorm is removed.
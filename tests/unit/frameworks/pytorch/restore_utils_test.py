@@ -28,12 +28,15 @@ from pathlib import Path
 
 import numpy as np
 import torch
+from torch.utils.data import DataLoader, TensorDataset
 
 from nupic.research.frameworks.pytorch.model_utils import (
+    evaluate_model,
     serialize_state_dict,
     set_random_seed,
 )
 from nupic.research.frameworks.pytorch.restore_utils import (
+    evaluate_checkpoints,
     get_linear_param_names,
     get_nonlinear_param_names,
     load_multi_state,
@@ -105,6 +108,20 @@ class RestoreUtilsTest1(unittest.TestCase):
     def tearDown(self):
         self.tempdir.cleanup()
 
+    def test_evaluate_checkpoints(self):
+        loader = DataLoader(TensorDataset(torch.rand(20, 1, 28, 28),
+                                          torch.randint(10, (20,))),
+                            batch_size=8)
+        expected = evaluate_model(self.model, loader, "cpu")
+
+        paths = [self.checkpoint_path] * 3
+        results = evaluate_checkpoints(MNISTSparseCNN(), paths, loader, "cpu",
+                                       models_per_pass=2)
+        self.assertEqual(list(results.keys()), [self.checkpoint_path])
+        result = results[self.checkpoint_path]
+        self.assertEqual(result["total_correct"], expected["total_correct"])
+        self.assertAlmostEqual(result["mean_loss"], expected["mean_loss"], places=5)
+
     def test_get_param_names(self):
 
         linear_params = get_linear_param_names(self.model)
@@ -0,0 +1,111 @@
+# ----------------------------------------------------------------------
+# Numenta Platform for Intelligent Computing (NuPIC)
+# Copyright (C) 2021, Numenta, Inc.  Unless you have an agreement
+# with Numenta, Inc., for a separate license for this software code, the
+# following terms and conditions apply:
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero Public License version 3 as
+# published by the Free Software Foundation.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.
+# See the GNU Affero Public License for more details.
+#
+# You should have received a copy of the GNU Affero Public License
+# along with this program.  If not, see http://www.gnu.org/licenses.
+#
+# http://numenta.org/licenses/
+# ----------------------------------------------------------------------
+
+import copy
+import unittest
+
+import torch
+import torch.nn.functional as F
+
+from nupic.research.frameworks.pytorch.modules import (
+    MaskedConv2d,
+    MaskedLinear,
+    maskedconv2d_init,
+    maskedlinear_init,
+)
+from nupic.research.frameworks.pytorch.modules.sgdw import (
+    SGDW,
+    MaskedSGDW,
+    get_weight_masks,
+)
+
+
+def create_model():
+    conv = MaskedConv2d(3, 8, 3, mask_mode="channel_to_channel")
+    maskedconv2d_init(conv, 0.5)
+    linear = MaskedLinear(8 * 6 * 6, 10)
+    maskedlinear_init(linear, 0.3)
+    return torch.nn.Sequential(conv, torch.nn.ReLU(), torch.nn.Flatten(), linear)
+
+
+class MaskedSGDWTest(unittest.TestCase):
+
+    def setUp(self):
+        torch.manual_seed(18)
+        self.model = create_model()
+        self.batches = [
+            (torch.randn(16, 3, 8, 8), torch.randint(10, (16,))) for _ in range(5)
+        ]
+
+    def train(self, model, optimizer, masks=None):
+        for x, target in self.batches:
+            optimizer.zero_grad()
+            F.cross_entropy(model(x), target).backward()
+            optimizer.step()
+            if masks is not None:
+                # rezero masked weights
+                with torch.no_grad():
+                    for p, mask in masks.items():
+                        p.mul_(mask)
+
+    def test_same_as_sgdw_and_rezero(self):
+        """
+        MaskedSGDW should give exactly the same weights as SGDW followed by
+        zeroing the masked weights.
+        """
+        for args in [
+            dict(lr=0.1),
+            dict(lr=0.1, momentum=0.9),
+            dict(lr=0.1, momentum=0.9, dampening=0.1, weight_decay=0),
+            dict(lr=0.1, momentum=0.9, nesterov=True, weight_decay=1e-3),
+        ]:
+            model1 = copy.deepcopy(self.model)
+            self.train(
+                model1, SGDW(model1.parameters(), **args), get_weight_masks(model1)
+            )
+
+            model2 = copy.deepcopy(self.model)
+            self.train(
+                model2,
+                MaskedSGDW(model2.parameters(), get_weight_masks(model2), **args)
+            )
+
+            for p1, p2 in zip(model1.parameters(), model2.parameters()):
+                self.assertTrue(torch.equal(p1, p2), args)
+
+    def test_masked_momentum(self):
+        """Masked weights should stay at zero and get no momentum"""
+        masks = get_weight_masks(self.model)
+        optimizer = MaskedSGDW(
+            self.model.parameters(), masks, lr=0.1, momentum=0.9
+        )
+        self.train(self.model, optimizer)
+
+        self.assertEqual(len(masks), 2)
+        for p, mask in masks.items():
+            mask = mask.expand_as(p) == 0
+            self.assertTrue((p[mask] == 0).all())
+            self.assertTrue((optimizer.state[p]["momentum_buffer"][mask] == 0).all())
+            self.assertTrue((p[~mask] != 0).all())
+
+
+if __name__ == "__main__":
+    unittest.main(verbosity=2)
@@ -0,0 +1,135 @@
+# ----------------------------------------------------------------------
+# Numenta Platform for Intelligent Computing (NuPIC)
+# Copyright (C) 2021, Numenta, Inc.  Unless you have an agreement
+# with Numenta, Inc., for a separate license for this software code, the
+# following terms and conditions apply:
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero Public License version 3 as
+# published by the Free Software Foundation.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.
+# See the GNU Affero Public License for more details.
+#
+# You should have received a copy of the GNU Affero Public License
+# along with this program.  If not, see http://www.gnu.org/licenses.
+#
+# http://numenta.org/licenses/
+# ----------------------------------------------------------------------
+
+import unittest
+
+import torch
+from torch.utils.data import Subset, TensorDataset
+from torchvision import transforms
+
+from nupic.research.frameworks.pytorch.dataset_utils import (
+    EpochBatchSampler,
+    EpochVariants,
+    ResizeBatch,
+    SharedTensorDataset,
+    create_epoch_loader,
+    has_random_transforms,
+)
+
+
+class TransformDataset(TensorDataset):
+    def __init__(self, *tensors, transform=None):
+        super().__init__(*tensors)
+        self.transform = transform
+
+    def __getitem__(self, index):
+        image, target = super().__getitem__(index)
+        return self.transform(image), target
+
+
+class SharedTensorDatasetTest(unittest.TestCase):
+
+    def setUp(self):
+        self.images = torch.rand(100, 1, 8, 8)
+        self.targets = torch.arange(100)
+        self.variants = EpochVariants(
+            defaults=dict(batch_size=10),
+            variants={
+                2: dict(batch_size=16, resolution=4),
+                4: dict(resolution=None, subset=0.5),
+                6: dict(subset=list(range(30))),
+            },
+        )
+
+    def test_variants(self):
+        self.assertEqual(self.variants(0), dict(batch_size=10))
+        self.assertEqual(self.variants(3), dict(batch_size=16, resolution=4))
+        self.assertEqual(self.variants(5), dict(batch_size=16, resolution=None,
+                                                subset=0.5))
+
+    def test_epoch_loader(self):
+        dataset = SharedTensorDataset.from_dataset(
+            TensorDataset(self.images, self.targets), batch_size=32,
+            batch_transform=ResizeBatch(self.variants),
+        )
+        self.assertTrue(dataset.tensors[0].is_shared())
+        self.assertTrue(torch.equal(dataset.tensors[0], self.images))
+
+        sampler = EpochBatchSampler(len(dataset), self.variants)
+        loader = create_epoch_loader(dataset, sampler)
+        expected = {0: (10, 10, 8), 2: (6, 16, 4), 4: (3, 16, 8), 6: (1, 16, 8)}
+        for epoch, (num_batches, batch_size, resolution) in expected.items():
+            self.assertEqual(sampler.num_batches(epoch), num_batches)
+            sampler.set_epoch(epoch)
+            batches = list(loader)
+            self.assertEqual(len(batches), num_batches)
+            for images, targets in batches:
+                self.assertEqual(images.shape, (batch_size, 1, resolution,
+                                                resolution))
+                if resolution == 8:
+                    self.assertTrue(torch.equal(images, self.images[targets]))
+
+        # Shuffling depends on the epoch only
+        sampler.set_epoch(1)
+        first = torch.cat([targets for _, targets in loader])
+        second = torch.cat([targets for _, targets in loader])
+        self.assertTrue(torch.equal(first, second))
+        self.assertEqual(len(first.unique()), 100)
+
+    def test_random_transforms(self):
+        dataset = TransformDataset(self.images, self.targets,
+                                   transform=lambda x: x + torch.rand_like(x))
+        self.assertTrue(has_random_transforms(dataset))
+        with self.assertRaises(ValueError):
+            SharedTensorDataset.from_dataset(dataset)
+        with self.assertWarns(UserWarning):
+            SharedTensorDataset.from_dataset(dataset,
+                                             allow_random_transforms=True)
+
+        # Detected from the transform names, even if the first sample is fixed
+        dataset = Subset(TransformDataset(
+            self.images, self.targets,
+            transform=transforms.Compose([transforms.RandomHorizontalFlip(p=0)]),
+        ), range(10))
+        self.assertTrue(has_random_transforms(dataset))
+
+        dataset = TransformDataset(
+            self.images, self.targets,
+            transform=transforms.Compose([transforms.Normalize((0.5,), (0.2,))]),
+        )
+        self.assertFalse(has_random_transforms(dataset))
+        SharedTensorDataset.from_dataset(dataset)
+
+    def test_replicas(self):
+        variants = EpochVariants(dict(batch_size=8))
+        indices = []
+        for rank in range(3):
+            sampler = EpochBatchSampler(100, variants, drop_last=False,
+                                        num_replicas=3, rank=rank)
+            batches = [batch.indices for batch in sampler]
+            self.assertEqual(len(batches), sampler.num_batches(0))
+            indices.append(torch.cat(batches))
+        self.assertEqual(len(torch.cat(indices).unique()), 100)
+        self.assertTrue(all(len(i) == 34 for i in indices))
+
+
+if __name__ == "__main__":
+    unittest.main()
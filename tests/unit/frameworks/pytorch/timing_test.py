@@ -0,0 +1,75 @@
+# ----------------------------------------------------------------------
+# Numenta Platform for Intelligent Computing (NuPIC)
+# Copyright (C) 2021, Numenta, Inc.  Unless you have an agreement
+# with Numenta, Inc., for a separate license for this software code, the
+# following terms and conditions apply:
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero Public License version 3 as
+# published by the Free Software Foundation.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.
+# See the GNU Affero Public License for more details.
+#
+# You should have received a copy of the GNU Affero Public License
+# along with this program.  If not, see http://www.gnu.org/licenses.
+#
+# http://numenta.org/licenses/
+# ----------------------------------------------------------------------
+
+import unittest
+
+import torch
+import torch.nn.functional as F
+from torch.utils.data import DataLoader, TensorDataset
+
+from nupic.research.frameworks.pytorch.model_utils import evaluate_model, train_model
+from nupic.research.frameworks.pytorch.timing import PhaseTimer
+
+
+class PhaseTimerTest(unittest.TestCase):
+
+    def setUp(self):
+        dataset = TensorDataset(torch.randn(64, 10), torch.randint(0, 3, (64,)))
+        self.loader = DataLoader(dataset, batch_size=8)
+        self.model = torch.nn.Sequential(
+            torch.nn.Linear(10, 3),
+            torch.nn.LogSoftmax(dim=1),
+        )
+
+    def test_train_model_phases(self):
+        timer = PhaseTimer()
+        optimizer = torch.optim.SGD(self.model.parameters(), lr=0.1)
+        train_model(self.model, self.loader, optimizer, "cpu", criterion=F.nll_loss,
+                    batches_in_epoch=6, timer=timer)
+
+        self.assertEqual(timer.num_batches, 6)
+        self.assertEqual(set(timer.times.keys()), {
+            "data_loading", "to_device", "forward", "backward",
+            "complexity_loss", "optimizer_step", "post_batch",
+        })
+
+        summary = timer.summary(prefix="train_time_")
+        phases_total = sum(v for k, v in summary.items()
+                           if k.endswith("_total") and k != "train_time_total")
+        self.assertAlmostEqual(summary["train_time_total"], phases_total)
+        self.assertLessEqual(summary["train_time_forward_p50"],
+                             summary["train_time_forward_p99"])
+
+    def test_evaluate_model_phases(self):
+        timer = PhaseTimer(percentiles=(50,))
+        evaluate_model(self.model, self.loader, "cpu", timer=timer)
+
+        self.assertEqual(timer.num_batches, 8)
+        summary = timer.summary()
+        self.assertIn("forward_p50", summary)
+        self.assertNotIn("forward_p90", summary)
+
+        timer.reset()
+        self.assertEqual(timer.num_batches, 0)
+
+
+if __name__ == "__main__":
+    unittest.main(verbosity=2)
@@ -0,0 +1,120 @@
+# ----------------------------------------------------------------------
+# Numenta Platform for Intelligent Computing (NuPIC)
+# Copyright (C) 2021, Numenta, Inc.  Unless you have an agreement
+# with Numenta, Inc., for a separate license for this software code, the
+# following terms and conditions apply:
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero Public License version 3 as
+# published by the Free Software Foundation.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.
+# See the GNU Affero Public License for more details.
+#
+# You should have received a copy of the GNU Affero Public License
+# along with this program.  If not, see http://www.gnu.org/licenses.
+#
+# http://numenta.org/licenses/
+# ----------------------------------------------------------------------
+
+import math
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+from torch.optim import SGD
+
+from nupic.research.frameworks.sigopt import LocalConnection
+from nupic.research.frameworks.sigopt.mixins import SGDParams
+from nupic.research.frameworks.sigopt.sigopt_experiment import SigOptExperiment
+
+SIGOPT_CONFIG = dict(
+    name="local_test",
+    parameters=[
+        dict(name="log_lr", type="double", bounds=dict(min=-6.0, max=0.0)),
+        dict(name="momentum", type="double", bounds=dict(min=0.0, max=0.99)),
+        dict(name="optimizer", type="categorical",
+             categorical_values=[dict(name="sgd"), dict(name="nesterov")]),
+        dict(name="batch_size", type="int", bounds=dict(min=16, max=256),
+             transformation="log"),
+    ],
+    metrics=[dict(name="mean_accuracy", objective="maximize")],
+    parallel_bandwidth=4,
+    observation_budget=30,
+)
+
+
+def accuracy(assignments):
+    return (1.0 - 0.05 * (assignments["log_lr"] + 2.0) ** 2
+            - 0.5 * (assignments["momentum"] - 0.9) ** 2)
+
+
+class SigOptSGDExperiment(SGDParams, SigOptExperiment):
+    pass
+
+
+class LocalConnectionTest(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_experiment_offline(self):
+        env = dict(SIGOPT_BACKEND="local", SIGOPT_LOCAL_DIR=self.tmp.name)
+        with mock.patch.dict(os.environ, env):
+            # Existing ids are created locally from the config
+            sigopt = SigOptSGDExperiment(experiment_id=1234,
+                                         sigopt_config=SIGOPT_CONFIG)
+            self.assertIsNone(sigopt.get_best_assignments())
+
+            config = dict(optimizer_class=SGD, optimizer_args=dict(lr=0.1))
+            suggestion = sigopt.get_next_suggestion()
+            sigopt.update_config_with_suggestion(config, suggestion)
+            self.assertEqual(config["optimizer_args"]["lr"],
+                             math.exp(suggestion.assignments["log_lr"]))
+
+            # Parallel suggestions stay open until observed
+            suggestions = [sigopt.get_next_suggestion() for _ in range(3)]
+            self.assertEqual(len(sigopt.open_suggestions()), 4)
+            for s in [suggestion] + suggestions:
+                value = accuracy(s.assignments)
+                sigopt.update_observation(
+                    s, values=[dict(name="mean_accuracy", value=value)])
+            self.assertEqual(len(sigopt.open_suggestions()), 0)
+
+            # State is shared through the local directory
+            sigopt = SigOptSGDExperiment(experiment_id=1234,
+                                         sigopt_config=SIGOPT_CONFIG)
+            self.assertEqual(sigopt.get_observation_count(), 4)
+            sigopt.create_training_run(sigopt.get_next_suggestion())
+            sigopt.create_checkpoint(0.5)
+            sigopt.delete_open_suggestions()
+            self.assertEqual(len(sigopt.open_suggestions()), 0)
+
+    def test_optimization(self):
+        conn = LocalConnection(self.tmp.name, seed=0)
+        experiment = conn.experiments().create(**SIGOPT_CONFIG)
+        self.assertEqual(experiment.id, 1)
+
+        for _ in range(25):
+            suggestion = conn.experiments(1).suggestions().create()
+            assignments = suggestion.assignments
+            self.assertIn(assignments["optimizer"], ["sgd", "nesterov"])
+            self.assertTrue(16 <= assignments["batch_size"] <= 256)
+            conn.experiments(1).observations().create(
+                suggestion=suggestion.id,
+                values=[dict(name="mean_accuracy", value=accuracy(assignments))]
+            )
+
+        best = conn.experiments(1).best_assignments().fetch().data[0]
+        self.assertGreater(best.values[0].value, 0.97)
+        self.assertEqual(conn.experiments(1).fetch().progress.observation_count, 25)
+
+
+if __name__ == "__main__":
+    unittest.main()
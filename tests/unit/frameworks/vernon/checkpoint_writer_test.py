@@ -0,0 +1,137 @@
+# ----------------------------------------------------------------------
+# Numenta Platform for Intelligent Computing (NuPIC)
+# Copyright (C) 2021, Numenta, Inc.  Unless you have an agreement
+# with Numenta, Inc., for a separate license for this software code, the
+# following terms and conditions apply:
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero Public License version 3 as
+# published by the Free Software Foundation.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.
+# See the GNU Affero Public License for more details.
+#
+# You should have received a copy of the GNU Affero Public License
+# along with this program.  If not, see http://www.gnu.org/licenses.
+#
+# http://numenta.org/licenses/
+# ----------------------------------------------------------------------
+
+import io
+import os
+import pickle
+import tempfile
+import unittest
+
+import torch
+
+from nupic.research.frameworks.pytorch.model_utils import deserialize_state_dict
+from nupic.research.frameworks.vernon.checkpoint_writer import (
+    CheckpointWriter,
+    StateDictSnapshot,
+    get_checkpoint_file,
+    get_latest_checkpoint,
+    list_checkpoints,
+)
+
+
+class CheckpointWriterTest(unittest.TestCase):
+
+    def test_save_and_restore(self):
+        with tempfile.TemporaryDirectory() as checkpoint_dir:
+            saved = []
+            writer = CheckpointWriter(
+                checkpoint_dir=checkpoint_dir,
+                on_saved=lambda epoch, path: saved.append((epoch, path)),
+            )
+            for epoch in range(1, 4):
+                writer.save(epoch, {"current_epoch": epoch, "model": b"\x00" * 10})
+            writer.close()
+
+            self.assertEqual([epoch for epoch, _ in saved], [1, 2, 3])
+            self.assertEqual(len(list_checkpoints(checkpoint_dir)), 3)
+
+            latest = get_latest_checkpoint(checkpoint_dir)
+            self.assertEqual(latest, get_checkpoint_file(checkpoint_dir, 3))
+            with open(latest, mode="rb") as f:
+                state = pickle.load(f)
+            self.assertEqual(state["current_epoch"], 3)
+
+            # No temporary files are left behind
+            for _, path in saved:
+                self.assertFalse(os.path.exists(f"{path}.tmp"))
+
+    def test_state_dict_snapshot(self):
+        model = torch.nn.Sequential(torch.nn.Linear(4, 4), torch.nn.BatchNorm1d(4))
+        optimizer = torch.optim.SGD(model.parameters(), lr=0.1, momentum=0.9)
+        model(torch.rand(8, 4)).sum().backward()
+        optimizer.step()
+        expected = {k: v.clone() for k, v in model.state_dict().items()}
+
+        with tempfile.TemporaryDirectory() as checkpoint_dir:
+            writer = CheckpointWriter(checkpoint_dir=checkpoint_dir)
+            writer.save(1, {"current_epoch": 1,
+                            "model": StateDictSnapshot(model.state_dict()),
+                            "optimizer": StateDictSnapshot(optimizer.state_dict())})
+            # Training continues while the checkpoint is serialized
+            with torch.no_grad():
+                for param in model.parameters():
+                    param.add_(1.0)
+            writer.close()
+
+            with open(get_latest_checkpoint(checkpoint_dir), mode="rb") as f:
+                state = pickle.load(f)
+
+        with io.BytesIO(state["model"]) as buffer:
+            model_state = deserialize_state_dict(buffer)
+        self.assertEqual(model_state.keys(), expected.keys())
+        for name, value in expected.items():
+            self.assertTrue(torch.equal(model_state[name], value))
+        self.assertEqual(model_state._metadata, model.state_dict()._metadata)
+
+        with io.BytesIO(state["optimizer"]) as buffer:
+            optimizer.load_state_dict(deserialize_state_dict(buffer))
+
+    def test_keep_checkpoints_num(self):
+        with tempfile.TemporaryDirectory() as checkpoint_dir:
+            writer = CheckpointWriter(checkpoint_dir=checkpoint_dir,
+                                      keep_checkpoints_num=2)
+            for epoch in range(5):
+                writer.save(epoch, {"current_epoch": epoch})
+            writer.close()
+
+            epochs = [epoch for epoch, _ in list_checkpoints(checkpoint_dir)]
+            self.assertEqual(epochs, [3, 4])
+
+    def test_ignore_incomplete_checkpoints(self):
+        with tempfile.TemporaryDirectory() as checkpoint_dir:
+            self.assertIsNone(get_latest_checkpoint(checkpoint_dir))
+
+            # Simulate a checkpoint interrupted before the rename
+            os.makedirs(os.path.join(checkpoint_dir, "checkpoint_7"))
+            with open(get_checkpoint_file(checkpoint_dir, 7) + ".tmp", "wb") as f:
+                f.write(b"partial")
+            self.assertIsNone(get_latest_checkpoint(checkpoint_dir))
+
+    def test_write_error_is_raised(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            # Use a regular file as checkpoint directory to force a failure
+            checkpoint_dir = os.path.join(tmp_dir, "file")
+            with open(checkpoint_dir, "w") as f:
+                f.write("")
+            writer = CheckpointWriter(checkpoint_dir=checkpoint_dir)
+            writer.save(1, {"current_epoch": 1})
+            with self.assertRaises(RuntimeError):
+                writer.close()
+
+            # Only logged when closing after another error
+            writer = CheckpointWriter(checkpoint_dir=checkpoint_dir)
+            writer.save(1, {"current_epoch": 1})
+            with self.assertLogs(level="ERROR"):
+                writer.close(raise_error=False)
+
+
+if __name__ == "__main__":
+    unittest.main(verbosity=2)
@@ -0,0 +1,117 @@
+# ----------------------------------------------------------------------
+# Numenta Platform for Intelligent Computing (NuPIC)
+# Copyright (C) 2021, Numenta, Inc.  Unless you have an agreement
+# with Numenta, Inc., for a separate license for this software code, the
+# following terms and conditions apply:
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero Public License version 3 as
+# published by the Free Software Foundation.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.
+# See the GNU Affero Public License for more details.
+#
+# You should have received a copy of the GNU Affero Public License
+# along with this program.  If not, see http://www.gnu.org/licenses.
+#
+# http://numenta.org/licenses/
+# ----------------------------------------------------------------------
+
+import unittest
+
+import torch
+
+from nupic.research.frameworks.vernon.mixins.cutmix import (
+    CutMix,
+    cutmix_batch,
+    cutmix_single_box,
+    soft_cross_entropy,
+)
+
+
+class BaseExperiment(object):
+    def setup_experiment(self, config):
+        self.device = torch.device("cpu")
+        self.num_classes = 10
+        self.model = torch.nn.Linear(1, 1)
+
+
+class CutMixExperiment(CutMix, BaseExperiment):
+    pass
+
+
+class CutMixTest(unittest.TestCase):
+
+    def setUp(self):
+        torch.manual_seed(42)
+
+    def test_cutmix_batch(self):
+        # Each image is filled with its index in the batch
+        data = torch.arange(16, dtype=torch.float).view(16, 1, 1, 1)
+        data = data.expand(16, 3, 20, 24).contiguous()
+
+        mixed, rand_index, lam = cutmix_batch(data)
+        self.assertEqual(mixed.shape, data.shape)
+        self.assertEqual(lam.shape, (16, 1))
+
+        for i in range(16):
+            image = mixed[i]
+            patch = image != i
+            if rand_index[i] != i:
+                # Pixels either come from the image itself or from its pair
+                self.assertTrue((image[patch] == rand_index[i]).all())
+                # Lambda matches the ratio of pixels kept
+                kept = 1. - patch[0].float().mean()
+                self.assertAlmostEqual(lam[i].item(), kept.item(), places=5)
+
+            # The patch is a rectangle
+            rows = patch[0].any(dim=1).nonzero()
+            cols = patch[0].any(dim=0).nonzero()
+            if len(rows):
+                box = patch[0, rows.min():rows.max() + 1, cols.min():cols.max() + 1]
+                self.assertTrue(box.all())
+
+    def test_cutmix_prob(self):
+        data = torch.rand(32, 3, 8, 8)
+        mixed, _, lam = cutmix_batch(data.clone(), cutmix_prob=0.0)
+        self.assertTrue(torch.equal(mixed, data))
+        self.assertTrue((lam == 1.).all())
+
+    def test_cutmix_single_box(self):
+        data = torch.arange(16, dtype=torch.float).view(16, 1, 1, 1)
+        data = data.expand(16, 3, 20, 24).contiguous()
+
+        mixed, rand_index, lam = cutmix_single_box(data)
+        patches = mixed != torch.arange(16).view(16, 1, 1, 1)
+        shuffled = rand_index != torch.arange(16)
+
+        # The same box is pasted on every shuffled image
+        box = patches[shuffled.nonzero()[0, 0], 0]
+        self.assertTrue((patches[shuffled, 0] == box).all())
+        self.assertAlmostEqual(lam, 1. - box.float().mean().item(), places=5)
+
+    def test_transform_targets(self):
+        for per_sample in (False, True):
+            with self.subTest(cutmix_per_sample=per_sample):
+                exp = CutMixExperiment()
+                exp.setup_experiment(dict(cutmix_per_sample=per_sample))
+                data = torch.rand(32, 3, 16, 16)
+                target = torch.randint(10, (32,))
+
+                _, new_target = exp.transform_data_to_device(
+                    data, target, exp.device, False)
+                self.assertEqual(new_target.shape, (32, 10))
+                self.assertTrue(torch.allclose(new_target.sum(dim=1),
+                                               torch.ones(32)))
+                self.assertTrue((new_target.argmax(dim=1) == target).any())
+
+                output = torch.randn(32, 10, requires_grad=True)
+                loss = exp.error_loss(output, new_target)
+                self.assertTrue(torch.allclose(
+                    loss, soft_cross_entropy(output, new_target)))
+
+
+if __name__ == "__main__":
+    unittest.main(verbosity=2)
@@ -0,0 +1,235 @@
+# ----------------------------------------------------------------------
+# Numenta Platform for Intelligent Computing (NuPIC)
+# Copyright (C) 2021, Numenta, Inc.  Unless you have an agreement
+# with Numenta, Inc., for a separate license for this software code, the
+# following terms and conditions apply:
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero Public License version 3 as
+# published by the Free Software Foundation.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.
+# See the GNU Affero Public License for more details.
+#
+# You should have received a copy of the GNU Affero Public License
+# along with this program.  If not, see http://www.gnu.org/licenses.
+#
+# http://numenta.org/licenses/
+# ----------------------------------------------------------------------
+
+import logging
+import unittest
+
+import torch
+import torch.nn.functional as F
+
+from nupic.research.frameworks.vernon.mixins.cutmix import CutMix
+from nupic.research.frameworks.vernon.mixins.knowledge_distillation import (
+    KnowledgeDistillation,
+)
+from nupic.research.frameworks.vernon.mixins.maxup import (
+    MaxupPerSample,
+    MaxupStandard,
+    score_replicas,
+)
+
+
+def simple_model():
+    return torch.nn.Sequential(
+        torch.nn.Flatten(),
+        torch.nn.Linear(3 * 4 * 4, 5),
+    )
+
+
+class BaseExperiment(object):
+    def setup_experiment(self, config):
+        self.device = torch.device("cpu")
+        self.logger = logging.getLogger(__name__)
+        self.num_classes = 5
+        self.model = simple_model()
+        self._loss_function = config.get("loss_function", F.cross_entropy)
+
+    def transform_data_to_device(self, data, target, device, non_blocking):
+        return data.to(device), target.to(device)
+
+    def error_loss(self, output, target, reduction="mean"):
+        return F.cross_entropy(output, target, reduction=reduction)
+
+
+class MaxupStandardExperiment(MaxupStandard, BaseExperiment):
+    pass
+
+
+class MaxupPerSampleExperiment(MaxupPerSample, BaseExperiment):
+    pass
+
+
+class MaxupKDExperiment(MaxupPerSample, KnowledgeDistillation, BaseExperiment):
+    pass
+
+
+class MaxupCutMixExperiment(MaxupStandard, CutMix, BaseExperiment):
+    pass
+
+
+def replica_losses(model, data, target):
+    """Reference: score each replica with a separate forward pass"""
+    with torch.no_grad():
+        return torch.stack([
+            F.cross_entropy(model(data[:, i]), target, reduction="none")
+            for i in range(data.shape[1])
+        ], dim=1)
+
+
+class MaxupTest(unittest.TestCase):
+
+    def setUp(self):
+        torch.manual_seed(42)
+        self.data = torch.randn(8, 3, 3, 4, 4)
+        self.target = torch.randint(5, (8,))
+
+    def test_score_replicas(self):
+        exp = MaxupStandardExperiment()
+        exp.setup_experiment({})
+        expected = replica_losses(exp.model, self.data, self.target)
+        for chunk_size in [None, 1, 5, 24]:
+            losses = score_replicas(exp.model, self.data, self.target,
+                                    chunk_size=chunk_size)
+            self.assertEqual(losses.shape, (8, 3))
+            self.assertTrue(torch.allclose(losses, expected, atol=1e-6))
+
+        losses = score_replicas(
+            exp.model, self.data, self.target,
+            lambda output, target: F.cross_entropy(output, target,
+                                                   reduction="none"))
+        self.assertTrue(torch.allclose(losses, expected, atol=1e-6))
+
+    def test_score_replicas_batch_norm(self):
+        """One chunk per replica normalizes each replica on its own"""
+        model = torch.nn.Sequential(simple_model(), torch.nn.BatchNorm1d(5))
+        model.train()
+        expected = replica_losses(model, self.data, self.target)
+        losses = score_replicas(model, self.data, self.target, chunk_size=8)
+        self.assertTrue(torch.allclose(losses, expected, atol=1e-5))
+
+        losses = score_replicas(model, self.data, self.target)
+        self.assertFalse(torch.allclose(losses, expected, atol=1e-5))
+
+    def test_maxup_standard(self):
+        exp = MaxupStandardExperiment()
+        exp.setup_experiment(dict(maxup_chunk_size=4))
+        expected = replica_losses(exp.model, self.data, self.target)
+        worst = expected.mean(dim=0).argmax()
+
+        data, target = exp.transform_data_to_device(
+            self.data, self.target, exp.device, False)
+        self.assertTrue(torch.equal(data, self.data[:, worst]))
+        self.assertTrue(torch.equal(target, self.target))
+
+    def test_maxup_loss_function(self):
+        """Replicas are scored with the configured loss function"""
+        def negative_cross_entropy(output, target, reduction="mean"):
+            return -F.cross_entropy(output, target, reduction=reduction)
+
+        exp = MaxupStandardExperiment()
+        exp.setup_experiment(dict(loss_function=negative_cross_entropy))
+        expected = replica_losses(exp.model, self.data, self.target)
+        best = expected.mean(dim=0).argmin()
+
+        data, _ = exp.transform_data_to_device(self.data, self.target,
+                                               exp.device, False)
+        self.assertTrue(torch.equal(data, self.data[:, best]))
+
+    def test_maxup_reuse_output(self):
+        exp = MaxupStandardExperiment()
+        exp.setup_experiment(dict(maxup_reuse_output=True))
+        exp.model.train()
+        expected = replica_losses(exp.model, self.data, self.target)
+        worst = expected.mean(dim=0).argmax()
+
+        forwards = []
+        exp.model.register_forward_hook(lambda *args: forwards.append(1))
+        data, target = exp.transform_data_to_device(
+            self.data, self.target, exp.device, False)
+        self.assertTrue(torch.equal(data, self.data[:, worst]))
+        self.assertEqual(len(forwards), 3)
+
+        # The training step reuses the output computed while scoring
+        output = exp.model(data)
+        self.assertEqual(len(forwards), 4)
+        exp.error_loss(output, target).backward()
+        grads = [p.grad.clone() for p in exp.model.parameters()]
+
+        exp.model.zero_grad()
+        exp.error_loss(exp.model(data), target).backward()
+        for grad, p in zip(grads, exp.model.parameters()):
+            self.assertTrue(torch.allclose(grad, p.grad))
+        self.assertNotIn("forward", exp.model.__dict__)
+
+    def test_maxup_reuse_output_other_data(self):
+        """The model runs normally if a later mixin changes the data"""
+        exp = MaxupStandardExperiment()
+        exp.setup_experiment(dict(maxup_reuse_output=True))
+        exp.model.train()
+        data, _ = exp.transform_data_to_device(
+            self.data, self.target, exp.device, False)
+
+        other = data.clone()
+        other[0] = 0
+        with torch.no_grad():
+            expected = exp.model[1](other.flatten(1))
+            self.assertTrue(torch.allclose(exp.model(other), expected))
+        self.assertNotIn("forward", exp.model.__dict__)
+
+    def test_maxup_per_sample(self):
+        exp = MaxupPerSampleExperiment()
+        exp.setup_experiment({})
+        expected = replica_losses(exp.model, self.data, self.target)
+        worst = expected.argmax(dim=1)
+
+        data, _ = exp.transform_data_to_device(self.data, self.target,
+                                               exp.device, False)
+        for i in range(len(self.target)):
+            self.assertTrue(torch.equal(data[i], self.data[i, worst[i]]))
+
+    def test_maxup_knowledge_distillation(self):
+        """Replicas are scored with the hard labels, the teacher targets the
+        selected variant"""
+        exp = MaxupKDExperiment()
+        exp.setup_experiment(dict(teacher_model_class=simple_model))
+        exp.model.train()
+        expected = replica_losses(exp.model, self.data, self.target)
+        worst = expected.argmax(dim=1)
+
+        data, target = exp.transform_data_to_device(self.data, self.target,
+                                                    exp.device, False)
+        selected = self.data[torch.arange(8), worst]
+        self.assertTrue(torch.equal(data, selected))
+        with torch.no_grad():
+            teacher_target = F.softmax(exp.teacher_models[0](selected), dim=1)
+        self.assertTrue(torch.allclose(target, teacher_target))
+
+        loss = exp.error_loss(exp.model(data), target)
+        self.assertTrue(torch.isfinite(loss))
+
+    def test_maxup_cutmix(self):
+        """Replicas are scored with the hard labels, cutmix mixes the selected
+        variant"""
+        exp = MaxupCutMixExperiment()
+        exp.setup_experiment({})
+        exp.model.train()
+
+        data, target = exp.transform_data_to_device(self.data.clone(),
+                                                    self.target, exp.device, False)
+        self.assertEqual(data.shape, (8, 3, 4, 4))
+        self.assertEqual(target.shape, (8, 5))
+        self.assertTrue(torch.allclose(target.sum(dim=1), torch.ones(8)))
+
+        loss = exp.error_loss(exp.model(data), target)
+        self.assertTrue(torch.isfinite(loss))
+
+
+if __name__ == "__main__":
+    unittest.main(verbosity=2)
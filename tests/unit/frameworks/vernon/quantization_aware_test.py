@@ -0,0 +1,144 @@
+# ----------------------------------------------------------------------
+# Numenta Platform for Intelligent Computing (NuPIC)
+# Copyright (C) 2021, Numenta, Inc.  Unless you have an agreement
+# with Numenta, Inc., for a separate license for this software code, the
+# following terms and conditions apply:
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero Public License version 3 as
+# published by the Free Software Foundation.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.
+# See the GNU Affero Public License for more details.
+#
+# You should have received a copy of the GNU Affero Public License
+# along with this program.  If not, see http://www.gnu.org/licenses.
+#
+# http://numenta.org/licenses/
+# ----------------------------------------------------------------------
+
+import io
+import os
+import pickle
+import tempfile
+import unittest
+from collections import OrderedDict
+
+import torch
+import torch.nn as nn
+from nupic.torch.modules import KWinners, KWinners2d
+from torch.quantization import DeQuantStub, QuantStub, fuse_modules
+
+from nupic.research.frameworks.pytorch.model_utils import serialize_state_dict
+from nupic.research.frameworks.quantization import (
+    QuantizedKWinners,
+    QuantizedKWinners2d,
+)
+from nupic.research.frameworks.vernon.mixins.quantization_aware import (
+    QuantizationAware,
+    convert_to_quantized,
+    prepare_for_qat,
+)
+
+
+class KWinnersNet(nn.Sequential):
+    def __init__(self):
+        super().__init__(OrderedDict([
+            ("quant", QuantStub()),
+            ("conv", nn.Conv2d(1, 8, 3)),
+            ("bn", nn.BatchNorm2d(8)),
+            ("kwinners2d", KWinners2d(channels=8, percent_on=0.25,
+                                      k_inference_factor=1.0, local=True)),
+            ("flatten", nn.Flatten()),
+            ("linear", nn.Linear(8 * 6 * 6, 32)),
+            ("kwinners", KWinners(n=32, percent_on=0.25, k_inference_factor=1.5,
+                                  break_ties=True, relu=True)),
+            ("classifier", nn.Linear(32, 4)),
+            ("dequant", DeQuantStub()),
+        ]))
+
+    def fuse_model(self, fuse_relu=False):
+        fuse_modules(self, [["conv", "bn"]], inplace=True)
+
+
+class BaseExperiment(object):
+    @classmethod
+    def create_model(cls, config, device):
+        return KWinnersNet()
+
+
+class QATExperiment(QuantizationAware, BaseExperiment):
+    pass
+
+
+def train_qat(model, steps=10):
+    optimizer = torch.optim.SGD(model.parameters(), lr=0.01)
+    model.train()
+    for _ in range(steps):
+        data = torch.rand(16, 1, 8, 8)
+        target = torch.randint(4, (16,))
+        optimizer.zero_grad()
+        torch.nn.functional.cross_entropy(model(data), target).backward()
+        optimizer.step()
+    return model.eval()
+
+
+class QuantizationAwareTest(unittest.TestCase):
+
+    def setUp(self):
+        torch.manual_seed(42)
+        torch.backends.quantized.engine = "fbgemm"
+
+    def test_convert_and_script(self):
+        model = KWinnersNet()
+        prepare_for_qat(model, quantize_weights_per_channel=True, fuse_relu=False)
+        train_qat(model)
+
+        quantized = convert_to_quantized(model)
+        self.assertIsInstance(quantized.kwinners, QuantizedKWinners)
+        self.assertIsInstance(quantized.kwinners2d, QuantizedKWinners2d)
+
+        data = torch.rand(8, 1, 8, 8)
+        out = quantized(data)
+        scripted = torch.jit.script(quantized)
+        self.assertTrue(torch.equal(scripted(data), out))
+
+        # The scripted model can be saved and loaded without the python classes
+        with io.BytesIO() as buffer:
+            torch.jit.save(scripted, buffer)
+            buffer.seek(0)
+            loaded = torch.jit.load(buffer)
+        self.assertTrue(torch.equal(loaded(data), out))
+
+        # The int8 model predicts like the fake quantized model
+        data = torch.rand(32, 1, 8, 8)
+        agreement = quantized(data).argmax(dim=1) == model(data).argmax(dim=1)
+        self.assertGreaterEqual(agreement.float().mean().item(), 0.9)
+
+    def test_create_qat_model(self):
+        config = dict(quantize_weights_per_channel=False)
+        trained = train_qat(QATExperiment.create_qat_model(config))
+
+        with tempfile.TemporaryDirectory() as tmpdir:
+            checkpoint_file = os.path.join(tmpdir, "checkpoint.pt")
+            with io.BytesIO() as buffer:
+                serialize_state_dict(buffer, trained.state_dict())
+                state = dict(model=buffer.getvalue())
+            with open(checkpoint_file, "wb") as f:
+                pickle.dump(state, f)
+
+            model = QATExperiment.create_qat_model(config, checkpoint_file)
+
+        self.assertFalse(model.training)
+        data = torch.rand(8, 1, 8, 8)
+        self.assertTrue(torch.equal(model(data), trained(data)))
+
+        expected = convert_to_quantized(trained)(data)
+        scripted = torch.jit.script(convert_to_quantized(model))
+        self.assertTrue(torch.equal(scripted(data), expected))
+
+
+if __name__ == "__main__":
+    unittest.main(verbosity=2)
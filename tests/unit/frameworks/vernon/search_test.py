@@ -0,0 +1,110 @@
+# ----------------------------------------------------------------------
+# Numenta Platform for Intelligent Computing (NuPIC)
+# Copyright (C) 2021, Numenta, Inc.  Unless you have an agreement
+# with Numenta, Inc., for a separate license for this software code, the
+# following terms and conditions apply:
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero Public License version 3 as
+# published by the Free Software Foundation.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.
+# See the GNU Affero Public License for more details.
+#
+# You should have received a copy of the GNU Affero Public License
+# along with this program.  If not, see http://www.gnu.org/licenses.
+#
+# http://numenta.org/licenses/
+# ----------------------------------------------------------------------
+
+import os
+import tempfile
+import unittest
+
+from nupic.research.frameworks.vernon.search import (
+    GridSearch,
+    LocalTrialScheduler,
+    RandomSearch,
+    SequentialSearch,
+    TrialsCollection,
+)
+
+
+class ExpandTrialsTest(unittest.TestCase):
+
+    def test_nested_grid_search(self):
+        config = dict(
+            lr=GridSearch([0.1, 0.2]),
+            lr_scheduler_args=dict(
+                schedulers=dict(
+                    first=dict(gamma=GridSearch([0.5, 0.7, 0.9])),
+                ),
+            ),
+        )
+        trials = TrialsCollection.expand_trials(config)
+        self.assertEqual(len(trials), 6)
+
+        values = {(t["lr"], t["lr_scheduler_args"]["schedulers"]["first"]["gamma"])
+                  for t in trials}
+        self.assertEqual(values, {(lr, gamma)
+                                  for lr in [0.1, 0.2]
+                                  for gamma in [0.5, 0.7, 0.9]})
+
+    def test_nested_random_and_sequential_search(self):
+        config = dict(
+            seed=SequentialSearch([10, 20, 30]),
+            optimizer_args=dict(
+                nested=dict(momentum=RandomSearch([0.8, 0.9])),
+            ),
+        )
+        trials = TrialsCollection.expand_trials(config, num_samples=3)
+        self.assertEqual([t["seed"] for t in trials], [10, 20, 30])
+        for t in trials:
+            self.assertIn(t["optimizer_args"]["nested"]["momentum"], [0.8, 0.9])
+
+
+class LocalTrialSchedulerTest(unittest.TestCase):
+
+    def test_run_and_restore(self):
+        with tempfile.TemporaryDirectory() as local_dir:
+            config = dict(
+                experiment_name="search_test",
+                local_dir=local_dir,
+                value=GridSearch([1, 2, 3, 4]),
+            )
+
+            # Use `dict` as trial function returning a copy of the config
+            scheduler = LocalTrialScheduler(config, max_concurrent=2,
+                                            cpus_per_trial=1, trial_fn=dict)
+            self.assertEqual(scheduler.count(scheduler.PENDING), 4)
+
+            # Simulate a sweep killed after starting the first trial
+            with scheduler.db:
+                scheduler.db.execute("UPDATE trials SET status=? WHERE id=0",
+                                     (scheduler.RUNNING,))
+            scheduler.close()
+
+            scheduler = LocalTrialScheduler(config, max_concurrent=2,
+                                            cpus_per_trial=1, trial_fn=dict)
+            self.assertEqual(scheduler.count(scheduler.PENDING), 4)
+            scheduler.run()
+            self.assertEqual(scheduler.count(scheduler.COMPLETED), 4)
+
+            results = scheduler.get_results()
+            self.assertEqual(sorted(r["result"]["value"] for r in results),
+                             [1, 2, 3, 4])
+            scheduler.close()
+
+            # Nothing left to run after restoring a finished sweep
+            scheduler = LocalTrialScheduler(config, trial_fn=dict)
+            scheduler.run()
+            self.assertEqual(scheduler.count(scheduler.COMPLETED), 4)
+            scheduler.close()
+            self.assertTrue(os.path.exists(os.path.join(local_dir,
+                                                        "search_test.db")))
+
+
+if __name__ == "__main__":
+    unittest.main(verbosity=2)
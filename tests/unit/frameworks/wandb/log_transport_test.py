@@ -0,0 +1,188 @@
+# ----------------------------------------------------------------------
+# Numenta Platform for Intelligent Computing (NuPIC)
+# Copyright (C) 2021, Numenta, Inc.  Unless you have an agreement
+# with Numenta, Inc., for a separate license for this software code, the
+# following terms and conditions apply:
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero Public License version 3 as
+# published by the Free Software Foundation.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.
+# See the GNU Affero Public License for more details.
+#
+# You should have received a copy of the GNU Affero Public License
+# along with this program.  If not, see http://www.gnu.org/licenses.
+#
+# http://numenta.org/licenses/
+# ----------------------------------------------------------------------
+
+import json
+import os
+import tempfile
+import threading
+import time
+import unittest
+from unittest import mock
+
+from nupic.research.frameworks.wandb.log_transport import (
+    LocalDirectorySink,
+    LogTransport,
+    WandbSink,
+    create_sink,
+)
+
+
+class StubSink(object):
+    """Collects the records, optionally waiting for an event before each write."""
+
+    def __init__(self, wait_event=None, fail=False):
+        self.batches = []
+        self.wait_event = wait_event
+        self.fail = fail
+        self.closed = False
+
+    def write(self, records):
+        if self.wait_event is not None:
+            self.wait_event.wait()
+        if self.fail:
+            raise IOError("Connection refused")
+        self.batches.append(records)
+
+    def close(self):
+        self.closed = True
+
+    @property
+    def records(self):
+        return [record for batch in self.batches for record in batch]
+
+
+class LogTransportTest(unittest.TestCase):
+
+    def test_records_in_order(self):
+        sink = StubSink()
+        transport = LogTransport(sink, flush_interval=10.0)
+        for step in range(5):
+            transport.log({"loss": step}, step=step)
+        self.assertTrue(transport.flush(timeout=5))
+        transport.close()
+
+        self.assertTrue(sink.closed)
+        self.assertEqual(sink.records,
+                         [(step, {"loss": step}, None) for step in range(5)])
+
+    def test_coalesce_by_step(self):
+        sink = StubSink()
+        transport = LogTransport(sink, flush_interval=10.0)
+        transport.log({"loss": 1.0}, step=0)
+        transport.log({"acc": 0.5}, step=0)
+        transport.log({"loss": 0.5}, step=1)
+        transport.log({"norm": 2.0}, commit=False)
+        transport.log({"lr": 0.1}, commit=False)
+        transport.log({"loss": 0.1})
+        transport.close()
+
+        self.assertEqual(sink.records, [
+            (0, {"loss": 1.0, "acc": 0.5}, None),
+            (1, {"loss": 0.5}, None),
+            (None, {"norm": 2.0, "lr": 0.1, "loss": 0.1}, None),
+        ])
+
+    def test_slow_sink_does_not_block(self):
+        """Logging returns immediately while the sink is stalled."""
+        event = threading.Event()
+        sink = StubSink(wait_event=event)
+        transport = LogTransport(sink, max_queue_size=3, flush_interval=0.0,
+                                 block_timeout=0.0)
+
+        start = time.time()
+        for step in range(10):
+            transport.log({"loss": step}, step=step)
+        self.assertLess(time.time() - start, 1.0)
+        self.assertFalse(transport.flush(timeout=0.1))
+
+        event.set()
+        with self.assertLogs(LogTransport.__module__, "WARNING") as logs:
+            transport.close()
+
+        # The oldest records are dropped when the queue is full
+        steps = [step for step, _, _ in sink.records]
+        self.assertEqual(len(steps) + transport.dropped, 10)
+        self.assertGreater(transport.dropped, 0)
+        self.assertEqual(steps, sorted(steps))
+        self.assertEqual(steps[-1], 9)
+        self.assertIn(f"Dropped {transport.dropped} records", logs.output[0])
+
+    def test_full_queue_waits(self):
+        """By default a full queue waits for the sink instead of dropping"""
+        sink = StubSink()
+        write = sink.write
+        sink.write = lambda records: (time.sleep(0.01), write(records))
+        transport = LogTransport(sink, max_queue_size=2, max_batch_size=1,
+                                 flush_interval=0.0)
+        for step in range(20):
+            transport.log({"loss": step}, step=step)
+        transport.close()
+
+        self.assertEqual(transport.dropped, 0)
+        self.assertEqual([step for step, _, _ in sink.records], list(range(20)))
+
+    def test_sink_errors(self):
+        sink = StubSink(fail=True)
+        transport = LogTransport(sink, flush_interval=0.0)
+        transport.log({"loss": 1.0})
+        self.assertTrue(transport.flush(timeout=5))
+        self.assertEqual(transport.errors, 1)
+
+        # The transport keeps running after an error
+        sink.fail = False
+        transport.log({"loss": 0.5})
+        transport.close()
+        self.assertEqual(sink.records, [(None, {"loss": 0.5}, None)])
+        self.assertRaises(RuntimeError, transport.log, {"loss": 0.1})
+
+    def test_local_directory(self):
+        with tempfile.TemporaryDirectory() as tmpdir, \
+                mock.patch.dict(os.environ, {"WANDB_MODE": "disabled"}):
+            sink = create_sink(os.path.join(tmpdir, "wandb_local"))
+            self.assertIsInstance(sink, LocalDirectorySink)
+
+            transport = LogTransport(sink)
+            transport.log({"loss": 0.5, "name": object()}, step=3)
+            transport.close()
+
+            with open(sink.path) as f:
+                lines = [json.loads(line) for line in f]
+            self.assertEqual(len(lines), 1)
+            self.assertEqual(lines[0]["_step"], 3)
+            self.assertEqual(lines[0]["loss"], 0.5)
+            self.assertIsInstance(lines[0]["name"], str)
+
+    def test_create_sink(self):
+        installed = mock.patch("importlib.util.find_spec", return_value=object())
+        with tempfile.TemporaryDirectory() as tmpdir, installed:
+            # Offline mode and missing credentials are handled by wandb
+            for mode in ("offline", "online", ""):
+                with mock.patch.dict(os.environ, {"WANDB_MODE": mode}):
+                    self.assertIsInstance(create_sink(tmpdir), WandbSink)
+
+            # Disabled through the environment or the wandb.init arguments
+            with mock.patch.dict(os.environ, {"WANDB_MODE": "disabled"}):
+                self.assertIsInstance(create_sink(tmpdir), LocalDirectorySink)
+            with mock.patch.dict(os.environ, {"WANDB_MODE": ""}):
+                sink = create_sink(tmpdir, dict(mode="disabled"))
+                self.assertIsInstance(sink, LocalDirectorySink)
+                sink.close()
+
+        # Not installed
+        with tempfile.TemporaryDirectory() as tmpdir, \
+                mock.patch("importlib.util.find_spec", return_value=None):
+            sink = create_sink(tmpdir)
+            self.assertIsInstance(sink, LocalDirectorySink)
+            sink.close()
+
+
+if __name__ == "__main__":
+    unittest.main(verbosity=2)
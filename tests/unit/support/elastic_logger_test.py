@@ -0,0 +1,239 @@
+# ----------------------------------------------------------------------
+# Numenta Platform for Intelligent Computing (NuPIC)
+# Copyright (C) 2021, Numenta, Inc.  Unless you have an agreement
+# with Numenta, Inc., for a separate license for this software code, the
+# following terms and conditions apply:
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero Public License version 3 as
+# published by the Free Software Foundation.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.
+# See the GNU Affero Public License for more details.
+#
+# You should have received a copy of the GNU Affero Public License
+# along with this program.  If not, see http://www.gnu.org/licenses.
+#
+# http://numenta.org/licenses/
+# ----------------------------------------------------------------------
+
+import json
+import os
+import tempfile
+import threading
+import time
+import unittest
+from datetime import datetime
+from unittest import mock
+
+from nupic.research.support.elastic_logger import (
+    AsyncIndexer,
+    ElasticsearchLogger,
+    FileSink,
+    get_git_info,
+)
+
+
+class StubSink(object):
+    """Collects the documents, failing while `fail` is set."""
+
+    def __init__(self, fail=False, wait_event=None):
+        self.documents = []
+        self.fail = fail
+        self.wait_event = wait_event
+        self.calls = 0
+
+    def write(self, documents):
+        self.calls += 1
+        if self.wait_event is not None:
+            self.wait_event.wait()
+        if self.fail:
+            raise ConnectionError("Cluster unreachable")
+        self.documents.extend(documents)
+
+    def close(self):
+        pass
+
+
+class PartialFailureSink(object):
+    """
+    Index keyed by `_id` like elasticsearch, failing after writing half of the
+    first batch.
+    """
+
+    def __init__(self):
+        self.index = {}
+        self.calls = 0
+
+    def write(self, documents):
+        self.calls += 1
+        if self.calls == 1:
+            documents = documents[:len(documents) // 2]
+        for doc in documents:
+            doc = dict(doc)
+            self.index[doc.pop("_id")] = doc
+        if self.calls == 1:
+            raise ConnectionError("Connection reset")
+
+    def close(self):
+        pass
+
+
+class AsyncIndexerTest(unittest.TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.spill_path = os.path.join(self.tmpdir.name, "spill.jsonl")
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def test_write_batches(self):
+        sink = StubSink()
+        indexer = AsyncIndexer(sink, self.spill_path, max_batch_size=4)
+        for i in range(10):
+            indexer.put({"i": i})
+        indexer.close(timeout=5)
+
+        self.assertEqual(sink.documents, [{"i": i} for i in range(10)])
+        self.assertFalse(os.path.exists(self.spill_path))
+
+    def test_unreachable_sink(self):
+        """Documents are spilled to disk and replayed when the sink is back."""
+        sink = StubSink(fail=True)
+        indexer = AsyncIndexer(sink, self.spill_path, max_retries=2,
+                               retry_interval=0.01)
+        for i in range(5):
+            indexer.put({"i": i})
+        self.assertTrue(indexer.wait(timeout=5))
+        self.assertEqual(indexer.spilled, 5)
+        self.assertEqual(sink.calls, 2)
+
+        # New documents go after the spilled ones
+        indexer.put({"i": 5})
+        sink.fail = False
+        time.sleep(0.05)
+        indexer.close(timeout=5)
+
+        self.assertEqual(sink.documents, [{"i": i} for i in range(6)])
+        self.assertEqual(indexer.spilled, 0)
+
+    def test_replay_on_start(self):
+        """A new indexer writes the documents spilled by a previous one."""
+        indexer = AsyncIndexer(StubSink(fail=True), self.spill_path, max_retries=1)
+        indexer.put({"i": 0})
+        indexer.close(timeout=5)
+        self.assertEqual(indexer.spilled, 1)
+
+        sink = StubSink()
+        indexer = AsyncIndexer(sink, self.spill_path)
+        indexer.close(timeout=5)
+        self.assertEqual(sink.documents, [{"i": 0}])
+
+    def test_replay_interrupted(self):
+        """Documents being replayed when the process is killed are not lost."""
+        indexer = AsyncIndexer(StubSink(fail=True), self.spill_path, max_retries=1)
+        for i in range(3):
+            indexer.put({"_id": f"trial_{i}", "i": i})
+        indexer.close(timeout=5)
+
+        # Killed after the spill file was moved aside, before writing it
+        os.replace(self.spill_path, self.spill_path + ".replaying")
+        indexer = AsyncIndexer(StubSink(fail=True), self.spill_path, max_retries=1)
+        indexer.put({"_id": "trial_3", "i": 3})
+        indexer.close(timeout=5)
+        self.assertEqual(indexer.spilled, 4)
+
+        sink = StubSink()
+        indexer = AsyncIndexer(sink, self.spill_path)
+        indexer.close(timeout=5)
+        self.assertEqual(sink.documents,
+                         [{"_id": f"trial_{i}", "i": i} for i in range(4)])
+        self.assertEqual(indexer.spilled, 0)
+        self.assertEqual(os.listdir(self.tmpdir.name), [])
+
+    def test_put_never_blocks(self):
+        event = threading.Event()
+        sink = StubSink(wait_event=event)
+        indexer = AsyncIndexer(sink, self.spill_path, max_queue_size=5,
+                               max_batch_size=2)
+        start = time.time()
+        for i in range(20):
+            indexer.put({"i": i})
+            indexer.flush()
+        self.assertLess(time.time() - start, 1.0)
+        self.assertGreater(indexer.spilled, 0)
+
+        event.set()
+        indexer.close(timeout=5)
+        indexer = AsyncIndexer(sink, self.spill_path)
+        indexer.close(timeout=5)
+        self.assertEqual(sorted(doc["i"] for doc in sink.documents), list(range(20)))
+
+    def test_partial_failure(self):
+        """Retrying a partially indexed batch does not duplicate documents."""
+        sink = PartialFailureSink()
+        indexer = AsyncIndexer(sink, self.spill_path, retry_interval=0.01)
+        for i in range(6):
+            indexer.put({"_id": f"trial_{i}", "i": i})
+        indexer.close(timeout=5)
+
+        self.assertEqual(sink.calls, 2)
+        self.assertEqual(sink.index, {f"trial_{i}": {"i": i} for i in range(6)})
+
+    def test_spill_serializer(self):
+        indexer = AsyncIndexer(StubSink(fail=True), self.spill_path, max_retries=1)
+        timestamp = datetime(2020, 1, 2, 3, 4, 5)
+        indexer.put({"_id": "a", "timestamp": timestamp})
+        with self.assertLogs("nupic.research.support.elastic_logger", "ERROR"):
+            indexer.put({"_id": "b", "value": object()})
+            indexer.close(timeout=5)
+
+        # Dates are serialized as elasticsearch would, unknown types are dropped
+        with open(self.spill_path) as f:
+            documents = [json.loads(line) for line in f]
+        self.assertEqual(documents, [{"_id": "a", "timestamp": timestamp.isoformat()}])
+
+
+GIT_INFO = dict(remote="git@github.com:numenta/nupic.research.git",
+                branch="master", sha="abc", user="user", root="/")
+
+
+class ElasticsearchLoggerTest(unittest.TestCase):
+
+    @mock.patch("nupic.research.support.elastic_logger.get_git_info",
+                return_value=GIT_INFO)
+    def test_file_sink(self, _):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            path = os.path.join(tmpdir, "index.jsonl")
+            config = dict(name="test", path=tmpdir, elasticsearch_index="test",
+                          elasticsearch_sink=FileSink(path))
+            logger = ElasticsearchLogger(config, tmpdir)
+            for i in range(3):
+                logger.on_result(dict(timestamp=time.time(), trial_id="abc_00000",
+                                      training_iteration=i))
+            logger.flush()
+            logger.close()
+
+            with open(path) as f:
+                documents = [json.loads(line) for line in f]
+            self.assertEqual([doc["training_iteration"] for doc in documents],
+                             [0, 1, 2])
+            self.assertEqual([doc["_id"] for doc in documents],
+                             ["abc_00000_0", "abc_00000_1", "abc_00000_2"])
+            self.assertEqual(documents[0]["git"]["sha"], "abc")
+            self.assertEqual(documents[0]["logdir"], os.path.basename(tmpdir))
+
+    def test_git_info_cached(self):
+        get_git_info.cache_clear()
+        with mock.patch("subprocess.check_output", return_value=b"abc") as git:
+            get_git_info()
+            get_git_info()
+        self.assertEqual(git.call_count, 5)
+        get_git_info.cache_clear()
+
+
+if __name__ == "__main__":
+    unittest.main(verbosity=2)
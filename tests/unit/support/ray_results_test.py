@@ -0,0 +1,151 @@
+# ----------------------------------------------------------------------
+# Numenta Platform for Intelligent Computing (NuPIC)
+# Copyright (C) 2021, Numenta, Inc.  Unless you have an agreement
+# with Numenta, Inc., for a separate license for this software code, the
+# following terms and conditions apply:
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero Public License version 3 as
+# published by the Free Software Foundation.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.
+# See the GNU Affero Public License for more details.
+#
+# You should have received a copy of the GNU Affero Public License
+# along with this program.  If not, see http://www.gnu.org/licenses.
+#
+# http://numenta.org/licenses/
+# ----------------------------------------------------------------------
+
+import json
+import os
+import tempfile
+import unittest
+
+import numpy as np
+
+from nupic.research.support.ray_results import ResultsStore
+from nupic.research.support.ray_utils import load_ray_tune_experiments
+
+
+def write_results(path, rows, mode="a"):
+    with open(path, mode) as f:
+        for row in rows:
+            f.write(json.dumps(row) + "\n")
+
+
+def create_experiment(experiment_path, num_trials, num_iterations):
+    """Create a synthetic ray tune results tree"""
+    checkpoints = []
+    for i in range(num_trials):
+        tag = f"{i}_lr={0.1 * (i + 1):.1f}"
+        logdir = os.path.join("/remote/results", f"Trainable_{i:05d}_{tag}")
+        os.makedirs(os.path.join(experiment_path, os.path.basename(logdir)))
+        write_results(
+            os.path.join(experiment_path, os.path.basename(logdir), "result.json"),
+            [dict(training_iteration=t + 1, mean_accuracy=i + t / 10.0,
+                  config=dict(lr=0.1 * (i + 1)))
+             for t in range(num_iterations)]
+        )
+        checkpoints.append(dict(logdir=logdir, experiment_tag=tag,
+                                trial_id=f"{i:05d}"))
+
+    with open(os.path.join(experiment_path,
+                           "experiment_state-2021-01-01.json"), "w") as f:
+        json.dump(dict(checkpoints=checkpoints), f)
+
+    return [os.path.join(experiment_path, os.path.basename(c["logdir"]))
+            for c in checkpoints]
+
+
+class ResultsStoreTest(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.experiment_path = self.tmp.name
+        self.trial_dirs = create_experiment(self.experiment_path,
+                                            num_trials=4, num_iterations=3)
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_table(self):
+        store = ResultsStore(self.experiment_path, num_workers=2)
+        self.assertEqual(store.refresh(), 12)
+
+        table = store.table()
+        self.assertEqual(len(table["trial"]), 12)
+        self.assertIn("config/lr", table)
+        np.testing.assert_allclose(table["mean_accuracy"][:3], [0.0, 0.1, 0.2])
+        self.assertEqual(table["experiment_tag"][0], "0_lr=0.1")
+
+        table = store.table(["training_iteration", "missing"])
+        self.assertEqual(list(table.keys()), ["training_iteration", "missing"])
+        self.assertTrue(np.isnan(table["missing"]).all())
+
+    def test_incremental_refresh(self):
+        store = ResultsStore(self.experiment_path, num_workers=1)
+        store.refresh()
+        self.assertEqual(store.refresh(), 0)
+
+        # A partially written line is only read once it is complete
+        result_file = os.path.join(self.trial_dirs[0], "result.json")
+        write_results(result_file, [dict(training_iteration=4, new_metric=1.0)])
+        with open(result_file, "a") as f:
+            f.write('{"training_iteration": 5,')
+        self.assertEqual(store.refresh(), 1)
+        with open(result_file, "a") as f:
+            f.write(' "new_metric": 2.0}\n')
+        self.assertEqual(store.refresh(), 1)
+
+        trial = os.path.basename(self.trial_dirs[0])
+        self.assertEqual([r["training_iteration"] for r in store.results(trial)],
+                         [1, 2, 3, 4, 5])
+        table = store.table(["trial", "new_metric"])
+        values = table["new_metric"][table["trial"] == trial]
+        np.testing.assert_allclose(values, [np.nan, np.nan, np.nan, 1.0, 2.0])
+
+        # Rewritten result files are read from the beginning
+        write_results(result_file, [dict(training_iteration=1)], mode="w")
+        self.assertEqual(store.refresh(), 1)
+        self.assertEqual(len(store.results(trial)), 1)
+
+    def test_persisted_index(self):
+        index_file = os.path.join(self.experiment_path, ".results_index.pkl")
+        ResultsStore(self.experiment_path).refresh()
+        self.assertFalse(os.path.exists(index_file))
+
+        ResultsStore(self.experiment_path, persist=True).refresh()
+        self.assertTrue(os.path.exists(index_file))
+
+        # Only new lines are parsed by the next session
+        write_results(os.path.join(self.trial_dirs[1], "result.json"),
+                      [dict(training_iteration=4)])
+        store = ResultsStore(self.experiment_path, persist=True)
+        self.assertEqual(store.refresh(), 1)
+        self.assertEqual(len(store.table()["trial"]), 13)
+
+        store = ResultsStore(self.experiment_path)
+        self.assertEqual(store.refresh(), 13)
+
+    def test_load_ray_tune_experiments(self):
+        states = load_ray_tune_experiments(self.experiment_path, load_results=True,
+                                           num_workers=2)
+        self.assertEqual(len(states), 1)
+        checkpoints = states[0]["checkpoints"]
+        self.assertEqual(len(checkpoints), 4)
+        self.assertEqual([r["mean_accuracy"] for r in checkpoints[2]["results"]],
+                         [2.0, 2.1, 2.2])
+
+        # The experiment directory is only written to when asked
+        index_file = os.path.join(self.experiment_path, ".results_index.pkl")
+        self.assertFalse(os.path.exists(index_file))
+        load_ray_tune_experiments(self.experiment_path, load_results=True,
+                                  num_workers=1, persist=True)
+        self.assertTrue(os.path.exists(index_file))
+
+
+if __name__ == "__main__":
+    unittest.main()